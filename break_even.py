@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+"Take the express if..." break-even tables for local/express corridors.
+
+The difference matrices from compare_lines.py say how much faster the express
+is once you are on it, but a rider standing on the platform has a different
+question: should I take whichever train comes first, or let the local go and
+wait for the express?
+
+For every origin/destination pair a corridor's two routes share, and every
+hour of the day, this module computes the expected total time (wait + ride)
+of a rider arriving at a uniformly random moment in that hour under two
+strategies:
+
+- first train: board the first local or express train that goes to the
+  destination
+- wait for express: board the first express train that goes to the
+  destination
+
+Both are exact over the timetable. Each train's departure at the origin and
+arrival at the destination are taken from the trip itself, so overtakes,
+short turns and uneven headways are all accounted for. The expected time is
+integrated in closed form between consecutive departures, for all
+departures at once. Both strategies are scored over the same riders: those
+arriving in the hour no later than the last express departure (after it,
+there is no express to wait for).
+
+The same trips give the rule of thumb riders actually use: the express is
+worth waiting for if it leaves within break_even_wait_min minutes of the
+local (the difference in average ride times for trains leaving in that
+service-day hour).
+"""
+import gtfs_kit as gk
+import numpy as np
+import pandas as pd
+
+import compare_lines as cl
+from feed_index import get_stop_times_table, trip_mask
+from service_calendar import parse_service_date, resolve_service_ids
+
+
+# Single-character codes used by get_decision_table()
+DECISION_CODES = {'express': 'E', 'first': 'F', 'either': '='}
+
+
+def _station_times(feed, mask, station_ids):
+    """
+    Departure and arrival times of the selected trips at each station.
+
+    Returns (departures, arrivals): float arrays of shape
+    (n_trips, len(station_ids)) in seconds, NaN where a trip does not stop.
+    """
+    stop_times = get_stop_times_table(feed)
+    trip_idx = stop_times['trip_idx'].to_numpy()
+    stations = stop_times['station_id'].to_numpy().astype(object)
+
+    rows = np.flatnonzero(
+        (trip_idx >= 0) & mask[np.maximum(trip_idx, 0)] & np.isin(stations, station_ids)
+    )
+    trips = np.unique(trip_idx[rows])
+    trip_rows = np.searchsorted(trips, trip_idx[rows])
+    positions = {station_id: i for i, station_id in enumerate(station_ids)}
+    columns = np.array([positions[s] for s in stations[rows]], dtype=np.int64)
+
+    departures = np.full((len(trips), len(station_ids)), np.nan)
+    arrivals = np.full((len(trips), len(station_ids)), np.nan)
+    departures[trip_rows, columns] = stop_times['departure_s'].to_numpy()[rows]
+    arrivals[trip_rows, columns] = stop_times['arrival_s'].to_numpy()[rows]
+    return departures, arrivals
+
+
+def _mean_ride_minutes(departures, arrivals, hours):
+    """Average ride minutes of the trains leaving in each service-day hour (NaN if none)."""
+    rides = pd.Series((arrivals - departures) / 60.0).groupby(departures // 3600).mean()
+    return rides.reindex(hours).to_numpy()
+
+
+def expected_total_minutes(departures, arrivals, hour_starts, until=None):
+    """
+    Expected wait + ride time for riders who board the next train.
+
+    A rider arriving at time t boards the first departure at or after t and
+    reaches the destination at that train's arrival time. Riders arriving
+    between two consecutive departures all board the later one, so the total
+    time integrates in closed form over each gap. Riders arrive uniformly
+    within each hour; those arriving after the last departure (or after
+    until) are ignored.
+
+    Parameters:
+    -----------
+    departures : np.ndarray
+        Departure times from the origin, in seconds
+    arrivals : np.ndarray
+        Arrival times at the destination of the same trains, in seconds
+    hour_starts : np.ndarray
+        Start of each hour window, in seconds
+    until : float, optional
+        Ignore riders arriving after this time (seconds), so that two
+        strategies can be scored over the same riders
+
+    Returns:
+    --------
+    np.ndarray
+        Expected total minutes for each hour window (NaN if no rider in the
+        window can board a train)
+    """
+    # Ties go to the train that arrives first
+    order = np.lexsort((arrivals, departures))
+    departures = departures[order]
+    arrivals = arrivals[order]
+    previous = np.concatenate(([-np.inf], departures[:-1]))
+
+    window_start = np.asarray(hour_starts, dtype=float)[:, None]
+    window_end = window_start + 3600
+    if until is not None:
+        window_end = np.minimum(window_end, until)
+    lo = np.clip(previous, window_start, window_end)
+    hi = np.clip(departures, window_start, window_end)
+
+    # Integral of (arrival - t) dt over each rider interval [lo, hi]
+    covered = (hi - lo).sum(axis=1)
+    total = ((hi - lo) * arrivals - (hi ** 2 - lo ** 2) / 2).sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(covered > 0, total / np.maximum(covered, 1) / 60.0, np.nan)
+
+
+def calculate_break_even_table(feed, local_route, express_route, service_id='Weekday',
+                               date=None, shared_stops=None, hours=None, tolerance=0.5):
+    """
+    Compare "take the first train" with "wait for the express" for a corridor.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    local_route : str
+        Route ID for the local train (e.g., 'C')
+    express_route : str
+        Route ID for the express train (e.g., 'A')
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
+    shared_stops : list, optional
+        Stations to compare, as (stop_id, stop_name) tuples. Defaults to
+        compare_lines.get_shared_express_stops().
+    hours : list of int, optional
+        Service-day hours to include (e.g., [7, 8, 9]). Defaults to every
+        hour in which both routes leave the origin for the destination.
+    tolerance : float, default=0.5
+        Differences smaller than this many minutes are reported as 'either'
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per direction, origin, destination and hour, with columns:
+        - direction_id, origin_id, origin, destination_id, destination, hour
+        - first_train_min: Expected total minutes taking the first train
+        - wait_express_min: Expected total minutes waiting for the express
+          (both over riders arriving in the hour no later than the last
+          express departure)
+        - saving_min: first_train_min - wait_express_min (positive = waiting
+          for the express is faster on average)
+        - break_even_wait_min: Average local ride minus average express ride
+          of the trains leaving the origin that service-day hour (wait for
+          the express if it leaves within this many minutes of the local)
+        - decision: 'express', 'first' or 'either'
+    """
+    if shared_stops is None:
+        shared_stops = cl.get_shared_express_stops(feed, local_route, express_route, 1, service_id, date)
+
+    columns = ['direction_id', 'origin_id', 'origin', 'destination_id', 'destination', 'hour',
+               'first_train_min', 'wait_express_min', 'saving_min', 'break_even_wait_min', 'decision']
+    if not shared_stops:
+        return pd.DataFrame(columns=columns)
+
+    station_ids = [stop_id for stop_id, _ in shared_stops]
+    station_names = [name for _, name in shared_stops]
+    service_ids = resolve_service_ids(feed, service_id, date)
+
+    results = []
+    for direction_id in (0, 1):
+        local_dep, local_arr = _station_times(
+            feed, trip_mask(feed, local_route, direction_id, service_ids), station_ids)
+        express_dep, express_arr = _station_times(
+            feed, trip_mask(feed, express_route, direction_id, service_ids), station_ids)
+
+        for i in range(len(station_ids)):
+            for j in range(len(station_ids)):
+                if i == j:
+                    continue
+
+                # Trains that leave the origin and later reach the destination
+                with np.errstate(invalid='ignore'):
+                    local_ok = local_arr[:, j] > local_dep[:, i]
+                    express_ok = express_arr[:, j] > express_dep[:, i]
+                if not local_ok.any() or not express_ok.any():
+                    continue
+
+                l_dep, l_arr = local_dep[local_ok, i], local_arr[local_ok, j]
+                e_dep, e_arr = express_dep[express_ok, i], express_arr[express_ok, j]
+
+                pair_hours = np.intersect1d(l_dep // 3600, e_dep // 3600).astype(np.int64)
+                if hours is not None:
+                    pair_hours = pair_hours[np.isin(pair_hours, hours)]
+                if len(pair_hours) == 0:
+                    continue
+
+                # Score both strategies over the riders who still have an express
+                hour_starts = pair_hours * 3600
+                last_express = e_dep.max()
+                first_train = expected_total_minutes(
+                    np.concatenate((l_dep, e_dep)), np.concatenate((l_arr, e_arr)), hour_starts, last_express)
+                wait_express = expected_total_minutes(e_dep, e_arr, hour_starts, last_express)
+
+                results.append(pd.DataFrame({
+                    'direction_id': direction_id,
+                    'origin_id': station_ids[i],
+                    'origin': station_names[i],
+                    'destination_id': station_ids[j],
+                    'destination': station_names[j],
+                    'hour': pair_hours,
+                    'first_train_min': first_train,
+                    'wait_express_min': wait_express,
+                    'saving_min': first_train - wait_express,
+                    'break_even_wait_min': (_mean_ride_minutes(l_dep, l_arr, pair_hours) -
+                                            _mean_ride_minutes(e_dep, e_arr, pair_hours)),
+                }))
+
+    if not results:
+        return pd.DataFrame(columns=columns)
+
+    table = pd.concat(results, ignore_index=True)
+    # Hours whose express service ends right at the start have no riders to compare
+    table = table[table['saving_min'].notna()].reset_index(drop=True)
+    saving = table['saving_min'].to_numpy()
+    table['decision'] = np.where(saving > tolerance, 'express',
+                                 np.where(saving < -tolerance, 'first', 'either'))
+    return table[columns]
+
+
+def get_decision_table(table, direction_id=None):
+    """
+    Pivot a break-even table into one row per origin/destination pair.
+
+    Parameters:
+    -----------
+    table : pd.DataFrame
+        Output of calculate_break_even_table()
+    direction_id : int, optional
+        Only include this direction
+
+    Returns:
+    --------
+    pd.DataFrame
+        Indexed by (direction_id, origin, destination) in station order, with
+        one column per hour holding 'E' (wait for the express), 'F' (take the
+        first train), '=' (either) or '' (no comparison that hour)
+    """
+    if direction_id is not None:
+        table = table[table['direction_id'] == direction_id]
+    if table.empty:
+        return pd.DataFrame()
+
+    keys = ['direction_id', 'origin', 'destination']
+    codes = table.assign(code=table['decision'].map(DECISION_CODES))
+    decisions = codes.set_index(keys + ['hour'])['code'].unstack('hour', fill_value='')
+    row_order = pd.MultiIndex.from_frame(table[keys].drop_duplicates())
+    return decisions.reindex(row_order)
+
+
+def print_decision_table(table, local_route, express_route, service_id='Weekday'):
+    """
+    Print the compact decision grid for both directions.
+
+    Parameters:
+    -----------
+    table : pd.DataFrame
+        Output of calculate_break_even_table()
+    local_route : str
+        Route ID for the local train
+    express_route : str
+        Route ID for the express train
+    service_id : str, default='Weekday'
+        Service ID (for the header)
+    """
+    print("="*80)
+    print(f"{local_route} Train vs {express_route} Train - Take the First Train or Wait for the Express?")
+    print(f"{service_id}")
+    print("="*80)
+    print(f"E = wait for the {express_route}   F = take the first train   = = either   (blank = no comparison)")
+
+    for direction_id in (0, 1):
+        decisions = get_decision_table(table, direction_id)
+        if decisions.empty:
+            continue
+
+        labels = [f"{origin} -> {destination}" for _, origin, destination in decisions.index]
+        width = max(len(label) for label in labels)
+        hours = list(decisions.columns)
+
+        print()
+        print(f"Direction {direction_id}")
+        print(f"{'':<{width}}  " + ''.join(f'{hour % 24:<3}' for hour in hours))
+        for label, (_, row) in zip(labels, decisions.iterrows()):
+            print(f"{label:<{width}}  " + ''.join(f'{row[hour] or ".":<3}' for hour in hours))
+
+    if not table.empty:
+        counts = table['decision'].value_counts()
+        print()
+        print(f"Wait for the {express_route}: {counts.get('express', 0)} of {len(table)} pair-hours, "
+              f"take the first train: {counts.get('first', 0)}, either: {counts.get('either', 0)}")
+
+
+def export_break_even(table, local_route, express_route, service_id='Weekday', output_dir='.'):
+    """
+    Export a break-even table to CSV.
+
+    Returns:
+    --------
+    str
+        Path to the exported CSV file
+    """
+    import os
+
+    filename = f'{local_route}_vs_{express_route}_break_even_{service_id}.csv'
+    filepath = os.path.join(output_dir, filename)
+    table.to_csv(filepath, index=False)
+    return filepath
+
+
+def build_break_even_tables(feed, pairs=None, service_id='Weekday', date=None, hours=None,
+                            export=True, verbose=True, output_dir='.'):
+    """
+    Build break-even tables for many corridors.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    pairs : list of (str, str), optional
+        (local_route, express_route) pairs. Defaults to
+        compare_lines.CORRIDOR_PAIRS. Pairs with a route missing from the
+        feed are skipped.
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze. If given, overrides service_id.
+    hours : list of int, optional
+        Service-day hours to include
+    export : bool, default=True
+        Whether to export each table to CSV
+    verbose : bool, default=True
+        Whether to print each corridor's decision grid
+    output_dir : str, default='.'
+        Directory for exported CSV files
+
+    Returns:
+    --------
+    dict
+        Dictionary mapping (local_route, express_route) -> break-even table
+    """
+    if pairs is None:
+        pairs = cl.CORRIDOR_PAIRS
+
+    feed_routes = set(feed.trips['route_id'])
+    service_label = service_id if date is None else parse_service_date(date).strftime('%Y%m%d')
+
+    tables = {}
+    for local_route, express_route in pairs:
+        if local_route not in feed_routes or express_route not in feed_routes:
+            if verbose:
+                print(f"Skipping {local_route} vs {express_route} - not found in feed")
+            continue
+
+        table = calculate_break_even_table(feed, local_route, express_route, service_id, date, hours=hours)
+        tables[(local_route, express_route)] = table
+
+        if verbose:
+            print_decision_table(table, local_route, express_route, service_label)
+            print()
+        if export:
+            export_break_even(table, local_route, express_route, service_label, output_dir)
+
+    return tables
+
+
+if __name__ == "__main__":
+    print(__doc__)
+
+    feed = gk.read_feed("gtfs_subway.zip", dist_units="m")
+
+    # C vs A, 6 AM to 11 PM
+    table = calculate_break_even_table(feed, 'C', 'A', 'Weekday', hours=list(range(6, 23)))
+    print_decision_table(table, 'C', 'A', 'Weekday')
+    print(f"\nExported to: {export_break_even(table, 'C', 'A', 'Weekday')}")
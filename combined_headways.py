@@ -26,10 +26,55 @@ import gtfs_kit as gk
 import pandas as pd
 from collections import defaultdict
 from datetime import datetime, timedelta
+import numpy as np
+from feed_index import get_trip_departures, get_trip_table, resolve_branch, trip_mask
+from service_calendar import describe_service, service_mask
+from service_timeline import get_calendar_day_departures, get_stitched_headways_by_hour, service_break_mask
+
+
+def _get_departures(feed, mask, stop_id=None, date=None, all_services_mask=None):
+    """
+    Departures for the selected trips, sorted by time.
+
+    Without a date, departure_s is the service-day time of the trips in mask.
+    With a date, departures come from the stitched timeline for that calendar
+    day (trips in all_services_mask that actually run then), departure_s is
+    seconds after midnight, the last row is the first departure after the
+    following midnight, and service_date and timeline_s are kept for
+    service_break_mask().
+    """
+    if date is None:
+        return get_trip_departures(feed, mask, stop_id)
+
+    departures = get_calendar_day_departures(feed, date, stop_id=stop_id, mask=all_services_mask)
+    return pd.DataFrame({
+        'trip_id': departures['trip_id'].to_numpy(),
+        'departure_s': departures['day_s'].to_numpy(),
+        'service_date': departures['service_date'].to_numpy(),
+        'timeline_s': departures['timeline_s'].to_numpy(),
+    })
+
+
+def _excluded_gaps(departures, exclude_first_last, date=None):
+    """
+    Which gaps between consecutive departures exclude_first_last drops.
+
+    Without a date these are the first and last headway of the service
+    period. On a stitched timeline (date given) they are the gaps across the
+    overnight break in service (service_timeline.service_break_mask()).
+    Element i is the gap between rows i and i + 1.
+    """
+    skip = np.zeros(max(len(departures) - 1, 0), dtype=bool)
+    if not exclude_first_last or len(skip) == 0:
+        return skip
+    if date is not None:
+        return service_break_mask(departures)
+    skip[[0, -1]] = True
+    return skip
 
 
 def get_headway_dist(feed, direction_id, *route_ids, service_id='Weekday',
-                     stop_id=None, exclude_first_last=True):
+                     stop_id=None, exclude_first_last=True, date=None):
     """
     Get headway distribution DataFrame for one or more routes.
 
@@ -78,7 +123,18 @@ def get_headway_dist(feed, direction_id, *route_ids, service_id='Weekday',
     exclude_first_last : bool, default=True
         If True, excludes the first and last headway of each service period to
         avoid boundary effects (e.g., the long gap between last train of the day
-        and first train of the next day appearing as a "headway").
+        and first train of the next day appearing as a "headway"). With a date,
+        excludes the gaps across the overnight break in service instead (see
+        service_timeline.service_break_mask()).
+
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225' or '2024-12-25'). If given,
+        overrides service_id with the services that run on that date according
+        to calendar.txt and calendar_dates.txt (so holidays resolve correctly),
+        and headways are measured on the stitched timeline for that day (see
+        service_timeline.py): trips after midnight from the previous service
+        day are included, and exclude_first_last drops the gaps across the
+        overnight break in service instead of the first and last headway.
 
     Returns:
     --------
@@ -96,7 +152,9 @@ def get_headway_dist(feed, direction_id, *route_ids, service_id='Weekday',
             - route_ids (list): List of route IDs analyzed
             - direction_id (int): Direction ID used
             - direction_name (str): Human-readable direction name
-            - service_id (str): Service pattern analyzed
+            - service_id (str): Service pattern analyzed (or the date and its
+              active services when date is given)
+            - date: The date argument, if any
 
         Notes:
             - Hours with no service have num_trains=0 and None for headway values
@@ -150,7 +208,8 @@ def get_headway_dist(feed, direction_id, *route_ids, service_id='Weekday',
         direction_id=direction_id,
         service_id=service_id,
         stop_id=stop_id,
-        exclude_first_last=exclude_first_last
+        exclude_first_last=exclude_first_last,
+        date=date
     )
 
     # Build DataFrame
@@ -195,11 +254,12 @@ def get_headway_dist(feed, direction_id, *route_ids, service_id='Weekday',
     # Add metadata as attributes
     df.attrs['route_ids'] = route_list
     df.attrs['direction_id'] = direction_id
-    df.attrs['service_id'] = service_id
+    df.attrs['service_id'] = describe_service(feed, service_id, date)
+    df.attrs['date'] = date
 
     # Get direction name
     from travel_times import get_direction_name
-    df.attrs['direction_name'] = get_direction_name(feed, route_list[0], direction_id, service_id)
+    df.attrs['direction_name'] = get_direction_name(feed, route_list[0], direction_id, service_id, date=date)
 
     return df
 
@@ -333,7 +393,7 @@ def print_headway_dist(df):
 
 
 def get_headway_dist_branch(feed, route_id, direction_id, branch_terminal,
-                            service_id='Weekday', stop_id=None, exclude_first_last=True):
+                            service_id='Weekday', stop_id=None, exclude_first_last=True, date=None):
     """
     Get headway distribution DataFrame for a specific branch of a multi-branch route.
 
@@ -382,7 +442,18 @@ def get_headway_dist_branch(feed, route_id, direction_id, branch_terminal,
     exclude_first_last : bool, default=True
         If True, excludes the first and last headway of each service period to
         avoid boundary effects (e.g., the long gap between last train of the day
-        and first train of the next day appearing as a "headway").
+        and first train of the next day appearing as a "headway"). With a date,
+        excludes the gaps across the overnight break in service instead (see
+        service_timeline.service_break_mask()).
+
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225' or '2024-12-25'). If given,
+        overrides service_id with the services that run on that date according
+        to calendar.txt and calendar_dates.txt (so holidays resolve correctly),
+        and headways are measured on the stitched timeline for that day (see
+        service_timeline.py): trips after midnight from the previous service
+        day are included, and exclude_first_last drops the gaps across the
+        overnight break in service instead of the first and last headway.
 
     Returns:
     --------
@@ -400,7 +471,9 @@ def get_headway_dist_branch(feed, route_id, direction_id, branch_terminal,
             - route_id (str): Route ID analyzed
             - direction_id (int): Direction ID used
             - direction_name (str): Human-readable direction name
-            - service_id (str): Service pattern analyzed
+            - service_id (str): Service pattern analyzed (or the date and its
+              active services when date is given)
+            - date: The date argument, if any
             - branch_terminal (str): Full terminal station name found
             - branch_terminal_id (str): GTFS stop_id of the terminal
 
@@ -452,160 +525,24 @@ def get_headway_dist_branch(feed, route_id, direction_id, branch_terminal,
     print_headway_dist : Display formatted table from DataFrame
     get_combined_headways_by_hour : Lower-level function for combined routes
     """
-    # Get all trips for this route/direction/service
-    trips = feed.trips[
-        (feed.trips['route_id'] == route_id) &
-        (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
-    ].copy()
-
-    if trips.empty:
-        raise ValueError(
-            f"No trips found for route {route_id}, direction {direction_id}, service {service_id}"
-        )
-
-    # Get all stop times for these trips
-    stop_times = feed.stop_times[feed.stop_times['trip_id'].isin(trips['trip_id'])].copy()
-    stop_times = stop_times.sort_values(['trip_id', 'stop_sequence'])
-
-    # Get both first and last stops for each trip
-    first_stops = stop_times.groupby('trip_id').first().reset_index()
-    last_stops = stop_times.groupby('trip_id').last().reset_index()
-
-    # For identifying branches, we need to look at the "branch end" of the trip:
-    # - For outbound trips: the last stop (terminal/destination)
-    # - For inbound trips: the first stop (origin, which was the terminal of the outbound direction)
-    #
-    # Strategy: First check if the user's specified terminal exists at either end.
-    # If found, use that end. Otherwise, use automatic detection based on which end
-    # has more significant branches.
-
-    first_stop_unique = first_stops['stop_id'].unique()
-    last_stop_unique = last_stops['stop_id'].unique()
-
-    # First, try to find the user's specified terminal at EITHER end
-    branch_terminal_lower = branch_terminal.lower()
-
-    # Check first stops (origins)
-    matching_first_stop_id = None
-    matching_first_stop_name = None
-    for stop_id in first_stop_unique:
-        stop_name = feed.stops[feed.stops['stop_id'] == stop_id]['stop_name'].values
-        if len(stop_name) > 0:
-            stop_name = stop_name[0]
-            if branch_terminal_lower in stop_name.lower():
-                matching_first_stop_id = stop_id
-                matching_first_stop_name = stop_name
-                break
-
-    # Check last stops (destinations)
-    matching_last_stop_id = None
-    matching_last_stop_name = None
-    for stop_id in last_stop_unique:
-        stop_name = feed.stops[feed.stops['stop_id'] == stop_id]['stop_name'].values
-        if len(stop_name) > 0:
-            stop_name = stop_name[0]
-            if branch_terminal_lower in stop_name.lower():
-                matching_last_stop_id = stop_id
-                matching_last_stop_name = stop_name
-                break
-
-    # Determine which end to use based on where we found the terminal
-    if matching_first_stop_id is not None and matching_last_stop_id is not None:
-        # Terminal found at BOTH ends - use automatic detection
-        first_stop_counts = first_stops['stop_id'].value_counts()
-        last_stop_counts = last_stops['stop_id'].value_counts()
-        min_significant_trips = len(trips) * 0.05
-        significant_first_stops = sum(first_stop_counts >= min_significant_trips)
-        significant_last_stops = sum(last_stop_counts >= min_significant_trips)
-
-        if significant_first_stops > significant_last_stops:
-            branch_stops = first_stops
-            branch_end_description = "originates from"
-            matching_terminal_id = matching_first_stop_id
-            matching_terminal_name = matching_first_stop_name
-        elif significant_last_stops > significant_first_stops:
-            branch_stops = last_stops
-            branch_end_description = "terminates at"
-            matching_terminal_id = matching_last_stop_id
-            matching_terminal_name = matching_last_stop_name
-        else:
-            # Tie - use total count as tie-breaker
-            if len(first_stop_unique) < len(last_stop_unique):
-                branch_stops = first_stops
-                branch_end_description = "originates from"
-                matching_terminal_id = matching_first_stop_id
-                matching_terminal_name = matching_first_stop_name
-            else:
-                branch_stops = last_stops
-                branch_end_description = "terminates at"
-                matching_terminal_id = matching_last_stop_id
-                matching_terminal_name = matching_last_stop_name
-    elif matching_first_stop_id is not None:
-        # Found at first stops only (origins)
-        branch_stops = first_stops
-        branch_end_description = "originates from"
-        matching_terminal_id = matching_first_stop_id
-        matching_terminal_name = matching_first_stop_name
-    elif matching_last_stop_id is not None:
-        # Found at last stops only (destinations)
-        branch_stops = last_stops
-        branch_end_description = "terminates at"
-        matching_terminal_id = matching_last_stop_id
-        matching_terminal_name = matching_last_stop_name
-    else:
-        # Terminal not found at either end - build helpful error message
-        available_stops = []
-        for stop_id in list(first_stop_unique) + list(last_stop_unique):
-            stop_name = feed.stops[feed.stops['stop_id'] == stop_id]['stop_name'].values
-            if len(stop_name) > 0 and stop_name[0] not in [s.strip("'") for s in available_stops]:
-                available_stops.append(f"'{stop_name[0]}'")
-
-        raise ValueError(
-            f"No stop matching '{branch_terminal}' found for route {route_id}, "
-            f"direction {direction_id}.\nAvailable stops: {', '.join(sorted(set(available_stops)))}"
-        )
-
-    # Filter trips to only those associated with this branch
-    branch_trip_ids = branch_stops[branch_stops['stop_id'] == matching_terminal_id]['trip_id'].tolist()
-    branch_trips = trips[trips['trip_id'].isin(branch_trip_ids)]
-
-    # Get stop times for branch trips
-    branch_stop_times = feed.stop_times[
-        feed.stop_times['trip_id'].isin(branch_trip_ids)
-    ].copy()
-
-    # Filter by specific stop if requested, otherwise use first stop
-    if stop_id is not None:
-        branch_stop_times = branch_stop_times[branch_stop_times['stop_id'] == stop_id]
-        if branch_stop_times.empty:
-            raise ValueError(f"No stop times found for stop {stop_id} on this branch")
-    else:
-        # Use the first stop of each trip
-        branch_stop_times = branch_stop_times.sort_values(['trip_id', 'stop_sequence'])
-        branch_stop_times = branch_stop_times.groupby('trip_id').first().reset_index()
-
-    def parse_gtfs_time(time_str):
-        """Parse GTFS time format (which can exceed 24 hours)"""
-        parts = time_str.split(':')
-        hours = int(parts[0])
-        minutes = int(parts[1])
-        seconds = int(parts[2])
-        return hours, minutes, seconds
-
-    # Convert to total seconds for sorting and headway calculation
-    branch_stop_times['departure_seconds'] = branch_stop_times['departure_time'].apply(
-        lambda x: sum([parse_gtfs_time(x)[0] * 3600,
-                      parse_gtfs_time(x)[1] * 60,
-                      parse_gtfs_time(x)[2]])
+    # Resolve the branch terminal against the prebuilt trip table. Origin and
+    # terminal stops of every trip are precomputed there, so selecting the
+    # branch is just a boolean mask.
+    branch = resolve_branch(feed, route_id, direction_id, branch_terminal, service_id, date)
+    matching_terminal_id = branch['terminal_id']
+    matching_terminal_name = branch['terminal_name']
+    branch_end_description = branch['branch_end_description']
+
+    # Departures at the requested stop, or at the first stop of each trip
+    branch_stop_times = _get_departures(
+        feed, branch['trip_mask'], stop_id, date, branch['all_services_mask']
     )
+    if stop_id is not None and branch_stop_times.empty:
+        raise ValueError(f"No stop times found for stop {stop_id} on this branch")
 
-    # Sort by departure time
-    branch_stop_times = branch_stop_times.sort_values('departure_seconds')
-
-    # Calculate headways
-    departure_times = branch_stop_times['departure_seconds'].values
-    departure_time_strings = branch_stop_times['departure_time'].values
+    # Already sorted by departure time
+    departure_times = branch_stop_times['departure_s'].to_numpy()
+    excluded = _excluded_gaps(branch_stop_times, exclude_first_last, date)
 
     headways_by_hour = defaultdict(list)
 
@@ -627,13 +564,12 @@ def get_headway_dist_branch(feed, route_id, direction_id, branch_terminal,
             headway_seconds = departure_times[i] - departure_times[i-1]
             headway_minutes = headway_seconds / 60.0
 
-            # Skip first/last headways if requested
-            if exclude_first_last and (i == 1 or i == len(departure_times) - 1):
+            # Skip boundary headways if requested (see _excluded_gaps)
+            if excluded[i-1]:
                 continue
 
             # Assign headway to the hour of the EARLIER train
-            earlier_train_time = departure_time_strings[i-1]
-            hour = parse_gtfs_time(earlier_train_time)[0] % 24
+            hour = int(departure_times[i-1] // 3600) % 24
 
             headways_by_hour[hour].append(headway_minutes)
 
@@ -677,20 +613,21 @@ def get_headway_dist_branch(feed, route_id, direction_id, branch_terminal,
     # Add metadata as attributes
     df.attrs['route_id'] = route_id
     df.attrs['direction_id'] = direction_id
-    df.attrs['service_id'] = service_id
+    df.attrs['service_id'] = describe_service(feed, service_id, date)
+    df.attrs['date'] = date
     df.attrs['branch_terminal'] = matching_terminal_name
     df.attrs['branch_terminal_id'] = matching_terminal_id
     df.attrs['branch_end_description'] = branch_end_description
 
     # Get direction name
     from travel_times import get_direction_name
-    df.attrs['direction_name'] = get_direction_name(feed, route_id, direction_id, service_id)
+    df.attrs['direction_name'] = get_direction_name(feed, route_id, direction_id, service_id, date=date)
 
     return df
 
 
 def get_headway_dist_combined(feed, direction_id, *route_specs, service_id='Weekday',
-                                stop_id=None, hour_range=None, exclude_first_last=True):
+                                stop_id=None, hour_range=None, exclude_first_last=True, date=None):
     """
     Get headway distribution for a combination of routes and/or specific branches.
 
@@ -730,7 +667,17 @@ def get_headway_dist_combined(feed, direction_id, *route_specs, service_id='Week
         If None (default), includes all hours (0-23).
 
     exclude_first_last : bool, default=True
-        Exclude first/last headways to avoid boundary effects
+        Exclude first/last headways to avoid boundary effects (with a date,
+        the gaps across the overnight break in service)
+
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225' or '2024-12-25'). If given,
+        overrides service_id with the services that run on that date according
+        to calendar.txt and calendar_dates.txt (so holidays resolve correctly),
+        and headways are measured on the stitched timeline for that day (see
+        service_timeline.py): trips after midnight from the previous service
+        day are included, and exclude_first_last drops the gaps across the
+        overnight break in service instead of the first and last headway.
 
     Returns:
     --------
@@ -771,8 +718,9 @@ def get_headway_dist_combined(feed, direction_id, *route_specs, service_id='Week
     Evening rush with specific branch (5-7 PM):
         >>> df = ch.get_headway_dist_combined(feed, 0, ('5', 'Nereid'), hour_range=(17, 19))
     """
-    # Parse route specifications and collect trip IDs
-    all_trip_ids = []
+    # Parse route specifications into a mask over the prebuilt trip table
+    combined_mask = np.zeros(len(get_trip_table(feed)), dtype=bool)
+    all_services_mask = np.zeros(len(combined_mask), dtype=bool)
     route_descriptions = []
 
     for spec in route_specs:
@@ -780,38 +728,16 @@ def get_headway_dist_combined(feed, direction_id, *route_specs, service_id='Week
             # Branch specification: (route_id, branch_terminal)
             route_id, branch_terminal = spec
 
-            # Get trips for this branch using get_headway_dist_branch
-            branch_df = get_headway_dist_branch(
-                feed, route_id, direction_id, branch_terminal,
-                service_id=service_id, stop_id=stop_id, exclude_first_last=exclude_first_last
-            )
-
-            # Extract trip IDs from the branch
-            trips = feed.trips[
-                (feed.trips['route_id'] == route_id) &
-                (feed.trips['direction_id'] == direction_id) &
-                (feed.trips['service_id'] == service_id)
-            ]
-            stop_times = feed.stop_times[feed.stop_times['trip_id'].isin(trips['trip_id'])].copy()
-            stop_times = stop_times.sort_values(['trip_id', 'stop_sequence'])
-
-            # Get the matching terminal ID from branch_df metadata
-            terminal_id = branch_df.attrs['branch_terminal_id']
-            branch_end_desc = branch_df.attrs['branch_end_description']
-
-            # Find trips associated with this terminal
-            if branch_end_desc == "originates from":
-                first_stops = stop_times.groupby('trip_id').first().reset_index()
-                branch_trip_ids = first_stops[first_stops['stop_id'] == terminal_id]['trip_id'].tolist()
-            else:  # "terminates at"
-                last_stops = stop_times.groupby('trip_id').last().reset_index()
-                branch_trip_ids = last_stops[last_stops['stop_id'] == terminal_id]['trip_id'].tolist()
+            branch = resolve_branch(feed, route_id, direction_id, branch_terminal, service_id, date)
+            if stop_id is not None and get_trip_departures(feed, branch['trip_mask'], stop_id).empty:
+                raise ValueError(f"No stop times found for stop {stop_id} on this branch")
 
-            all_trip_ids.extend(branch_trip_ids)
+            combined_mask |= branch['trip_mask']
+            all_services_mask |= branch['all_services_mask']
 
             # Build description
-            terminal_name = branch_df.attrs['branch_terminal']
-            if branch_end_desc == "originates from":
+            terminal_name = branch['terminal_name']
+            if branch['branch_end_description'] == "originates from":
                 route_descriptions.append(f"{route_id} from {terminal_name}")
             else:
                 route_descriptions.append(f"{route_id} to {terminal_name}")
@@ -819,76 +745,42 @@ def get_headway_dist_combined(feed, direction_id, *route_specs, service_id='Week
         else:
             # Simple route specification: just a route_id string
             route_id = spec
-
-            # Get all trips for this route
-            trips = feed.trips[
-                (feed.trips['route_id'] == route_id) &
-                (feed.trips['direction_id'] == direction_id) &
-                (feed.trips['service_id'] == service_id)
-            ]
-
-            all_trip_ids.extend(trips['trip_id'].tolist())
+            combined_mask |= trip_mask(feed, route_id, direction_id, service_id, date)
+            all_services_mask |= trip_mask(feed, route_id, direction_id)
             route_descriptions.append(route_id)
 
-    if not all_trip_ids:
+    if not combined_mask.any():
         raise ValueError("No trips found for the specified route specifications")
 
-    # Now calculate headways for all collected trips
-    combined_trips = feed.trips[feed.trips['trip_id'].isin(all_trip_ids)].copy()
-
-    # Get stop times
-    stop_times = feed.stop_times[feed.stop_times['trip_id'].isin(combined_trips['trip_id'])].copy()
-
-    # Filter by specific stop if requested
-    if stop_id is not None:
-        stop_times = stop_times[stop_times['stop_id'] == stop_id]
-        if stop_times.empty:
-            raise ValueError(f"No stop times found for stop {stop_id}")
-    else:
-        # Use the first stop of each trip
-        stop_times = stop_times.sort_values(['trip_id', 'stop_sequence'])
-        stop_times = stop_times.groupby('trip_id').first().reset_index()
-
-    def parse_gtfs_time(time_str):
-        """Parse GTFS time format (which can exceed 24 hours)"""
-        parts = time_str.split(':')
-        hours = int(parts[0])
-        minutes = int(parts[1])
-        seconds = int(parts[2])
-        return hours, minutes, seconds
+    # Departures at the requested stop, or at the first stop of each trip
+    stop_times = _get_departures(feed, combined_mask, stop_id, date, all_services_mask)
+    if stop_id is not None and stop_times.empty:
+        raise ValueError(f"No stop times found for stop {stop_id}")
 
-    # Convert to total seconds for sorting and headway calculation
-    stop_times['departure_seconds'] = stop_times['departure_time'].apply(
-        lambda x: sum([parse_gtfs_time(x)[0] * 3600,
-                      parse_gtfs_time(x)[1] * 60,
-                      parse_gtfs_time(x)[2]])
-    )
+    # Hour of each departure. On a stitched timeline the trailing departure
+    # after midnight gets hour 24, so it is never counted as a train
+    stop_times['hour'] = stop_times['departure_s'] // 3600
+    if date is None:
+        stop_times['hour'] %= 24
 
     # Filter by hour range if specified
     if hour_range is not None:
         start_hour, end_hour = hour_range
-        stop_times['hour'] = stop_times['departure_time'].apply(
-            lambda x: parse_gtfs_time(x)[0] % 24
-        )
         stop_times = stop_times[
             (stop_times['hour'] >= start_hour) &
             (stop_times['hour'] <= end_hour)
         ]
 
-    # Sort by departure time
-    stop_times = stop_times.sort_values('departure_seconds')
-
-    # Calculate headways
-    departure_times = stop_times['departure_seconds'].values
-    departure_time_strings = stop_times['departure_time'].values
+    # Calculate headways (already sorted by departure time)
+    departure_times = stop_times['departure_s'].to_numpy()
+    excluded = _excluded_gaps(stop_times, exclude_first_last, date)
 
     headways_by_hour = defaultdict(list)
-    trains_by_hour = defaultdict(int)  # Count actual trains per hour
 
     # Count trains per hour (by departure time)
-    for departure_time_str in departure_time_strings:
-        hour = parse_gtfs_time(departure_time_str)[0] % 24
-        trains_by_hour[hour] += 1
+    departure_hours = stop_times['hour'].to_numpy()
+    hours, counts = np.unique(departure_hours, return_counts=True)
+    trains_by_hour = {int(hour): int(count) for hour, count in zip(hours, counts)}
 
     if len(departure_times) < 2:
         # Not enough trips - return empty DataFrame
@@ -909,13 +801,12 @@ def get_headway_dist_combined(feed, direction_id, *route_specs, service_id='Week
             headway_seconds = departure_times[i] - departure_times[i-1]
             headway_minutes = headway_seconds / 60.0
 
-            # Skip first/last headways if requested
-            if exclude_first_last and (i == 1 or i == len(departure_times) - 1):
+            # Skip boundary headways if requested (see _excluded_gaps)
+            if excluded[i-1]:
                 continue
 
             # Assign headway to the hour of the EARLIER train
-            earlier_train_time = departure_time_strings[i-1]
-            hour = parse_gtfs_time(earlier_train_time)[0] % 24
+            hour = int(departure_hours[i-1])
 
             headways_by_hour[hour].append(headway_minutes)
 
@@ -962,20 +853,21 @@ def get_headway_dist_combined(feed, direction_id, *route_specs, service_id='Week
     # Add metadata
     df.attrs['route_specs'] = route_descriptions
     df.attrs['direction_id'] = direction_id
-    df.attrs['service_id'] = service_id
+    df.attrs['service_id'] = describe_service(feed, service_id, date)
+    df.attrs['date'] = date
     df.attrs['hour_range'] = hour_range
 
     # Get direction name from first route
     from travel_times import get_direction_name
     first_route = route_specs[0] if isinstance(route_specs[0], str) else route_specs[0][0]
-    df.attrs['direction_name'] = get_direction_name(feed, first_route, direction_id, service_id)
+    df.attrs['direction_name'] = get_direction_name(feed, first_route, direction_id, service_id, date=date)
 
     return df
 
 
 def get_combined_headways_by_hour(feed, route_ids, direction_id=None,
                                    service_id=None, stop_id=None,
-                                   exclude_first_last=True):
+                                   exclude_first_last=True, date=None):
     """
     Calculate combined headways when multiple routes serve the same corridor.
 
@@ -997,6 +889,12 @@ def get_combined_headways_by_hour(feed, route_ids, direction_id=None,
     exclude_first_last : bool, default=True
         If True, excludes the first and last headway of the service period to avoid
         boundary effects (e.g., overnight gaps appearing as "headways")
+    date : str or datetime.date, optional
+        Calendar date to analyze. If given, overrides service_id and measures
+        headways on the stitched timeline for that day (see
+        service_timeline.py), so trips after midnight from the previous
+        service day are included and exclude_first_last drops the gaps
+        across the overnight break in service.
 
     Returns:
     --------
@@ -1004,6 +902,9 @@ def get_combined_headways_by_hour(feed, route_ids, direction_id=None,
         Dictionary with hours (0-23) as keys and lists of headways (in minutes) as values.
         These headways represent the time between ANY train (from any of the routes).
     """
+    if date is not None:
+        return get_stitched_headways_by_hour(feed, date, list(route_ids), direction_id, stop_id,
+                                             exclude_first_last)
 
     # Get trips for all specified routes
     all_trips = []
@@ -1014,9 +915,9 @@ def get_combined_headways_by_hour(feed, route_ids, direction_id=None,
         if direction_id is not None:
             trips = trips[trips['direction_id'] == direction_id]
 
-        # Filter by service_id if specified
-        if service_id is not None:
-            trips = trips[trips['service_id'] == service_id]
+        # Filter by service_id (or the services running on date) if specified
+        if service_id is not None or date is not None:
+            trips = trips[service_mask(feed, trips, service_id, date)]
 
         all_trips.append(trips)
 
@@ -1101,7 +1002,7 @@ def get_combined_headways_by_hour(feed, route_ids, direction_id=None,
 
 def get_individual_and_combined_headways(feed, route_ids, direction_id=None,
                                          service_id=None, stop_id=None,
-                                         exclude_first_last=True):
+                                         exclude_first_last=True, date=None):
     """
     Calculate both individual route headways and combined headways.
 
@@ -1126,13 +1027,13 @@ def get_individual_and_combined_headways(feed, route_ids, direction_id=None,
     individual_headways = {}
     for route_id in route_ids:
         headways = get_line_headways_by_hour_improved(
-            feed, route_id, direction_id, service_id, stop_id, exclude_first_last
+            feed, route_id, direction_id, service_id, stop_id, exclude_first_last, date
         )
         individual_headways[route_id] = headways
 
     # Calculate combined headways
     combined_headways, trains_count = get_combined_headways_by_hour(
-        feed, route_ids, direction_id, service_id, stop_id, exclude_first_last
+        feed, route_ids, direction_id, service_id, stop_id, exclude_first_last, date
     )
 
     return {
@@ -1244,7 +1145,7 @@ def display_simple_combined_headways(headways_by_hour, route_ids, title=None):
             print(f"{hour:02d}:00  {0:<12} {'-':<12} {'-':<12} {'-':<12}")
 
 
-def analyze_combined_service_pattern(feed, route_ids, direction_id=None, service_id=None):
+def analyze_combined_service_pattern(feed, route_ids, direction_id=None, service_id=None, date=None):
     """
     Analyze when combined service runs - shows all trains from all routes together.
 
@@ -1259,8 +1160,8 @@ def analyze_combined_service_pattern(feed, route_ids, direction_id=None, service
         if direction_id is not None:
             trips = trips[trips['direction_id'] == direction_id]
 
-        if service_id is not None:
-            trips = trips[trips['service_id'] == service_id]
+        if service_id is not None or date is not None:
+            trips = trips[service_mask(feed, trips, service_id, date)]
 
         all_trips.append(trips)
 
@@ -1300,7 +1201,8 @@ def analyze_combined_service_pattern(feed, route_ids, direction_id=None, service
 
     print(f"\nCombined Service Pattern for Routes {', '.join(route_ids)}" +
           (f", Direction {direction_id}" if direction_id is not None else "") +
-          (f", Service {service_id}" if service_id is not None else ""))
+          (f", Service {describe_service(feed, service_id, date)}"
+           if service_id is not None or date is not None else ""))
     print("-" * 70)
     print(f"{'Hour':<6} {'Total Deps':<12} {'First':<15} {'Last':<15} {'Routes':<20}")
     print("-" * 70)
@@ -10,9 +10,17 @@ import travel_times as tt
 import express_local as el
 import pandas as pd
 import numpy as np
+from service_calendar import parse_service_date
 
 
-def get_shared_express_stops(feed, local_route, express_route, direction_id=1, service_id='Weekday'):
+# Local/express route pairs that share a corridor, as (local_route, express_route)
+CORRIDOR_PAIRS = [
+    ('C', 'A'), ('1', '2'), ('1', '3'), ('6', '4'), ('6', '5'),
+    ('R', 'N'), ('R', 'Q'), ('M', 'F'), ('E', 'F'), ('7', '7X'),
+]
+
+
+def get_shared_express_stops(feed, local_route, express_route, direction_id=1, service_id='Weekday', date=None):
     """
     Get the list of express stops that both routes serve.
 
@@ -32,6 +40,9 @@ def get_shared_express_stops(feed, local_route, express_route, direction_id=1, s
         will be the last stop in the returned list.
     service_id : str, default='Weekday'
         Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -40,17 +51,28 @@ def get_shared_express_stops(feed, local_route, express_route, direction_id=1, s
         ordered by direction_id travel
     """
     # Get express stops for the express route (use direction 0 for trunk ordering)
-    express_order = tt.get_station_order(feed, express_route, 0, service_id)
+    express_order = tt.get_station_order(feed, express_route, 0, service_id, date)
 
     # Apply express filtering to get only express stops
     express_stops = tt.filter_station_order_express(
         feed, express_order, express_route, 0, service_id,
         express_boroughs=['Manhattan', 'Brooklyn'],
-        all_stops_boroughs=[]
+        all_stops_boroughs=[], date=date
     )
 
     # Get all stops for the local route
-    local_order = tt.get_station_order(feed, local_route, direction_id, service_id)
+    local_order = tt.get_station_order(feed, local_route, direction_id, service_id, date)
+
+    return _intersect_shared_stops(express_stops, local_order, direction_id)
+
+
+def _intersect_shared_stops(express_stops, local_order, direction_id):
+    """
+    Express stops (in express order) that the local route also serves.
+
+    If direction_id is 1, the order is reversed so the terminal for
+    direction 1 is last.
+    """
     local_stop_ids = set([stop_id for stop_id, _ in local_order])
 
     # Filter to only stops served by both routes
@@ -68,7 +90,7 @@ def get_shared_express_stops(feed, local_route, express_route, direction_id=1, s
 
 def calculate_travel_time_difference(feed, local_route, express_route,
                                      direction_id=1, service_id='Weekday',
-                                     shared_stops=None, hour_range=None):
+                                     shared_stops=None, hour_range=None, date=None):
     """
     Calculate the travel time difference between local and express routes.
 
@@ -94,6 +116,9 @@ def calculate_travel_time_difference(feed, local_route, express_route,
         - Single int (0-23): specific hour (e.g., 7 = 7:00-7:59 AM)
         - Tuple (start, end): hour range inclusive (e.g., (7, 9) = 7:00-9:59 AM)
         - None (default): all hours
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -103,27 +128,27 @@ def calculate_travel_time_difference(feed, local_route, express_route,
     # Get shared stops if not provided
     if shared_stops is None:
         shared_stops = get_shared_express_stops(
-            feed, local_route, express_route, direction_id, service_id
+            feed, local_route, express_route, direction_id, service_id, date
         )
 
     # Calculate matrices based on whether hour_range is specified
     if hour_range is not None:
         # Use hour-filtered matrices
-        local_dir0 = tt.calculate_travel_time_matrix_by_hour(feed, local_route, 0, hour_range, service_id, shared_stops)
-        local_dir1 = tt.calculate_travel_time_matrix_by_hour(feed, local_route, 1, hour_range, service_id, shared_stops)
+        local_dir0 = tt.calculate_travel_time_matrix_by_hour(feed, local_route, 0, hour_range, service_id, shared_stops, date=date)
+        local_dir1 = tt.calculate_travel_time_matrix_by_hour(feed, local_route, 1, hour_range, service_id, shared_stops, date=date)
         local_combined = tt.combine_bidirectional_matrix(local_dir0, local_dir1)
 
-        express_dir0 = tt.calculate_travel_time_matrix_by_hour(feed, express_route, 0, hour_range, service_id, shared_stops)
-        express_dir1 = tt.calculate_travel_time_matrix_by_hour(feed, express_route, 1, hour_range, service_id, shared_stops)
+        express_dir0 = tt.calculate_travel_time_matrix_by_hour(feed, express_route, 0, hour_range, service_id, shared_stops, date=date)
+        express_dir1 = tt.calculate_travel_time_matrix_by_hour(feed, express_route, 1, hour_range, service_id, shared_stops, date=date)
         express_combined = tt.combine_bidirectional_matrix(express_dir0, express_dir1)
     else:
         # Use all-hours matrices
-        local_dir0 = tt.calculate_travel_time_matrix(feed, local_route, 0, service_id, shared_stops)
-        local_dir1 = tt.calculate_travel_time_matrix(feed, local_route, 1, service_id, shared_stops)
+        local_dir0 = tt.calculate_travel_time_matrix(feed, local_route, 0, service_id, shared_stops, date=date)
+        local_dir1 = tt.calculate_travel_time_matrix(feed, local_route, 1, service_id, shared_stops, date=date)
         local_combined = tt.combine_bidirectional_matrix(local_dir0, local_dir1)
 
-        express_dir0 = tt.calculate_travel_time_matrix(feed, express_route, 0, service_id, shared_stops)
-        express_dir1 = tt.calculate_travel_time_matrix(feed, express_route, 1, service_id, shared_stops)
+        express_dir0 = tt.calculate_travel_time_matrix(feed, express_route, 0, service_id, shared_stops, date=date)
+        express_dir1 = tt.calculate_travel_time_matrix(feed, express_route, 1, service_id, shared_stops, date=date)
         express_combined = tt.combine_bidirectional_matrix(express_dir0, express_dir1)
 
     # Ensure both matrices have the same index/columns in the correct order
@@ -254,7 +279,7 @@ def export_comparison(difference_matrix, local_route, express_route, service_id=
 
 
 def compare_lines(feed, local_route, express_route, direction_id=1,
-                 service_id='Weekday', hour_range=None, export=True, verbose=True):
+                 service_id='Weekday', hour_range=None, export=True, verbose=True, date=None):
     """
     Complete workflow to compare local and express train travel times.
 
@@ -280,6 +305,9 @@ def compare_lines(feed, local_route, express_route, direction_id=1,
         Whether to export results to CSV
     verbose : bool, default=True
         Whether to print detailed output
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -308,7 +336,7 @@ def compare_lines(feed, local_route, express_route, direction_id=1,
 
     # Get shared express stops
     shared_stops = get_shared_express_stops(
-        feed, local_route, express_route, direction_id, service_id
+        feed, local_route, express_route, direction_id, service_id, date
     )
 
     if verbose:
@@ -321,20 +349,143 @@ def compare_lines(feed, local_route, express_route, direction_id=1,
 
     # Calculate difference matrix
     difference_matrix = calculate_travel_time_difference(
-        feed, local_route, express_route, direction_id, service_id, shared_stops, hour_range
+        feed, local_route, express_route, direction_id, service_id, shared_stops, hour_range, date
     )
 
+    # Label output with the date instead of the service ID when one was given
+    service_label = service_id if date is None else parse_service_date(date).strftime('%Y%m%d')
+
     if verbose:
-        print_comparison_summary(difference_matrix, local_route, express_route, service_id, hour_range)
+        print_comparison_summary(difference_matrix, local_route, express_route, service_label, hour_range)
 
     if export:
-        filepath = export_comparison(difference_matrix, local_route, express_route, service_id, hour_range)
+        filepath = export_comparison(difference_matrix, local_route, express_route, service_label, hour_range)
         if verbose:
             print(f"\nExported to {filepath}")
 
     return difference_matrix
 
 
+def compare_lines_batch(feed, pairs=None, hour_ranges=None, direction_id=1, service_id='Weekday',
+                        export=True, verbose=True, date=None, output_dir='.'):
+    """
+    Compare many local/express pairs over many hour windows in one run.
+
+    compare_lines() recomputes station orders, express classification and
+    full travel time matrices on every call. Here each route's station order
+    and express stops are computed once, and each route/direction's hourly
+    travel time cube (travel_times.get_travel_time_cube) is built once and
+    reused for every pair and hour window it appears in.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    pairs : list of (str, str), optional
+        (local_route, express_route) pairs. Defaults to CORRIDOR_PAIRS.
+        Pairs with a route missing from the feed are skipped.
+    hour_ranges : list, optional
+        Hour windows, each None (all hours), an int or an inclusive
+        (start, end) tuple, as in compare_lines(). Defaults to [None].
+    direction_id : int, default=1
+        Direction to use for ordering stops
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    export : bool, default=True
+        Whether to export every difference matrix to CSV
+    verbose : bool, default=True
+        Whether to print a one-line summary per matrix
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
+    output_dir : str, default='.'
+        Directory for exported CSV files
+
+    Returns:
+    --------
+    dict
+        Dictionary mapping (local_route, express_route, hour_range) ->
+        difference matrix (local - express, in minutes)
+
+    Examples:
+    ---------
+    >>> results = compare_lines_batch(feed, hour_ranges=[None, (7, 9), (17, 19)])
+    >>> results[('C', 'A', (7, 9))]
+    """
+    if pairs is None:
+        pairs = CORRIDOR_PAIRS
+    if hour_ranges is None:
+        hour_ranges = [None]
+
+    feed_routes = set(feed.trips['route_id'])
+    service_label = service_id if date is None else parse_service_date(date).strftime('%Y%m%d')
+
+    station_orders = {}
+    express_stops = {}
+    matrices = {}
+
+    def station_order(route_id, direction):
+        if (route_id, direction) not in station_orders:
+            station_orders[(route_id, direction)] = tt.get_station_order(feed, route_id, direction, service_id, date)
+        return station_orders[(route_id, direction)]
+
+    def express_stop_order(route_id):
+        # Same filtering as get_shared_express_stops()
+        if route_id not in express_stops:
+            express_stops[route_id] = tt.filter_station_order_express(
+                feed, station_order(route_id, 0), route_id, 0, service_id,
+                express_boroughs=['Manhattan', 'Brooklyn'],
+                all_stops_boroughs=[], date=date
+            )
+        return express_stops[route_id]
+
+    def combined_matrix(route_id, shared_stops, hour_range):
+        # Both directions from the cached cubes, combined as in
+        # calculate_travel_time_difference()
+        by_direction = []
+        for direction in (0, 1):
+            cube = tt.get_travel_time_cube(feed, route_id, direction, service_id, date)
+            by_direction.append(tt.travel_time_matrix_from_cube(cube, shared_stops, hour_range))
+        return tt.combine_bidirectional_matrix(*by_direction)
+
+    results = {}
+    for local_route, express_route in pairs:
+        if local_route not in feed_routes or express_route not in feed_routes:
+            if verbose:
+                print(f"Skipping {local_route} vs {express_route} - not found in feed")
+            continue
+
+        shared_stops = _intersect_shared_stops(
+            express_stop_order(express_route), station_order(local_route, direction_id), direction_id
+        )
+        station_names = [name for _, name in shared_stops]
+
+        for hour_range in hour_ranges:
+            local_combined = combined_matrix(local_route, shared_stops, hour_range)
+            express_combined = combined_matrix(express_route, shared_stops, hour_range)
+
+            local_combined = local_combined.reindex(index=station_names, columns=station_names)
+            express_combined = express_combined.reindex(index=station_names, columns=station_names)
+            difference = local_combined - express_combined
+            results[(local_route, express_route, hour_range)] = difference
+
+            if verbose:
+                values = difference.values.flatten()
+                values = values[~np.isnan(values)]
+                values = values[values != 0]
+                window = 'all hours' if hour_range is None else f'hours {hour_range}'
+                if len(values) > 0:
+                    print(f"{local_route} vs {express_route} ({window}): {len(shared_stops)} stations, "
+                          f"average {express_route} saving {np.mean(values):.2f} min")
+                else:
+                    print(f"{local_route} vs {express_route} ({window}): no data")
+
+            if export:
+                export_comparison(difference, local_route, express_route, service_label, hour_range, output_dir)
+
+    return results
+
+
 if __name__ == "__main__":
     # Example usage
     print(__doc__)
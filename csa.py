@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Connection Scan Algorithm (CSA) for earliest-arrival and isochrone queries.
+
+Every pair of consecutive stops on a trip is an elementary connection: a
+train leaves one stop at dep_s and reaches the next at arr_s. With all of a
+service day's connections sorted by departure time, the earliest arrival at
+every stop from an origin is one linear scan: a connection can be used if
+the rider is already on its trip or has reached its departure stop by
+dep_s, and using it may improve the arrival time at its arrival stop.
+
+The connection array is built once per feed and service from the sorted
+stop times table (feed_index.get_stop_times_table), by pairing each row
+with the next row of the same trip. Footpaths between platforms are the
+same as the RAPTOR planner's (raptor.build_footpaths).
+
+Compared with raptor.py, CSA answers one-to-all questions (isochrones,
+"where can I get to in 30 minutes") with a single pass and no rounds, but
+does not limit the number of transfers.
+
+accessible=True masks arrivals and footpaths the same way as the RAPTOR
+planner's accessible mode: riders only board or leave trains at stations
+whose complex has a step-free entrance.
+"""
+import gtfs_kit as gk
+import numpy as np
+import pandas as pd
+
+from feed_index import (get_feed_cache, get_stop_name_lookup, get_stop_times_table,
+                        get_trip_table, seconds_to_gtfs_time, trip_mask)
+from raptor import (DEFAULT_TRANSFER_S, accessible_stop_mask, build_footpaths, parse_time_of_day,
+                    resolve_stop_positions)
+from service_calendar import resolve_service_ids
+from station_complexes import get_complex_transfer_seconds
+
+
+# One elementary connection; stops are positions in ConnectionTable.stop_ids
+CONNECTION_DTYPE = np.dtype([
+    ('trip', np.int64),
+    ('from_stop', np.int32),
+    ('to_stop', np.int32),
+    ('dep_s', np.int32),
+    ('arr_s', np.int32),
+])
+
+
+class ConnectionTable:
+    """
+    All elementary connections of one feed and service, sorted by departure.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_ids : list of str, optional
+        Service IDs whose trips are included. If None, includes every trip.
+    default_transfer_s : int, default=DEFAULT_TRANSFER_S
+        Transfer time between platforms of a station with no transfers.txt
+        entry
+    station_transfers : dict, optional
+        Extra (from_station, to_station) -> seconds transfers, see
+        raptor.build_footpaths()
+
+    Attributes:
+    -----------
+    stop_ids : np.ndarray
+        Platform stop IDs, indexed by stop position
+    station_ids : np.ndarray
+        Parent station of each stop
+    connections : np.ndarray
+        Structured array with CONNECTION_DTYPE, sorted by dep_s then arr_s.
+        'trip' is the row of the trip in feed_index.get_trip_table().
+    """
+
+    def __init__(self, feed, service_ids=None, default_transfer_s=DEFAULT_TRANSFER_S, station_transfers=None):
+        self.feed = feed
+        stop_times = get_stop_times_table(feed)
+        trip_idx = stop_times['trip_idx'].to_numpy()
+        stop_id_values = stop_times['stop_id'].astype(object).to_numpy()
+
+        self.stop_ids = np.unique(stop_id_values)
+        station_lookup = stop_times.drop_duplicates('stop_id').set_index('stop_id')['station_id']
+        self.station_ids = station_lookup.reindex(self.stop_ids).to_numpy().astype(object)
+        self._stop_positions = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+
+        # Consecutive rows of the same (selected) trip form a connection
+        mask = trip_mask(feed, service_id=service_ids)
+        same_trip = (trip_idx[1:] == trip_idx[:-1]) & (trip_idx[:-1] >= 0)
+        rows = np.flatnonzero(same_trip & mask[np.maximum(trip_idx[:-1], 0)])
+        codes = np.searchsorted(self.stop_ids, stop_id_values)
+
+        connections = np.empty(len(rows), dtype=CONNECTION_DTYPE)
+        connections['trip'] = trip_idx[rows]
+        connections['from_stop'] = codes[rows]
+        connections['to_stop'] = codes[rows + 1]
+        connections['dep_s'] = stop_times['departure_s'].to_numpy()[rows]
+        connections['arr_s'] = stop_times['arrival_s'].to_numpy()[rows + 1]
+        self.connections = connections[np.lexsort((connections['arr_s'], connections['dep_s']))]
+
+        foot_from, foot_to, foot_s = build_footpaths(feed, self.station_ids, default_transfer_s,
+                                                   station_transfers)
+        self._footpaths = [[] for _ in range(len(self.stop_ids))]
+        for a, b, seconds in zip(foot_from.tolist(), foot_to.tolist(), foot_s.tolist()):
+            self._footpaths[a].append((b, seconds))
+        self._accessible = None
+
+    def __len__(self):
+        return len(self.connections)
+
+    def resolve_stops(self, stop):
+        """
+        Stop positions for a platform stop ID, a parent station ID, or a list of them.
+        """
+        return resolve_stop_positions(stop, self._stop_positions, self.station_ids)
+
+    def accessible_stops(self):
+        """Boolean mask of stops with step-free access (see raptor.accessible_stop_mask())."""
+        if self._accessible is None:
+            self._accessible = accessible_stop_mask(self.feed, self.station_ids)
+        return self._accessible
+
+    def scan(self, origin_stops, departure_s, target_stops=None, end_s=None, stop_mask=None):
+        """
+        Run the connection scan from origin_stops at departure_s.
+
+        Parameters:
+        -----------
+        origin_stops : np.ndarray
+            Stop positions the rider starts from
+        departure_s : int
+            Time the rider is at the origin, in seconds
+        target_stops : np.ndarray, optional
+            Stop the scan as soon as no later connection can improve the
+            arrival at any of these stops
+        end_s : int, optional
+            Ignore connections leaving after this time
+        stop_mask : np.ndarray, optional
+            Boolean array (n_stops). Riders can only start at, alight at or
+            walk to stops where it is True (e.g., accessible_stops()).
+
+        Returns:
+        --------
+        dict
+            Dictionary with:
+            - 'arrival': float array (n_stops), earliest arrival (inf if
+              unreachable)
+            - 'arrived_by': connection index used to reach each stop (-1 if
+              none)
+            - 'walk_from': stop walked from to reach each stop (-1 if none)
+            - 'boarded_at': dict mapping trip row -> connection index where
+              the trip was boarded
+        """
+        n_stops = len(self.stop_ids)
+        arrival = [np.inf] * n_stops
+        arrived_by = [-1] * n_stops
+        walk_from = [-1] * n_stops
+        boarded_at = {}
+
+        footpaths = self._footpaths
+        can_alight = None
+        if stop_mask is not None:
+            origin_stops = [stop for stop in origin_stops if stop_mask[stop]]
+            footpaths = [[(target, seconds) for target, seconds in paths if stop_mask[target]]
+                         for paths in footpaths]
+            can_alight = stop_mask.tolist()
+
+        for stop in origin_stops:
+            arrival[stop] = departure_s
+        for stop in origin_stops:
+            for target, seconds in footpaths[stop]:
+                if departure_s + seconds < arrival[target]:
+                    arrival[target] = departure_s + seconds
+                    walk_from[target] = stop
+
+        targets = None if target_stops is None else list(target_stops)
+        dep = self.connections['dep_s']
+        start = int(np.searchsorted(dep, departure_s, side='left'))
+        stop_index = len(dep) if end_s is None else int(np.searchsorted(dep, end_s, side='right'))
+
+        trips = self.connections['trip'][start:stop_index].tolist()
+        from_stops = self.connections['from_stop'][start:stop_index].tolist()
+        to_stops = self.connections['to_stop'][start:stop_index].tolist()
+        departures = dep[start:stop_index].tolist()
+        arrivals = self.connections['arr_s'][start:stop_index].tolist()
+
+        best_target = np.inf
+        for offset, (trip, from_stop, to_stop, dep_s, arr_s) in enumerate(
+                zip(trips, from_stops, to_stops, departures, arrivals)):
+            if dep_s >= best_target:
+                break
+            if trip not in boarded_at:
+                if arrival[from_stop] > dep_s:
+                    continue
+                boarded_at[trip] = start + offset
+            if arr_s < arrival[to_stop] and (can_alight is None or can_alight[to_stop]):
+                arrival[to_stop] = arr_s
+                arrived_by[to_stop] = start + offset
+                walk_from[to_stop] = -1
+                for target, seconds in footpaths[to_stop]:
+                    if arr_s + seconds < arrival[target]:
+                        arrival[target] = arr_s + seconds
+                        walk_from[target] = to_stop
+                if targets is not None:
+                    best_target = min(arrival[t] for t in targets)
+
+        return {
+            'arrival': np.array(arrival, dtype=float),
+            'arrived_by': np.array(arrived_by, dtype=np.int64),
+            'walk_from': np.array(walk_from, dtype=np.int64),
+            'boarded_at': boarded_at,
+        }
+
+    def earliest_arrival_all(self, origin, t, max_duration_s=None, accessible=False):
+        """
+        Earliest arrival at every stop when leaving origin at time t.
+
+        Parameters:
+        -----------
+        origin : str or list of str
+            Platform stop IDs or parent station IDs
+        t : str or int
+            Departure time, 'HH:MM:SS' or seconds after midnight
+        max_duration_s : int, optional
+            Only scan connections leaving within this many seconds of t
+            (stops reachable only later are reported unreachable)
+        accessible : bool, default=False
+            Only start, end and change trains at stations with step-free
+            access
+
+        Returns:
+        --------
+        np.ndarray
+            Float array aligned with stop_ids, in seconds (inf if unreachable)
+        """
+        departure_s = parse_time_of_day(t)
+        end_s = None if max_duration_s is None else departure_s + max_duration_s
+        stop_mask = self.accessible_stops() if accessible else None
+        arrival = self.scan(self.resolve_stops(origin), departure_s, end_s=end_s, stop_mask=stop_mask)['arrival']
+        if end_s is not None:
+            arrival[arrival > end_s] = np.inf
+        return arrival
+
+    def earliest_arrival(self, origin, destination, t, accessible=False):
+        """
+        Fastest journey from origin to destination leaving at time t.
+
+        Parameters:
+        -----------
+        origin, destination : str or list of str
+            Platform stop IDs or parent station IDs
+        t : str or int
+            Departure time, 'HH:MM:SS' or seconds after midnight
+        accessible : bool, default=False
+            Only start, end and change trains at stations with step-free
+            access
+
+        Returns:
+        --------
+        dict or None
+            Same format as raptor.plan_journey() (departure_s, arrival_s,
+            transfers, legs), or None if unreachable
+        """
+        departure_s = parse_time_of_day(t)
+        destination_stops = self.resolve_stops(destination)
+        result = self.scan(self.resolve_stops(origin), departure_s, target_stops=destination_stops,
+                           stop_mask=self.accessible_stops() if accessible else None)
+
+        arrivals = result['arrival'][destination_stops]
+        if not np.isfinite(arrivals).any():
+            return None
+        stop = destination_stops[int(np.argmin(arrivals))]
+
+        trips = get_trip_table(self.feed)
+        legs = []
+        while True:
+            source = result['walk_from'][stop]
+            if source >= 0:
+                legs.append({
+                    'mode': 'walk',
+                    'from_stop_id': self.stop_ids[source],
+                    'to_stop_id': self.stop_ids[stop],
+                    'departure_s': float(result['arrival'][source]),
+                    'arrival_s': float(result['arrival'][stop]),
+                })
+                stop = source
+                continue
+
+            last = result['arrived_by'][stop]
+            if last < 0:
+                break
+            connection = self.connections[last]
+            first = self.connections[result['boarded_at'][int(connection['trip'])]]
+            legs.append({
+                'mode': 'train',
+                'route_id': trips['route_id'].iat[connection['trip']],
+                'trip_id': trips['trip_id'].iat[connection['trip']],
+                'from_stop_id': self.stop_ids[first['from_stop']],
+                'to_stop_id': self.stop_ids[stop],
+                'departure_s': float(first['dep_s']),
+                'arrival_s': float(connection['arr_s']),
+            })
+            stop = first['from_stop']
+
+        legs.reverse()
+        return {
+            'departure_s': departure_s,
+            'arrival_s': float(arrivals.min()),
+            'transfers': max(0, sum(leg['mode'] == 'train' for leg in legs) - 1),
+            'legs': legs,
+        }
+
+    def reachable_stations(self, origin, t, max_minutes=None, accessible=False):
+        """
+        Stations reachable from origin leaving at time t, for isochrone maps.
+
+        Parameters:
+        -----------
+        origin : str or list of str
+            Platform stop IDs or parent station IDs
+        t : str or int
+            Departure time, 'HH:MM:SS' or seconds after midnight
+        max_minutes : float, optional
+            Only include stations reached within this many minutes
+        accessible : bool, default=False
+            Only start, end and change trains at stations with step-free
+            access
+
+        Returns:
+        --------
+        pd.DataFrame
+            One row per reachable parent station with columns station_id,
+            stop_name, arrival_time (HH:MM:SS) and minutes, sorted by minutes
+        """
+        departure_s = parse_time_of_day(t)
+        max_duration_s = None if max_minutes is None else int(max_minutes * 60)
+        arrival = self.earliest_arrival_all(origin, departure_s, max_duration_s, accessible)
+
+        stations = pd.DataFrame({'station_id': self.station_ids, 'arrival_s': arrival})
+        stations = stations[np.isfinite(stations['arrival_s'])]
+        stations = stations.groupby('station_id', as_index=False)['arrival_s'].min()
+
+        names = get_stop_name_lookup(self.feed)
+        stations['stop_name'] = stations['station_id'].map(names)
+        stations['arrival_time'] = stations['arrival_s'].astype(np.int64).map(seconds_to_gtfs_time)
+        stations['minutes'] = (stations['arrival_s'] - departure_s) / 60.0
+        return stations[['station_id', 'stop_name', 'arrival_time', 'minutes']].sort_values(
+            ['minutes', 'station_id'], kind='stable').reset_index(drop=True)
+
+
+def get_connection_table(feed, service_id='Weekday', date=None):
+    """
+    Get the cached ConnectionTable for a feed and service.
+
+    Footpaths include the in-complex transfers of
+    station_complexes.get_complex_transfer_seconds().
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_id : str or list of str, default='Weekday'
+        Service ID(s) to include
+    date : str or datetime.date, optional
+        Calendar date (e.g., '20241225'). If given, overrides service_id with
+        the services that run on that date.
+
+    Returns:
+    --------
+    ConnectionTable
+    """
+    service_ids = resolve_service_ids(feed, service_id, date)
+    key = ('connection_table', None if service_ids is None else tuple(sorted(service_ids)))
+    cache = get_feed_cache(feed)
+    if key not in cache:
+        cache[key] = ConnectionTable(feed, service_ids, station_transfers=get_complex_transfer_seconds(feed))
+    return cache[key]
+
+
+def earliest_arrival_all(feed, origin, t, service_id='Weekday', date=None, max_duration_s=None,
+                         accessible=False):
+    """
+    Earliest arrival at every stop from origin leaving at time t.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    origin : str or list of str
+        Platform stop IDs or parent station IDs (e.g., '127')
+    t : str or int
+        Departure time, 'HH:MM:SS' or seconds after midnight
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date. If given, overrides service_id.
+    max_duration_s : int, optional
+        Only scan connections leaving within this many seconds of t
+    accessible : bool, default=False
+        Only start, end and change trains at stations with step-free access
+
+    Returns:
+    --------
+    pd.Series
+        Arrival time in seconds indexed by platform stop ID (inf if
+        unreachable)
+
+    Examples:
+    ---------
+    >>> arrivals = earliest_arrival_all(feed, '127', '08:00:00')
+    >>> (arrivals - 8 * 3600) / 60  # minutes from Times Sq
+    """
+    table = get_connection_table(feed, service_id, date)
+    arrival = table.earliest_arrival_all(origin, t, max_duration_s, accessible)
+    return pd.Series(arrival, index=pd.Index(table.stop_ids, name='stop_id'), name='arrival_s')
+
+
+if __name__ == "__main__":
+    import time
+
+    print(__doc__)
+
+    feed = gk.read_feed("gtfs_subway.zip", dist_units="m")
+
+    start = time.perf_counter()
+    table = get_connection_table(feed, 'Weekday')
+    print(f"Built {len(table)} connections in {time.perf_counter() - start:.2f}s\n")
+
+    # Everywhere reachable from Times Sq-42 St within 30 minutes at 8 AM
+    start = time.perf_counter()
+    reachable = table.reachable_stations('127', '08:00:00', max_minutes=30)
+    print(f"Scan took {1000 * (time.perf_counter() - start):.1f} ms")
+    print(reachable.to_string(index=False))
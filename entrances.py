@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Spatial index over subway entrances.
+
+Built once from the MTA entrances dataset (see station_complexes.py), the
+index answers "nearest elevator to this address" or "entrances within
+200 m" for many points at once without re-reading the CSV.
+
+Entrance coordinates are projected to meters on a local equirectangular
+plane (x east, y north, centered on the dataset), which is accurate to well
+under 1% across New York City, and stored in a scipy KD-tree. Queries with
+an entrance type filter use a separate tree over just those entrances,
+built on first use and kept, so "the 3 nearest elevators" never falls back
+to scanning all entrances.
+
+Entrance types are matched against each part of compound types, so 'Ramp'
+matches 'Stair/Ramp' (station_complexes.match_entrance_types, the same rule
+the complex index uses to decide step-free access).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from station_complexes import (EARTH_RADIUS_M, ELEVATOR_TYPES, find_entrances_csv, load_entrances,
+                               match_entrance_types)
+
+
+_ENTRANCE_COLUMNS = ['station_id', 'station_ids', 'station_name', 'complex_id', 'daytime_routes',
+                     'entrance_type', 'entry_allowed', 'exit_allowed', 'entrance_lat', 'entrance_lon']
+
+
+class EntranceIndex:
+    """
+    KD-tree over subway entrance coordinates.
+
+    Parameters:
+    -----------
+    csv_path : str, optional
+        Entrances dataset. Defaults to the newest file matching
+        station_complexes.ENTRANCES_PATTERN.
+
+    Attributes:
+    -----------
+    entrances : pd.DataFrame
+        One row per entrance (station_id, station_ids, station_name,
+        complex_id, daytime_routes, entrance_type, entry_allowed,
+        exit_allowed, entrance_lat, entrance_lon); the row number is the
+        entrance's position in query results. station_ids lists every
+        station the entrance leads to and station_id is the first of them.
+    entrance_types : list of str
+        Distinct single entrance types (compound types split on '/')
+    """
+
+    def __init__(self, csv_path=None):
+        station_rows = load_entrances(csv_path)
+        station_rows = station_rows[station_rows['entrance_lat'].notna() & station_rows['entrance_lon'].notna()]
+        station_ids = station_rows.groupby('entrance_id', sort=False)['station_id'].agg(tuple)
+        entrances = station_rows.drop_duplicates('entrance_id').copy()
+        entrances['station_ids'] = entrances['entrance_id'].map(station_ids)
+        self.entrances = entrances[_ENTRANCE_COLUMNS].reset_index(drop=True)
+
+        self._lat0 = np.radians(self.entrances['entrance_lat'].mean())
+        self._lon0 = np.radians(self.entrances['entrance_lon'].mean())
+        self._xy = self._project(self.entrances['entrance_lat'], self.entrances['entrance_lon'])
+
+        type_parts = self.entrances['entrance_type'].fillna('').str.split('/')
+        self.entrance_types = sorted({part for parts in type_parts for part in parts if part})
+
+        # Entrance rows grouped by station for per-station listings
+        positions = pd.Series(np.arange(len(entrances)), index=entrances['entrance_id'].to_numpy())
+        rows = positions.loc[station_rows['entrance_id'].to_numpy()].to_numpy()
+        self._station_rows = {station: np.sort(group) for station, group in
+                              pd.Series(rows).groupby(station_rows['station_id'].to_numpy())}
+
+        # Station -> the complex most of its entrances are filed under
+        votes = station_rows.groupby(['station_id', 'complex_id']).size().rename('n').reset_index()
+        votes = votes.sort_values(['station_id', 'n', 'complex_id'], ascending=[True, False, True])
+        self._station_complex = dict(votes.drop_duplicates('station_id')[['station_id', 'complex_id']].to_numpy())
+
+        # (entrance types, entry_only) -> (entrance rows, tree over them)
+        self._trees = {}
+
+    def __len__(self):
+        return len(self.entrances)
+
+    def _project(self, lat, lon):
+        """(n, 2) array of meters east and north of the dataset center."""
+        lat = np.radians(np.atleast_1d(np.asarray(lat, dtype=float)))
+        lon = np.radians(np.atleast_1d(np.asarray(lon, dtype=float)))
+        x = EARTH_RADIUS_M * (lon - self._lon0) * np.cos(self._lat0)
+        y = EARTH_RADIUS_M * (lat - self._lat0)
+        return np.column_stack((x, y))
+
+    def _mask(self, entrance_types=None, entry_only=False):
+        """Boolean mask of entrances passing the filters."""
+        mask = np.ones(len(self.entrances), dtype=bool)
+        if entrance_types is not None:
+            mask &= match_entrance_types(self.entrances['entrance_type'], entrance_types)
+        if entry_only:
+            mask &= self.entrances['entry_allowed'].to_numpy()
+        return mask
+
+    def _tree(self, entrance_types=None, entry_only=False):
+        """Cached (entrance rows, cKDTree) for one filter."""
+        if isinstance(entrance_types, str):
+            entrance_types = (entrance_types,)
+        key = (None if entrance_types is None else tuple(sorted(entrance_types)), bool(entry_only))
+        if key not in self._trees:
+            rows = np.flatnonzero(self._mask(entrance_types, entry_only))
+            self._trees[key] = (rows, cKDTree(self._xy[rows]))
+        return self._trees[key]
+
+    def _results(self, query, rows, distance):
+        """Long-format result frame: query point, entrance columns, distance."""
+        result = self.entrances.iloc[rows].reset_index(drop=True)
+        result.insert(0, 'query', np.asarray(query, dtype=np.int64))
+        result['distance_m'] = np.round(np.asarray(distance, dtype=float), 1)
+        return result
+
+    def nearest(self, lat, lon, k=1, entrance_types=None, entry_only=False, max_distance_m=None):
+        """
+        The k nearest entrances to each of one or more points.
+
+        Parameters:
+        -----------
+        lat, lon : float or array-like
+            Query point(s) in degrees
+        k : int, default=1
+            Number of entrances per point
+        entrance_types : str or list of str, optional
+            Only entrances of these types (e.g., 'Elevator')
+        entry_only : bool, default=False
+            Only entrances where entry is allowed
+        max_distance_m : float, optional
+            Drop entrances farther than this
+
+        Returns:
+        --------
+        pd.DataFrame
+            One row per (query point, entrance) with columns query (position
+            of the point in lat/lon), rank (0 = nearest), the entrance
+            columns and distance_m, sorted by query then rank
+
+        Examples:
+        ---------
+        >>> index = get_entrance_index()
+        >>> index.nearest([40.7527, 40.6782], [-73.9772, -73.9442], k=3, entrance_types='Elevator')
+        """
+        rows, tree = self._tree(entrance_types, entry_only)
+        points = self._project(lat, lon)
+        k = min(int(k), len(rows))
+        distance = np.full((len(points), k), np.inf)
+        position = np.zeros((len(points), k), dtype=np.int64)
+        if k > 0:
+            bound = np.inf if max_distance_m is None else float(max_distance_m)
+            found_distance, found_position = tree.query(points, k=k, distance_upper_bound=bound)
+            distance[:] = found_distance.reshape(len(points), k)
+            position[:] = np.minimum(found_position.reshape(len(points), k), len(rows) - 1)
+
+        found = np.isfinite(distance)
+        query, rank = np.nonzero(found)
+        result = self._results(query, rows[position[found]], distance[found])
+        result.insert(1, 'rank', rank)
+        return result
+
+    def within(self, lat, lon, radius_m, entrance_types=None, entry_only=False):
+        """
+        Every entrance within radius_m of each of one or more points.
+
+        Parameters:
+        -----------
+        lat, lon : float or array-like
+            Query point(s) in degrees
+        radius_m : float
+            Search radius in meters
+        entrance_types : str or list of str, optional
+            Only entrances of these types (e.g., ['Elevator', 'Ramp'])
+        entry_only : bool, default=False
+            Only entrances where entry is allowed
+
+        Returns:
+        --------
+        pd.DataFrame
+            One row per (query point, entrance) with columns query, the
+            entrance columns and distance_m, sorted by query then distance
+        """
+        rows, tree = self._tree(entrance_types, entry_only)
+        points = self._project(lat, lon)
+
+        matches = tree.query_ball_point(points, r=float(radius_m))
+        lengths = np.array([len(m) for m in matches], dtype=np.int64)
+        query = np.repeat(np.arange(len(points)), lengths)
+        position = np.concatenate([np.asarray(m, dtype=np.int64) for m in matches]) if lengths.sum() \
+            else np.array([], dtype=np.int64)
+        distance = np.hypot(*(tree.data[position] - points[query]).T) if len(position) else np.array([])
+
+        result = self._results(query, rows[position], distance)
+        return result.sort_values(['query', 'distance_m'], kind='stable').reset_index(drop=True)
+
+    def station_entrances(self, station_id, entrance_types=None, entry_only=False):
+        """
+        Entrances of one parent station.
+
+        Parameters:
+        -----------
+        station_id : str
+            GTFS parent station ID (e.g., '127')
+        entrance_types : str or list of str, optional
+            Only entrances of these types
+        entry_only : bool, default=False
+            Only entrances where entry is allowed
+
+        Returns:
+        --------
+        pd.DataFrame
+            The entrance columns for each matching entrance (empty if the
+            station is not in the dataset)
+        """
+        rows = self._station_rows.get(station_id, np.array([], dtype=np.int64))
+        rows = rows[self._mask(entrance_types, entry_only)[rows]]
+        return self.entrances.iloc[np.sort(rows)].reset_index(drop=True)
+
+    def accessible_entrances(self, station_id, entry_only=True):
+        """
+        Step-free entrances (station_complexes.ELEVATOR_TYPES) of a station's complex.
+
+        The dataset often files a complex's elevators under one of its
+        stations only (Times Sq-42 St's under 902), so every station of the
+        complex is searched, as in station_complexes.build_station_table().
+
+        Parameters:
+        -----------
+        station_id : str
+            GTFS parent station ID
+        entry_only : bool, default=True
+            Only entrances where entry is allowed
+
+        Returns:
+        --------
+        pd.DataFrame
+            Same columns as station_entrances()
+        """
+        complex_id = self._station_complex.get(station_id)
+        if complex_id is None:
+            return self.station_entrances(station_id, ELEVATOR_TYPES, entry_only)
+        rows = np.flatnonzero(self._mask(ELEVATOR_TYPES, entry_only)
+                              & (self.entrances['complex_id'].to_numpy() == complex_id))
+        return self.entrances.iloc[rows].reset_index(drop=True)
+
+
+# absolute path -> EntranceIndex
+_INDEXES = {}
+
+
+def get_entrance_index(csv_path=None):
+    """
+    Get the shared EntranceIndex for an entrances dataset.
+
+    Parameters:
+    -----------
+    csv_path : str, optional
+        Entrances dataset. Defaults to the newest file matching
+        station_complexes.ENTRANCES_PATTERN.
+
+    Returns:
+    --------
+    EntranceIndex
+    """
+    if csv_path is None:
+        csv_path = find_entrances_csv()
+    key = os.path.abspath(csv_path)
+    if key not in _INDEXES:
+        _INDEXES[key] = EntranceIndex(csv_path)
+    return _INDEXES[key]
+
+
+if __name__ == "__main__":
+    print(__doc__)
+
+    index = get_entrance_index()
+    print(f"{len(index)} entrances; types: {', '.join(index.entrance_types)}\n")
+
+    # Nearest elevators to Grand Central and Barclays Center
+    nearest = index.nearest([40.7527, 40.6826], [-73.9772, -73.9754], k=3, entrance_types='Elevator')
+    print(nearest[['query', 'rank', 'station_name', 'daytime_routes', 'distance_m']].to_string(index=False))
+
+    print()
+    print(index.accessible_entrances('127')[['station_name', 'entrance_type', 'entrance_lat',
+                                             'entrance_lon']].to_string(index=False))
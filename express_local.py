@@ -1,7 +1,11 @@
 import gtfs_kit as gk
 import pandas as pd
 from collections import defaultdict
+import numpy as np
 from shapely.geometry import Point, Polygon
+from feed_index import get_feed_cache, get_trip_table, seconds_to_gtfs_time, trip_mask
+from service_calendar import resolve_service_ids, service_mask
+from stop_patterns import EXPRESS, LOCAL, build_borough_masks, classify_patterns, get_pattern_catalog
 
 
 """
@@ -23,6 +27,15 @@ SPECIAL CASES:
 - J/Z lines: Excluded from analysis (uses different track system)
 """
 
+# Borough columns produced by analyze_route_express_patterns()
+BOROUGHS = ['Manhattan', 'Brooklyn', 'Queens', 'Bronx', 'Staten Island']
+
+# Routes that never run express
+ALWAYS_LOCAL_ROUTES = ['C', 'M', 'R', '1', '6', 'L', 'G']
+
+# Largest gap between express departures within one block of express service
+MAX_GAP_SECONDS = 7200
+
 
 def get_stop_borough(lat, lon):
     """
@@ -209,6 +222,61 @@ def create_stop_borough_mapping(feed):
     return stops[['stop_id', 'stop_name', 'borough', 'stop_lat', 'stop_lon']].sort_values('stop_name')
 
 
+def get_stop_borough_map(feed):
+    """
+    Get a cached mapping of stop_id -> borough for every stop in the feed.
+
+    create_stop_borough_mapping() tests every stop against the borough
+    polygons, which is slow; this runs it once per feed.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+
+    Returns:
+    --------
+    dict
+        Dictionary mapping stop_id -> borough name (or None)
+    """
+    cache = get_feed_cache(feed)
+    if 'stop_borough_map' not in cache:
+        stop_boroughs = get_stop_borough_table(feed)
+        cache['stop_borough_map'] = dict(zip(stop_boroughs['stop_id'], stop_boroughs['borough']))
+    return cache['stop_borough_map']
+
+
+def get_stop_borough_table(feed):
+    """
+    Get the cached output of create_stop_borough_mapping() for a feed.
+
+    Returns:
+    --------
+    pd.DataFrame
+        DataFrame with columns: stop_id, stop_name, borough, stop_lat, stop_lon.
+        Treat it as read-only.
+    """
+    cache = get_feed_cache(feed)
+    if 'stop_borough_table' not in cache:
+        cache['stop_borough_table'] = create_stop_borough_mapping(feed)
+    return cache['stop_borough_table']
+
+
+def get_borough_masks(feed):
+    """
+    Get cached per-borough stop bitsets over the feed's pattern catalog.
+
+    Returns:
+    --------
+    dict
+        Dictionary mapping borough -> uint64 bitset (see stop_patterns.py)
+    """
+    cache = get_feed_cache(feed)
+    if 'borough_masks' not in cache:
+        cache['borough_masks'] = build_borough_masks(get_pattern_catalog(feed), get_stop_borough_map(feed))
+    return cache['borough_masks']
+
+
 def identify_branch_point(feed, route_id, direction_id):
     """
     Identify where a multi-branch route splits into different branches.
@@ -401,7 +469,7 @@ def classify_trip_express_local(feed, trip_id, reference_stop_pattern, stop_boro
     return result
 
 
-def analyze_route_express_patterns(feed, route_id, direction_id=0, service_id=None):
+def analyze_route_express_patterns(feed, route_id, direction_id=0, service_id=None, date=None):
     """
     Analyze express/local patterns for all trips on a route.
 
@@ -415,59 +483,158 @@ def analyze_route_express_patterns(feed, route_id, direction_id=0, service_id=No
         Direction ID (0 or 1)
     service_id : str, optional
         Service ID to filter by (e.g., weekday, weekend)
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
     pd.DataFrame
         DataFrame with columns: trip_id, and one column per borough showing 'express'/'local'/None
     """
-    # Create borough mapping
-    stop_boroughs = create_stop_borough_mapping(feed)
-    stop_borough_map = dict(zip(stop_boroughs['stop_id'], stop_boroughs['borough']))
-
     # Get trips
     trips = feed.trips[
         (feed.trips['route_id'] == route_id) &
         (feed.trips['direction_id'] == direction_id)
     ].copy()
 
-    if service_id:
-        trips = trips[trips['service_id'] == service_id]
+    if service_id or date is not None:
+        trips = trips[service_mask(feed, trips, service_id, date)]
 
     if trips.empty:
         return pd.DataFrame()
 
-    # Check for branches
-    branch_point, branches = identify_branch_point(feed, route_id, direction_id)
+    # Stop patterns are compared as bitsets from the pattern catalog (see
+    # stop_patterns.py); trips sharing a pattern are classified together
+    catalog = get_pattern_catalog(feed)
+    stop_borough_map = get_stop_borough_map(feed)
+    borough_masks = get_borough_masks(feed)
+    trip_table = get_trip_table(feed)
+    trip_positions = pd.Series(np.arange(len(trip_table)), index=trip_table['trip_id'])
+
+    # Branches and reference patterns use every service, as identify_branch_point()
+    # and get_reference_stop_pattern() do
+    route_trips = trip_table[trip_mask(feed, route_id, direction_id)]
+    route_patterns = catalog.trip_pattern[route_trips.index.to_numpy()]
+    terminal_counts = route_trips['terminal_stop_id'].value_counts()
+
+    is_branched = False
+    if len(terminal_counts) > 1:
+        # Branch point exists if one sample trip per terminal shares any stop
+        sample_patterns = route_patterns[~route_trips['terminal_stop_id'].duplicated().to_numpy()]
+        common_stops = np.bitwise_and.reduce(catalog.bits[sample_patterns], axis=0)
+        is_branched = bool(common_stops.any())
+
+    def reference_for(selection):
+        # The trip making the most stops (first by trip_id on ties)
+        num_stops = route_trips['num_stops'].to_numpy()[selection]
+        return route_patterns[selection][np.argmax(num_stops)]
+
+    def classify(trip_ids, reference_pattern, extra=None):
+        # Boroughs in the order the reference pattern passes through them
+        ordered_boroughs = []
+        for stop_id in catalog.pattern_stop_ids(reference_pattern):
+            borough = stop_borough_map.get(stop_id)
+            if borough and borough not in ordered_boroughs and borough in borough_masks:
+                ordered_boroughs.append(borough)
+
+        patterns = trip_positions.reindex(trip_ids).fillna(-1).to_numpy(dtype=np.int64)
+        patterns = np.where(patterns >= 0, catalog.trip_pattern[np.maximum(patterns, 0)], -1)
+        codes = classify_patterns(
+            catalog, patterns, catalog.bits[reference_pattern],
+            {borough: borough_masks[borough] for borough in ordered_boroughs}
+        )
+
+        records = []
+        for row, trip_id in enumerate(trip_ids):
+            classification = {}
+            for borough, borough_codes in codes.items():
+                if borough_codes[row] == EXPRESS:
+                    classification[borough] = 'express'
+                elif borough_codes[row] == LOCAL:
+                    classification[borough] = 'local'
+            classification['trip_id'] = trip_id
+            if extra:
+                classification.update(extra)
+            records.append(classification)
+        return records
 
     results = []
 
-    if branch_point and len(branches) > 1:
+    if is_branched:
         # Multi-branch route - analyze each branch separately
-        for terminal, trip_ids in branches.items():
-            reference_pattern = get_reference_stop_pattern(feed, route_id, direction_id, terminal)
-            for trip_id in trip_ids:
-                if trip_id in trips['trip_id'].values:
-                    classification = classify_trip_express_local(
-                        feed, trip_id, reference_pattern, stop_borough_map
-                    )
-                    classification['trip_id'] = trip_id
-                    classification['branch_terminal'] = terminal
-                    results.append(classification)
+        selected_trip_ids = set(trips['trip_id'])
+        route_terminals = route_trips['terminal_stop_id'].to_numpy()
+        route_trip_ids = route_trips['trip_id'].to_numpy()
+        for terminal in terminal_counts.index:
+            on_branch = route_terminals == terminal
+            branch_trip_ids = [t for t in route_trip_ids[on_branch] if t in selected_trip_ids]
+            results.extend(classify(
+                branch_trip_ids, reference_for(on_branch), {'branch_terminal': terminal}
+            ))
     else:
         # Single branch - analyze all trips against one reference
-        reference_pattern = get_reference_stop_pattern(feed, route_id, direction_id)
-        for trip_id in trips['trip_id']:
-            classification = classify_trip_express_local(
-                feed, trip_id, reference_pattern, stop_borough_map
-            )
-            classification['trip_id'] = trip_id
-            results.append(classification)
+        results.extend(classify(
+            trips['trip_id'].tolist(), reference_for(np.ones(len(route_trips), dtype=bool))
+        ))
 
     return pd.DataFrame(results)
 
 
-def get_express_service_times(feed, route_id, direction_id=0, service_id=None, borough=None):
+def get_classified_trips(feed, service_id=None, date=None, route_ids=None):
+    """
+    Classify every trip of every route as express or local in each borough.
+
+    Runs analyze_route_express_patterns() for each route and direction and
+    stacks the results into one long table, so system-wide summaries can be
+    computed with a single groupby.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_id : str, optional
+        Service ID to filter by (e.g., 'Weekday'). If None, includes all services.
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
+    route_ids : list of str, optional
+        Routes to include. If None, includes every route in the feed.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per (trip, borough) the trip serves, with columns trip_id,
+        route_id, direction_id, borough and service_type ('express' or 'local')
+    """
+    trip_table = get_trip_table(feed)
+    if route_ids is None:
+        route_ids = sorted(trip_table['route_id'].dropna().unique())
+
+    frames = []
+    for route_id in route_ids:
+        route_trips = trip_table[trip_table['route_id'] == route_id]
+        for direction_id in sorted(route_trips['direction_id'].dropna().unique()):
+            patterns = analyze_route_express_patterns(feed, route_id, direction_id, service_id, date)
+            if patterns.empty:
+                continue
+
+            borough_cols = [col for col in patterns.columns if col in BOROUGHS]
+            long = patterns.melt(id_vars='trip_id', value_vars=borough_cols,
+                                 var_name='borough', value_name='service_type').dropna(subset=['service_type'])
+            long['route_id'] = route_id
+            long['direction_id'] = direction_id
+            frames.append(long)
+
+    if not frames:
+        return pd.DataFrame(columns=['trip_id', 'route_id', 'direction_id', 'borough', 'service_type'])
+
+    return pd.concat(frames, ignore_index=True)[
+        ['trip_id', 'route_id', 'direction_id', 'borough', 'service_type']
+    ]
+
+
+def get_express_service_times(feed, route_id, direction_id=0, service_id=None, borough=None, date=None):
     """
     Find the first and last express trips for a route.
 
@@ -484,6 +651,9 @@ def get_express_service_times(feed, route_id, direction_id=0, service_id=None, b
     borough : str, optional
         Specific borough to check for express service (e.g., 'Manhattan', 'Brooklyn')
         If None, checks if express in ANY borough
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -491,7 +661,7 @@ def get_express_service_times(feed, route_id, direction_id=0, service_id=None, b
         Dictionary with 'first_express' and 'last_express' containing trip info
     """
     # Get express/local patterns
-    patterns = analyze_route_express_patterns(feed, route_id, direction_id, service_id)
+    patterns = analyze_route_express_patterns(feed, route_id, direction_id, service_id, date)
 
     if patterns.empty:
         return None
@@ -571,7 +741,7 @@ def get_express_service_times(feed, route_id, direction_id=0, service_id=None, b
     }
 
 
-def get_express_service_window(feed, route_id, direction_id, service_id='Weekday', borough=None):
+def get_express_service_window(feed, route_id, direction_id, service_id='Weekday', borough=None, date=None):
     """
     Get the express service window for a route (NOT for J/Z lines - they use skip_stop.py).
 
@@ -598,6 +768,9 @@ def get_express_service_window(feed, route_id, direction_id, service_id='Weekday
     borough : str, optional
         Specific borough to check for express service (e.g., 'Manhattan', 'Brooklyn')
         If None, returns windows for ALL boroughs the route passes through
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -635,53 +808,34 @@ def get_express_service_window(feed, route_id, direction_id, service_id='Weekday
       * C, M, R, 1, 6, L, G trains are always local (never run express)
       * F trains are never express in Brooklyn
     """
+    # The B special case only applies when weekday service is running
+    weekday_service = 'Weekday' in (resolve_service_ids(feed, service_id, date) or [])
+
     # Hardcoded special case: trains that are always local (never run express)
-    if route_id in ['C', 'M', 'R', '1', '6', 'L', 'G']:
+    if route_id in ALWAYS_LOCAL_ROUTES:
         if borough is None:
             return {}
         else:
             return None, None
 
-    # Hardcoded special case: A trains are always local in Queens
-    if route_id == 'A' and borough == 'Queens':
-        return None, None
-
-    # Hardcoded special case: F trains are never express in Brooklyn
-    if route_id == 'F' and borough == 'Brooklyn':
-        return None, None
-
-    # Hardcoded special case: B trains always run express in both Manhattan and Brooklyn (daytime weekdays only)
-    if route_id == 'B' and borough in ['Brooklyn', 'Manhattan']:
-        if service_id == 'Weekday':
-            # B train only runs weekdays, approximately 6 AM to 10 PM
-            return '06:00:00', '22:00:00'
-        else:
-            return None, None  # No weekend B service
-
     # If requesting all boroughs, analyze each one
     if borough is None:
         # Get all boroughs this route passes through
-        patterns = analyze_route_express_patterns(feed, route_id, direction_id, service_id)
+        patterns = analyze_route_express_patterns(feed, route_id, direction_id, service_id, date)
 
         if patterns.empty:
             return {}
 
-        borough_cols = [col for col in patterns.columns
-                       if col in ['Manhattan', 'Brooklyn', 'Queens', 'Bronx', 'Staten Island']]
+        borough_cols = [col for col in patterns.columns if col in BOROUGHS]
 
         # Get express windows for each borough using the already-computed patterns
         result = {}
         for boro in borough_cols:
             # Check hardcoded special cases first
-            if route_id == 'A' and boro == 'Queens':
-                continue
-
-            if route_id == 'F' and boro == 'Brooklyn':
-                continue
-
-            if route_id == 'B' and boro in ['Brooklyn', 'Manhattan']:
-                if service_id == 'Weekday':
-                    result[boro] = ('06:00:00', '22:00:00')
+            forced = _get_hardcoded_express_window(route_id, boro, weekday_service)
+            if forced is not None:
+                if forced[0]:
+                    result[boro] = forced
                 continue
 
             # Process this borough directly using the patterns we already have
@@ -691,9 +845,13 @@ def get_express_service_window(feed, route_id, direction_id, service_id='Weekday
 
         return result
 
+    forced = _get_hardcoded_express_window(route_id, borough, weekday_service)
+    if forced is not None:
+        return forced
+
     # Single borough analysis
     # Get all patterns first (will be used by helper function)
-    patterns = analyze_route_express_patterns(feed, route_id, direction_id, service_id)
+    patterns = analyze_route_express_patterns(feed, route_id, direction_id, service_id, date)
 
     if patterns.empty:
         return None, None
@@ -702,103 +860,224 @@ def get_express_service_window(feed, route_id, direction_id, service_id='Weekday
     return _get_express_window_from_patterns(feed, patterns, borough)
 
 
-def _get_express_window_from_patterns(feed, patterns, borough):
+def get_express_service_blocks(feed, route_id, direction_id, service_id='Weekday', borough=None, date=None,
+                               max_gap_seconds=None):
     """
-    Helper function to extract express service window from already-computed patterns.
+    Get every block of express service for a route, not just the main one.
+
+    get_express_service_window() reports only the largest block. Routes with
+    peak-only express service (e.g., 6X/7X, or locals that run express in the
+    AM and PM rush) have separate morning and evening blocks; this returns
+    all of them, in time order.
 
     Parameters:
     -----------
     feed : gtfs_kit.Feed
         A GTFS feed object loaded with gtfs_kit
-    patterns : pd.DataFrame
-        Already-computed patterns from analyze_route_express_patterns()
-    borough : str
-        Specific borough to check for express service
+    route_id : str
+        The route ID (not 'J' or 'Z')
+    direction_id : int
+        Direction ID (0 or 1)
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    borough : str, optional
+        Borough to check. If None, returns blocks for all boroughs.
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
+    max_gap_seconds : int, optional
+        Largest gap between express departures within one block
+        (default: MAX_GAP_SECONDS, 2 hours)
 
     Returns:
     --------
-    tuple
-        (first_express_time, last_express_time) for that borough
-        Returns (None, None) if no express service in that borough
+    dict or list
+        If borough is None, dict mapping borough -> list of blocks (boroughs
+        without express service are omitted). Otherwise the list of blocks.
+        Each block is a dict with first_departure, last_departure (HH:MM:SS)
+        and num_trips. The same hardcoded special cases as
+        get_express_service_window() apply; forced windows have num_trips None.
+
+    Examples:
+    ---------
+    >>> for block in get_express_service_blocks(feed, '6X', 1, borough='Bronx'):
+    ...     print(block['first_departure'], block['last_departure'], block['num_trips'])
     """
-    if patterns.empty:
-        return None, None
+    weekday_service = 'Weekday' in (resolve_service_ids(feed, service_id, date) or [])
 
-    # Check if borough exists in patterns
-    if borough not in patterns.columns:
-        return None, None
+    if route_id in ALWAYS_LOCAL_ROUTES:
+        return {} if borough is None else []
 
-    # Identify express trips in this borough
-    patterns_copy = patterns.copy()
-    patterns_copy['is_express'] = patterns_copy[borough] == 'express'
+    def forced_blocks(window):
+        first, last = window
+        if not first:
+            return []
+        return [{'first_departure': first, 'last_departure': last, 'num_trips': None}]
 
-    express_trips = patterns_copy[patterns_copy['is_express']].copy()
+    if borough is not None:
+        forced = _get_hardcoded_express_window(route_id, borough, weekday_service)
+        if forced is not None:
+            return forced_blocks(forced)
 
-    if express_trips.empty:
-        return None, None
+    patterns = analyze_route_express_patterns(feed, route_id, direction_id, service_id, date)
 
-    # Get departure times for each trip
-    trip_times = []
-    for trip_id in express_trips['trip_id']:
-        stop_times = feed.stop_times[feed.stop_times['trip_id'] == trip_id].copy()
-        stop_times = stop_times.sort_values('stop_sequence')
+    if borough is not None:
+        return _get_express_blocks_from_patterns(feed, patterns, borough, max_gap_seconds)
 
-        if not stop_times.empty:
-            first_departure = stop_times.iloc[0]['departure_time']
+    result = {}
+    for boro in [col for col in patterns.columns if col in BOROUGHS]:
+        forced = _get_hardcoded_express_window(route_id, boro, weekday_service)
+        if forced is not None:
+            blocks = forced_blocks(forced)
+        else:
+            blocks = _get_express_blocks_from_patterns(feed, patterns, boro, max_gap_seconds)
+        if blocks:
+            result[boro] = blocks
 
-            # Parse time to get hours for sorting (handle 24+ hour times)
-            parts = first_departure.split(':')
-            departure_seconds = int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+    return result
 
-            trip_times.append({
-                'departure_time': first_departure,
-                'departure_seconds': departure_seconds
-            })
 
-    if not trip_times:
+def _get_hardcoded_express_window(route_id, borough, weekday_service):
+    """
+    Window forced by a hardcoded special case, or None if there is none.
+
+    Returns (None, None) where the route is known never to run express in the
+    borough, and the B train's fixed weekday window in Manhattan and Brooklyn.
+    """
+    # Trains that are always local (never run express)
+    if route_id in ALWAYS_LOCAL_ROUTES:
         return None, None
 
-    # Sort by departure time
-    trip_times.sort(key=lambda x: x['departure_seconds'])
-    all_express_trips = trip_times
+    # A trains are always local in Queens
+    if route_id == 'A' and borough == 'Queens':
+        return None, None
 
-    if not all_express_trips:
+    # F trains are never express in Brooklyn
+    if route_id == 'F' and borough == 'Brooklyn':
         return None, None
 
-    # If only a few express trips (< 5), just return first and last
-    if len(all_express_trips) < 5:
-        return all_express_trips[0]['departure_time'], all_express_trips[-1]['departure_time']
+    # B trains always run express in both Manhattan and Brooklyn (daytime weekdays only)
+    if route_id == 'B' and borough in ['Brooklyn', 'Manhattan']:
+        if weekday_service:
+            # B train only runs weekdays, approximately 6 AM to 10 PM
+            return '06:00:00', '22:00:00'
+        return None, None  # No weekend B service
 
-    # Find continuous blocks of express service
-    # Allow gaps of up to 2 hours (7200 seconds) within a block
-    MAX_GAP_SECONDS = 7200
+    return None
 
-    blocks = []
-    current_block_start = 0
-    current_block_end = 0
 
-    for i in range(1, len(all_express_trips)):
-        gap = all_express_trips[i]['departure_seconds'] - all_express_trips[i-1]['departure_seconds']
+def _get_express_departures(feed, patterns, borough):
+    """
+    First departures (seconds, sorted) of the trips running express in a borough.
+    """
+    if patterns.empty or borough not in patterns.columns:
+        return np.array([], dtype=np.int64)
 
-        if gap <= MAX_GAP_SECONDS:
-            # Continue current block
-            current_block_end = i
-        else:
-            # Gap too large - save current block and start new one
-            blocks.append((current_block_start, current_block_end))
-            current_block_start = i
-            current_block_end = i
+    express_trip_ids = patterns.loc[patterns[borough] == 'express', 'trip_id']
+    if express_trip_ids.empty:
+        return np.array([], dtype=np.int64)
+
+    trips = get_trip_table(feed)
+    positions = pd.Series(np.arange(len(trips)), index=trips['trip_id'])
+    positions = positions.reindex(express_trip_ids).dropna().to_numpy(dtype=np.int64)
+
+    departures = trips['first_departure_s'].to_numpy()[positions]
+    return np.sort(departures, kind='stable')
+
+
+def _split_service_blocks(departures, max_gap_seconds):
+    """
+    Split sorted departures into blocks at gaps larger than max_gap_seconds.
+
+    Returns:
+    --------
+    tuple
+        (starts, ends): Index of the first and last departure of each block
+    """
+    breaks = np.flatnonzero(np.diff(departures) > max_gap_seconds)
+    starts = np.concatenate(([0], breaks + 1))
+    ends = np.append(breaks, len(departures) - 1)
+    return starts, ends
 
-    # Save the last block
-    blocks.append((current_block_start, current_block_end))
 
-    # Find the largest block (by number of trips)
-    largest_block = max(blocks, key=lambda b: b[1] - b[0])
+def _get_express_blocks_from_patterns(feed, patterns, borough, max_gap_seconds=None):
+    """
+    Helper function to extract every express service block from already-computed patterns.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    patterns : pd.DataFrame
+        Already-computed patterns from analyze_route_express_patterns()
+    borough : str
+        Specific borough to check for express service
+    max_gap_seconds : int, optional
+        Largest gap within a block (default: MAX_GAP_SECONDS)
+
+    Returns:
+    --------
+    list
+        Blocks in time order, each a dict with first_departure,
+        last_departure and num_trips. Fewer than 5 express trips are
+        reported as one block.
+    """
+    if max_gap_seconds is None:
+        max_gap_seconds = MAX_GAP_SECONDS
+
+    departures = _get_express_departures(feed, patterns, borough)
+    if len(departures) == 0:
+        return []
+
+    if len(departures) < 5:
+        starts, ends = np.array([0]), np.array([len(departures) - 1])
+    else:
+        starts, ends = _split_service_blocks(departures, max_gap_seconds)
+
+    return [
+        {
+            'first_departure': seconds_to_gtfs_time(departures[start]),
+            'last_departure': seconds_to_gtfs_time(departures[end]),
+            'num_trips': int(end - start + 1),
+        }
+        for start, end in zip(starts, ends)
+    ]
+
+
+def _get_express_window_from_patterns(feed, patterns, borough):
+    """
+    Helper function to extract express service window from already-computed patterns.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    patterns : pd.DataFrame
+        Already-computed patterns from analyze_route_express_patterns()
+    borough : str
+        Specific borough to check for express service
+
+    Returns:
+    --------
+    tuple
+        (first_express_time, last_express_time) for that borough
+        Returns (None, None) if no express service in that borough
+    """
+    departures = _get_express_departures(feed, patterns, borough)
+
+    if len(departures) == 0:
+        return None, None
+
+    # If only a few express trips (< 5), just return first and last
+    if len(departures) < 5:
+        return seconds_to_gtfs_time(departures[0]), seconds_to_gtfs_time(departures[-1])
 
-    first_express = all_express_trips[largest_block[0]]['departure_time']
-    last_express = all_express_trips[largest_block[1]]['departure_time']
+    # Find continuous blocks of express service, allowing gaps of up to
+    # MAX_GAP_SECONDS within a block, and keep the largest (by number of trips)
+    starts, ends = _split_service_blocks(departures, MAX_GAP_SECONDS)
+    largest = int(np.argmax(ends - starts))
 
-    return first_express, last_express
+    return seconds_to_gtfs_time(departures[starts[largest]]), seconds_to_gtfs_time(departures[ends[largest]])
 
 
 def summarize_express_service(feed, route_id, service_days=None, borough=None):
@@ -2,63 +2,145 @@
 """
 Generate timeline charts showing express/local service by hour
 """
+import time
 import gtfs_kit as gk
 import express_local as el
+import numpy as np
 import pandas as pd
-from collections import defaultdict
+from feed_index import get_trip_table
 
 
-def create_hourly_express_timeline(feed, route_id, direction_id, service_id, borough='Manhattan'):
+def create_hourly_express_timeline(feed, route_id, direction_id, service_id, borough='Manhattan', date=None):
     """
     Create a timeline showing express vs local service for each hour of the day.
 
     Returns a dict mapping hour -> 'express', 'local', 'both', or 'none'
     """
     # Get all trips with express/local classification
-    patterns = el.analyze_route_express_patterns(feed, route_id, direction_id, service_id)
+    patterns = el.analyze_route_express_patterns(feed, route_id, direction_id, service_id, date=date)
 
     if patterns.empty or borough not in patterns.columns:
         return {}
 
-    # Get departure times for each trip
-    hourly_service = defaultdict(lambda: {'express': 0, 'local': 0})
+    # Count express and local trips by the hour of their first departure
+    classified = patterns[['trip_id', borough]].rename(columns={borough: 'service_type'})
+    counts = _count_by_hour(feed, classified.dropna(subset=['service_type']), [])
+    hourly_service = {
+        int(row.hour): {'express': int(row.express_count), 'local': int(row.local_count)}
+        for row in counts.itertuples(index=False)
+    }
 
-    for _, row in patterns.iterrows():
-        trip_id = row['trip_id']
-        service_type = row[borough]
+    # Classify each hour
+    timeline = {}
+    for hour in range(24):
+        counts = hourly_service.get(hour, {'express': 0, 'local': 0})
+        timeline[hour] = _classify_hour(counts['express'], counts['local'])
 
-        if pd.isna(service_type):
-            continue
+    return timeline
 
-        # Get departure time
-        stop_times = feed.stop_times[feed.stop_times['trip_id'] == trip_id].copy()
-        stop_times = stop_times.sort_values('stop_sequence')
 
-        if not stop_times.empty:
-            departure_time = stop_times.iloc[0]['departure_time']
-            hour = int(departure_time.split(':')[0]) % 24  # Handle 24+ hour times
+def _count_by_hour(feed, classified, keys):
+    """
+    Count express and local trips per hour of first departure.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    classified : pd.DataFrame
+        Rows with trip_id, service_type ('express'/'local') and the key columns
+    keys : list of str
+        Columns to group by in addition to the hour
+
+    Returns:
+    --------
+    pd.DataFrame
+        keys + hour, express_count, local_count
+    """
+    trips = get_trip_table(feed)[['trip_id', 'first_departure_s']]
+    merged = classified.merge(trips, on='trip_id', how='inner')
+    merged['hour'] = (merged['first_departure_s'] // 3600) % 24  # Handle 24+ hour times
 
-            hourly_service[hour][service_type] += 1
+    if merged.empty:
+        return pd.DataFrame(columns=keys + ['hour', 'express_count', 'local_count'])
 
-    # Classify each hour
-    timeline = {}
-    for hour in range(24):
-        if hour in hourly_service:
-            express_count = hourly_service[hour]['express']
-            local_count = hourly_service[hour]['local']
-
-            if express_count > 0 and local_count > 0:
-                timeline[hour] = 'both'
-            elif express_count > 0:
-                timeline[hour] = 'express'
-            elif local_count > 0:
-                timeline[hour] = 'local'
-            else:
-                timeline[hour] = 'none'
-        else:
-            timeline[hour] = 'none'
+    counts = merged.groupby(keys + ['hour', 'service_type']).size().unstack('service_type', fill_value=0)
+    counts = counts.reindex(columns=['express', 'local'], fill_value=0)
+    counts.columns = ['express_count', 'local_count']
+    return counts.reset_index()
 
-    return timeline
+
+def build_system_express_timeline(feed, service_id='Weekday', date=None, route_ids=None):
+    """
+    Count express and local trips by route, direction, borough and hour for the whole system.
+
+    Classifies every trip once (see express_local.get_classified_trips) and
+    counts them with a single groupby on the hour of their first departure,
+    instead of calling create_hourly_express_timeline() per route, direction
+    and borough.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_id : str, default='Weekday'
+        Service ID to analyze
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
+    route_ids : list of str, optional
+        Routes to include. If None, includes every route in the feed.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per (route_id, direction_id, borough, hour) with trips, with
+        columns express_count and local_count. Hours are 0-23 (times past
+        24:00 wrap to the early morning hours).
+
+    Examples:
+    ---------
+    >>> table = build_system_express_timeline(feed, 'Weekday')
+    >>> timeline_from_table(table, '4', 0, 'Manhattan')[8]
+    'express'
+    """
+    classified = el.get_classified_trips(feed, service_id, date, route_ids)
+    return _count_by_hour(feed, classified, ['route_id', 'direction_id', 'borough'])
+
+
+def timeline_from_table(table, route_id, direction_id, borough='Manhattan'):
+    """
+    Get one route's hourly timeline from build_system_express_timeline() output.
+
+    Returns:
+    --------
+    dict
+        Same as create_hourly_express_timeline(): hour -> 'express', 'local',
+        'both' or 'none', for all 24 hours ('none' throughout if the route
+        has no trips in the borough)
+    """
+    rows = table[(table['route_id'] == route_id) &
+                 (table['direction_id'] == direction_id) &
+                 (table['borough'] == borough)]
+
+    express = np.zeros(24, dtype=np.int64)
+    local = np.zeros(24, dtype=np.int64)
+    hours = rows['hour'].to_numpy(dtype=np.int64)
+    express[hours] = rows['express_count'].to_numpy()
+    local[hours] = rows['local_count'].to_numpy()
+
+    return {hour: _classify_hour(express[hour], local[hour]) for hour in range(24)}
+
+
+def _classify_hour(express_count, local_count):
+    """Label an hour by which kinds of service ran in it."""
+    if express_count > 0 and local_count > 0:
+        return 'both'
+    elif express_count > 0:
+        return 'express'
+    elif local_count > 0:
+        return 'local'
+    return 'none'
 
 
 def print_timeline_chart(route_id, direction_id, service_id, timeline, borough='Manhattan'):
@@ -103,6 +185,42 @@ def print_timeline_chart(route_id, direction_id, service_id, timeline, borough='
     print("  ---- = No service")
 
 
+def print_system_timeline_chart(table, direction_id, service_id, borough='Manhattan'):
+    """
+    Print one row per route showing its service pattern in each hour.
+
+    Parameters:
+    -----------
+    table : pd.DataFrame
+        Output of build_system_express_timeline()
+    direction_id : int
+        Direction ID (0 or 1)
+    service_id : str
+        Service label for the title
+    borough : str, default='Manhattan'
+        Borough to chart
+    """
+    symbols = {'express': '█', 'local': '▒', 'both': '▓', 'none': '-'}
+    direction_name = "Northbound" if direction_id == 0 else "Southbound"
+
+    print(f"\n{'='*70}")
+    print(f"All Routes - {service_id} - {direction_name} - {borough}")
+    print(f"{'='*70}")
+    print()
+    print("Route " + "".join(f"{hour:<3d}" for hour in range(0, 24, 3)))
+    print("-" * 30)
+
+    rows = table[(table['direction_id'] == direction_id) & (table['borough'] == borough)]
+    for route_id in sorted(rows['route_id'].unique()):
+        timeline = timeline_from_table(rows, route_id, direction_id, borough)
+        print(f"{route_id:5s} " + "".join(symbols[timeline[hour]] for hour in range(24)))
+
+    # Legend
+    print()
+    print("Legend:")
+    print("  █ = Express   ▒ = Local   ▓ = Express + local   - = No service")
+
+
 def main():
     # Load GTFS feed
     feed = gk.read_feed("gtfs_subway.zip", dist_units="m")
@@ -112,14 +230,19 @@ def main():
 
     # Generate timelines for each service day and direction
     for service_id in ['Weekday', 'Saturday', 'Sunday']:
+        start = time.perf_counter()
+        table = build_system_express_timeline(feed, service_id)
+        print(f"\nClassified {service_id} service in {time.perf_counter() - start:.2f}s")
+
         for direction_id in [0, 1]:
-            timeline = create_hourly_express_timeline(
-                feed, route_id, direction_id, service_id, borough
-            )
+            timeline = timeline_from_table(table, route_id, direction_id, borough)
 
-            if timeline:
+            if any(service != 'none' for service in timeline.values()):
                 print_timeline_chart(route_id, direction_id, service_id, timeline, borough)
 
+        for direction_id in [0, 1]:
+            print_system_timeline_chart(table, direction_id, service_id, borough)
+
 
 if __name__ == "__main__":
     main()
@@ -10,13 +10,48 @@ Express service windows indicate the time periods during which trains run expres
 (skip stops) in each borough they pass through.
 """
 import json
+import os
+import sys
+import tempfile
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, time as dt_time
 import gtfs_kit as gk
+import numpy as np
+import pandas as pd
 import express_local as el
 import skip_stop as ss
+from feed_index import (get_stop_departure_index, get_stop_times_table, get_terminal_index,
+                        get_trip_table, gtfs_time_to_seconds)
+from service_calendar import get_service_calendar, get_trip_service_codes
+from stop_patterns import get_pattern_catalog
 from travel_times import get_direction_name
 from pathlib import Path
 
 
+# All standard routes (excluding J/Z which need special handling)
+STANDARD_ROUTES = ['A', 'C', 'E', 'B', 'D', 'F', 'M', 'N', 'Q', 'R', 'W',
+                   '1', '2', '3', '4', '5', '6', '7', 'L', 'G', 'S']
+
+# Express variants (X trains)
+EXPRESS_VARIANTS = ['6X', '7X', 'FX']
+
+# J/Z trains need special handling
+JZ_ROUTES = ['J', 'Z']
+
+ALL_ROUTES = STANDARD_ROUTES + EXPRESS_VARIANTS + JZ_ROUTES
+
+# Service IDs covered by generate_all_express_windows()
+SERVICE_IDS = ['Weekday', 'Saturday', 'Sunday']
+
+# Version of the multi-service JSON layout. Files written by
+# generate_express_windows() (a single service, no version key) are version 1.
+FORMAT_VERSION = 2
+
+_BOROUGH_COLUMNS = ['Manhattan', 'Brooklyn', 'Queens', 'Bronx', 'Staten Island']
+
+
 def _normalize_borough_name(borough):
     """
     Normalize borough names to their proper display format.
@@ -36,7 +71,137 @@ def _normalize_borough_name(borough):
     return borough
 
 
-def generate_express_windows(feed, service_id='Weekday', output_file='express_window_data.json'):
+def _get_direction_windows(feed, route_id, direction_id, service_id='Weekday', date=None):
+    """
+    Compute the express window entry for one route and direction.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    route_id : str
+        Route ID (e.g., 'A', '6X', 'J')
+    direction_id : int
+        Direction ID (0 or 1)
+    service_id : str, default='Weekday'
+        Service ID to analyze
+    date : str or datetime.date, optional
+        Calendar date to analyze. Overrides service_id.
+
+    Returns:
+    --------
+    dict
+        direction_name plus borough -> [first_time, last_time] (or express_J /
+        Z_service for the J/Z). Errors computing the windows are raised.
+    """
+    direction_data = {}
+
+    # Get direction name
+    try:
+        direction_name = get_direction_name(feed, route_id, direction_id, service_id, date=date)
+        direction_data['direction_name'] = direction_name
+    except Exception:
+        direction_data['direction_name'] = f"Direction {direction_id}"
+
+    # Handle J/Z trains specially
+    if route_id in JZ_ROUTES:
+        first_exp_j, first_z, last_z, last_exp_j = ss.get_express_service_window(
+            feed, direction_id, service_id, date
+        )
+
+        if route_id == 'J':
+            if first_exp_j and last_exp_j:
+                direction_data['express_J'] = [first_exp_j, last_exp_j]
+        elif route_id == 'Z':
+            if first_z and last_z:
+                direction_data['Z_service'] = [first_z, last_z]
+
+    # Handle express variants (X trains)
+    elif route_id in EXPRESS_VARIANTS:
+        # X trains run express in outer boroughs, local in Manhattan
+        patterns = el.analyze_route_express_patterns(feed, route_id, direction_id, service_id, date=date)
+        if not patterns.empty:
+            borough_cols = [col for col in patterns.columns if col in _BOROUGH_COLUMNS]
+
+            # First and last departure of a sample of trips
+            stop_times = get_stop_times_table(feed)
+            sample = stop_times[stop_times['trip_id'].isin(patterns['trip_id'].head(10))]
+            by_trip = sample.groupby('trip_idx', sort=False)['departure_time']
+
+            if not sample.empty:
+                # X trains run during specific hours - use actual trip times
+                first_time = by_trip.first().min()
+                last_time = by_trip.last().max()
+
+                for boro in borough_cols:
+                    if boro != 'Manhattan':
+                        # Express in outer boroughs
+                        normalized_boro = _normalize_borough_name(boro)
+                        direction_data[normalized_boro] = [first_time, last_time]
+                    # Local in Manhattan - don't add to express windows
+
+    # Handle standard routes
+    else:
+        windows = el.get_express_service_window(
+            feed, route_id, direction_id, service_id, date=date
+        )
+
+        if isinstance(windows, dict) and windows:
+            for borough, (first, last) in windows.items():
+                normalized_boro = _normalize_borough_name(borough)
+                direction_data[normalized_boro] = [first, last]
+
+    return direction_data
+
+
+def get_route_windows(feed, route_id, service_id='Weekday', date=None):
+    """
+    Compute the express window entries for every direction of a route.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    route_id : str
+        Route ID (e.g., 'A', '6X', 'J')
+    service_id : str, default='Weekday'
+        Service ID to analyze
+    date : str or datetime.date, optional
+        Calendar date to analyze. Overrides service_id.
+
+    Returns:
+    --------
+    dict
+        Dictionary mapping str(direction_id) -> direction entry (see
+        _get_direction_windows). Empty if the route is not in the feed.
+
+    Raises:
+    -------
+    Exception
+        Whatever computing a direction's windows raised, so callers never
+        mistake a failed route for one without express service
+    """
+    route_data = {}
+
+    # Directions come from all of the route's trips, whatever the service
+    trips = get_trip_table(feed)
+    route_trips = trips[trips['route_id'] == route_id]
+
+    for direction_id in route_trips['direction_id'].unique():
+        direction_data = _get_direction_windows(feed, route_id, direction_id, service_id, date)
+        if direction_data:
+            route_data[str(direction_id)] = direction_data
+
+    return route_data
+
+
+def _get_feed_routes(feed, routes=None):
+    """Routes from routes (default ALL_ROUTES) that have trips in the feed."""
+    feed_routes = set(get_trip_table(feed)['route_id'])
+    return [route_id for route_id in (routes or ALL_ROUTES) if route_id in feed_routes]
+
+
+def generate_express_windows(feed, service_id='Weekday', output_file='express_window_data.json', date=None):
     """
     Generate express service window data for all subway routes and save to JSON.
 
@@ -52,6 +217,9 @@ def generate_express_windows(feed, service_id='Weekday', output_file='express_wi
         Service ID to analyze (e.g., 'Weekday', 'Saturday', 'Sunday')
     output_file : str, default='express_window_data.json'
         Path to output JSON file
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -63,6 +231,8 @@ def generate_express_windows(feed, service_id='Weekday', output_file='express_wi
     - J/Z trains use skip_stop.get_express_service_window() for special handling
     - Express variants (6X, 7X, FX) run express in outer boroughs, local in Manhattan
     - All hardcoded special cases from express_local.py are applied
+    - A route whose windows cannot be computed is printed and left out
+    - To generate every service ID at once, use generate_all_express_windows()
 
     Example output structure:
     {
@@ -77,125 +247,237 @@ def generate_express_windows(feed, service_id='Weekday', output_file='express_wi
         ...
     }
     """
-    # All standard routes (excluding J/Z which need special handling)
-    standard_routes = ['A', 'C', 'E', 'B', 'D', 'F', 'M', 'N', 'Q', 'R', 'W',
-                      '1', '2', '3', '4', '5', '6', '7', 'L', 'G', 'S']
-
-    # Express variants (X trains)
-    express_variants = ['6X', '7X', 'FX']
-
-    # J/Z trains need special handling
-    jz_routes = ['J', 'Z']
-
-    all_routes = standard_routes + express_variants + jz_routes
-
     result = {}
+    feed_routes = set(_get_feed_routes(feed))
 
-    for route_id in all_routes:
-        route_data = {}
-
+    for route_id in ALL_ROUTES:
         # Check if this route exists in the feed
-        route_trips = feed.trips[feed.trips['route_id'] == route_id]
-        if route_trips.empty:
+        if route_id not in feed_routes:
             print(f"  Skipping {route_id} - not found in feed")
             continue
 
         print(f"Processing {route_id} train...")
 
-        # Get available directions for this route
-        available_directions = route_trips['direction_id'].unique()
+        try:
+            route_data = get_route_windows(feed, route_id, service_id, date)
+        except Exception as e:
+            print(f"  Error processing {route_id}: {e}")
+            continue
+        if route_data:
+            result[route_id] = route_data
 
-        for direction_id in available_directions:
-            direction_data = {}
+    # Save to JSON
+    with open(output_file, 'w') as f:
+        json.dump(result, f, indent=2)
 
-            # Get direction name
-            try:
-                direction_name = get_direction_name(feed, route_id, direction_id, service_id)
-                direction_data['direction_name'] = direction_name
-            except:
-                direction_data['direction_name'] = f"Direction {direction_id}"
+    print(f"\nExpress window data saved to {output_file}")
+    return result
 
-            # Handle J/Z trains specially
-            if route_id in jz_routes:
-                try:
-                    first_exp_j, first_z, last_z, last_exp_j = ss.get_express_service_window(
-                        feed, direction_id, service_id
-                    )
-
-                    if route_id == 'J':
-                        if first_exp_j and last_exp_j:
-                            direction_data['express_J'] = [first_exp_j, last_exp_j]
-                    elif route_id == 'Z':
-                        if first_z and last_z:
-                            direction_data['Z_service'] = [first_z, last_z]
-                except Exception as e:
-                    print(f"  Error processing {route_id} direction {direction_id}: {e}")
 
-            # Handle express variants (X trains)
-            elif route_id in express_variants:
-                # X trains run express in outer boroughs, local in Manhattan
-                base_route = route_id[0]  # '6X' -> '6', '7X' -> '7', 'FX' -> 'F'
+def compile_feed(feed):
+    """
+    Build every per-feed index used by express window generation.
 
-                # Get all boroughs this route passes through
-                try:
-                    patterns = el.analyze_route_express_patterns(feed, route_id, direction_id, service_id)
-                    if not patterns.empty:
-                        borough_cols = [col for col in patterns.columns
-                                       if col in ['Manhattan', 'Brooklyn', 'Queens', 'Bronx', 'Staten Island']]
-
-                        # Get trip times for this route
-                        trip_times = []
-                        for trip_id in patterns['trip_id'].head(10):  # Sample trips
-                            stop_times = feed.stop_times[feed.stop_times['trip_id'] == trip_id]
-                            if not stop_times.empty:
-                                stop_times = stop_times.sort_values('stop_sequence')
-                                first_dep = stop_times.iloc[0]['departure_time']
-                                last_dep = stop_times.iloc[-1]['departure_time']
-                                trip_times.append((first_dep, last_dep))
-
-                        if trip_times:
-                            # X trains run during specific hours - use actual trip times
-                            first_time = min(t[0] for t in trip_times)
-                            last_time = max(t[1] for t in trip_times)
-
-                            for boro in borough_cols:
-                                if boro != 'Manhattan':
-                                    # Express in outer boroughs
-                                    normalized_boro = _normalize_borough_name(boro)
-                                    direction_data[normalized_boro] = [first_time, last_time]
-                                # Local in Manhattan - don't add to express windows
-                except Exception as e:
-                    print(f"  Error processing {route_id} direction {direction_id}: {e}")
+    The indexes are cached on the feed (see feed_index.get_feed_cache), so
+    calling this before forking worker processes lets all workers share one
+    copy of them instead of each rebuilding the borough mapping, stop pattern
+    bitsets and sorted stop_times.
 
-            # Handle standard routes
-            else:
-                try:
-                    windows = el.get_express_service_window(
-                        feed, route_id, direction_id, service_id
-                    )
-
-                    if isinstance(windows, dict) and windows:
-                        for borough, (first, last) in windows.items():
-                            normalized_boro = _normalize_borough_name(borough)
-                            direction_data[normalized_boro] = [first, last]
-                except Exception as e:
-                    print(f"  Error processing {route_id} direction {direction_id}: {e}")
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
 
-            if direction_data:
-                route_data[str(direction_id)] = direction_data
+    Returns:
+    --------
+    gtfs_kit.Feed
+        The same feed, for chaining
+    """
+    get_trip_table(feed)
+    get_stop_times_table(feed)
+    get_stop_departure_index(feed)
+    get_terminal_index(feed)
+    get_trip_service_codes(feed)
+    get_service_calendar(feed)
+    get_pattern_catalog(feed)
+    el.get_stop_borough_map(feed)
+    el.get_borough_masks(feed)
+    return feed
 
-        if route_data:
-            result[route_id] = route_data
 
-    # Save to JSON
-    with open(output_file, 'w') as f:
-        json.dump(result, f, indent=2)
+# Feed used by worker processes. Set in the parent before forking, or loaded
+# by _init_worker() when workers are spawned.
+_WORKER_FEED = None
 
-    print(f"\nExpress window data saved to {output_file}")
-    return result
+
+def _init_worker(feed_path):
+    """Process pool initializer for platforms that spawn instead of fork."""
+    global _WORKER_FEED
+    if _WORKER_FEED is None:
+        _WORKER_FEED = compile_feed(gk.read_feed(feed_path, dist_units="m"))
+
+
+def _route_task(service_id, route_id):
+    """Worker task: all directions of one route for one service ID, timed."""
+    start = time.perf_counter()
+    route_data = get_route_windows(_WORKER_FEED, route_id, service_id)
+    return service_id, route_id, route_data, time.perf_counter() - start
 
 
-def load_express_windows(json_file='express_window_data.json'):
+def write_json_atomic(data, output_file):
+    """
+    Write JSON to a temporary file next to output_file and move it into place.
+
+    Readers never see a half-written file, even if the process is killed
+    mid-write.
+
+    Parameters:
+    -----------
+    data : dict or list
+        JSON-serializable data
+    output_file : str
+        Path of the JSON file
+    """
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix=f'.{os.path.basename(output_file)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, output_file)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def generate_all_express_windows(feed, service_ids=None, output_file='express_window_data_all.json',
+                                 max_workers=None, feed_path='gtfs_subway.zip', routes=None):
+    """
+    Generate express windows for every route, direction and service ID in parallel.
+
+    Each (service_id, route) pair is a task run in a process pool. The feed
+    is compiled once (see compile_feed) in the parent; with the 'fork' start
+    method the workers inherit it, otherwise each worker loads feed_path.
+    The output file is rewritten after every completed task, so a partial
+    run still leaves valid JSON behind ("complete" is false until the end).
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_ids : list of str, optional
+        Service IDs to generate (default: SERVICE_IDS)
+    output_file : str, default='express_window_data_all.json'
+        Path to output JSON file
+    max_workers : int, optional
+        Number of worker processes (default: CPU count). Use 1 to run
+        serially in this process.
+    feed_path : str, default='gtfs_subway.zip'
+        Feed for workers to load when processes cannot be forked
+    routes : list of str, optional
+        Routes to generate (default: ALL_ROUTES)
+
+    Returns:
+    --------
+    dict
+        The data written to output_file:
+        - format_version (int): FORMAT_VERSION
+        - generated_at (str): ISO timestamp
+        - complete (bool): Whether every task finished
+        - services: service_id -> route_id -> direction_id -> entry, with
+          entries laid out as in generate_express_windows()
+        - timings: service_id -> route_id -> seconds
+        - errors: List of failed tasks
+
+    Examples:
+    ---------
+    >>> data = generate_all_express_windows(feed)
+    >>> data['services']['Saturday']['A']['0']
+    >>> load_express_windows('express_window_data_all.json', service_id='Sunday')
+    """
+    global _WORKER_FEED
+
+    service_ids = list(service_ids or SERVICE_IDS)
+    route_ids = _get_feed_routes(feed, routes)
+    tasks = [(service_id, route_id) for service_id in service_ids for route_id in route_ids]
+
+    compile_start = time.perf_counter()
+    compile_feed(feed)
+    print(f"Compiled feed in {time.perf_counter() - compile_start:.1f}s")
+
+    services = {service_id: {} for service_id in service_ids}
+    timings = {service_id: {} for service_id in service_ids}
+    errors = []
+
+    def snapshot(complete):
+        # Keep the canonical route order regardless of completion order
+        return {
+            'format_version': FORMAT_VERSION,
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'complete': complete,
+            'services': {
+                service_id: {r: services[service_id][r] for r in route_ids if r in services[service_id]}
+                for service_id in service_ids
+            },
+            'timings': {
+                service_id: {r: timings[service_id][r] for r in route_ids if r in timings[service_id]}
+                for service_id in service_ids
+            },
+            'errors': errors,
+        }
+
+    def fail(service_id, route_id, e):
+        print(f"  Error processing {route_id} ({service_id}): {e}")
+        errors.append({'service_id': service_id, 'route_id': route_id, 'error': str(e)})
+
+    def record(service_id, route_id, route_data, elapsed):
+        if route_data:
+            services[service_id][route_id] = route_data
+        timings[service_id][route_id] = round(elapsed, 3)
+        print(f"  {service_id:10s} {route_id:3s} {elapsed:7.2f}s")
+        write_json_atomic(snapshot(False), output_file)
+
+    wall_start = time.perf_counter()
+    _WORKER_FEED = feed
+    try:
+        if max_workers == 1:
+            for service_id, route_id in tasks:
+                try:
+                    record(*_route_task(service_id, route_id))
+                except Exception as e:
+                    fail(service_id, route_id, e)
+        else:
+            methods = multiprocessing.get_all_start_methods()
+            if 'fork' in methods:
+                context, initargs = multiprocessing.get_context('fork'), ()
+            else:
+                context, initargs = multiprocessing.get_context(), (feed_path,)
+
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                     initializer=_init_worker if initargs else None,
+                                     initargs=initargs) as pool:
+                futures = {pool.submit(_route_task, *task): task for task in tasks}
+                for future in as_completed(futures):
+                    service_id, route_id = futures[future]
+                    try:
+                        record(*future.result())
+                    except Exception as e:
+                        fail(service_id, route_id, e)
+    finally:
+        _WORKER_FEED = None
+
+    data = snapshot(not errors)
+    write_json_atomic(data, output_file)
+
+    print(f"\nGenerated {len(tasks)} route/service combinations in "
+          f"{time.perf_counter() - wall_start:.1f}s")
+    slowest = sorted(((t, s, r) for s in timings for r, t in timings[s].items()), reverse=True)[:5]
+    for elapsed, service_id, route_id in slowest:
+        print(f"  slowest: {route_id} {service_id} {elapsed:.2f}s")
+    print(f"Express window data saved to {output_file}")
+    return data
+
+
+def load_express_windows(json_file='express_window_data.json', service_id='Weekday'):
     """
     Load express service window data from JSON file.
 
@@ -203,6 +485,9 @@ def load_express_windows(json_file='express_window_data.json'):
     -----------
     json_file : str, default='express_window_data.json'
         Path to JSON file containing express window data
+    service_id : str, default='Weekday'
+        Service ID to return from a multi-service file written by
+        generate_all_express_windows(). Ignored for single-service files.
 
     Returns:
     --------
@@ -213,6 +498,8 @@ def load_express_windows(json_file='express_window_data.json'):
     -------
     FileNotFoundError
         If the JSON file doesn't exist
+    KeyError
+        If a multi-service file has no data for service_id
 
     Example:
     --------
@@ -227,10 +514,286 @@ def load_express_windows(json_file='express_window_data.json'):
         )
 
     with open(json_file, 'r') as f:
-        return json.load(f)
+        data = json.load(f)
 
+    if 'format_version' not in data:
+        return data
 
-def get_express_window(route_id, direction_id, borough=None, json_file='express_window_data.json'):
+    if service_id not in data['services']:
+        raise KeyError(f"Service '{service_id}' not found in express window data")
+    return data['services'][service_id]
+
+
+def _parse_clock_time(value):
+    """
+    Convert a query time to seconds after midnight.
+
+    Accepts seconds (int), 'HH:MM' or 'HH:MM:SS' strings (hours may exceed
+    24, as in GTFS) and datetime.time objects.
+    """
+    if isinstance(value, dt_time):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+
+    parts = str(value).strip().split(':')
+    if len(parts) not in (2, 3):
+        raise ValueError(f"Could not parse time '{value}' (expected HH:MM or HH:MM:SS)")
+    hours, minutes = int(parts[0]), int(parts[1])
+    seconds = int(parts[2]) if len(parts) == 3 else 0
+    return hours * 3600 + minutes * 60 + seconds
+
+
+class ExpressWindowStore:
+    """
+    Express window data loaded once and indexed for fast lookups.
+
+    get_express_window() re-reads the JSON file on every call; the store keeps
+    the parsed data in memory and reloads it only when the file's modification
+    time or size changes. Every window is also kept in a flat index of
+    (route_id, direction_id, borough) -> (start_s, end_s) in integer seconds,
+    so questions like "which routes run express in Brooklyn at 08:15" are
+    interval comparisons over arrays.
+
+    J/Z entries are indexed under their own keys ('express_J', 'Z_service')
+    in place of a borough.
+
+    Use get_express_window_store() to share one store per file and service.
+
+    Parameters:
+    -----------
+    json_file : str, default='express_window_data.json'
+        Path to JSON file containing express window data
+    service_id : str, default='Weekday'
+        Service ID to read from a multi-service file
+
+    Examples:
+    ---------
+    >>> store = get_express_window_store()
+    >>> store.get_window('A', 0, 'Brooklyn')
+    (18750, 80280)
+    >>> store.routes_express_at('08:15', borough='Brooklyn')
+    ['4', '5', 'A', 'B', 'D', 'FX', 'N']
+    """
+
+    def __init__(self, json_file='express_window_data.json', service_id='Weekday'):
+        self.json_file = json_file
+        self.service_id = service_id
+        self._file_stamp = None
+        self.refresh()
+
+    def refresh(self):
+        """
+        Reload the data if the file changed since it was last read.
+
+        Returns:
+        --------
+        bool
+            True if the data was (re)loaded
+        """
+        if not Path(self.json_file).exists():
+            # Raises FileNotFoundError with the usual message
+            load_express_windows(self.json_file, self.service_id)
+
+        stat = os.stat(self.json_file)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._file_stamp:
+            return False
+
+        self.data = load_express_windows(self.json_file, self.service_id)
+        self._build_index()
+        self._file_stamp = stamp
+        return True
+
+    def _build_index(self):
+        """Flatten the nested data into parallel arrays and a lookup dict."""
+        route_ids, direction_ids, boroughs, starts, ends = [], [], [], [], []
+
+        for route_id, route_data in self.data.items():
+            for direction_str, direction_data in route_data.items():
+                for borough, window in direction_data.items():
+                    if borough == 'direction_name':
+                        continue
+                    route_ids.append(route_id)
+                    direction_ids.append(int(direction_str))
+                    boroughs.append(borough)
+                    starts.append(window[0])
+                    ends.append(window[1])
+
+        self.route_ids = np.array(route_ids, dtype=object)
+        self.direction_ids = np.array(direction_ids, dtype=np.int64)
+        self.boroughs = np.array(boroughs, dtype=object)
+        self.start_s = gtfs_time_to_seconds(starts) if starts else np.array([], dtype=np.int64)
+        self.end_s = gtfs_time_to_seconds(ends) if ends else np.array([], dtype=np.int64)
+
+        self.windows = {
+            (route_id, direction_id, borough): (int(start), int(end))
+            for route_id, direction_id, borough, start, end in zip(
+                self.route_ids, self.direction_ids, self.boroughs, self.start_s, self.end_s)
+        }
+
+        # Row positions of each borough, so borough queries skip the other rows
+        self._borough_rows = {}
+        for row, borough in enumerate(self.boroughs):
+            self._borough_rows.setdefault(borough, []).append(row)
+        self._borough_rows = {b: np.array(rows, dtype=np.int64) for b, rows in self._borough_rows.items()}
+
+    def get_window(self, route_id, direction_id, borough=None):
+        """
+        Get the express window of a route and direction in seconds.
+
+        Parameters:
+        -----------
+        route_id : str
+            Route ID (e.g., 'A', '6X')
+        direction_id : int
+            Direction ID (0 or 1)
+        borough : str, optional
+            Borough (e.g., 'Brooklyn'). If None, returns all boroughs.
+
+        Returns:
+        --------
+        tuple or dict or None
+            (start_s, end_s) for one borough (None if no express service), or a
+            dict mapping borough -> (start_s, end_s)
+        """
+        self.refresh()
+        direction_id = int(direction_id)
+        if borough is not None:
+            return self.windows.get((route_id, direction_id, borough))
+        return {b: window for (r, d, b), window in self.windows.items()
+                if r == route_id and d == direction_id}
+
+    def direction_name(self, route_id, direction_id):
+        """Direction name stored for a route and direction, or None."""
+        self.refresh()
+        return self.data.get(route_id, {}).get(str(direction_id), {}).get('direction_name')
+
+    def express_at(self, time, borough=None, direction_id=None):
+        """
+        Find every window that covers a time of day.
+
+        Windows that run past midnight (end after 24:00:00) also match early
+        morning query times.
+
+        Parameters:
+        -----------
+        time : str, int or datetime.time
+            Time of day ('08:15', '08:15:00' or seconds after midnight)
+        borough : str, optional
+            Only windows in this borough
+        direction_id : int, optional
+            Only windows in this direction
+
+        Returns:
+        --------
+        pd.DataFrame
+            Matching windows with columns route_id, direction_id, borough,
+            start_s, end_s
+        """
+        self.refresh()
+        t = _parse_clock_time(time)
+
+        if borough is None:
+            rows = np.arange(len(self.route_ids))
+        else:
+            rows = self._borough_rows.get(borough, np.array([], dtype=np.int64))
+        if direction_id is not None:
+            rows = rows[self.direction_ids[rows] == int(direction_id)]
+
+        start, end = self.start_s[rows], self.end_s[rows]
+        covers = ((start <= t) & (t <= end)) | ((start <= t + 86400) & (t + 86400 <= end))
+        rows = rows[covers]
+
+        return pd.DataFrame({
+            'route_id': self.route_ids[rows],
+            'direction_id': self.direction_ids[rows],
+            'borough': self.boroughs[rows],
+            'start_s': self.start_s[rows],
+            'end_s': self.end_s[rows],
+        })
+
+    def routes_express_at(self, time, borough=None, direction_id=None):
+        """
+        Get the routes running express at a time of day.
+
+        Takes the same arguments as express_at().
+
+        Returns:
+        --------
+        list
+            Sorted route IDs with an express window covering time
+        """
+        matches = self.express_at(time, borough, direction_id)
+        return sorted(set(matches['route_id']))
+
+    def express_at_times(self, times, borough=None):
+        """
+        Evaluate many times of day at once.
+
+        Parameters:
+        -----------
+        times : list
+            Times of day in any form accepted by express_at()
+        borough : str, optional
+            Only windows in this borough
+
+        Returns:
+        --------
+        pd.DataFrame
+            Boolean DataFrame indexed by (route_id, direction_id, borough),
+            one column per query time, True where the window covers it
+        """
+        self.refresh()
+        seconds = np.array([_parse_clock_time(t) for t in times], dtype=np.int64)
+
+        if borough is None:
+            rows = np.arange(len(self.route_ids))
+        else:
+            rows = self._borough_rows.get(borough, np.array([], dtype=np.int64))
+
+        start = self.start_s[rows][:, None]
+        end = self.end_s[rows][:, None]
+        covers = (((start <= seconds) & (seconds <= end)) |
+                  ((start <= seconds + 86400) & (seconds + 86400 <= end)))
+
+        index = pd.MultiIndex.from_arrays(
+            [self.route_ids[rows], self.direction_ids[rows], self.boroughs[rows]],
+            names=['route_id', 'direction_id', 'borough']
+        )
+        return pd.DataFrame(covers, index=index, columns=list(times))
+
+
+# (absolute path, service_id) -> ExpressWindowStore
+_STORES = {}
+
+
+def get_express_window_store(json_file='express_window_data.json', service_id='Weekday'):
+    """
+    Get the shared ExpressWindowStore for a file and service ID.
+
+    The store is created on first use and refreshes itself when the file
+    changes, so callers can hold on to it or call this on every lookup.
+
+    Parameters:
+    -----------
+    json_file : str, default='express_window_data.json'
+        Path to JSON file containing express window data
+    service_id : str, default='Weekday'
+        Service ID to read from a multi-service file
+
+    Returns:
+    --------
+    ExpressWindowStore
+    """
+    key = (os.path.abspath(json_file), service_id)
+    if key not in _STORES:
+        _STORES[key] = ExpressWindowStore(json_file, service_id)
+    return _STORES[key]
+
+
+def get_express_window(route_id, direction_id, borough=None, json_file='express_window_data.json',
+                       service_id='Weekday'):
     """
     Get express service window for a specific route, direction, and optionally borough.
 
@@ -245,6 +808,8 @@ def get_express_window(route_id, direction_id, borough=None, json_file='express_
         If None, returns all boroughs
     json_file : str, default='express_window_data.json'
         Path to JSON file containing express window data
+    service_id : str, default='Weekday'
+        Service ID to read from a multi-service file
 
     Returns:
     --------
@@ -273,7 +838,9 @@ def get_express_window(route_id, direction_id, borough=None, json_file='express_
     >>> get_express_window('C', 0, 'Manhattan')
     None
     """
-    data = load_express_windows(json_file)
+    store = get_express_window_store(json_file, service_id)
+    store.refresh()
+    data = store.data
 
     if route_id not in data:
         raise KeyError(f"Route '{route_id}' not found in express window data")
@@ -282,7 +849,9 @@ def get_express_window(route_id, direction_id, borough=None, json_file='express_
     if direction_str not in data[route_id]:
         raise KeyError(f"Direction {direction_id} not found for route '{route_id}'")
 
-    direction_data = data[route_id][direction_str].copy()
+    # Copy so callers cannot modify the shared store
+    direction_data = {k: list(v) if isinstance(v, list) else v
+                      for k, v in data[route_id][direction_str].items()}
 
     # Remove metadata fields
     if 'direction_name' in direction_data:
@@ -294,7 +863,7 @@ def get_express_window(route_id, direction_id, borough=None, json_file='express_
         return direction_data.get(borough)
 
 
-def print_express_windows(route_id=None, json_file='express_window_data.json'):
+def print_express_windows(route_id=None, json_file='express_window_data.json', service_id='Weekday'):
     """
     Pretty-print express service windows for routes.
 
@@ -304,6 +873,8 @@ def print_express_windows(route_id=None, json_file='express_window_data.json'):
         Specific route to print. If None, prints all routes
     json_file : str, default='express_window_data.json'
         Path to JSON file containing express window data
+    service_id : str, default='Weekday'
+        Service ID to read from a multi-service file
 
     Example:
     --------
@@ -315,7 +886,9 @@ def print_express_windows(route_id=None, json_file='express_window_data.json'):
       Manhattan      : 05:12:30 → 22:18:00
     ...
     """
-    data = load_express_windows(json_file)
+    store = get_express_window_store(json_file, service_id)
+    store.refresh()
+    data = store.data
 
     routes_to_print = [route_id] if route_id else sorted(data.keys())
 
@@ -356,10 +929,26 @@ if __name__ == '__main__':
     """
     Generate express window data for all routes.
     Run this script directly to regenerate the express_window_data.json file.
+    Run with --all to generate Weekday, Saturday and Sunday in parallel into
+    express_window_data_all.json.
     """
     print("Loading GTFS feed...")
     feed = gk.read_feed("gtfs_subway.zip", dist_units="m")
 
+    if '--all' in sys.argv[1:]:
+        print("\n" + "="*80)
+        print("GENERATING EXPRESS SERVICE WINDOWS - ALL SERVICES")
+        print("="*80 + "\n")
+
+        data = generate_all_express_windows(feed)
+
+        print("\n" + "="*80)
+        print("GENERATION COMPLETE")
+        print("="*80)
+        print(f"\nOutput file: express_window_data_all.json")
+        print("\nUse load_express_windows('express_window_data_all.json', service_id=...) to access the data.")
+        sys.exit(0)
+
     print("\n" + "="*80)
     print("GENERATING EXPRESS SERVICE WINDOWS - WEEKDAY SERVICE")
     print("="*80 + "\n")
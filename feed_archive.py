@@ -0,0 +1,632 @@
+#!/usr/bin/env python3
+"""
+Archive of GTFS feed versions with cross-version schedule diffs.
+
+The MTA republishes the subway feed often; each book edition goes into the
+archive as a version (its zip plus a manifest), side by side with the
+others:
+
+    feed_archive/
+        versions/<version>/gtfs_subway.zip
+        versions/<version>/manifest.json
+        partitions/<content hash>.json
+
+A version is split into partitions, one per route. A partition's content
+hash covers everything its results depend on: the stop sequences and times
+of the route's trips by service and direction, and the stops they use
+(names and coordinates, which decide boroughs). Trip IDs are left out, as
+they are renamed with every timetable. J and Z share a partition hash
+because skip-stop windows compare the two.
+
+Compiled partition results (per service ID and direction: trip counts,
+stop pattern catalog, terminals, express windows and hourly headways) are
+stored under their content hash, so a route that did not change between
+editions is compiled once and shared by every version that contains it.
+Diffing two versions only loads partitions whose hashes differ; everything
+else is reported unchanged without being looked at.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import gtfs_kit as gk
+import numpy as np
+import pandas as pd
+
+from combined_headways import get_headway_dist
+from express_windows import SERVICE_IDS, compile_feed, get_route_windows, write_json_atomic
+from feed_index import (get_station_lookup, get_stop_name_lookup, get_stop_times_table, get_trip_content_hashes,
+                        get_trip_table, trip_mask)
+from stop_patterns import get_pattern_catalog
+
+
+# Bump when compiled partition contents change, so old results are not reused
+FORMAT_VERSION = 1
+
+# Routes whose results depend on each other's trips share one partition hash
+PARTITION_GROUPS = [('J', 'Z')]
+
+FEED_FILENAME = 'gtfs_subway.zip'
+
+# Hourly average headway changes smaller than this (minutes) are not reported
+HEADWAY_TOLERANCE_MIN = 0.5
+
+
+def file_sha256(path):
+    """Hex SHA-256 of a file's bytes, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def partition_hashes(feed):
+    """
+    Content hash of every route partition of a feed.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+
+    Returns:
+    --------
+    dict
+        Dictionary mapping route_id -> hex SHA-256 of the route's (and its
+        PARTITION_GROUPS partners') trips and stops
+    """
+    trips = get_trip_table(feed)
+    stop_times = get_stop_times_table(feed)
+    trip_idx = stop_times['trip_idx'].to_numpy()
+    valid = np.flatnonzero(trip_idx >= 0)
+    trip_hash = get_trip_content_hashes(feed)
+
+    trip_records = pd.DataFrame({
+        'route_id': trips['route_id'].to_numpy(),
+        'service_id': trips['service_id'].to_numpy(),
+        'direction_id': trips['direction_id'].to_numpy(),
+        'trip_hash': trip_hash,
+    })
+    stop_columns = [c for c in ['stop_id', 'stop_name', 'stop_lat', 'stop_lon', 'parent_station']
+                    if c in feed.stops.columns]
+    stops = feed.stops[stop_columns].astype(str).set_index('stop_id')
+    stop_ids_by_route = pd.Series(stop_times['stop_id'].to_numpy()[valid]).groupby(
+        trips['route_id'].to_numpy()[trip_idx[valid]]).unique()
+
+    groups = {}
+    for route_id in trip_records['route_id'].unique():
+        groups[route_id] = (route_id,)
+    for group in PARTITION_GROUPS:
+        for route_id in group:
+            if route_id in groups:
+                groups[route_id] = tuple(sorted(group))
+
+    hashes = {}
+    for route_id in sorted(groups):
+        group = groups[route_id]
+        records = trip_records[trip_records['route_id'].isin(group)].sort_values(
+            ['route_id', 'service_id', 'direction_id', 'trip_hash'])
+        stop_ids = sorted(set().union(*(stop_ids_by_route.get(r, []) for r in group)))
+        digest = hashlib.sha256(f"format {FORMAT_VERSION}".encode())
+        digest.update(pd.util.hash_pandas_object(records, index=False).to_numpy().tobytes())
+        digest.update(pd.util.hash_pandas_object(stops.reindex(stop_ids).reset_index(), index=False)
+                      .to_numpy().tobytes())
+        hashes[route_id] = digest.hexdigest()
+    return hashes
+
+
+def _round(value):
+    """JSON-friendly float (None for missing)."""
+    return None if value is None or pd.isna(value) else round(float(value), 2)
+
+
+def compile_partition(feed, route_id, service_ids=None):
+    """
+    Compile the diffable summary of one route.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    route_id : str
+        Route ID
+    service_ids : list of str, optional
+        Service IDs to summarize (default: express_windows.SERVICE_IDS)
+
+    Returns:
+    --------
+    dict
+        service_id -> direction_id (str) -> entry with:
+        - trips (int): Number of trips
+        - patterns: List of {'stops': [stop_id, ...], 'trips': n}, most
+          used first
+        - terminals: Terminal station_id -> {'name', 'trips'}
+        - express_windows: Borough -> [first_time, last_time] (see
+          express_windows.get_route_windows())
+        - headways: 24 rows of [hour, num_trains, avg, min, max] from
+          get_headway_dist() at each trip's first stop
+    """
+    trips = get_trip_table(feed)
+    catalog = get_pattern_catalog(feed)
+    stations = get_station_lookup(feed)
+    names = get_stop_name_lookup(feed)
+    directions = sorted(int(d) for d in trips.loc[trips['route_id'] == route_id, 'direction_id'].unique())
+
+    result = {}
+    for service_id in service_ids or SERVICE_IDS:
+        windows = get_route_windows(feed, route_id, service_id)
+        service = {}
+        for direction_id in directions:
+            mask = trip_mask(feed, route_id, direction_id, service_id)
+            if not mask.any():
+                continue
+            patterns, counts = np.unique(catalog.trip_pattern[mask], return_counts=True)
+            order = np.lexsort((patterns, -counts))
+
+            terminals = {}
+            for pattern, count in zip(patterns[order], counts[order]):
+                if pattern < 0:
+                    continue
+                last_stop = catalog.pattern_stop_ids(pattern)[-1]
+                station_id = stations.get(last_stop, last_stop)
+                entry = terminals.setdefault(station_id, {'name': names.get(station_id, station_id), 'trips': 0})
+                entry['trips'] += int(count)
+
+            headways = get_headway_dist(feed, direction_id, route_id, service_id=service_id)
+            service[str(direction_id)] = {
+                'trips': int(mask.sum()),
+                'patterns': [{'stops': catalog.pattern_stop_ids(p), 'trips': int(c)}
+                             for p, c in zip(patterns[order], counts[order]) if p >= 0],
+                'terminals': terminals,
+                'express_windows': {k: v for k, v in windows.get(str(direction_id), {}).items()
+                                    if k != 'direction_name'},
+                'headways': [[int(row.hour), int(row.num_trains), _round(row.avg_headway),
+                              _round(row.min_headway), _round(row.max_headway)]
+                             for row in headways.itertuples()],
+            }
+        if service:
+            result[service_id] = service
+    return result
+
+
+# Feed used by worker processes. Set in the parent before forking, or loaded
+# by _init_worker() when workers are spawned.
+_WORKER_FEED = None
+
+
+def _init_worker(feed_path):
+    """Process pool initializer for platforms that spawn instead of fork."""
+    global _WORKER_FEED
+    if _WORKER_FEED is None:
+        _WORKER_FEED = compile_feed(gk.read_feed(feed_path, dist_units="m"))
+
+
+def _partition_task(route_id, service_ids):
+    """Worker task: one route's compiled partition, timed."""
+    start = time.perf_counter()
+    result = compile_partition(_WORKER_FEED, route_id, service_ids)
+    return route_id, result, time.perf_counter() - start
+
+
+class FeedArchive:
+    """
+    Feed versions stored side by side, with content-addressed compiled partitions.
+
+    Parameters:
+    -----------
+    root : str, default='feed_archive'
+        Archive directory (created if missing)
+
+    Examples:
+    ---------
+    >>> archive = FeedArchive()
+    >>> archive.add_version('gtfs_subway_20241215.zip')
+    >>> archive.add_version('gtfs_subway_20250120.zip')
+    >>> report = archive.diff('20241215', '20250120')
+    >>> print_change_report(report)
+    """
+
+    def __init__(self, root='feed_archive'):
+        self.root = root
+        os.makedirs(os.path.join(root, 'versions'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'partitions'), exist_ok=True)
+
+    def _version_dir(self, version):
+        return os.path.join(self.root, 'versions', version)
+
+    def _partition_path(self, partition_hash):
+        return os.path.join(self.root, 'partitions', f'{partition_hash}.json')
+
+    def versions(self):
+        """Archived version names, sorted."""
+        versions_dir = os.path.join(self.root, 'versions')
+        return sorted(v for v in os.listdir(versions_dir)
+                      if os.path.exists(os.path.join(versions_dir, v, 'manifest.json')))
+
+    def manifest(self, version):
+        """
+        Manifest of one version.
+
+        Returns:
+        --------
+        dict
+            version, added_at, source, feed_sha256, start_date, end_date,
+            service_ids and partitions (route_id -> content hash)
+        """
+        path = os.path.join(self._version_dir(version), 'manifest.json')
+        if not os.path.exists(path):
+            raise ValueError(f"Version {version!r} is not in the archive (have: {self.versions()})")
+        with open(path) as f:
+            return json.load(f)
+
+    def feed_path(self, version):
+        """Path of a version's feed zip."""
+        return os.path.join(self._version_dir(version), FEED_FILENAME)
+
+    def load_feed(self, version):
+        """Load a version's feed with gtfs_kit."""
+        self.manifest(version)
+        return gk.read_feed(self.feed_path(version), dist_units="m")
+
+    def add_version(self, feed_path, version=None, compile=True, service_ids=None, max_workers=None):
+        """
+        Copy a feed into the archive and record its partition hashes.
+
+        Parameters:
+        -----------
+        feed_path : str
+            GTFS zip to archive
+        version : str, optional
+            Version name. Defaults to the first start_date in calendar.txt
+            (the book edition's pick date, e.g. '20241215').
+        compile : bool, default=True
+            Compile the partitions not already in the archive (see
+            compile_version())
+        service_ids : list of str, optional
+            Service IDs to compile (default: express_windows.SERVICE_IDS)
+        max_workers : int, optional
+            Worker processes for compiling (None = one per CPU, 1 = run in
+            this process)
+
+        Returns:
+        --------
+        dict
+            The version's manifest. Adding the same feed under the same name
+            again returns the existing manifest.
+        """
+        feed_sha256 = file_sha256(feed_path)
+        feed = gk.read_feed(feed_path, dist_units="m")
+        calendar = feed.calendar if feed.calendar is not None else pd.DataFrame(columns=['start_date', 'end_date'])
+        if version is None:
+            if calendar.empty:
+                raise ValueError(f"{feed_path} has no calendar.txt; pass a version name")
+            version = str(calendar['start_date'].min())
+
+        path = os.path.join(self._version_dir(version), 'manifest.json')
+        if os.path.exists(path):
+            existing = self.manifest(version)
+            if existing['feed_sha256'] != feed_sha256:
+                raise ValueError(f"Version {version!r} is already archived with a different feed")
+            manifest = existing
+        else:
+            os.makedirs(self._version_dir(version), exist_ok=True)
+            shutil.copyfile(feed_path, self.feed_path(version))
+            trips = get_trip_table(feed)
+            manifest = {
+                'version': version,
+                'added_at': datetime.now().isoformat(timespec='seconds'),
+                'source': os.path.abspath(feed_path),
+                'feed_sha256': feed_sha256,
+                'start_date': None if calendar.empty else str(calendar['start_date'].min()),
+                'end_date': None if calendar.empty else str(calendar['end_date'].max()),
+                'service_ids': sorted(trips['service_id'].dropna().unique().tolist()),
+                'partitions': partition_hashes(feed),
+            }
+            write_json_atomic(manifest, path)
+
+        if compile:
+            self.compile_version(version, service_ids, max_workers, feed=feed)
+        return manifest
+
+    def missing_partitions(self, version):
+        """Route IDs of a version whose partition hash has no compiled result yet."""
+        partitions = self.manifest(version)['partitions']
+        return [route_id for route_id, partition_hash in partitions.items()
+                if not os.path.exists(self._partition_path(partition_hash))]
+
+    def compile_version(self, version, service_ids=None, max_workers=None, feed=None):
+        """
+        Compile the partitions of a version that no archived version has compiled.
+
+        Each result is written as soon as it finishes, so an interrupted run
+        only redoes the partitions still missing.
+
+        Parameters:
+        -----------
+        version : str
+            Version name
+        service_ids : list of str, optional
+            Service IDs to compile (default: express_windows.SERVICE_IDS)
+        max_workers : int, optional
+            Worker processes (None = one per CPU, 1 = run in this process)
+        feed : gtfs_kit.Feed, optional
+            The version's feed, if already loaded
+
+        Returns:
+        --------
+        list of str
+            Route IDs compiled (empty if everything was already compiled)
+        """
+        global _WORKER_FEED
+
+        manifest = self.manifest(version)
+        route_ids = self.missing_partitions(version)
+        if not route_ids:
+            return []
+        service_ids = list(service_ids or SERVICE_IDS)
+
+        if feed is None:
+            feed = self.load_feed(version)
+        compile_feed(feed)
+
+        def record(route_id, result, elapsed):
+            partition_hash = manifest['partitions'][route_id]
+            write_json_atomic({'format_version': FORMAT_VERSION, 'route_id': route_id, 'hash': partition_hash,
+                                'services': result}, self._partition_path(partition_hash))
+            print(f"  {version} {route_id:3s} {elapsed:7.2f}s")
+
+        start = time.perf_counter()
+        _WORKER_FEED = feed
+        try:
+            if max_workers == 1:
+                for route_id in route_ids:
+                    record(*_partition_task(route_id, service_ids))
+            else:
+                methods = multiprocessing.get_all_start_methods()
+                if 'fork' in methods:
+                    context, initargs = multiprocessing.get_context('fork'), ()
+                else:
+                    context, initargs = multiprocessing.get_context(), (self.feed_path(version),)
+
+                with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                         initializer=_init_worker if initargs else None,
+                                         initargs=initargs) as pool:
+                    futures = [pool.submit(_partition_task, route_id, service_ids) for route_id in route_ids]
+                    for future in as_completed(futures):
+                        record(*future.result())
+        finally:
+            _WORKER_FEED = None
+
+        print(f"Compiled {len(route_ids)} of {len(manifest['partitions'])} partitions of {version} in "
+              f"{time.perf_counter() - start:.1f}s")
+        return route_ids
+
+    def partition(self, version, route_id):
+        """
+        Compiled partition of one route in a version.
+
+        Returns:
+        --------
+        dict
+            service_id -> direction_id -> entry (see compile_partition())
+        """
+        partition_hash = self.manifest(version)['partitions'].get(route_id)
+        if partition_hash is None:
+            raise ValueError(f"Route {route_id!r} is not in version {version!r}")
+        path = self._partition_path(partition_hash)
+        if not os.path.exists(path):
+            self.compile_version(version)
+        with open(path) as f:
+            return json.load(f)['services']
+
+    def diff(self, old_version, new_version, output_file=None):
+        """
+        Structured change report between two versions.
+
+        Only routes whose partition hashes differ are loaded and compared.
+
+        Parameters:
+        -----------
+        old_version, new_version : str
+            Version names
+        output_file : str, optional
+            Also write the report as JSON here
+
+        Returns:
+        --------
+        dict
+            - old_version, new_version (str)
+            - routes_added, routes_removed, routes_unchanged (list of str):
+              routes_unchanged have identical partition hashes
+            - routes_retimed (list of str): Content changed, but nothing
+              below crossed a reporting threshold
+            - changes: route_id -> service_id -> direction_id -> changes
+              (see diff_partitions())
+        """
+        old_partitions = self.manifest(old_version)['partitions']
+        new_partitions = self.manifest(new_version)['partitions']
+
+        report = {
+            'old_version': old_version,
+            'new_version': new_version,
+            'routes_added': sorted(set(new_partitions) - set(old_partitions)),
+            'routes_removed': sorted(set(old_partitions) - set(new_partitions)),
+            'routes_unchanged': [],
+            'routes_retimed': [],
+            'changes': {},
+        }
+        for route_id in sorted(set(old_partitions) & set(new_partitions)):
+            if old_partitions[route_id] == new_partitions[route_id]:
+                report['routes_unchanged'].append(route_id)
+                continue
+            changes = diff_partitions(self.partition(old_version, route_id), self.partition(new_version, route_id))
+            if changes:
+                report['changes'][route_id] = changes
+            else:
+                report['routes_retimed'].append(route_id)
+
+        if output_file:
+            write_json_atomic(report, output_file)
+        return report
+
+
+def _diff_direction(old, new, headway_tolerance_min):
+    """Changes between two compiled direction entries (empty dict if none)."""
+    changes = {}
+    if old['trips'] != new['trips']:
+        changes['trips'] = [old['trips'], new['trips']]
+
+    old_patterns = {tuple(p['stops']): p['trips'] for p in old['patterns']}
+    new_patterns = {tuple(p['stops']): p['trips'] for p in new['patterns']}
+    patterns = {
+        'added': [{'stops': list(s), 'trips': n} for s, n in new_patterns.items() if s not in old_patterns],
+        'removed': [{'stops': list(s), 'trips': n} for s, n in old_patterns.items() if s not in new_patterns],
+        'trip_counts': [{'stops': list(s), 'trips': [old_patterns[s], n]} for s, n in new_patterns.items()
+                        if s in old_patterns and old_patterns[s] != n],
+    }
+    if any(patterns.values()):
+        changes['patterns'] = {k: v for k, v in patterns.items() if v}
+
+    old_terminals, new_terminals = old['terminals'], new['terminals']
+    terminals = {
+        'added': {s: t['name'] for s, t in new_terminals.items() if s not in old_terminals},
+        'removed': {s: t['name'] for s, t in old_terminals.items() if s not in new_terminals},
+    }
+    if any(terminals.values()):
+        changes['terminals'] = {k: v for k, v in terminals.items() if v}
+
+    windows = {borough: [old['express_windows'].get(borough), new['express_windows'].get(borough)]
+               for borough in sorted(set(old['express_windows']) | set(new['express_windows']))
+               if old['express_windows'].get(borough) != new['express_windows'].get(borough)}
+    if windows:
+        changes['express_windows'] = windows
+
+    headways = []
+    for (hour, old_trains, old_avg, _, _), (_, new_trains, new_avg, _, _) in zip(old['headways'], new['headways']):
+        moved = (old_avg is None) != (new_avg is None) or (
+            old_avg is not None and abs(new_avg - old_avg) >= headway_tolerance_min)
+        if old_trains != new_trains or moved:
+            headways.append({'hour': hour, 'trains': [old_trains, new_trains], 'avg_headway': [old_avg, new_avg]})
+    if headways:
+        changes['headways'] = headways
+    return changes
+
+
+def diff_partitions(old, new, headway_tolerance_min=HEADWAY_TOLERANCE_MIN):
+    """
+    Changes between two compiled partitions of a route.
+
+    Parameters:
+    -----------
+    old, new : dict
+        Compiled partitions (see compile_partition())
+    headway_tolerance_min : float, default=HEADWAY_TOLERANCE_MIN
+        Smallest hourly average headway change reported
+
+    Returns:
+    --------
+    dict
+        service_id -> direction_id -> changes, each with only the keys that
+        changed:
+        - added / removed (bool): The service or direction exists in only
+          one version
+        - trips: [old, new] trip count
+        - patterns: added / removed stop patterns and patterns whose trip
+          count changed
+        - terminals: added / removed terminal station_id -> name
+        - express_windows: borough -> [old window, new window] (None if
+          absent)
+        - headways: Hours whose train count or average headway changed
+    """
+    changes = {}
+    for service_id in sorted(set(old) | set(new)):
+        old_service, new_service = old.get(service_id, {}), new.get(service_id, {})
+        service_changes = {}
+        for direction_id in sorted(set(old_service) | set(new_service)):
+            if direction_id not in old_service:
+                service_changes[direction_id] = {'added': True, 'trips': [0, new_service[direction_id]['trips']]}
+            elif direction_id not in new_service:
+                service_changes[direction_id] = {'removed': True, 'trips': [old_service[direction_id]['trips'], 0]}
+            else:
+                direction_changes = _diff_direction(old_service[direction_id], new_service[direction_id],
+                                                    headway_tolerance_min)
+                if direction_changes:
+                    service_changes[direction_id] = direction_changes
+        if service_changes:
+            changes[service_id] = service_changes
+    return changes
+
+
+def print_change_report(report):
+    """
+    Print a change report from FeedArchive.diff().
+
+    Parameters:
+    -----------
+    report : dict
+        Output of FeedArchive.diff()
+    """
+    print(f"\nSchedule changes: {report['old_version']} -> {report['new_version']}")
+    print("=" * 70)
+    if report['routes_added']:
+        print(f"New routes: {', '.join(report['routes_added'])}")
+    if report['routes_removed']:
+        print(f"Removed routes: {', '.join(report['routes_removed'])}")
+    print(f"Unchanged: {', '.join(report['routes_unchanged']) or 'none'}")
+    if report['routes_retimed']:
+        print(f"Minor retiming only: {', '.join(report['routes_retimed'])}")
+
+    for route_id, services in report['changes'].items():
+        print(f"\n{route_id} train")
+        print("-" * 70)
+        for service_id, directions in services.items():
+            for direction_id, changes in directions.items():
+                label = f"  {service_id}, direction {direction_id}:"
+                if changes.get('added') or changes.get('removed'):
+                    print(f"{label} {'added' if changes.get('added') else 'removed'} "
+                          f"({max(changes['trips'])} trips)")
+                    continue
+                print(label)
+                if 'trips' in changes:
+                    print(f"    Trips: {changes['trips'][0]} -> {changes['trips'][1]}")
+                for key, verb in (('added', 'New'), ('removed', 'Dropped')):
+                    for station_id, name in changes.get('terminals', {}).get(key, {}).items():
+                        print(f"    {verb} terminal: {name} ({station_id})")
+                patterns = changes.get('patterns', {})
+                if patterns:
+                    print(f"    Stop patterns: {len(patterns.get('added', []))} new, "
+                          f"{len(patterns.get('removed', []))} dropped, "
+                          f"{len(patterns.get('trip_counts', []))} with changed trip counts")
+                for borough, (old_window, new_window) in changes.get('express_windows', {}).items():
+                    old_text = '-'.join(old_window) if old_window else 'none'
+                    new_text = '-'.join(new_window) if new_window else 'none'
+                    print(f"    Express window ({borough}): {old_text} -> {new_text}")
+                for row in changes.get('headways', []):
+                    old_avg, new_avg = row['avg_headway']
+                    old_text = f"{old_avg:.1f}" if old_avg is not None else '-'
+                    new_text = f"{new_avg:.1f}" if new_avg is not None else '-'
+                    print(f"    {row['hour']:02d}:00  trains {row['trains'][0]:>3} -> {row['trains'][1]:<3} "
+                          f"avg headway {old_text} -> {new_text} min")
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(__doc__)
+
+    if len(sys.argv) < 3:
+        print("Usage: python feed_archive.py OLD_FEED.zip NEW_FEED.zip")
+        sys.exit(1)
+
+    archive = FeedArchive()
+    old_manifest = archive.add_version(sys.argv[1])
+    new_manifest = archive.add_version(sys.argv[2])
+    report = archive.diff(old_manifest['version'], new_manifest['version'], output_file='feed_changes.json')
+    print_change_report(report)
+    print("\nExported to: feed_changes.json")
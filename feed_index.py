@@ -0,0 +1,702 @@
+#!/usr/bin/env python3
+"""
+Per-feed indexes that are expensive to build but cheap to query.
+
+Most analysis functions in this project start the same way: filter feed.trips,
+pull the matching rows out of feed.stop_times, sort them by stop_sequence and
+parse the GTFS time strings. Doing that on every call is the main reason the
+scripts are slow. This module does that work once per feed and caches the
+results, so callers can work with plain boolean masks over prebuilt tables.
+
+Indexes provided:
+- Stop times table: feed.stop_times sorted by (trip_id, stop_sequence) with
+  integer arrival/departure seconds and the parent station of every stop
+- Trip table: one row per trip with its origin and terminal stop (and parent
+  station), first departure, last arrival and number of stops
+- Terminal index: a token index over stop names for resolving partial
+  terminal names like 'Nereid' or 'Far Rockaway' to stop IDs
+- Stop departure index: every departure grouped by stop and sorted by time,
+  stored as flat arrays with per-stop offsets
+- Trip content hashes: one hash per trip over its stops and times, ignoring
+  the trip_id
+
+The cache is keyed on the feed object. If any of the feed's tables is replaced
+(e.g. feed.trips = new_trips) the indexes are rebuilt on next access.
+"""
+import re
+import weakref
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+
+# id(feed) -> (weakref to feed, table identity stamp, dict of cached indexes)
+_FEED_CACHE = {}
+
+# Feed tables that the cached indexes are derived from
+_STAMP_TABLES = ('trips', 'stop_times', 'stops', 'routes', 'calendar', 'calendar_dates')
+
+
+def get_feed_cache(feed):
+    """
+    Get the dictionary of cached indexes for a feed.
+
+    Other modules store their own per-feed indexes here (under their own keys)
+    so that everything derived from a feed is invalidated together.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+
+    Returns:
+    --------
+    dict
+        Mutable cache dictionary for this feed
+    """
+    key = id(feed)
+    stamp = tuple(id(getattr(feed, name, None)) for name in _STAMP_TABLES)
+
+    entry = _FEED_CACHE.get(key)
+    if entry is not None:
+        feed_ref, cached_stamp, cache = entry
+        if feed_ref() is feed and cached_stamp == stamp:
+            return cache
+
+    cache = {}
+    _FEED_CACHE[key] = (weakref.ref(feed, lambda _: _FEED_CACHE.pop(key, None)), stamp, cache)
+    return cache
+
+
+def clear_feed_cache(feed=None):
+    """
+    Drop cached indexes for one feed, or for all feeds if feed is None.
+    """
+    if feed is None:
+        _FEED_CACHE.clear()
+    else:
+        _FEED_CACHE.pop(id(feed), None)
+
+
+def gtfs_time_to_seconds(times):
+    """
+    Convert GTFS time strings to seconds after midnight (vectorized).
+
+    GTFS times can exceed 24 hours (e.g., "25:30:00" = 1:30 AM the next day);
+    these are kept as-is, so "25:30:00" becomes 91800.
+
+    Parameters:
+    -----------
+    times : array-like of str
+        GTFS time strings in H:MM:SS or HH:MM:SS format
+
+    Returns:
+    --------
+    np.ndarray
+        int64 array of seconds. Missing or malformed times become -1.
+    """
+    times = pd.Series(times, copy=False).astype(object)
+    parts = times.str.split(':', expand=True)
+
+    if parts.shape[1] < 3:
+        return np.full(len(times), -1, dtype=np.int64)
+
+    hours = pd.to_numeric(parts[0], errors='coerce')
+    minutes = pd.to_numeric(parts[1], errors='coerce')
+    seconds = pd.to_numeric(parts[2], errors='coerce')
+
+    total = hours * 3600 + minutes * 60 + seconds
+    return total.fillna(-1).to_numpy(dtype=np.int64)
+
+
+def seconds_to_gtfs_time(seconds):
+    """
+    Format seconds after midnight as a GTFS HH:MM:SS string.
+
+    Hours are not wrapped, so 91800 becomes "25:30:00", matching the strings
+    stored in stop_times.txt.
+    """
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+def get_station_lookup(feed):
+    """
+    Get a mapping of stop_id -> parent station ID.
+
+    Stops without a parent station (including the parent stations themselves)
+    map to their own stop_id.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+
+    Returns:
+    --------
+    dict
+        Dictionary mapping stop_id -> parent station stop_id
+    """
+    cache = get_feed_cache(feed)
+    if 'station_lookup' not in cache:
+        stops = feed.stops
+        parents = stops['parent_station'].astype(object).where(stops['parent_station'].notna(), None)
+        cache['station_lookup'] = {
+            stop_id: (parent if parent not in (None, '') else stop_id)
+            for stop_id, parent in zip(stops['stop_id'], parents)
+        }
+    return cache['station_lookup']
+
+
+def get_stop_name_lookup(feed):
+    """
+    Get a mapping of stop_id -> stop_name for every stop in the feed.
+    """
+    cache = get_feed_cache(feed)
+    if 'stop_names' not in cache:
+        cache['stop_names'] = dict(zip(feed.stops['stop_id'], feed.stops['stop_name']))
+    return cache['stop_names']
+
+
+def get_stop_times_table(feed):
+    """
+    Get feed.stop_times sorted by (trip_id, stop_sequence) with parsed times.
+
+    Columns added to the original stop_times columns:
+        - arrival_s (int): Arrival time in seconds after midnight
+        - departure_s (int): Departure time in seconds after midnight
+        - station_id (str): Parent station of stop_id
+        - trip_idx (int): Row position of the trip in get_trip_table()
+
+    The table is built once per feed and cached. Treat it as read-only.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+
+    Returns:
+    --------
+    pd.DataFrame
+        Sorted stop times with a RangeIndex
+    """
+    cache = get_feed_cache(feed)
+    if 'stop_times' not in cache:
+        _build_trip_indexes(feed, cache)
+    return cache['stop_times']
+
+
+def get_trip_table(feed):
+    """
+    Get a table with one row per trip, including its first and last stop.
+
+    Columns:
+        - trip_id, route_id, direction_id, service_id: From trips.txt
+        - origin_stop_id (str): First stop of the trip (platform stop ID)
+        - terminal_stop_id (str): Last stop of the trip (platform stop ID)
+        - origin_station_id (str): Parent station of the first stop
+        - terminal_station_id (str): Parent station of the last stop
+        - first_departure_s (int): Departure from the first stop, in seconds
+        - last_arrival_s (int): Arrival at the last stop, in seconds
+        - num_stops (int): Number of stop_times rows for the trip
+
+    Rows are sorted by trip_id and only trips that have stop times are included.
+    The table is built once per feed and cached. Treat it as read-only.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+
+    Returns:
+    --------
+    pd.DataFrame
+        Trip table with a RangeIndex
+
+    Examples:
+    ---------
+    >>> trips = get_trip_table(feed)
+    >>> mask = trip_mask(feed, route_id='A', direction_id=0, service_id='Weekday')
+    >>> trips.loc[mask, 'terminal_station_id'].value_counts()
+    """
+    cache = get_feed_cache(feed)
+    if 'trip_table' not in cache:
+        _build_trip_indexes(feed, cache)
+    return cache['trip_table']
+
+
+def _build_trip_indexes(feed, cache):
+    """
+    Build the sorted stop times table and the trip table in one pass.
+    """
+    stop_times = feed.stop_times.sort_values(['trip_id', 'stop_sequence']).reset_index(drop=True)
+    stop_times['arrival_s'] = gtfs_time_to_seconds(stop_times['arrival_time'])
+    stop_times['departure_s'] = gtfs_time_to_seconds(stop_times['departure_time'])
+
+    # Fill missing times from the other column (timepoint-only feeds)
+    missing_departure = stop_times['departure_s'] < 0
+    stop_times.loc[missing_departure, 'departure_s'] = stop_times.loc[missing_departure, 'arrival_s']
+    missing_arrival = stop_times['arrival_s'] < 0
+    stop_times.loc[missing_arrival, 'arrival_s'] = stop_times.loc[missing_arrival, 'departure_s']
+
+    station_lookup = get_station_lookup(feed)
+    stop_times['station_id'] = stop_times['stop_id'].map(station_lookup).fillna(stop_times['stop_id'])
+
+    # Row boundaries of each trip in the sorted table
+    trip_ids = stop_times['trip_id'].to_numpy()
+    if len(trip_ids):
+        starts = np.concatenate(([0], np.flatnonzero(trip_ids[1:] != trip_ids[:-1]) + 1))
+    else:
+        starts = np.array([], dtype=np.int64)
+    ends = np.append(starts[1:], len(trip_ids)) - 1
+
+    first = stop_times.iloc[starts]
+    last = stop_times.iloc[ends]
+
+    trip_table = pd.DataFrame({
+        'trip_id': first['trip_id'].to_numpy(),
+        'origin_stop_id': first['stop_id'].to_numpy(),
+        'terminal_stop_id': last['stop_id'].to_numpy(),
+        'origin_station_id': first['station_id'].to_numpy(),
+        'terminal_station_id': last['station_id'].to_numpy(),
+        'first_departure_s': first['departure_s'].to_numpy(),
+        'last_arrival_s': last['arrival_s'].to_numpy(),
+        'num_stops': ends - starts + 1,
+    })
+
+    trip_columns = [c for c in ['trip_id', 'route_id', 'direction_id', 'service_id']
+                    if c in feed.trips.columns]
+    trip_table = trip_table.merge(feed.trips[trip_columns], on='trip_id', how='inner')
+    trip_table = trip_table[[
+        'trip_id', 'route_id', 'direction_id', 'service_id',
+        'origin_stop_id', 'terminal_stop_id', 'origin_station_id', 'terminal_station_id',
+        'first_departure_s', 'last_arrival_s', 'num_stops'
+    ]].sort_values('trip_id').reset_index(drop=True)
+
+    trip_positions = pd.Series(np.arange(len(trip_table)), index=trip_table['trip_id'])
+    stop_times['trip_idx'] = stop_times['trip_id'].map(trip_positions).fillna(-1).astype(np.int64)
+
+    cache['stop_times'] = stop_times
+    cache['trip_table'] = trip_table
+
+
+def trip_mask(feed, route_id=None, direction_id=None, service_id=None, date=None):
+    """
+    Build a boolean mask over get_trip_table() for a route/direction/service.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    route_id : str or list of str, optional
+        Route ID(s) to keep. If None, keeps all routes.
+    direction_id : int, optional
+        Direction ID (0 or 1). If None, keeps both directions.
+    service_id : str or list of str, optional
+        Service ID(s) to keep. If None, keeps all services.
+    date : str or datetime.date, optional
+        Keep only services running on this date (overrides service_id)
+
+    Returns:
+    --------
+    np.ndarray
+        Boolean array aligned with get_trip_table() rows
+    """
+    from service_calendar import resolve_service_ids
+
+    trips = get_trip_table(feed)
+    mask = np.ones(len(trips), dtype=bool)
+
+    if route_id is not None:
+        if isinstance(route_id, str):
+            mask &= (trips['route_id'] == route_id).to_numpy()
+        else:
+            mask &= trips['route_id'].isin(list(route_id)).to_numpy()
+
+    if direction_id is not None:
+        mask &= (trips['direction_id'] == direction_id).to_numpy(dtype=bool, na_value=False)
+
+    service_ids = resolve_service_ids(feed, service_id, date)
+    if service_ids is not None:
+        mask &= trips['service_id'].isin(service_ids).to_numpy(dtype=bool, na_value=False)
+
+    return mask
+
+
+def _normalize_name(name):
+    """Lowercase a stop name and split it into alphanumeric tokens."""
+    return re.findall(r'[a-z0-9]+', str(name).lower())
+
+
+class TerminalIndex:
+    """
+    Token index over stop names for resolving partial terminal names.
+
+    Each stop name is split into lowercase alphanumeric tokens (so
+    "Ozone Park-Lefferts Blvd" becomes ozone/park/lefferts/blvd). A query is
+    tokenized the same way and every query token is looked up as a token
+    prefix with a binary search over the sorted vocabulary. Candidates are then
+    confirmed with the same case-insensitive substring test the original
+    branch functions used, so "Lefferts", "Ozone", "far rock" and
+    "Park-Lefferts" all behave exactly like `query.lower() in name.lower()`.
+
+    Parameters:
+    -----------
+    stop_names : dict
+        Dictionary mapping stop_id -> stop_name
+    """
+
+    def __init__(self, stop_names):
+        self.stop_names = dict(stop_names)
+        self._lower_names = {stop_id: str(name).lower() for stop_id, name in self.stop_names.items()}
+
+        postings = {}
+        for stop_id, name in self.stop_names.items():
+            for token in _normalize_name(name):
+                postings.setdefault(token, set()).add(stop_id)
+
+        self._tokens = sorted(postings)
+        self._postings = [postings[token] for token in self._tokens]
+
+    def _prefix_lookup(self, prefix):
+        """Return all stop IDs with a name token starting with prefix."""
+        result = set()
+        i = bisect_left(self._tokens, prefix)
+        while i < len(self._tokens) and self._tokens[i].startswith(prefix):
+            result |= self._postings[i]
+            i += 1
+        return result
+
+    def _vocabulary_lookup(self, predicate):
+        """Return all stop IDs with a name token matching predicate."""
+        result = set()
+        for token, stop_ids in zip(self._tokens, self._postings):
+            if predicate(token):
+                result |= stop_ids
+        return result
+
+    def lookup(self, query):
+        """
+        Find all stop IDs whose name contains query (case-insensitive).
+
+        Parameters:
+        -----------
+        query : str
+            Full or partial stop name
+
+        Returns:
+        --------
+        set
+            Set of matching stop IDs
+        """
+        query_lower = str(query).lower()
+        tokens = _normalize_name(query)
+
+        if not tokens:
+            return {s for s, name in self._lower_names.items() if query_lower in name}
+
+        # The first token may start mid-word ('efferts'), and the last may end
+        # mid-word ('Rock'), but every later token starts at a word boundary
+        if len(tokens) == 1:
+            candidates = self._vocabulary_lookup(lambda token: tokens[0] in token)
+        else:
+            candidates = self._vocabulary_lookup(lambda token: token.endswith(tokens[0]))
+            for token in tokens[1:]:
+                candidates &= self._prefix_lookup(token)
+
+        return {s for s in candidates if query_lower in self._lower_names[s]}
+
+    def match(self, query, stop_ids):
+        """
+        Filter stop_ids to those whose name contains query, preserving order.
+
+        Parameters:
+        -----------
+        query : str
+            Full or partial stop name
+        stop_ids : iterable of str
+            Candidate stop IDs (e.g., the terminals of a route)
+
+        Returns:
+        --------
+        list
+            Matching stop IDs in the order they appear in stop_ids
+        """
+        matches = self.lookup(query)
+        return [stop_id for stop_id in stop_ids if stop_id in matches]
+
+
+def get_terminal_index(feed):
+    """
+    Get the cached TerminalIndex over all stop names in the feed.
+    """
+    cache = get_feed_cache(feed)
+    if 'terminal_index' not in cache:
+        cache['terminal_index'] = TerminalIndex(get_stop_name_lookup(feed))
+    return cache['terminal_index']
+
+
+def resolve_branch(feed, route_id, direction_id, branch_terminal, service_id='Weekday', date=None):
+    """
+    Resolve a partial terminal name to the trips serving that branch.
+
+    The branch end of a trip can be either its origin or its terminal: outbound
+    trips end at the branch terminal, inbound trips start there. The terminal
+    name is looked up at both ends; if it matches at both, the end with more
+    significant terminals (>= 5% of trips) is used.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    route_id : str
+        Route ID (e.g., 'A', '5')
+    direction_id : int
+        Direction ID (0 or 1)
+    branch_terminal : str
+        Full or partial terminal name (case-insensitive), e.g. 'Nereid'
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Use the services running on this date instead of service_id
+
+    Returns:
+    --------
+    dict
+        Dictionary with:
+        - 'trip_mask': boolean mask over get_trip_table() for the branch trips
+        - 'terminal_id': stop_id of the matched terminal
+        - 'terminal_name': stop_name of the matched terminal
+        - 'branch_end_description': 'originates from' or 'terminates at'
+        - 'num_route_trips': number of trips on the route/direction/service
+        - 'all_services_mask': trips on the branch across every service,
+          for use with the stitched timelines in service_timeline.py
+
+    Raises:
+    -------
+    ValueError
+        If the route has no trips, or no terminal matches branch_terminal
+    """
+    trips = get_trip_table(feed)
+    route_mask = trip_mask(feed, route_id, direction_id, service_id, date)
+
+    if not route_mask.any():
+        raise ValueError(
+            f"No trips found for route {route_id}, direction {direction_id}, "
+            f"service {service_id if date is None else date}"
+        )
+
+    route_trips = trips[route_mask]
+    first_stop_unique = route_trips['origin_stop_id'].unique()
+    last_stop_unique = route_trips['terminal_stop_id'].unique()
+
+    index = get_terminal_index(feed)
+    first_matches = index.match(branch_terminal, first_stop_unique)
+    last_matches = index.match(branch_terminal, last_stop_unique)
+
+    stop_names = get_stop_name_lookup(feed)
+
+    if first_matches and last_matches:
+        # Terminal found at BOTH ends - use the end with more significant branches
+        first_stop_counts = route_trips['origin_stop_id'].value_counts()
+        last_stop_counts = route_trips['terminal_stop_id'].value_counts()
+        min_significant_trips = len(route_trips) * 0.05
+        significant_first_stops = sum(first_stop_counts >= min_significant_trips)
+        significant_last_stops = sum(last_stop_counts >= min_significant_trips)
+
+        if significant_first_stops != significant_last_stops:
+            use_first = significant_first_stops > significant_last_stops
+        else:
+            # Tie - use total count as tie-breaker
+            use_first = len(first_stop_unique) < len(last_stop_unique)
+    elif first_matches:
+        use_first = True
+    elif last_matches:
+        use_first = False
+    else:
+        available_stops = sorted({
+            f"'{stop_names[stop_id]}'"
+            for stop_id in list(first_stop_unique) + list(last_stop_unique)
+            if stop_id in stop_names
+        })
+        raise ValueError(
+            f"No stop matching '{branch_terminal}' found for route {route_id}, "
+            f"direction {direction_id}.\nAvailable stops: {', '.join(available_stops)}"
+        )
+
+    if use_first:
+        terminal_id = first_matches[0]
+        end_column = 'origin_stop_id'
+        branch_end_description = "originates from"
+    else:
+        terminal_id = last_matches[0]
+        end_column = 'terminal_stop_id'
+        branch_end_description = "terminates at"
+
+    end_mask = (trips[end_column] == terminal_id).to_numpy()
+    branch_mask = route_mask & end_mask
+
+    return {
+        'trip_mask': branch_mask,
+        'terminal_id': terminal_id,
+        'terminal_name': stop_names.get(terminal_id, terminal_id),
+        'branch_end_description': branch_end_description,
+        'num_route_trips': int(route_mask.sum()),
+        'all_services_mask': trip_mask(feed, route_id, direction_id) & end_mask,
+    }
+
+
+def get_trip_departures(feed, mask, stop_id=None):
+    """
+    Get departure times for the trips selected by a trip table mask.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    mask : np.ndarray
+        Boolean mask over get_trip_table()
+    stop_id : str, optional
+        Stop to take departures at. If None (default), uses the first stop of
+        each trip.
+
+    Returns:
+    --------
+    pd.DataFrame
+        DataFrame with columns trip_id, departure_s, sorted by departure_s.
+        Empty if no selected trip serves stop_id.
+    """
+    trips = get_trip_table(feed)
+
+    if stop_id is None:
+        departures = pd.DataFrame({
+            'trip_id': trips['trip_id'].to_numpy()[mask],
+            'departure_s': trips['first_departure_s'].to_numpy()[mask],
+        })
+    else:
+        stop_times = get_stop_times_table(feed)
+        trip_positions = np.flatnonzero(mask)
+        rows = stop_times[
+            (stop_times['stop_id'] == stop_id).to_numpy() &
+            np.isin(stop_times['trip_idx'].to_numpy(), trip_positions)
+        ]
+        departures = pd.DataFrame({
+            'trip_id': rows['trip_id'].to_numpy(),
+            'departure_s': rows['departure_s'].to_numpy(),
+        })
+
+    return departures.sort_values('departure_s', kind='stable').reset_index(drop=True)
+
+
+def get_trip_content_hashes(feed):
+    """
+    Get a content hash of every trip's stop sequence and times.
+
+    Each stop time row (stop_id, arrival, departure, position in the trip)
+    is hashed and the row hashes of a trip are summed, so two trips with the
+    same stops and times hash the same whatever their trip_id. Used to tell
+    which parts of a feed changed between versions.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+
+    Returns:
+    --------
+    np.ndarray
+        uint64 array aligned with get_trip_table() rows
+    """
+    cache = get_feed_cache(feed)
+    if 'trip_content_hashes' not in cache:
+        trips = get_trip_table(feed)
+        stop_times = get_stop_times_table(feed)
+        valid = np.flatnonzero(stop_times['trip_idx'].to_numpy() >= 0)
+        trip_idx = stop_times['trip_idx'].to_numpy()[valid]
+
+        if len(valid):
+            starts = np.concatenate(([0], np.flatnonzero(trip_idx[1:] != trip_idx[:-1]) + 1))
+        else:
+            starts = np.array([], dtype=np.int64)
+        lengths = np.diff(np.append(starts, len(valid)))
+        rows = pd.DataFrame({
+            'stop_id': stop_times['stop_id'].to_numpy()[valid],
+            'arrival_s': stop_times['arrival_s'].to_numpy()[valid],
+            'departure_s': stop_times['departure_s'].to_numpy()[valid],
+            'position': np.arange(len(valid)) - np.repeat(starts, lengths),
+        })
+        row_hashes = pd.util.hash_pandas_object(rows, index=False).to_numpy()
+
+        hashes = np.zeros(len(trips), dtype=np.uint64)
+        if len(starts):
+            hashes[trip_idx[starts]] = np.add.reduceat(row_hashes, starts)
+        cache['trip_content_hashes'] = hashes
+    return cache['trip_content_hashes']
+
+
+def get_stop_departure_index(feed):
+    """
+    Get every departure in the feed grouped by stop and sorted by time.
+
+    The index is stored as flat arrays (compressed sparse row layout): the
+    departures of stop_ids[k] are rows offsets[k]:offsets[k + 1] of trip_idx
+    and departure_s, already sorted by departure time. Looking up a stop is a
+    binary search plus a slice, with no per-call filtering or sorting.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+
+    Returns:
+    --------
+    dict
+        Dictionary with:
+        - 'stop_ids': sorted array of stop IDs
+        - 'offsets': int array of length len(stop_ids) + 1
+        - 'trip_idx': row of each departure's trip in get_trip_table()
+        - 'departure_s': departure time in seconds (service-day time)
+    """
+    cache = get_feed_cache(feed)
+    if 'stop_departure_index' not in cache:
+        stop_times = get_stop_times_table(feed)
+        stop_codes, stop_ids = pd.factorize(stop_times['stop_id'].astype(object), sort=True)
+        departure_s = stop_times['departure_s'].to_numpy()
+        order = np.lexsort((departure_s, stop_codes))
+
+        counts = np.bincount(stop_codes, minlength=len(stop_ids))
+        cache['stop_departure_index'] = {
+            'stop_ids': np.asarray(stop_ids, dtype=object),
+            'offsets': np.concatenate(([0], np.cumsum(counts))),
+            'trip_idx': stop_times['trip_idx'].to_numpy()[order],
+            'departure_s': departure_s[order],
+        }
+    return cache['stop_departure_index']
+
+
+def get_stop_departures(feed, stop_id):
+    """
+    Get all departures at a stop, sorted by departure time.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    stop_id : str
+        Platform stop ID (e.g., '127N')
+
+    Returns:
+    --------
+    tuple of np.ndarray
+        (trip_idx, departure_s). trip_idx indexes rows of get_trip_table().
+        Both arrays are empty if the stop has no departures.
+    """
+    index = get_stop_departure_index(feed)
+    stop_ids = index['stop_ids']
+    k = np.searchsorted(stop_ids, stop_id)
+    if k >= len(stop_ids) or stop_ids[k] != stop_id:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    start, end = index['offsets'][k], index['offsets'][k + 1]
+    return index['trip_idx'][start:end], index['departure_s'][start:end]
@@ -6,9 +6,10 @@ This helps you verify direction IDs when filling in direction_names.csv
 """
 import gtfs_kit as gk
 import pandas as pd
+from service_calendar import describe_service, service_mask
 
 
-def get_terminal_for_direction(feed, route_id, direction_id, service_id='Weekday'):
+def get_terminal_for_direction(feed, route_id, direction_id, service_id='Weekday', date=None):
     """
     Get the terminal station for a route/direction.
 
@@ -22,6 +23,9 @@ def get_terminal_for_direction(feed, route_id, direction_id, service_id='Weekday
         Direction ID (0 or 1)
     service_id : str, default='Weekday'
         Service ID to use for finding the terminal
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -32,7 +36,7 @@ def get_terminal_for_direction(feed, route_id, direction_id, service_id='Weekday
     trips = feed.trips[
         (feed.trips['route_id'] == route_id) &
         (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
+        service_mask(feed, feed.trips, service_id, date)
     ].copy()
 
     if trips.empty:
@@ -55,7 +59,7 @@ def get_terminal_for_direction(feed, route_id, direction_id, service_id='Weekday
     return None
 
 
-def generate_terminal_reference(feed, service_id='Weekday', output_file='terminal_reference.csv'):
+def generate_terminal_reference(feed, service_id='Weekday', output_file='terminal_reference.csv', date=None):
     """
     Generate a CSV showing terminal stations for all routes and directions.
 
@@ -67,6 +71,9 @@ def generate_terminal_reference(feed, service_id='Weekday', output_file='termina
         Service ID to use for finding terminals
     output_file : str, default='terminal_reference.csv'
         Output CSV filename
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
     """
     # Get all unique routes
     routes = feed.routes.sort_values('route_id')
@@ -78,8 +85,8 @@ def generate_terminal_reference(feed, service_id='Weekday', output_file='termina
         route_long_name = route_row.get('route_long_name', '')
 
         # Get terminals for both directions
-        terminal_0 = get_terminal_for_direction(feed, route_id, 0, service_id)
-        terminal_1 = get_terminal_for_direction(feed, route_id, 1, service_id)
+        terminal_0 = get_terminal_for_direction(feed, route_id, 0, service_id, date)
+        terminal_1 = get_terminal_for_direction(feed, route_id, 1, service_id, date)
 
         # Only include routes that have at least one direction with service
         if terminal_0 or terminal_1:
@@ -95,7 +102,7 @@ def generate_terminal_reference(feed, service_id='Weekday', output_file='termina
     df.to_csv(output_file, index=False)
 
     print(f"Terminal reference saved to {output_file}")
-    print(f"\nFound {len(results)} routes with service on {service_id}:")
+    print(f"\nFound {len(results)} routes with service on {describe_service(feed, service_id, date)}:")
     print()
     print(df.to_string(index=False))
 
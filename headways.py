@@ -3,6 +3,8 @@ import pandas as pd
 from datetime import datetime, timedelta
 from collections import defaultdict
 from shapely.geometry import Point, Polygon
+from service_calendar import describe_service, service_mask
+from service_timeline import get_stitched_headways_by_hour
 
 
 """
@@ -39,7 +41,7 @@ IMPROVED APPROACH:
 
 def get_line_headways_by_hour_improved(feed, route_id, direction_id=None, 
                                        service_id=None, stop_id=None,
-                                       exclude_first_last=True):
+                                       exclude_first_last=True, date=None):
     """
     Calculate train headways for each hour of the day for a particular line.
     
@@ -67,12 +69,23 @@ def get_line_headways_by_hour_improved(feed, route_id, direction_id=None,
     exclude_first_last : bool, default=True
         If True, excludes the first and last headway of the service period to avoid
         boundary effects (e.g., overnight gaps appearing as "headways")
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id and measures headways on the stitched timeline for that
+        day (see service_timeline.py): the previous service day's 24:xx trips
+        are merged into the early-morning hours and exclude_first_last is not
+        needed, so it is ignored.
     
     Returns:
     --------
     dict
         Dictionary with hours (0-23) as keys and lists of headways (in minutes) as values
     """
+    if date is not None:
+        headways_by_hour, _ = get_stitched_headways_by_hour(
+            feed, date, route_id, direction_id, stop_id
+        )
+        return headways_by_hour
     
     # Get trips for the specified route
     trips = feed.trips[feed.trips['route_id'] == route_id].copy()
@@ -81,9 +94,9 @@ def get_line_headways_by_hour_improved(feed, route_id, direction_id=None,
     if direction_id is not None:
         trips = trips[trips['direction_id'] == direction_id]
     
-    # Filter by service_id if specified
-    if service_id is not None:
-        trips = trips[trips['service_id'] == service_id]
+    # Filter by service_id (or the services running on date) if specified
+    if service_id is not None or date is not None:
+        trips = trips[service_mask(feed, trips, service_id, date)]
     
     if trips.empty:
         print(f"No trips found for route {route_id}")
@@ -155,7 +168,7 @@ def get_line_headways_by_hour_improved(feed, route_id, direction_id=None,
     return dict(headways_by_hour)
 
 
-def analyze_service_pattern(feed, route_id, direction_id=None, service_id=None):
+def analyze_service_pattern(feed, route_id, direction_id=None, service_id=None, date=None):
     """
     Analyze when service actually runs to help debug headway calculations.
     Shows first and last departure for each hour.
@@ -165,8 +178,8 @@ def analyze_service_pattern(feed, route_id, direction_id=None, service_id=None):
     if direction_id is not None:
         trips = trips[trips['direction_id'] == direction_id]
     
-    if service_id is not None:
-        trips = trips[trips['service_id'] == service_id]
+    if service_id is not None or date is not None:
+        trips = trips[service_mask(feed, trips, service_id, date)]
     
     if trips.empty:
         print(f"No trips found")
@@ -189,7 +202,8 @@ def analyze_service_pattern(feed, route_id, direction_id=None, service_id=None):
     
     print(f"\nService Pattern for Route {route_id}" + 
           (f", Direction {direction_id}" if direction_id is not None else "") +
-          (f", Service {service_id}" if service_id is not None else ""))
+          (f", Service {describe_service(feed, service_id, date)}"
+           if service_id is not None or date is not None else ""))
     print("-" * 70)
     print(f"{'Hour':<6} {'# Departures':<15} {'First':<15} {'Last':<15}")
     print("-" * 70)
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Isochrones: how far can you get from each station in N minutes.
+
+For every parent station and a set of departure times, the fastest travel
+time to every other station is computed with the connection scan engine
+(csa.py) and stored in one compact array:
+
+    minutes[origin, destination, departure_time]   (uint8)
+
+Values are whole minutes rounded up; UNREACHABLE (255) means the station
+cannot be reached within the max_minutes the array was built with. The
+array is written as a .npy file and opened memory-mapped, so a page for one
+station reads a single origin slice instead of loading every origin. A JSON
+sidecar (same name, .json) records the station IDs, departure times and
+service the array was built for.
+
+Origins are computed in parallel with a process pool. Station coordinates
+for maps come from express_local.create_stop_borough_mapping().
+"""
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import gtfs_kit as gk
+import numpy as np
+import pandas as pd
+
+import express_local as el
+from csa import get_connection_table
+from feed_index import seconds_to_gtfs_time
+from raptor import parse_time_of_day
+from service_calendar import parse_service_date
+
+
+# Stored for stations not reachable within max_minutes
+UNREACHABLE = 255
+
+# Default departure times: every hour on the hour
+DEFAULT_DEPARTURE_TIMES = [hour * 3600 for hour in range(24)]
+
+FORMAT_VERSION = 1
+
+
+_WORKER_FEED = None
+
+
+def _init_worker(feed_path):
+    """Process pool initializer for platforms that spawn instead of fork."""
+    global _WORKER_FEED
+    if _WORKER_FEED is None:
+        _WORKER_FEED = gk.read_feed(feed_path, dist_units="m")
+
+
+def _origin_minutes(table, station_ids, origin, departure_s, max_minutes):
+    """
+    uint8 array (n_stations, n_times) of minutes from origin to every station.
+    """
+    station_codes = np.searchsorted(station_ids, table.station_ids.astype(str))
+    order = np.argsort(station_codes, kind='stable')
+    starts = np.searchsorted(station_codes[order], np.arange(len(station_ids)))
+
+    minutes = np.full((len(station_ids), len(departure_s)), UNREACHABLE, dtype=np.uint8)
+    for column, time_s in enumerate(departure_s):
+        arrival = table.earliest_arrival_all(origin, time_s, max_duration_s=max_minutes * 60)
+        station_arrival = np.minimum.reduceat(arrival[order], starts)
+        travel = np.ceil((station_arrival - time_s) / 60.0)
+        reached = np.isfinite(travel) & (travel <= max_minutes)
+        minutes[reached, column] = travel[reached].astype(np.uint8)
+    return minutes
+
+
+def _origin_task(origin, station_ids, departure_s, max_minutes, service_id, date):
+    """Worker task: one origin station's slice of the isochrone array."""
+    table = get_connection_table(_WORKER_FEED, service_id, date)
+    return origin, _origin_minutes(table, station_ids, origin, departure_s, max_minutes)
+
+
+def build_isochrone_array(feed, output_path, departure_times=None, service_id='Weekday', date=None,
+                          max_minutes=90, origins=None, max_workers=None, feed_path='gtfs_subway.zip'):
+    """
+    Build the station x station x departure time minutes array.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    output_path : str
+        Path of the .npy file to write (a .json sidecar is written next to it)
+    departure_times : list, optional
+        Departure times, 'HH:MM:SS' or seconds. Defaults to every hour on
+        the hour.
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date. If given, overrides service_id.
+    max_minutes : int, default=90
+        Longest travel time stored (at most 254)
+    origins : list of str, optional
+        Parent station IDs to compute. Defaults to every station; other rows
+        are left UNREACHABLE.
+    max_workers : int, optional
+        Number of worker processes (None = one per CPU, 1 = run in this
+        process)
+    feed_path : str, default='gtfs_subway.zip'
+        Feed loaded by workers when processes are spawned instead of forked
+
+    Returns:
+    --------
+    IsochroneStore
+        The finished array, opened memory-mapped
+    """
+    global _WORKER_FEED
+
+    if not 0 < max_minutes < UNREACHABLE:
+        raise ValueError(f"max_minutes must be between 1 and {UNREACHABLE - 1}")
+    if departure_times is None:
+        departure_times = DEFAULT_DEPARTURE_TIMES
+    departure_s = np.array([parse_time_of_day(t) for t in departure_times], dtype=np.int64)
+
+    # Build the connection table in the parent so forked workers inherit it
+    table = get_connection_table(feed, service_id, date)
+    station_ids = np.unique(table.station_ids.astype(str))
+    if origins is None:
+        origins = list(station_ids)
+    rows = {station_id: i for i, station_id in enumerate(station_ids)}
+    unknown = [o for o in origins if o not in rows]
+    if unknown:
+        raise ValueError(f"Unknown origin stations: {unknown}")
+
+    minutes = np.lib.format.open_memmap(
+        output_path, mode='w+', dtype=np.uint8, shape=(len(station_ids), len(station_ids), len(departure_s))
+    )
+    minutes[:] = UNREACHABLE
+
+    start = time.perf_counter()
+    _WORKER_FEED = feed
+    try:
+        if max_workers == 1:
+            for origin in origins:
+                _, origin_minutes = _origin_task(origin, station_ids, departure_s, max_minutes, service_id, date)
+                minutes[rows[origin]] = origin_minutes
+        else:
+            methods = multiprocessing.get_all_start_methods()
+            if 'fork' in methods:
+                context, initargs = multiprocessing.get_context('fork'), ()
+            else:
+                context, initargs = multiprocessing.get_context(), (feed_path,)
+
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                     initializer=_init_worker if initargs else None,
+                                     initargs=initargs) as pool:
+                futures = [pool.submit(_origin_task, origin, station_ids, departure_s, max_minutes,
+                                       service_id, date) for origin in origins]
+                for future in as_completed(futures):
+                    origin, origin_minutes = future.result()
+                    minutes[rows[origin]] = origin_minutes
+    finally:
+        _WORKER_FEED = None
+
+    minutes.flush()
+    del minutes
+
+    metadata = {
+        'format_version': FORMAT_VERSION,
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'service_id': service_id,
+        'date': None if date is None else parse_service_date(date).strftime('%Y%m%d'),
+        'max_minutes': int(max_minutes),
+        'station_ids': [str(s) for s in station_ids],
+        'departure_s': [int(t) for t in departure_s],
+        'origins': [str(o) for o in origins],
+    }
+    with open(_metadata_path(output_path), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    print(f"Computed {len(origins)} origins x {len(departure_s)} departure times in "
+          f"{time.perf_counter() - start:.1f}s")
+    print(f"Isochrone array saved to {output_path}")
+    return IsochroneStore(output_path, feed)
+
+
+def _metadata_path(output_path):
+    """Path of the JSON sidecar for an isochrone array."""
+    return os.path.splitext(output_path)[0] + '.json'
+
+
+class IsochroneStore:
+    """
+    Memory-mapped isochrone array written by build_isochrone_array().
+
+    Parameters:
+    -----------
+    path : str
+        Path to the .npy file
+    feed : gtfs_kit.Feed, optional
+        Feed used for station names and coordinates
+
+    Attributes:
+    -----------
+    minutes : np.memmap
+        uint8 array (n_stations, n_stations, n_times), read-only
+    station_ids : list of str
+    departure_s : list of int
+    max_minutes : int
+    """
+
+    def __init__(self, path, feed=None):
+        with open(_metadata_path(path)) as f:
+            metadata = json.load(f)
+        self.feed = feed
+        self.metadata = metadata
+        self.minutes = np.load(path, mmap_mode='r')
+        self.station_ids = metadata['station_ids']
+        self.departure_s = metadata['departure_s']
+        self.max_minutes = metadata['max_minutes']
+        self._rows = {station_id: i for i, station_id in enumerate(self.station_ids)}
+
+    def _time_column(self, departure_time):
+        """Index of the stored departure time closest to departure_time."""
+        departure_s = parse_time_of_day(departure_time)
+        return int(np.argmin(np.abs(np.array(self.departure_s) - departure_s)))
+
+    def travel_minutes(self, origin, departure_time):
+        """
+        Minutes from origin to every station at the nearest stored departure time.
+
+        Parameters:
+        -----------
+        origin : str
+            Parent station ID
+        departure_time : str or int
+            'HH:MM:SS' or seconds
+
+        Returns:
+        --------
+        pd.Series
+            Minutes indexed by station_id (NaN if not reachable within
+            max_minutes)
+        """
+        values = self.minutes[self._rows[origin], :, self._time_column(departure_time)].astype(float)
+        values[values == UNREACHABLE] = np.nan
+        return pd.Series(values, index=pd.Index(self.station_ids, name='station_id'), name='minutes')
+
+    def reachable(self, origin, departure_time, max_minutes=30):
+        """
+        Stations reachable from origin within max_minutes, with coordinates.
+
+        Parameters:
+        -----------
+        origin : str
+            Parent station ID
+        departure_time : str or int
+            'HH:MM:SS' or seconds (the nearest stored departure time is used)
+        max_minutes : int, default=30
+            Travel time limit
+
+        Returns:
+        --------
+        pd.DataFrame
+            Columns station_id, stop_name, borough, stop_lat, stop_lon and
+            minutes, sorted by minutes. Names and coordinates need a feed.
+        """
+        minutes = self.travel_minutes(origin, departure_time)
+        minutes = minutes[minutes <= max_minutes].reset_index()
+
+        if self.feed is not None:
+            stops = el.get_stop_borough_table(self.feed)
+            minutes = minutes.merge(
+                stops[['stop_id', 'stop_name', 'borough', 'stop_lat', 'stop_lon']],
+                left_on='station_id', right_on='stop_id', how='left'
+            ).drop(columns='stop_id')
+            minutes = minutes[['station_id', 'stop_name', 'borough', 'stop_lat', 'stop_lon', 'minutes']]
+
+        return minutes.sort_values(['minutes', 'station_id'], kind='stable').reset_index(drop=True)
+
+    def to_geojson(self, origin, departure_time, max_minutes=30, output_file=None):
+        """
+        GeoJSON points of the stations reachable within max_minutes.
+
+        Parameters:
+        -----------
+        origin : str
+            Parent station ID
+        departure_time : str or int
+            'HH:MM:SS' or seconds
+        max_minutes : int, default=30
+            Travel time limit
+        output_file : str, optional
+            If given, write the GeoJSON to this file
+
+        Returns:
+        --------
+        dict
+            GeoJSON FeatureCollection with station_id, stop_name, borough and
+            minutes properties
+        """
+        if self.feed is None:
+            raise ValueError("IsochroneStore needs a feed for station coordinates")
+
+        reachable = self.reachable(origin, departure_time, max_minutes)
+        column = self._time_column(departure_time)
+        features = [{
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [float(row.stop_lon), float(row.stop_lat)]},
+            'properties': {
+                'station_id': row.station_id,
+                'stop_name': row.stop_name,
+                'borough': row.borough,
+                'minutes': int(row.minutes),
+            },
+        } for row in reachable.itertuples(index=False)]
+
+        geojson = {
+            'type': 'FeatureCollection',
+            'properties': {
+                'origin': origin,
+                'departure_time': seconds_to_gtfs_time(self.departure_s[column]),
+                'max_minutes': max_minutes,
+            },
+            'features': features,
+        }
+        if output_file is not None:
+            with open(output_file, 'w') as f:
+                json.dump(geojson, f, indent=2)
+        return geojson
+
+
+if __name__ == "__main__":
+    print(__doc__)
+
+    feed = gk.read_feed("gtfs_subway.zip", dist_units="m")
+
+    store = build_isochrone_array(feed, 'isochrones_Weekday.npy', service_id='Weekday')
+
+    # Everywhere within 30 minutes of Times Sq-42 St at 8 AM
+    print(store.reachable('127', '08:00:00', max_minutes=30).to_string(index=False))
@@ -0,0 +1,961 @@
+#!/usr/bin/env python3
+"""
+RAPTOR (Round-bAsed Public Transit Optimized Router) journey planner.
+
+Answers "what is the fastest way from A to B if I leave at time T" over the
+whole subway network, including transfers between routes.
+
+RAPTOR works in rounds: round k finds the earliest arrival at every stop
+using at most k trains. Each round scans every route pattern that serves a
+stop improved in the previous round, boards the earliest catchable trip, and
+rides it forward; then footpaths (transfers within a station or between
+connected stations) are relaxed.
+
+The network is compiled once per feed and service:
+- Route patterns come from stop_patterns.PatternCatalog: trips with the
+  same stop sequence share a pattern. Each pattern stores its stop sequence
+  and trip x stop departure and arrival matrices, with trips sorted so that
+  no trip overtakes another (patterns with overtaking are split).
+- Footpaths connect the platforms of each parent station, and the stations
+  listed in transfers.txt, using min_transfer_time (DEFAULT_TRANSFER_S when
+  the feed gives none).
+
+Scanning a pattern is vectorized: the earliest catchable trip at every
+position comes from one comparison against the departure matrix, and a
+running minimum along the pattern gives the trip a rider is on at each
+later stop.
+
+Accessible mode (accessible=True) only lets riders board or leave a train
+at stations whose complex has a step-free entrance (station_complexes.py,
+which assumes the stations of a complex connect step-free): arrivals and
+footpaths into other stops are masked out during the scan, so journeys start,
+end and change trains only at accessible stations. Transfers at stations
+without one are not allowed, even cross-platform ones.
+
+Times are service-day seconds; trips of the next service day are not
+considered.
+"""
+import multiprocessing
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import gtfs_kit as gk
+import numpy as np
+import pandas as pd
+
+from feed_index import (get_feed_cache, get_stop_name_lookup, get_stop_times_table,
+                        get_trip_table, gtfs_time_to_seconds, seconds_to_gtfs_time, trip_mask)
+from service_calendar import resolve_service_ids
+from station_complexes import get_complex_transfer_seconds, get_station_complexes
+from stop_patterns import get_pattern_catalog
+
+
+# Transfer time between platforms of a station when transfers.txt has no entry
+DEFAULT_TRANSFER_S = 180
+
+# Default maximum number of transfers (rounds = transfers + 1)
+MAX_TRANSFERS = 4
+
+
+def _fifo_groups(departures, arrivals):
+    """
+    Split trips (sorted by first departure) into groups without overtaking.
+
+    Returns a list of row index arrays. Within each group, departure and
+    arrival times never decrease from one trip to the next at any stop.
+    """
+    if len(departures) < 2 or ((np.diff(departures, axis=0) >= 0).all() and
+                               (np.diff(arrivals, axis=0) >= 0).all()):
+        return [np.arange(len(departures))]
+
+    groups = []
+    for row in range(len(departures)):
+        for group in groups:
+            last = group[-1]
+            if (departures[row] >= departures[last]).all() and (arrivals[row] >= arrivals[last]).all():
+                group.append(row)
+                break
+        else:
+            groups.append([row])
+    return [np.array(group) for group in groups]
+
+
+def parse_time_of_day(time_value):
+    """Seconds after midnight from 'HH:MM:SS' or a number of seconds."""
+    if isinstance(time_value, str):
+        seconds = int(gtfs_time_to_seconds(pd.Series([time_value]))[0])
+        if seconds < 0:
+            raise ValueError(f"Invalid time '{time_value}', expected HH:MM:SS")
+        return seconds
+    return int(time_value)
+
+
+def build_footpaths(feed, station_ids, default_transfer_s=DEFAULT_TRANSFER_S, station_transfers=None):
+    """
+    Footpaths between platforms of the same or connected parent stations.
+
+    Platforms of one station are connected with the station's own
+    transfers.txt entry (from_stop_id == to_stop_id), or default_transfer_s.
+    Other transfers.txt entries connect every platform of one station to
+    every platform of the other. station_transfers adds station pairs that
+    transfers.txt does not list.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    station_ids : np.ndarray
+        Parent station of each stop position
+    default_transfer_s : int, default=DEFAULT_TRANSFER_S
+        Transfer time when transfers.txt has no entry or no min_transfer_time
+    station_transfers : dict, optional
+        (from_station, to_station) -> seconds, e.g. the in-complex transfers
+        of station_complexes.StationComplexIndex.transfer_seconds
+
+    Returns:
+    --------
+    tuple of np.ndarray
+        (from_stop, to_stop, seconds), sorted by from_stop then to_stop
+    """
+    transfer_times = {}
+    transfers = getattr(feed, 'transfers', None)
+    if transfers is not None and len(transfers):
+        minimum = transfers['min_transfer_time'] if 'min_transfer_time' in transfers.columns else None
+        for k, (from_stop, to_stop) in enumerate(zip(transfers['from_stop_id'], transfers['to_stop_id'])):
+            seconds = default_transfer_s
+            if minimum is not None and pd.notna(minimum.iloc[k]):
+                seconds = int(minimum.iloc[k])
+            transfer_times[(from_stop, to_stop)] = seconds
+    if station_transfers is not None:
+        for pair, seconds in station_transfers.items():
+            transfer_times.setdefault(pair, int(seconds))
+
+    platforms = pd.Series(np.arange(len(station_ids))).groupby(station_ids).apply(list).to_dict()
+    edges = {}
+    for station, stops in platforms.items():
+        seconds = transfer_times.pop((station, station), default_transfer_s)
+        for a in stops:
+            for b in stops:
+                if a != b:
+                    edges[(a, b)] = seconds
+    for (from_station, to_station), seconds in transfer_times.items():
+        for a in platforms.get(from_station, []):
+            for b in platforms.get(to_station, []):
+                if a != b:
+                    edges[(a, b)] = min(seconds, edges.get((a, b), seconds))
+
+    pairs = np.array(sorted(edges), dtype=np.int64).reshape(-1, 2)
+    seconds = np.array([edges[(a, b)] for a, b in pairs], dtype=float).reshape(-1)
+    return pairs[:, 0], pairs[:, 1], seconds
+
+
+def accessible_stop_mask(feed, station_ids, csv_path=None):
+    """
+    Which stop positions belong to a station with step-free access.
+
+    Access is decided per complex (StationComplexIndex.accessible_stations).
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    station_ids : np.ndarray
+        Parent station of each stop position
+    csv_path : str, optional
+        Entrances dataset (see station_complexes.get_station_complexes())
+
+    Returns:
+    --------
+    np.ndarray
+        Boolean array aligned with station_ids
+    """
+    accessible = get_station_complexes(feed, csv_path).accessible_stations
+    return np.array([station in accessible for station in station_ids], dtype=bool)
+
+
+def resolve_stop_positions(stop, stop_positions, station_ids):
+    """
+    Stop positions for a platform stop ID, a parent station ID, or a list of them.
+
+    Parameters:
+    -----------
+    stop : str or list of str
+        Platform stop IDs (e.g., '127S') or parent station IDs (e.g., '127')
+    stop_positions : dict
+        Dictionary mapping platform stop ID -> position
+    station_ids : np.ndarray
+        Parent station of each position
+
+    Returns:
+    --------
+    np.ndarray
+        Sorted stop positions
+
+    Raises:
+    -------
+    ValueError
+        If no platform matches
+    """
+    stops = [stop] if isinstance(stop, str) else list(stop)
+    positions = set()
+    for stop_id in stops:
+        if stop_id in stop_positions:
+            positions.add(stop_positions[stop_id])
+        else:
+            positions.update(np.flatnonzero(station_ids == stop_id).tolist())
+    if not positions:
+        raise ValueError(f"No stops found for {stop}")
+    return np.array(sorted(positions), dtype=np.int64)
+
+
+class RaptorNetwork:
+    """
+    Route patterns and footpaths of one feed and service, compiled for RAPTOR.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_ids : list of str, optional
+        Service IDs whose trips are included. If None, includes every trip.
+    default_transfer_s : int, default=DEFAULT_TRANSFER_S
+        Transfer time between platforms of a station with no transfers.txt
+        entry
+    station_transfers : dict, optional
+        Extra (from_station, to_station) -> seconds transfers, see
+        build_footpaths()
+
+    Attributes:
+    -----------
+    stop_ids : np.ndarray
+        Platform stop IDs, indexed by stop position
+    station_ids : np.ndarray
+        Parent station of each stop
+    pattern_stops : list of np.ndarray
+        Stop positions of each pattern, in travel order
+    pattern_departures, pattern_arrivals : list of np.ndarray
+        Float arrays (n_trips, n_stops) of each pattern, in seconds
+    pattern_trips : list of np.ndarray
+        Trip table row of each trip in each pattern
+    """
+
+    def __init__(self, feed, service_ids=None, default_transfer_s=DEFAULT_TRANSFER_S, station_transfers=None):
+        self.feed = feed
+        catalog = get_pattern_catalog(feed)
+        stop_times = get_stop_times_table(feed)
+        trips = get_trip_table(feed)
+        station_lookup = stop_times.drop_duplicates('stop_id').set_index('stop_id')['station_id']
+
+        self.stop_ids = catalog.stop_ids
+        self.station_ids = station_lookup.reindex(self.stop_ids).to_numpy().astype(object)
+        self._stop_positions = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+
+        # First stop time row of each trip
+        trip_idx = stop_times['trip_idx'].to_numpy()
+        starts = np.concatenate(([0], np.flatnonzero(trip_idx[1:] != trip_idx[:-1]) + 1))
+        trip_start = np.full(len(trips), -1, dtype=np.int64)
+        valid = trip_idx[starts] >= 0
+        trip_start[trip_idx[starts[valid]]] = starts[valid]
+
+        departure_s = stop_times['departure_s'].to_numpy().astype(float)
+        arrival_s = stop_times['arrival_s'].to_numpy().astype(float)
+
+        selected = np.flatnonzero(trip_mask(feed, service_id=service_ids) & (catalog.trip_pattern >= 0))
+        selected = selected[np.argsort(catalog.trip_pattern[selected], kind='stable')]
+        patterns, group_starts = np.unique(catalog.trip_pattern[selected], return_index=True)
+        group_ends = np.append(group_starts[1:], len(selected))
+
+        self.pattern_stops = []
+        self.pattern_departures = []
+        self.pattern_arrivals = []
+        self.pattern_trips = []
+        for pattern, start, end in zip(patterns, group_starts, group_ends):
+            sequence = catalog.sequences[pattern]
+            trip_rows = selected[start:end]
+            rows = trip_start[trip_rows][:, None] + np.arange(len(sequence))
+            departures = departure_s[rows]
+            arrivals = arrival_s[rows]
+
+            order = np.lexsort((arrivals[:, -1], departures[:, 0]))
+            departures, arrivals, trip_rows = departures[order], arrivals[order], trip_rows[order]
+            for group in _fifo_groups(departures, arrivals):
+                self.pattern_stops.append(sequence)
+                self.pattern_departures.append(departures[group])
+                self.pattern_arrivals.append(arrivals[group])
+                self.pattern_trips.append(trip_rows[group])
+
+        # Stop -> (pattern, position) incidence, as flat arrays grouped by stop
+        lengths = [len(s) for s in self.pattern_stops]
+        incidence_stop = np.concatenate(self.pattern_stops) if lengths else np.array([], dtype=np.int64)
+        incidence_pattern = np.repeat(np.arange(len(lengths)), lengths)
+        order = np.argsort(incidence_stop, kind='stable')
+        self._stop_pattern = incidence_pattern[order]
+        self._stop_pattern_offsets = np.searchsorted(incidence_stop[order], np.arange(len(self.stop_ids) + 1))
+
+        self._foot_from, self._foot_to, self._foot_s = build_footpaths(
+            feed, self.station_ids, default_transfer_s, station_transfers
+        )
+        self._accessible = None
+
+    def __len__(self):
+        return len(self.pattern_stops)
+
+    def resolve_stops(self, stop):
+        """
+        Stop positions for a platform stop ID, a parent station ID, or a list of them.
+
+        Raises:
+        -------
+        ValueError
+            If no platform in the network matches
+        """
+        return resolve_stop_positions(stop, self._stop_positions, self.station_ids)
+
+    def accessible_stops(self):
+        """Boolean mask of stops with step-free access (see accessible_stop_mask())."""
+        if self._accessible is None:
+            self._accessible = accessible_stop_mask(self.feed, self.station_ids)
+        return self._accessible
+
+    def run(self, sources, max_transfers=MAX_TRANSFERS, state=None, stop_mask=None):
+        """
+        Run RAPTOR from a set of source stops.
+
+        Parameters:
+        -----------
+        sources : dict
+            Dictionary mapping stop position -> time (seconds) the rider is
+            at that stop
+        max_transfers : int, default=MAX_TRANSFERS
+            Maximum number of transfers (the search runs max_transfers + 1
+            rounds)
+        state : dict, optional
+            Result of an earlier run from the same sources at a later time.
+            Its labels are kept and improved in place, which is what lets
+            profile() sweep departure times from latest to earliest.
+        stop_mask : np.ndarray, optional
+            Boolean array (n_stops). Riders can only start at, alight at or
+            walk to stops where it is True (e.g., accessible_stops()).
+
+        Returns:
+        --------
+        dict
+            Dictionary with, for rounds k = 0..max_transfers + 1:
+            - 'arrival': float array (rounds, n_stops), earliest arrival with
+              at most k trains (inf if unreachable)
+            - 'best': float array (n_stops), earliest arrival over all rounds
+            - 'ride_trip', 'ride_board', 'ride_arrival': label of the train
+              ridden into each stop in round k (pattern trip row, boarding
+              stop position, arrival time), -1 / inf if none
+            - 'walk_from': stop position each stop was walked from in round
+              k, -1 if none
+            - 'ride_pattern': pattern index of the train ridden
+        """
+        n_stops = len(self.stop_ids)
+        n_rounds = max_transfers + 2
+        if state is None:
+            state = {
+                'arrival': np.full((n_rounds, n_stops), np.inf),
+                'best': np.full(n_stops, np.inf),
+                'ride_trip': np.full((n_rounds, n_stops), -1, dtype=np.int64),
+                'ride_pattern': np.full((n_rounds, n_stops), -1, dtype=np.int64),
+                'ride_board': np.full((n_rounds, n_stops), -1, dtype=np.int64),
+                'ride_arrival': np.full((n_rounds, n_stops), np.inf),
+                'walk_from': np.full((n_rounds, n_stops), -1, dtype=np.int64),
+            }
+        arrival = state['arrival']
+        best = state['best']
+        ride_trip = state['ride_trip']
+        ride_pattern = state['ride_pattern']
+        ride_board = state['ride_board']
+        ride_arrival = state['ride_arrival']
+        walk_from = state['walk_from']
+
+        marked = np.zeros(n_stops, dtype=bool)
+        for stop, time_s in sources.items():
+            if stop_mask is not None and not stop_mask[stop]:
+                continue
+            if time_s < arrival[0, stop]:
+                arrival[0, stop] = time_s
+                ride_arrival[0, stop] = time_s
+                best[stop] = min(best[stop], time_s)
+                marked[stop] = True
+        marked |= self._relax_footpaths(0, marked, arrival, best, walk_from, stop_mask)
+
+        for k in range(1, n_rounds):
+            previous = arrival[k - 1]
+            np.minimum(arrival[k], previous, out=arrival[k])
+            marked_stops = np.flatnonzero(marked)
+            if len(marked_stops) == 0:
+                break
+
+            # Patterns that serve any stop improved in the last round
+            slices = [self._stop_pattern[self._stop_pattern_offsets[s]:self._stop_pattern_offsets[s + 1]]
+                      for s in marked_stops]
+            patterns = np.unique(np.concatenate(slices)) if slices else []
+
+            improved = np.zeros(n_stops, dtype=bool)
+            for pattern in patterns:
+                stops = self.pattern_stops[pattern]
+                departures = self.pattern_departures[pattern]
+                n_trips = len(departures)
+
+                # Earliest catchable trip at each position (n_trips = none)
+                catchable = departures >= previous[stops][None, :]
+                boardable = np.where(catchable.any(axis=0), catchable.argmax(axis=0), n_trips)
+
+                # Trip a rider is on when reaching each position, and where they boarded
+                on_trip = np.minimum.accumulate(boardable)
+                new_low = boardable < np.concatenate(([n_trips + 1], on_trip[:-1]))
+                boarded_at = np.maximum.accumulate(np.where(new_low, np.arange(len(stops)), 0))
+                on_trip = np.concatenate(([n_trips], on_trip[:-1]))
+                boarded_at = np.concatenate(([-1], boarded_at[:-1]))
+
+                riding = on_trip < n_trips
+                if not riding.any():
+                    continue
+                positions = np.flatnonzero(riding)
+                candidate = self.pattern_arrivals[pattern][on_trip[positions], positions]
+                targets = stops[positions]
+
+                better = candidate < best[targets]
+                if stop_mask is not None:
+                    better &= stop_mask[targets]
+                if not better.any():
+                    continue
+                positions, candidate, targets = positions[better], candidate[better], targets[better]
+
+                arrival[k, targets] = candidate
+                best[targets] = candidate
+                ride_trip[k, targets] = on_trip[positions]
+                ride_pattern[k, targets] = pattern
+                ride_board[k, targets] = stops[boarded_at[positions]]
+                ride_arrival[k, targets] = candidate
+                improved[targets] = True
+
+            marked = improved | self._relax_footpaths(k, improved, arrival, best, walk_from, stop_mask)
+
+        return state
+
+    def _relax_footpaths(self, k, marked, arrival, best, walk_from, stop_mask=None):
+        """
+        Walk from stops marked in round k. Returns the stops improved by walking.
+        """
+        edges = np.flatnonzero(marked[self._foot_from])
+        improved = np.zeros(len(marked), dtype=bool)
+        if len(edges) == 0:
+            return improved
+
+        sources = self._foot_from[edges]
+        targets = self._foot_to[edges]
+        candidate = arrival[k, sources] + self._foot_s[edges]
+
+        # Best footpath into each target
+        order = np.lexsort((candidate, targets))
+        targets, sources, candidate = targets[order], sources[order], candidate[order]
+        first = np.concatenate(([True], targets[1:] != targets[:-1]))
+        targets, sources, candidate = targets[first], sources[first], candidate[first]
+
+        better = candidate < best[targets]
+        if stop_mask is not None:
+            better &= stop_mask[targets]
+        targets, sources, candidate = targets[better], sources[better], candidate[better]
+        arrival[k, targets] = candidate
+        best[targets] = candidate
+        walk_from[k, targets] = sources
+        improved[targets] = True
+        return improved
+
+    def journey(self, result, destination_stops):
+        """
+        Reconstruct the fastest journey to any of destination_stops.
+
+        Among journeys with the earliest arrival, returns the one with the
+        fewest trains.
+
+        Parameters:
+        -----------
+        result : dict
+            Output of run()
+        destination_stops : np.ndarray
+            Stop positions of the destination
+
+        Returns:
+        --------
+        dict or None
+            Dictionary with arrival_s, transfers and legs (list of dicts with
+            mode 'train' or 'walk', from/to stop IDs, times and, for trains,
+            route_id and trip_id), or None if unreachable
+        """
+        arrival = result['arrival'][:, destination_stops]
+        if not np.isfinite(arrival).any():
+            return None
+
+        earliest = arrival.min()
+        k, column = np.argwhere(arrival == earliest)[0]
+        stop = destination_stops[column]
+        trips = get_trip_table(self.feed)
+
+        legs = []
+        walked = False
+        while True:
+            # Arrivals carried over from an earlier round are labeled there
+            while k > 0 and result['ride_trip'][k, stop] < 0 and (walked or result['walk_from'][k, stop] < 0):
+                k -= 1
+
+            source = -1 if walked else result['walk_from'][k, stop]
+            if source >= 0:
+                legs.append({
+                    'mode': 'walk',
+                    'from_stop_id': self.stop_ids[source],
+                    'to_stop_id': self.stop_ids[stop],
+                    'departure_s': float(result['ride_arrival'][k, source]),
+                    'arrival_s': float(result['arrival'][k, stop]),
+                })
+                stop = source
+                walked = True
+                continue
+            if k == 0:
+                break
+
+            pattern = result['ride_pattern'][k, stop]
+            trip = result['ride_trip'][k, stop]
+            board = result['ride_board'][k, stop]
+            sequence = self.pattern_stops[pattern]
+            board_position = np.flatnonzero(sequence == board)[0]
+            trip_row = self.pattern_trips[pattern][trip]
+            legs.append({
+                'mode': 'train',
+                'route_id': trips['route_id'].iat[trip_row],
+                'trip_id': trips['trip_id'].iat[trip_row],
+                'from_stop_id': self.stop_ids[board],
+                'to_stop_id': self.stop_ids[stop],
+                'departure_s': float(self.pattern_departures[pattern][trip, board_position]),
+                'arrival_s': float(result['ride_arrival'][k, stop]),
+            })
+            stop = board
+            walked = False
+            k -= 1
+
+        legs.reverse()
+        return {
+            'arrival_s': float(earliest),
+            'transfers': max(0, sum(leg['mode'] == 'train' for leg in legs) - 1),
+            'legs': legs,
+        }
+
+    def earliest_arrival(self, origin, destination, departure_time, max_transfers=MAX_TRANSFERS,
+                         accessible=False):
+        """
+        Fastest journey from origin to destination leaving at departure_time.
+
+        Parameters:
+        -----------
+        origin, destination : str or list of str
+            Platform stop IDs (e.g., '127S') or parent station IDs (e.g.,
+            '127'). A station starts or ends at any of its platforms.
+        departure_time : str or int
+            'HH:MM:SS' or seconds after midnight
+        max_transfers : int, default=MAX_TRANSFERS
+            Maximum number of transfers
+        accessible : bool, default=False
+            Only start, end and change trains at stations with step-free
+            access
+
+        Returns:
+        --------
+        dict or None
+            See journey(). departure_s is the time the search started.
+        """
+        departure_s = parse_time_of_day(departure_time)
+        sources = {stop: departure_s for stop in self.resolve_stops(origin)}
+        result = self.run(sources, max_transfers, stop_mask=self.accessible_stops() if accessible else None)
+        journey = self.journey(result, self.resolve_stops(destination))
+        if journey is not None:
+            journey['departure_s'] = departure_s
+        return journey
+
+    def origin_departures(self, origin_stops, start_s=0, end_s=None):
+        """
+        Distinct times a train leaves any of origin_stops, sorted ascending.
+
+        Parameters:
+        -----------
+        origin_stops : np.ndarray
+            Stop positions (see resolve_stops())
+        start_s, end_s : int, optional
+            Keep departures in [start_s, end_s]
+
+        Returns:
+        --------
+        np.ndarray
+            Float array of departure times in seconds
+        """
+        is_origin = np.zeros(len(self.stop_ids), dtype=bool)
+        is_origin[origin_stops] = True
+        times = [self.pattern_departures[p][:, np.flatnonzero(is_origin[stops[:-1]])].ravel()
+                 for p, stops in enumerate(self.pattern_stops)]
+        times = np.unique(np.concatenate(times)) if times else np.array([])
+        keep = times >= start_s
+        if end_s is not None:
+            keep &= times <= end_s
+        return times[keep]
+
+    def profile(self, origin, start_time=0, end_time=None, max_transfers=MAX_TRANSFERS, accessible=False):
+        """
+        Earliest arrivals at every stop for every departure from origin in a window (rRAPTOR).
+
+        Departure times are the times a train leaves the origin. They are
+        swept from latest to earliest, and each RAPTOR run keeps the labels
+        of the later runs: an arrival reachable by leaving later is also
+        reachable by leaving earlier and waiting, so each run only has to
+        explore what the earlier departure improves.
+
+        Parameters:
+        -----------
+        origin : str or list of str
+            Platform stop IDs or parent station IDs
+        start_time, end_time : str or int, optional
+            Departure window, 'HH:MM:SS' or seconds (default: all day)
+        max_transfers : int, default=MAX_TRANSFERS
+            Maximum number of transfers
+        accessible : bool, default=False
+            Only start, end and change trains at stations with step-free
+            access (no departures if the origin has none)
+
+        Returns:
+        --------
+        dict
+            Dictionary with:
+            - 'departure_s': float array (n_departures,), ascending
+            - 'arrival': float array (n_departures, n_stops), earliest
+              arrival at each stop when leaving at that time (inf if
+              unreachable)
+        """
+        origin_stops = self.resolve_stops(origin)
+        stop_mask = self.accessible_stops() if accessible else None
+        if stop_mask is not None:
+            origin_stops = origin_stops[stop_mask[origin_stops]]
+        end_s = None if end_time is None else parse_time_of_day(end_time)
+        departures = self.origin_departures(origin_stops, parse_time_of_day(start_time), end_s)
+
+        arrival = np.full((len(departures), len(self.stop_ids)), np.inf)
+        state = None
+        for row in range(len(departures) - 1, -1, -1):
+            time_s = departures[row]
+            state = self.run({stop: time_s for stop in origin_stops}, max_transfers, state, stop_mask)
+            arrival[row] = state['best']
+
+        return {'departure_s': departures, 'arrival': arrival}
+
+    def station_arrivals(self, arrival):
+        """
+        Reduce stop arrivals to parent stations (earliest platform).
+
+        Parameters:
+        -----------
+        arrival : np.ndarray
+            Array (..., n_stops), e.g. a profile's 'arrival'
+
+        Returns:
+        --------
+        tuple
+            (station_ids, array (..., n_stations))
+        """
+        stations, codes = np.unique(self.station_ids.astype(str), return_inverse=True)
+        order = np.argsort(codes, kind='stable')
+        starts = np.searchsorted(codes[order], np.arange(len(stations)))
+        return stations, np.minimum.reduceat(arrival[..., order], starts, axis=-1)
+
+
+def get_raptor_network(feed, service_id='Weekday', date=None):
+    """
+    Get the cached RaptorNetwork for a feed and service.
+
+    Footpaths include the in-complex transfers of
+    station_complexes.get_complex_transfer_seconds().
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_id : str or list of str, default='Weekday'
+        Service ID(s) to include
+    date : str or datetime.date, optional
+        Calendar date (e.g., '20241225'). If given, overrides service_id with
+        the services that run on that date.
+
+    Returns:
+    --------
+    RaptorNetwork
+    """
+    service_ids = resolve_service_ids(feed, service_id, date)
+    key = ('raptor_network', None if service_ids is None else tuple(sorted(service_ids)))
+    cache = get_feed_cache(feed)
+    if key not in cache:
+        cache[key] = RaptorNetwork(feed, service_ids, station_transfers=get_complex_transfer_seconds(feed))
+    return cache[key]
+
+
+def plan_journey(feed, origin, destination, departure_time, service_id='Weekday', date=None,
+                 max_transfers=MAX_TRANSFERS, accessible=False):
+    """
+    Find the fastest journey between two stations.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    origin, destination : str or list of str
+        Platform stop IDs or parent station IDs (e.g., '127' for Times Sq-42 St)
+    departure_time : str or int
+        'HH:MM:SS' or seconds after midnight
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date. If given, overrides service_id.
+    max_transfers : int, default=MAX_TRANSFERS
+        Maximum number of transfers
+    accessible : bool, default=False
+        Only start, end and change trains at stations with step-free access
+
+    Returns:
+    --------
+    dict or None
+        Dictionary with departure_s, arrival_s, transfers and legs, or None
+        if the destination cannot be reached
+
+    Examples:
+    ---------
+    >>> journey = plan_journey(feed, '101', '142', '08:00:00')
+    >>> print_journey(feed, journey)
+    """
+    network = get_raptor_network(feed, service_id, date)
+    return network.earliest_arrival(origin, destination, departure_time, max_transfers, accessible)
+
+
+def print_journey(feed, journey):
+    """
+    Print a journey from plan_journey().
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    journey : dict or None
+        Output of plan_journey()
+    """
+    if journey is None:
+        print("No journey found")
+        return
+
+    names = get_stop_name_lookup(feed)
+    total = (journey['arrival_s'] - journey['departure_s']) / 60.0
+    print(f"Leave {seconds_to_gtfs_time(journey['departure_s'])}, arrive "
+          f"{seconds_to_gtfs_time(journey['arrival_s'])} ({total:.0f} min, "
+          f"{journey['transfers']} transfer{'s' if journey['transfers'] != 1 else ''})")
+    for leg in journey['legs']:
+        start = seconds_to_gtfs_time(leg['departure_s'])
+        end = seconds_to_gtfs_time(leg['arrival_s'])
+        source = names.get(leg['from_stop_id'], leg['from_stop_id'])
+        target = names.get(leg['to_stop_id'], leg['to_stop_id'])
+        if leg['mode'] == 'train':
+            print(f"  {start}  {leg['route_id']:<3} train  {source} -> {target}  (arrive {end})")
+        else:
+            print(f"  {start}  transfer   {source} ({leg['from_stop_id']}) -> "
+                  f"{target} ({leg['to_stop_id']})  (ready {end})")
+
+
+def pareto_profile(profile, stop):
+    """
+    Non-dominated (departure, arrival) pairs for one stop from a profile.
+
+    A departure is dominated when leaving at the next later departure
+    arrives just as early.
+
+    Parameters:
+    -----------
+    profile : dict
+        Output of RaptorNetwork.profile()
+    stop : int
+        Stop position (or a station column index, if the arrivals were
+        reduced with station_arrivals())
+
+    Returns:
+    --------
+    list of (float, float)
+        (departure_s, arrival_s) pairs, ascending by departure
+    """
+    departures = profile['departure_s']
+    arrivals = profile['arrival'][:, stop]
+    later = np.append(arrivals[1:], np.inf)
+    keep = np.isfinite(arrivals) & (arrivals < later)
+    return list(zip(departures[keep].tolist(), arrivals[keep].tolist()))
+
+
+_WORKER_FEED = None
+
+
+def _init_worker(feed_path):
+    """Process pool initializer for platforms that spawn instead of fork."""
+    global _WORKER_FEED
+    if _WORKER_FEED is None:
+        _WORKER_FEED = gk.read_feed(feed_path, dist_units="m")
+
+
+def _profile_medians(network, profile, hours):
+    """Median travel minutes (n_stations, n_hours) over a profile's departures in each hour."""
+    _, arrival = network.station_arrivals(profile['arrival'])
+
+    departure_s = profile['departure_s']
+    minutes = (arrival - departure_s[:, None]) / 60.0
+    minutes[~np.isfinite(minutes)] = np.nan
+    departure_hours = (departure_s // 3600).astype(np.int64) % 24
+
+    medians = np.full((arrival.shape[1], len(hours)), np.nan)
+    for column, hour in enumerate(hours):
+        in_hour = departure_hours == hour
+        if in_hour.any():
+            with warnings.catch_warnings():
+                # Stations unreachable all hour give an all-NaN column
+                warnings.simplefilter('ignore', RuntimeWarning)
+                medians[:, column] = np.nanmedian(minutes[in_hour], axis=0)
+    return medians
+
+
+def _origin_task(origin, service_id, date, hours, max_transfers, include_accessible=False):
+    """Worker task: median travel minutes from one origin station, by hour."""
+    network = get_raptor_network(_WORKER_FEED, service_id, date)
+    medians = _profile_medians(network, network.profile(origin, max_transfers=max_transfers), hours)
+    accessible_medians = None
+    if include_accessible:
+        profile = network.profile(origin, max_transfers=max_transfers, accessible=True)
+        accessible_medians = _profile_medians(network, profile, hours)
+    return origin, medians, accessible_medians
+
+
+def build_od_travel_time_cube(feed, service_id='Weekday', date=None, origins=None, hours=None,
+                              max_transfers=MAX_TRANSFERS, max_workers=None, feed_path='gtfs_subway.zip',
+                              output_file=None, include_accessible=False):
+    """
+    Median fastest travel time between every pair of stations, by hour of departure.
+
+    Runs one profile query (see RaptorNetwork.profile) per origin station
+    over the whole service day, in a process pool. For each departure from
+    the origin, the travel time to a station is the earliest arrival there
+    minus the departure time; the cube holds the median over the departures
+    in each hour (times past 24:00 wrap to the early morning hours).
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date. If given, overrides service_id.
+    origins : list of str, optional
+        Parent station IDs to compute. Defaults to every station.
+    hours : list of int, optional
+        Hour buckets (0-23). Defaults to all 24.
+    max_transfers : int, default=MAX_TRANSFERS
+        Maximum number of transfers
+    max_workers : int, optional
+        Number of worker processes (None = one per CPU, 1 = run in this
+        process)
+    feed_path : str, default='gtfs_subway.zip'
+        Feed loaded by workers when processes are spawned instead of forked
+    output_file : str, optional
+        If given, save the cube with numpy.savez_compressed
+    include_accessible : bool, default=False
+        Also compute the accessible-only cube (see RaptorNetwork.profile)
+        in the same worker tasks
+
+    Returns:
+    --------
+    dict
+        Dictionary with:
+        - 'origins': array of origin station IDs
+        - 'station_ids': array of destination station IDs
+        - 'hours': array of hour buckets
+        - 'median_minutes': float array (n_origins, n_stations, n_hours),
+          NaN where no journey was found
+        - 'accessible_median_minutes': same shape, accessible journeys
+          only (if include_accessible)
+
+    Examples:
+    ---------
+    >>> cube = build_od_travel_time_cube(feed, 'Weekday', hours=[8, 12, 18])
+    >>> o = list(cube['origins']).index('101'); d = list(cube['station_ids']).index('142')
+    >>> cube['median_minutes'][o, d]
+    """
+    global _WORKER_FEED
+
+    # Compile once in the parent so forked workers inherit the network
+    network = get_raptor_network(feed, service_id, date)
+    station_ids, _ = network.station_arrivals(np.zeros(len(network.stop_ids)))
+    if include_accessible:
+        network.accessible_stops()
+    if origins is None:
+        origins = list(station_ids)
+    hours = list(range(24)) if hours is None else list(hours)
+
+    results = {}
+    start = time.perf_counter()
+    _WORKER_FEED = feed
+    try:
+        if max_workers == 1:
+            for origin in origins:
+                results[origin] = _origin_task(origin, service_id, date, hours, max_transfers,
+                                               include_accessible)[1:]
+        else:
+            methods = multiprocessing.get_all_start_methods()
+            if 'fork' in methods:
+                context, initargs = multiprocessing.get_context('fork'), ()
+            else:
+                context, initargs = multiprocessing.get_context(), (feed_path,)
+
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                                     initializer=_init_worker if initargs else None,
+                                     initargs=initargs) as pool:
+                futures = [pool.submit(_origin_task, origin, service_id, date, hours, max_transfers,
+                                       include_accessible) for origin in origins]
+                for future in as_completed(futures):
+                    origin, medians, accessible_medians = future.result()
+                    results[origin] = (medians, accessible_medians)
+    finally:
+        _WORKER_FEED = None
+
+    cube = {
+        'origins': np.array(origins, dtype=str),
+        'station_ids': np.array(station_ids, dtype=str),
+        'hours': np.array(hours, dtype=np.int64),
+        'median_minutes': np.stack([results[origin][0] for origin in origins]) if origins else
+                          np.empty((0, len(station_ids), len(hours))),
+    }
+    if include_accessible:
+        cube['accessible_median_minutes'] = np.stack([results[origin][1] for origin in origins]) if origins else \
+            np.empty((0, len(station_ids), len(hours)))
+    print(f"Computed {len(origins)} origin profiles in {time.perf_counter() - start:.1f}s")
+
+    if output_file is not None:
+        np.savez_compressed(output_file, **cube)
+        print(f"OD travel time cube saved to {output_file}")
+    return cube
+
+
+if __name__ == "__main__":
+    print(__doc__)
+
+    feed = gk.read_feed("gtfs_subway.zip", dist_units="m")
+
+    start = time.perf_counter()
+    network = get_raptor_network(feed, 'Weekday')
+    print(f"Compiled {len(network)} patterns in {time.perf_counter() - start:.2f}s\n")
+
+    # Van Cortlandt Park-242 St to Flatbush Av-Brooklyn College, 8 AM
+    start = time.perf_counter()
+    journey = plan_journey(feed, '101', '247', '08:00:00')
+    print(f"Query took {1000 * (time.perf_counter() - start):.1f} ms")
+    print_journey(feed, journey)
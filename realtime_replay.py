@@ -0,0 +1,568 @@
+#!/usr/bin/env python3
+"""
+Replay archived GTFS-realtime snapshots and measure actual headways.
+
+Everything else in this project reads the schedule. This module reads
+TripUpdate / VehiclePosition snapshots saved to disk (e.g., one file every
+30 seconds from the MTA's realtime feeds) and turns them into observed
+train arrivals, then actual headways per platform stop and route.
+
+Snapshots are processed one at a time in timestamp order:
+
+1. Each TripUpdate's stop_time_updates give the latest predicted arrival of
+   the trip at each upcoming stop. A (trip, stop) pair becomes an observed
+   arrival when the snapshot time reaches the prediction, or when the stop
+   drops out of the trip's updates (the train has passed it) with a
+   prediction no more than grace_s in the future. A trip missing from a
+   snapshot (finished, cancelled or removed from the feed) is dropped the
+   same way: predictions no more than grace_s in the future count, the
+   rest are discarded.
+2. A VehiclePosition with current_status STOPPED_AT records the arrival at
+   that stop at the vehicle's timestamp.
+3. Each (trip, stop) is emitted once; later snapshots repeating it are
+   ignored. The emitted stops of trips not seen for stale_s are forgotten,
+   so memory holds only the trips currently running.
+4. Each arrival updates the headway statistics of its (stop, route): running
+   totals for the whole replay and by hour, plus a rolling window of the
+   last window_s seconds of arrivals. An arrival no later than the previous
+   one at its (stop, route) (e.g., a late VehiclePosition) gives no headway
+   and is counted as out of order.
+
+Reading protobuf needs the optional gtfs-realtime-bindings package
+(pip install gtfs-realtime-bindings). Files may be gzip-compressed (.gz).
+Hours are local New York time.
+"""
+import glob
+import gzip
+import math
+import os
+import re
+from collections import deque
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import gtfs_kit as gk
+import numpy as np
+import pandas as pd
+
+from feed_index import get_stop_times_table, get_trip_table, trip_mask
+from service_calendar import resolve_service_ids
+
+try:
+    from google.transit import gtfs_realtime_pb2
+except ImportError:
+    gtfs_realtime_pb2 = None
+
+
+TIMEZONE = ZoneInfo('America/New_York')
+
+# VehiclePosition.VehicleStopStatus.STOPPED_AT
+STOPPED_AT = 1
+
+# Snapshot file name timestamps: 20241115T083000, 20241115_083000, or epoch seconds
+_NAME_DATETIME = re.compile(r'(\d{8})[T_-]?(\d{6})')
+_NAME_EPOCH = re.compile(r'(?<!\d)(1\d{9})(?!\d)')
+
+
+def snapshot_file_time(path):
+    """
+    Timestamp of a snapshot file, for ordering.
+
+    Uses a date and time (YYYYMMDD[T_-]HHMMSS, local time) or epoch seconds
+    in the file name, falling back to the file's modification time.
+
+    Returns:
+    --------
+    float
+        POSIX timestamp
+    """
+    name = os.path.basename(path)
+    match = _NAME_DATETIME.search(name)
+    if match:
+        local = datetime.strptime(match.group(1) + match.group(2), '%Y%m%d%H%M%S')
+        return local.replace(tzinfo=TIMEZONE).timestamp()
+    match = _NAME_EPOCH.search(name)
+    if match:
+        return float(match.group(1))
+    return os.path.getmtime(path)
+
+
+def list_snapshot_files(paths):
+    """
+    Snapshot files sorted by timestamp.
+
+    Parameters:
+    -----------
+    paths : str or list of str
+        Files, directories (every file inside) or glob patterns
+
+    Returns:
+    --------
+    list of str
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in os.listdir(path)
+                         if os.path.isfile(os.path.join(path, name)))
+        else:
+            files.extend(glob.glob(path))
+    return sorted(set(files), key=lambda f: (snapshot_file_time(f), f))
+
+
+def read_snapshot(path):
+    """
+    Parse one GTFS-realtime snapshot file.
+
+    Parameters:
+    -----------
+    path : str
+        Protobuf FeedMessage, optionally gzip-compressed (.gz)
+
+    Returns:
+    --------
+    gtfs_realtime_pb2.FeedMessage
+
+    Raises:
+    -------
+    ImportError
+        If gtfs-realtime-bindings is not installed
+    """
+    if gtfs_realtime_pb2 is None:
+        raise ImportError("Reading GTFS-realtime needs gtfs-realtime-bindings "
+                          "(pip install gtfs-realtime-bindings)")
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as f:
+        message = gtfs_realtime_pb2.FeedMessage()
+        message.ParseFromString(f.read())
+    return message
+
+
+class _HeadwayStats:
+    """Headway accumulators of one (stop, route): totals, hourly totals and a rolling window."""
+
+    __slots__ = ('last_arrival', 'count', 'total', 'total_sq', 'max', 'hourly', 'window', 'window_total',
+                 'out_of_order')
+
+    def __init__(self):
+        self.last_arrival = None
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.max = 0.0
+        self.hourly = {}
+        self.window = deque()
+        self.window_total = 0.0
+        self.out_of_order = 0
+
+    def add(self, arrival_s, hour, window_s):
+        """Record an arrival. Returns the headway in seconds, or None."""
+        last = self.last_arrival
+        if last is not None and arrival_s <= last:
+            # Out of order (e.g., a late VehiclePosition); not a headway
+            self.out_of_order += 1
+            return None
+        self.last_arrival = arrival_s
+        if last is None:
+            return None
+
+        headway = float(arrival_s - last)
+        self.count += 1
+        self.total += headway
+        self.total_sq += headway * headway
+        self.max = max(self.max, headway)
+
+        hourly = self.hourly.get(hour)
+        if hourly is None:
+            self.hourly[hour] = [1, headway, headway * headway, headway]
+        else:
+            hourly[0] += 1
+            hourly[1] += headway
+            hourly[2] += headway * headway
+            hourly[3] = max(hourly[3], headway)
+
+        self.window.append((arrival_s, headway))
+        self.window_total += headway
+        while self.window and self.window[0][0] <= arrival_s - window_s:
+            self.window_total -= self.window.popleft()[1]
+        return headway
+
+
+def _std(count, total, total_sq):
+    """Population standard deviation from running sums."""
+    if count == 0:
+        return np.nan
+    mean = total / count
+    return math.sqrt(max(total_sq / count - mean * mean, 0.0))
+
+
+class RealtimeReplay:
+    """
+    Streaming arrival and headway tracker fed one snapshot at a time.
+
+    Parameters:
+    -----------
+    route_ids : list of str, optional
+        Only track these routes
+    stop_ids : list of str, optional
+        Only track these platform stop IDs (e.g., '127S')
+    window_s : int, default=3600
+        Length of the rolling headway window
+    grace_s : int, default=60
+        How far in the future a prediction may be when its stop drops out of
+        the trip's updates and still count as an arrival
+    stale_s : int, default=600
+        Forget the emitted stops of trips not seen in any snapshot for this
+        long (a trip that reappears later could otherwise repeat arrivals)
+    keep_arrivals : bool, default=False
+        Keep every observed arrival in memory (see arrivals()). Off by
+        default so that memory stays bounded.
+
+    Attributes:
+    -----------
+    snapshots : int
+        Snapshots processed
+    observations : int
+        Arrivals emitted
+    duplicates : int
+        Repeated (trip, stop) arrivals ignored
+    out_of_order : int
+        Arrivals no later than the previous one at their (stop, route),
+        which give no headway
+    """
+
+    def __init__(self, route_ids=None, stop_ids=None, window_s=3600, grace_s=60, stale_s=600,
+                 keep_arrivals=False):
+        self.route_ids = None if route_ids is None else set(route_ids)
+        self.stop_ids = None if stop_ids is None else set(stop_ids)
+        self.window_s = window_s
+        self.grace_s = grace_s
+        self.stale_s = stale_s
+        self.keep_arrivals = keep_arrivals
+
+        self.snapshots = 0
+        self.observations = 0
+        self.duplicates = 0
+        self.out_of_order = 0
+        self.last_snapshot_s = None
+
+        # trip_id -> [route_id, {stop_id: predicted arrival}] of trips in the last snapshot
+        self._pending = {}
+        # trip_id -> [set of stop_ids already emitted, last seen]
+        self._emitted = {}
+        # (stop_id, route_id) -> _HeadwayStats
+        self._stats = {}
+        self._arrivals = []
+
+    def _emit(self, trip_id, route_id, stop_id, arrival_s, utc_offset_s):
+        """Record one arrival unless (trip, stop) was already emitted."""
+        emitted = self._emitted.get(trip_id)
+        if emitted is None:
+            emitted = self._emitted[trip_id] = [set(), self.last_snapshot_s]
+        if stop_id in emitted[0]:
+            self.duplicates += 1
+            return
+        emitted[0].add(stop_id)
+        self.observations += 1
+
+        stats = self._stats.get((stop_id, route_id))
+        if stats is None:
+            stats = self._stats[(stop_id, route_id)] = _HeadwayStats()
+        hour = int((arrival_s + utc_offset_s) // 3600) % 24
+        out_of_order = stats.out_of_order
+        headway = stats.add(arrival_s, hour, self.window_s)
+        self.out_of_order += stats.out_of_order - out_of_order
+        if self.keep_arrivals:
+            self._arrivals.append((trip_id, route_id, stop_id, arrival_s, headway))
+
+    def _wanted(self, route_id, stop_id):
+        return ((self.route_ids is None or route_id in self.route_ids) and
+                (self.stop_ids is None or stop_id in self.stop_ids))
+
+    def process(self, message, snapshot_s=None):
+        """
+        Update the tracker with one decoded snapshot.
+
+        Parameters:
+        -----------
+        message : gtfs_realtime_pb2.FeedMessage
+            Decoded snapshot (see read_snapshot())
+        snapshot_s : int, optional
+            Snapshot time. Defaults to the feed header timestamp.
+        """
+        now = int(snapshot_s if snapshot_s is not None else message.header.timestamp)
+        self.last_snapshot_s = now
+        self.snapshots += 1
+        offset = int(datetime.fromtimestamp(now, TIMEZONE).utcoffset().total_seconds())
+        pending = self._pending
+        seen = set()
+
+        for entity in message.entity:
+            if entity.HasField('trip_update'):
+                update = entity.trip_update
+                trip_id = update.trip.trip_id
+                route_id = update.trip.route_id
+                if self.route_ids is not None and route_id not in self.route_ids:
+                    continue
+                seen.add(trip_id)
+
+                predictions = {}
+                for stop_update in update.stop_time_update:
+                    event = stop_update.arrival if stop_update.HasField('arrival') else stop_update.departure
+                    if event.time:
+                        predictions[stop_update.stop_id] = event.time
+
+                entry = pending.get(trip_id)
+                if entry is not None:
+                    # Stops the train has passed since the last snapshot
+                    for stop_id, predicted in entry[1].items():
+                        if stop_id not in predictions and predicted <= now + self.grace_s:
+                            if self._wanted(route_id, stop_id):
+                                self._emit(trip_id, route_id, stop_id, predicted, offset)
+
+                remaining = {}
+                for stop_id, predicted in predictions.items():
+                    if predicted <= now:
+                        if self._wanted(route_id, stop_id):
+                            self._emit(trip_id, route_id, stop_id, predicted, offset)
+                    else:
+                        remaining[stop_id] = predicted
+                pending[trip_id] = [route_id, remaining]
+
+            if entity.HasField('vehicle'):
+                vehicle = entity.vehicle
+                if vehicle.current_status != STOPPED_AT or not vehicle.stop_id:
+                    continue
+                trip_id = vehicle.trip.trip_id
+                route_id = vehicle.trip.route_id
+                if self._wanted(route_id, vehicle.stop_id):
+                    self._emit(trip_id, route_id, vehicle.stop_id, int(vehicle.timestamp or now), offset)
+                    entry = pending.get(trip_id)
+                    if entry is not None:
+                        entry[1].pop(vehicle.stop_id, None)
+
+        # Trips missing from this snapshot: stops due within grace_s count,
+        # the rest (a cancelled or removed trip's) are dropped with the trip
+        for trip_id in [t for t in pending if t not in seen]:
+            route_id, predictions = pending.pop(trip_id)
+            for stop_id, predicted in predictions.items():
+                if predicted <= now + self.grace_s and self._wanted(route_id, stop_id):
+                    self._emit(trip_id, route_id, stop_id, predicted, offset)
+
+        for trip_id in seen:
+            if trip_id in self._emitted:
+                self._emitted[trip_id][1] = now
+        for trip_id in [t for t, (_, last_seen) in self._emitted.items()
+                        if t not in pending and now - last_seen > self.stale_s]:
+            del self._emitted[trip_id]
+
+    def process_file(self, path):
+        """Read and process one snapshot file."""
+        self.process(read_snapshot(path))
+
+    def replay(self, paths, verbose=True):
+        """
+        Process snapshot files in timestamp order.
+
+        Parameters:
+        -----------
+        paths : str or list of str
+            Files, directories or glob patterns (see list_snapshot_files())
+        verbose : bool, default=True
+            Print progress every 500 files
+
+        Returns:
+        --------
+        RealtimeReplay
+            self, for chaining
+        """
+        files = list_snapshot_files(paths)
+        for i, path in enumerate(files, 1):
+            self.process_file(path)
+            if verbose and i % 500 == 0:
+                print(f"{i}/{len(files)} snapshots, {self.observations} arrivals")
+        if verbose:
+            print(f"Replayed {len(files)} snapshots: {self.observations} arrivals, "
+                  f"{self.duplicates} duplicates ignored, {self.out_of_order} out of order")
+        return self
+
+    def headway_stats(self):
+        """
+        Actual headway statistics per platform stop and route.
+
+        Returns:
+        --------
+        pd.DataFrame
+            Columns stop_id, route_id, headways (count), mean_headway,
+            std_headway, max_headway, rolling_headways, rolling_mean_headway
+            (over the last window_s of arrivals), out_of_order (arrivals
+            that gave no headway because they were no later than the
+            previous one) and last_arrival (POSIX seconds). Headways are in
+            minutes.
+        """
+        rows = []
+        for (stop_id, route_id), stats in self._stats.items():
+            rows.append({
+                'stop_id': stop_id,
+                'route_id': route_id,
+                'headways': stats.count,
+                'mean_headway': stats.total / stats.count / 60.0 if stats.count else np.nan,
+                'std_headway': _std(stats.count, stats.total, stats.total_sq) / 60.0,
+                'max_headway': stats.max / 60.0 if stats.count else np.nan,
+                'rolling_headways': len(stats.window),
+                'rolling_mean_headway': stats.window_total / len(stats.window) / 60.0 if stats.window else np.nan,
+                'out_of_order': stats.out_of_order,
+                'last_arrival': stats.last_arrival,
+            })
+        columns = ['stop_id', 'route_id', 'headways', 'mean_headway', 'std_headway', 'max_headway',
+                   'rolling_headways', 'rolling_mean_headway', 'out_of_order', 'last_arrival']
+        return pd.DataFrame(rows, columns=columns).sort_values(['stop_id', 'route_id']).reset_index(drop=True)
+
+    def hourly_headway_stats(self):
+        """
+        Actual headway statistics per platform stop, route and hour.
+
+        Returns:
+        --------
+        pd.DataFrame
+            Columns stop_id, route_id, hour (0-23, local time of the later
+            arrival), headways, mean_headway, std_headway and max_headway
+            (minutes)
+        """
+        rows = []
+        for (stop_id, route_id), stats in self._stats.items():
+            for hour, (count, total, total_sq, longest) in stats.hourly.items():
+                rows.append((stop_id, route_id, hour, count, total / count / 60.0,
+                             _std(count, total, total_sq) / 60.0, longest / 60.0))
+        columns = ['stop_id', 'route_id', 'hour', 'headways', 'mean_headway', 'std_headway', 'max_headway']
+        return pd.DataFrame(rows, columns=columns).sort_values(['stop_id', 'route_id', 'hour']).reset_index(drop=True)
+
+    def arrivals(self):
+        """
+        Every observed arrival (needs keep_arrivals=True).
+
+        Returns:
+        --------
+        pd.DataFrame
+            Columns trip_id, route_id, stop_id, arrival_s (POSIX seconds) and
+            headway_s (None for the first arrival or an out-of-order one)
+        """
+        if not self.keep_arrivals:
+            raise ValueError("RealtimeReplay was created with keep_arrivals=False")
+        return pd.DataFrame(self._arrivals, columns=['trip_id', 'route_id', 'stop_id', 'arrival_s', 'headway_s'])
+
+
+def scheduled_hourly_headways(feed, service_id='Weekday', date=None, stop_ids=None, route_ids=None):
+    """
+    Scheduled headway statistics per platform stop, route and hour.
+
+    Same layout as RealtimeReplay.hourly_headway_stats(), from the static
+    schedule, for comparing actual and scheduled service.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date (e.g., the day the snapshots were recorded). If given,
+        overrides service_id.
+    stop_ids : list of str, optional
+        Platform stop IDs to include
+    route_ids : list of str, optional
+        Routes to include
+
+    Returns:
+    --------
+    pd.DataFrame
+        Columns stop_id, route_id, hour, headways, mean_headway, std_headway
+        and max_headway (minutes)
+    """
+    trips = get_trip_table(feed)
+    stop_times = get_stop_times_table(feed)
+    mask = trip_mask(feed, service_id=resolve_service_ids(feed, service_id, date))
+    trip_idx = stop_times['trip_idx'].to_numpy()
+    keep = (trip_idx >= 0) & mask[np.maximum(trip_idx, 0)]
+    if stop_ids is not None:
+        keep &= stop_times['stop_id'].isin(list(stop_ids)).to_numpy()
+
+    rows = np.flatnonzero(keep)
+    events = pd.DataFrame({
+        'stop_id': stop_times['stop_id'].to_numpy()[rows],
+        'route_id': trips['route_id'].to_numpy()[trip_idx[rows]],
+        'arrival_s': stop_times['arrival_s'].to_numpy()[rows],
+    })
+    if route_ids is not None:
+        events = events[events['route_id'].isin(list(route_ids))]
+
+    events = events.sort_values(['stop_id', 'route_id', 'arrival_s'], kind='stable')
+    same = (events['stop_id'].eq(events['stop_id'].shift()) & events['route_id'].eq(events['route_id'].shift()))
+    events['headway'] = events['arrival_s'].diff().where(same) / 60.0
+    events = events[events['headway'].notna() & (events['headway'] > 0)]
+    events['hour'] = (events['arrival_s'] // 3600).astype(np.int64) % 24
+
+    summary = events.groupby(['stop_id', 'route_id', 'hour'])['headway'].agg(
+        headways='count', mean_headway='mean', std_headway=lambda h: h.std(ddof=0), max_headway='max'
+    )
+    return summary.reset_index()
+
+
+def compare_with_schedule(feed, replay, service_id='Weekday', date=None):
+    """
+    Join actual hourly headways from a replay with the scheduled ones.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    replay : RealtimeReplay
+        A replay after processing snapshots
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Day the snapshots were recorded. If given, overrides service_id.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per stop_id, route_id and hour observed in the replay, with
+        actual_headways, actual_mean, scheduled_headways, scheduled_mean and
+        excess_wait (actual minus scheduled mean headway, minutes)
+    """
+    actual = replay.hourly_headway_stats()
+    scheduled = scheduled_hourly_headways(feed, service_id, date, stop_ids=actual['stop_id'].unique(),
+                                          route_ids=actual['route_id'].unique())
+    keys = ['stop_id', 'route_id', 'hour']
+    merged = actual[keys + ['headways', 'mean_headway']].rename(
+        columns={'headways': 'actual_headways', 'mean_headway': 'actual_mean'}
+    ).merge(
+        scheduled[keys + ['headways', 'mean_headway']].rename(
+            columns={'headways': 'scheduled_headways', 'mean_headway': 'scheduled_mean'}),
+        on=keys, how='left'
+    )
+    merged['excess_wait'] = merged['actual_mean'] - merged['scheduled_mean']
+    return merged
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(__doc__)
+
+    if len(sys.argv) < 2:
+        print("Usage: python realtime_replay.py SNAPSHOT_DIR [YYYYMMDD]")
+        sys.exit(1)
+
+    replay = RealtimeReplay().replay(sys.argv[1])
+    stats = replay.headway_stats()
+    stats.to_csv('realtime_headways.csv', index=False)
+    print(stats.head(20).to_string(index=False))
+
+    if len(sys.argv) > 2:
+        feed = gk.read_feed("gtfs_subway.zip", dist_units="m")
+        comparison = compare_with_schedule(feed, replay, date=sys.argv[2])
+        comparison.to_csv(f'realtime_vs_schedule_{sys.argv[2]}.csv', index=False)
+        print(f"Exported to: realtime_vs_schedule_{sys.argv[2]}.csv")
@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+Incremental rebuild of the derived data files.
+
+express_window_data.json, terminal_reference.csv, stop_boroughs.csv and the
+travel time CSVs are all derived from the feed. Regenerating every one of
+them after each feed update is slow, although a typical update only touches
+a few routes.
+
+The feed is split into input partitions, each with a content hash:
+- trips/<route_id>/<direction_id>/<service_id>: stop sequences and times of
+  the route's trips (feed_index.get_trip_content_hashes(), so renamed trip
+  IDs do not count as a change)
+- stops, routes: the stops.txt and routes.txt columns the artifacts use
+- file/<path>: other files read while building (e.g. direction_names.csv)
+
+Each artifact is made of units (one route's rows of terminal_reference.csv,
+one route's entry in express_window_data.json, one whole travel time CSV)
+and each unit lists the partitions it reads. A JSON manifest records, per
+unit, the hashes of its inputs when it was last built (and, for files
+assembled from several units, the unit's result). A rebuild recomputes only
+units whose input hashes changed, and rewrites only files with a
+recomputed, added or dropped unit.
+
+Inputs are listed as partition keys or prefixes: 'trips/A' means every
+partition of the A, 'trips/A/0/Weekday' just one.
+"""
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+import gtfs_kit as gk
+import numpy as np
+import pandas as pd
+
+import compare_lines as cl
+import express_local as el
+import travel_times as tt
+from express_windows import ALL_ROUTES, get_route_windows, write_json_atomic
+from feed_archive import PARTITION_GROUPS, file_sha256
+from feed_index import get_trip_content_hashes, get_trip_table
+from generate_terminal_reference import get_terminal_for_direction
+
+
+FORMAT_VERSION = 1
+
+DEFAULT_MANIFEST = 'build_manifest.json'
+
+# Hour windows of the default travel time CSVs (None = all hours)
+DEFAULT_HOUR_RANGES = [None, (7, 9), (17, 19)]
+
+_STOP_COLUMNS = ['stop_id', 'stop_name', 'stop_lat', 'stop_lon', 'parent_station']
+
+
+def _frame_sha256(df):
+    """Hex SHA-256 of a DataFrame's row hashes."""
+    digest = hashlib.sha256()
+    digest.update(','.join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def input_hashes(feed):
+    """
+    Content hash of every input partition of a feed.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+
+    Returns:
+    --------
+    dict
+        Dictionary mapping partition key -> hex SHA-256, with keys
+        'trips/<route_id>/<direction_id>/<service_id>', 'stops' and 'routes'
+    """
+    trips = get_trip_table(feed)
+    records = pd.DataFrame({
+        'route_id': trips['route_id'].astype(str).to_numpy(),
+        'direction_id': trips['direction_id'].astype(str).to_numpy(),
+        'service_id': trips['service_id'].astype(str).to_numpy(),
+        'trip_hash': get_trip_content_hashes(feed),
+    }).sort_values(['route_id', 'direction_id', 'service_id', 'trip_hash'], kind='stable')
+
+    keys = records[['route_id', 'direction_id', 'service_id']].to_numpy()
+    trip_hashes = records['trip_hash'].to_numpy()
+    if len(records):
+        starts = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]).any(axis=1)])
+    else:
+        starts = np.array([], dtype=np.int64)
+    ends = np.append(starts[1:], len(records))
+
+    hashes = {}
+    for start, end in zip(starts, ends):
+        route_id, direction_id, service_id = keys[start]
+        digest = hashlib.sha256(trip_hashes[start:end].tobytes())
+        hashes[f'trips/{route_id}/{direction_id}/{service_id}'] = digest.hexdigest()
+
+    stop_columns = [c for c in _STOP_COLUMNS if c in feed.stops.columns]
+    hashes['stops'] = _frame_sha256(feed.stops[stop_columns].astype(str).sort_values('stop_id'))
+    route_columns = [c for c in ['route_id', 'route_short_name', 'route_long_name'] if c in feed.routes.columns]
+    hashes['routes'] = _frame_sha256(feed.routes[route_columns].astype(str).sort_values('route_id'))
+    return hashes
+
+
+def _route_inputs(route_id):
+    """Trip partitions of a route plus any routes grouped with it."""
+    for group in PARTITION_GROUPS:
+        if route_id in group:
+            return [f'trips/{r}' for r in group]
+    return [f'trips/{route_id}']
+
+
+class Artifact:
+    """
+    A derived file built from independently recomputable units.
+
+    Parameters:
+    -----------
+    path : str
+        Output file
+    units : dict
+        Unit key -> list of input partition keys or prefixes it reads
+    build : callable
+        build(feed, unit_key) -> the unit's result
+    write : callable
+        write(path, results) with results a dict of unit key -> result, in
+        units order
+    keep_results : bool, default=True
+        Store unit results in the manifest (they must be JSON-serializable),
+        so unchanged units are reused when the file is reassembled. If
+        False, any stale unit rebuilds every unit.
+    """
+
+    def __init__(self, path, units, build, write, keep_results=True):
+        self.path = path
+        self.units = units
+        self.build = build
+        self.write = write
+        self.keep_results = keep_results
+
+
+def _write_dataframe(path, results):
+    """Write a single-unit artifact's DataFrame to CSV (keeping the index)."""
+    results[''].to_csv(path)
+
+
+def stop_boroughs_artifact(path='stop_boroughs.csv'):
+    """stop_boroughs.csv: express_local.create_stop_borough_mapping()."""
+    return Artifact(
+        path, {'': ['stops']},
+        lambda feed, _: el.create_stop_borough_mapping(feed),
+        lambda out, results: results[''].to_csv(out, index=False),
+        keep_results=False,
+    )
+
+
+def terminal_reference_artifact(feed, service_id='Weekday', path='terminal_reference.csv'):
+    """terminal_reference.csv, one unit per route (same rows as generate_terminal_reference())."""
+    route_names = feed.routes.set_index('route_id')['route_long_name'] \
+        if 'route_long_name' in feed.routes.columns else pd.Series(dtype=object)
+
+    def build(feed, route_id):
+        terminal_0 = get_terminal_for_direction(feed, route_id, 0, service_id)
+        terminal_1 = get_terminal_for_direction(feed, route_id, 1, service_id)
+        if not (terminal_0 or terminal_1):
+            return None
+        route_name = route_names.get(route_id, '')
+        return {
+            'route_id': route_id,
+            'route_name': '' if pd.isna(route_name) else route_name,
+            'direction_0_terminal': terminal_0 if terminal_0 else '',
+            'direction_1_terminal': terminal_1 if terminal_1 else '',
+        }
+
+    def write(out, results):
+        rows = [row for row in results.values() if row is not None]
+        pd.DataFrame(rows, columns=['route_id', 'route_name', 'direction_0_terminal',
+                                    'direction_1_terminal']).to_csv(out, index=False)
+
+    units = {route_id: [f'trips/{route_id}/0/{service_id}', f'trips/{route_id}/1/{service_id}', 'stops', 'routes']
+             for route_id in sorted(feed.routes['route_id'])}
+    return Artifact(path, units, build, write)
+
+
+def express_windows_artifact(feed, service_id='Weekday', path=None, direction_names_csv='direction_names.csv'):
+    """
+    express_window_data.json (generate_express_windows() layout), one unit per route.
+
+    A route's windows read all of its trips (reference patterns use every
+    service) and, for the J/Z, the other route's.
+    """
+    if path is None:
+        path = 'express_window_data.json' if service_id == 'Weekday' else f'express_window_data_{service_id}.json'
+    feed_routes = set(get_trip_table(feed)['route_id'])
+    units = {route_id: _route_inputs(route_id) + ['stops', f'file/{direction_names_csv}']
+             for route_id in ALL_ROUTES if route_id in feed_routes}
+
+    def write(out, results):
+        write_json_atomic({route_id: data for route_id, data in results.items() if data}, out)
+
+    return Artifact(path, units, lambda feed, route_id: get_route_windows(feed, route_id, service_id), write)
+
+
+def _hour_suffix(hour_range):
+    """Filename suffix used by compare_lines.export_comparison()."""
+    if hour_range is None:
+        return ''
+    if isinstance(hour_range, (tuple, list)):
+        return f'_hours_{hour_range[0]}-{hour_range[1]}'
+    return f'_hour_{hour_range}'
+
+
+def route_travel_time_artifact(route_id, service_id='Weekday', hour_range=None, output_dir='.'):
+    """
+    <route>_<service>[_hours_<a>-<b>]_travel_times.csv: the bidirectional matrix
+    of travel_times.display_bidirectional_matrix() over get_station_order() in
+    direction 1.
+    """
+    path = os.path.normpath(os.path.join(output_dir, f'{route_id}_{service_id}{_hour_suffix(hour_range)}_travel_times.csv'))
+
+    def build(feed, _):
+        station_order = tt.get_station_order(feed, route_id, 1, service_id)
+        return tt.display_bidirectional_matrix(feed, route_id, service_id, station_order, hour=hour_range)
+
+    inputs = [f'trips/{route_id}/0/{service_id}', f'trips/{route_id}/1/{service_id}', 'stops']
+    return Artifact(path, {'': inputs}, build, _write_dataframe, keep_results=False)
+
+
+def comparison_artifact(local_route, express_route, service_id='Weekday', hour_range=None, direction_id=1,
+                        output_dir='.'):
+    """
+    <local>_vs_<express>_difference_<service>[...].csv as written by
+    compare_lines.export_comparison().
+
+    The shared express stops classify the express route's trips against
+    reference patterns taken from all of its services, so the whole express
+    route is an input.
+    """
+    path = os.path.normpath(os.path.join(output_dir, f'{local_route}_vs_{express_route}_difference_{service_id}'
+                                                     f'{_hour_suffix(hour_range)}.csv'))
+
+    def build(feed, _):
+        return cl.calculate_travel_time_difference(feed, local_route, express_route, direction_id, service_id,
+                                                   hour_range=hour_range)
+
+    inputs = [f'trips/{local_route}/0/{service_id}', f'trips/{local_route}/1/{service_id}', 'stops'] + \
+        _route_inputs(express_route)
+    return Artifact(path, {'': inputs}, build, _write_dataframe, keep_results=False)
+
+
+def default_artifacts(feed, service_ids=('Weekday',), pairs=None, hour_ranges=None, output_dir='.'):
+    """
+    The project's standard derived files.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_ids : tuple of str, default=('Weekday',)
+        Services to build express windows, terminal references and travel
+        time CSVs for (non-Weekday files get the service in their name)
+    pairs : list of (str, str), optional
+        Local/express comparisons (default: compare_lines.CORRIDOR_PAIRS)
+    hour_ranges : list, optional
+        Hour windows of the travel time CSVs (default: DEFAULT_HOUR_RANGES)
+    output_dir : str, default='.'
+        Directory of the travel time CSVs
+
+    Returns:
+    --------
+    list of Artifact
+    """
+    pairs = cl.CORRIDOR_PAIRS if pairs is None else pairs
+    hour_ranges = DEFAULT_HOUR_RANGES if hour_ranges is None else hour_ranges
+    feed_routes = set(get_trip_table(feed)['route_id'])
+
+    artifacts = [stop_boroughs_artifact()]
+    for service_id in service_ids:
+        suffix = '' if service_id == 'Weekday' else f'_{service_id}'
+        artifacts.append(terminal_reference_artifact(feed, service_id, f'terminal_reference{suffix}.csv'))
+        artifacts.append(express_windows_artifact(feed, service_id))
+        for hour_range in hour_ranges:
+            artifacts.extend(route_travel_time_artifact(route_id, service_id, hour_range, output_dir)
+                             for route_id in sorted(feed_routes))
+            artifacts.extend(comparison_artifact(local_route, express_route, service_id, hour_range,
+                                                 output_dir=output_dir)
+                             for local_route, express_route in pairs
+                             if local_route in feed_routes and express_route in feed_routes)
+    return artifacts
+
+
+def _resolve_inputs(patterns, hashes, file_hashes):
+    """{partition key: hash} of the partitions a unit reads."""
+    resolved = {}
+    for pattern in patterns:
+        if pattern.startswith('file/'):
+            path = pattern[len('file/'):]
+            if path not in file_hashes:
+                file_hashes[path] = file_sha256(path) if os.path.exists(path) else None
+            resolved[pattern] = file_hashes[path]
+        elif pattern in hashes:
+            resolved[pattern] = hashes[pattern]
+        else:
+            prefix = pattern + '/'
+            resolved.update((key, value) for key, value in hashes.items() if key.startswith(prefix))
+    return dict(sorted(resolved.items()))
+
+
+def load_manifest(manifest_path=DEFAULT_MANIFEST):
+    """
+    Load a build manifest (an empty one if the file does not exist).
+
+    Returns:
+    --------
+    dict
+        format_version, built_at, feed_sha256, inputs (partition key ->
+        hash) and artifacts: path -> {'units': unit key -> {'inputs',
+        'result'}}
+    """
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') == FORMAT_VERSION:
+            return manifest
+    return {'format_version': FORMAT_VERSION, 'built_at': None, 'feed_sha256': None, 'inputs': {}, 'artifacts': {}}
+
+
+def stale_units(artifact, manifest, hashes, file_hashes=None):
+    """
+    Units of an artifact that must be rebuilt.
+
+    Parameters:
+    -----------
+    artifact : Artifact
+    manifest : dict
+        Output of load_manifest()
+    hashes : dict
+        Output of input_hashes() for the current feed
+    file_hashes : dict, optional
+        Cache of file path -> hash shared across calls
+
+    Returns:
+    --------
+    tuple
+        (stale unit keys, dict of unit key -> current input hashes)
+    """
+    file_hashes = {} if file_hashes is None else file_hashes
+    recorded = manifest['artifacts'].get(artifact.path, {}).get('units', {})
+    current = {unit: _resolve_inputs(patterns, hashes, file_hashes) for unit, patterns in artifact.units.items()}
+
+    if not os.path.exists(artifact.path):
+        return list(artifact.units), current
+    stale = [unit for unit in artifact.units
+             if unit not in recorded or recorded[unit]['inputs'] != current[unit]
+             or (artifact.keep_results and 'result' not in recorded[unit])]
+    if stale and not artifact.keep_results:
+        stale = list(artifact.units)
+    return stale, current
+
+
+def rebuild(feed, artifacts=None, manifest_path=DEFAULT_MANIFEST, feed_path=None, force=False, dry_run=False,
+            verbose=True):
+    """
+    Rebuild the artifacts whose inputs changed since the last build.
+
+    The manifest is saved after every artifact, so an interrupted rebuild
+    resumes where it stopped.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    artifacts : list of Artifact, optional
+        Artifacts to keep up to date (default: default_artifacts(feed))
+    manifest_path : str, default=DEFAULT_MANIFEST
+        Build manifest to read and update
+    feed_path : str, optional
+        Feed zip, recorded in the manifest by its SHA-256
+    force : bool, default=False
+        Rebuild every unit
+    dry_run : bool, default=False
+        Only report what would be rebuilt
+
+    Returns:
+    --------
+    dict
+        Dictionary mapping artifact path -> {'rebuilt': number of units
+        rebuilt, 'reused': number reused, 'written': whether the file was
+        written, 'seconds': build time}
+
+    Examples:
+    ---------
+    >>> feed = gk.read_feed("gtfs_subway.zip", dist_units="m")
+    >>> summary = rebuild(feed, feed_path="gtfs_subway.zip")
+    >>> [path for path, entry in summary.items() if entry['written']]
+    """
+    start = time.perf_counter()
+    if artifacts is None:
+        artifacts = default_artifacts(feed)
+    manifest = load_manifest(manifest_path)
+    hashes = input_hashes(feed)
+    file_hashes = {}
+    if verbose:
+        changed = sorted(key for key, value in hashes.items() if manifest['inputs'].get(key) != value)
+        removed = sorted(set(manifest['inputs']) - set(hashes))
+        print(f"Hashed {len(hashes)} input partitions in {time.perf_counter() - start:.1f}s "
+              f"({len(changed)} changed, {len(removed)} removed)")
+
+    summary = {}
+    for artifact in artifacts:
+        stale, current = stale_units(artifact, manifest, hashes, file_hashes)
+        if force:
+            stale = list(artifact.units)
+        recorded = manifest['artifacts'].get(artifact.path, {}).get('units', {})
+        dropped = set(recorded) - set(artifact.units)
+        write = bool(stale or dropped)
+        summary[artifact.path] = {'rebuilt': len(stale), 'reused': len(artifact.units) - len(stale),
+                                  'written': write and not dry_run, 'seconds': 0.0}
+        if not write or dry_run:
+            continue
+
+        artifact_start = time.perf_counter()
+        fresh = {unit: artifact.build(feed, unit) for unit in stale}
+        results = {unit: fresh[unit] if unit in fresh else recorded[unit]['result'] for unit in artifact.units}
+        output_dir = os.path.dirname(os.path.abspath(artifact.path))
+        os.makedirs(output_dir, exist_ok=True)
+        artifact.write(artifact.path, results)
+
+        units = {}
+        for unit in artifact.units:
+            units[unit] = {'inputs': current[unit]}
+            if artifact.keep_results:
+                units[unit]['result'] = results[unit]
+        manifest['artifacts'][artifact.path] = {'built_at': datetime.now().isoformat(timespec='seconds'),
+                                                'units': units}
+        write_json_atomic(manifest, manifest_path)
+
+        elapsed = time.perf_counter() - artifact_start
+        summary[artifact.path]['seconds'] = round(elapsed, 3)
+        if verbose:
+            print(f"  {artifact.path}: rebuilt {len(stale)} of {len(artifact.units)} units in {elapsed:.1f}s")
+
+    if not dry_run:
+        manifest['built_at'] = datetime.now().isoformat(timespec='seconds')
+        manifest['inputs'] = hashes
+        if feed_path is not None:
+            manifest['feed_sha256'] = file_sha256(feed_path)
+        write_json_atomic(manifest, manifest_path)
+
+    if verbose:
+        written = sum(entry['written'] for entry in summary.values())
+        print(f"{'Would rebuild' if dry_run else 'Rebuilt'} "
+              f"{sum(1 for entry in summary.values() if entry['rebuilt'])} of {len(summary)} artifacts "
+              f"({written} files written) in {time.perf_counter() - start:.1f}s")
+    return summary
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(__doc__)
+
+    feed_path = sys.argv[1] if len(sys.argv) > 1 else "gtfs_subway.zip"
+    feed = gk.read_feed(feed_path, dist_units="m")
+    rebuild(feed, feed_path=feed_path, dry_run='--dry-run' in sys.argv)
@@ -0,0 +1,578 @@
+#!/usr/bin/env python3
+"""
+Reconcile observed train arrivals with the static schedule.
+
+Observed arrivals come from realtime_replay.RealtimeReplay.arrivals() or a
+CSV log (route_id, stop_id, arrival time and, optionally, the realtime
+trip_id). They can span any number of days; everything is done in whole
+DataFrame operations so a month of observations reconciles in one batch.
+
+Matching: scheduled arrivals are laid out on the calendar (each date's
+active services, GTFS times measured from noon minus 12 hours local time)
+for just the routes and stops observed. Observed trips are matched to the
+scheduled trip with the same realtime trip ID; anything else is joined to
+the nearest scheduled arrival of the same route, direction and stop with
+one pandas.merge_asof (a sorted join), and an observed trip takes the
+scheduled trip most of its arrivals were nearest to.
+
+Results use the shapes of the schedule-only tools:
+- reconcile_headway_dist() returns get_headway_dist()'s DataFrame
+  (print_headway_dist() works) with scheduled and excess wait columns added
+- reconcile_travel_times() returns travel time matrices like
+  calculate_travel_time_matrix() (print_travel_time_matrix() works)
+
+Excess wait time is the observed expected wait minus the scheduled one,
+where the expected wait of a rider arriving at random is sum(h^2) / 2 sum(h)
+over the headways h.
+"""
+import gtfs_kit as gk
+import numpy as np
+import pandas as pd
+
+from feed_index import get_station_lookup, get_stop_name_lookup, get_stop_times_table, get_trip_table, trip_mask
+from realtime_replay import TIMEZONE
+from service_calendar import get_service_calendar, parse_service_date
+from travel_times import accumulate_trip_pairs, get_direction_name, get_station_order, travel_time_matrix_from_cube
+
+
+# A realtime trip ID seen again after this long is a different run (IDs repeat daily)
+TRIP_RUN_GAP_S = 3 * 3600
+
+DEFAULT_TOLERANCE_MIN = 10
+
+
+def load_observations(source):
+    """
+    Normalize observed arrivals.
+
+    Parameters:
+    -----------
+    source : pd.DataFrame or str
+        DataFrame (e.g., RealtimeReplay.arrivals()) or path to a CSV log with
+        columns route_id, stop_id (platform, e.g. '127S') and either
+        arrival_s (POSIX seconds) or arrival_time (timestamp; naive times
+        are New York local time). An optional trip_id column holds the
+        realtime trip ID.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Columns obs_trip_id (None if not given), route_id, stop_id and
+        arrival_s (int64 POSIX seconds), sorted by arrival_s, with exact
+        duplicates removed
+    """
+    observations = pd.read_csv(source, dtype={'route_id': str, 'stop_id': str, 'trip_id': str}) \
+        if isinstance(source, str) else source
+
+    if 'arrival_s' in observations.columns:
+        arrival_s = pd.to_numeric(observations['arrival_s'], errors='coerce')
+    elif 'arrival_time' in observations.columns:
+        times = pd.to_datetime(observations['arrival_time'], errors='coerce')
+        if times.dt.tz is None:
+            times = times.dt.tz_localize(TIMEZONE, ambiguous='NaT', nonexistent='shift_forward')
+        arrival_s = (times - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+    else:
+        raise ValueError("Observations need an arrival_s or arrival_time column")
+
+    normalized = pd.DataFrame({
+        'obs_trip_id': observations['trip_id'].astype(object) if 'trip_id' in observations.columns else None,
+        'route_id': observations['route_id'].astype(str).to_numpy(),
+        'stop_id': observations['stop_id'].astype(str).to_numpy(),
+        'arrival_s': arrival_s.to_numpy(),
+    })
+    normalized = normalized[normalized['arrival_s'].notna()]
+    normalized['arrival_s'] = normalized['arrival_s'].astype(np.int64)
+    normalized = normalized.drop_duplicates(['obs_trip_id', 'route_id', 'stop_id', 'arrival_s'])
+    return normalized.sort_values('arrival_s', kind='stable').reset_index(drop=True)
+
+
+def _local_time(arrival_s):
+    """(local date, local hour) of POSIX seconds."""
+    local = pd.to_datetime(np.asarray(arrival_s, dtype=np.int64), unit='s', utc=True).tz_convert(TIMEZONE)
+    return local.date, local.hour.to_numpy()
+
+
+def _service_day_origin(date):
+    """POSIX seconds of a service date's GTFS time origin (noon minus 12 hours, local)."""
+    noon = pd.Timestamp(parse_service_date(date)).replace(hour=12).tz_localize(TIMEZONE)
+    return int(noon.timestamp()) - 12 * 3600
+
+
+def scheduled_arrivals(feed, dates, route_ids=None, stop_ids=None):
+    """
+    Scheduled arrivals laid out on the calendar.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    dates : list
+        Service dates (str or datetime.date); dates outside the feed's
+        service window are skipped
+    route_ids : list of str, optional
+        Routes to include
+    stop_ids : list of str, optional
+        Platform stop IDs to include
+
+    Returns:
+    --------
+    pd.DataFrame
+        Columns service_date, trip_id, route_id, direction_id, stop_id,
+        station_id and scheduled_s (POSIX seconds), sorted by scheduled_s
+    """
+    trips = get_trip_table(feed)
+    stop_times = get_stop_times_table(feed)
+    trip_idx = stop_times['trip_idx'].to_numpy()
+    base = (trip_idx >= 0)
+    if stop_ids is not None:
+        base &= stop_times['stop_id'].isin(list(stop_ids)).to_numpy()
+    if route_ids is not None:
+        base &= np.isin(trips['route_id'].to_numpy()[np.maximum(trip_idx, 0)], list(route_ids))
+
+    # Dates sharing a set of active services share one set of rows
+    calendar = get_service_calendar(feed)
+    by_services = {}
+    for date in sorted({parse_service_date(d) for d in dates}):
+        if not calendar.covers(date):
+            continue
+        by_services.setdefault(tuple(sorted(calendar.active_service_ids(date))), []).append(date)
+
+    frames = []
+    for service_ids, service_dates in by_services.items():
+        mask = trip_mask(feed, service_id=list(service_ids))
+        rows = np.flatnonzero(base & mask[np.maximum(trip_idx, 0)])
+        if len(rows) == 0:
+            continue
+        row_trips = trip_idx[rows]
+        template = pd.DataFrame({
+            'trip_id': trips['trip_id'].to_numpy()[row_trips],
+            'route_id': trips['route_id'].to_numpy()[row_trips],
+            'direction_id': trips['direction_id'].to_numpy()[row_trips].astype(np.int64),
+            'stop_id': stop_times['stop_id'].to_numpy()[rows],
+            'station_id': stop_times['station_id'].to_numpy()[rows],
+        })
+        arrival_s = stop_times['arrival_s'].to_numpy()[rows].astype(np.int64)
+        for date in service_dates:
+            frames.append(template.assign(service_date=date, scheduled_s=arrival_s + _service_day_origin(date)))
+
+    columns = ['service_date', 'trip_id', 'route_id', 'direction_id', 'stop_id', 'station_id', 'scheduled_s']
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns].sort_values('scheduled_s', kind='stable').reset_index(drop=True)
+
+
+def _stop_directions(feed):
+    """(route_id, stop_id) -> direction_id of the scheduled trips serving it."""
+    trips = get_trip_table(feed)
+    stop_times = get_stop_times_table(feed)
+    trip_idx = stop_times['trip_idx'].to_numpy()
+    valid = trip_idx >= 0
+    served = pd.DataFrame({
+        'route_id': trips['route_id'].to_numpy()[trip_idx[valid]],
+        'stop_id': stop_times['stop_id'].to_numpy()[valid],
+        'direction_id': trips['direction_id'].to_numpy()[trip_idx[valid]].astype(np.int64),
+    })
+    counts = served.groupby(['route_id', 'stop_id', 'direction_id']).size().rename('n').reset_index()
+    counts = counts.sort_values(['route_id', 'stop_id', 'n'], ascending=[True, True, False])
+    return counts.drop_duplicates(['route_id', 'stop_id'])[['route_id', 'stop_id', 'direction_id']]
+
+
+def realtime_trip_id(trip_ids):
+    """
+    Realtime form of static trip IDs.
+
+    NYCT static trip IDs carry a timetable prefix ('AFA24GEN-1093-Weekday-00_')
+    in front of the ID the realtime feed uses ('000650_1..S03R').
+
+    Parameters:
+    -----------
+    trip_ids : array-like of str
+        Static (or already realtime) trip IDs
+
+    Returns:
+    --------
+    np.ndarray
+        Realtime trip IDs (IDs without a prefix are returned unchanged)
+    """
+    trip_ids = pd.Series(np.asarray(trip_ids, dtype=object))
+    prefixed = trip_ids.str.contains('-', regex=False, na=False) & trip_ids.str.contains('_', regex=False, na=False)
+    return trip_ids.where(~prefixed, trip_ids.str.split('_', n=1).str[1]).to_numpy()
+
+
+def _trips_by_id(runs, schedule):
+    """
+    Scheduled trip of each observed run with the same realtime trip ID.
+
+    A run can only belong to its first local date's service day or the day
+    before; of those candidates the one with the smallest median absolute
+    delay wins.
+    """
+    run_starts = runs.groupby('obs_trip').agg(realtime_trip_id=('realtime_trip_id', 'first'),
+                                             arrival_s=('arrival_s', 'min')).reset_index()
+    start_dates, _ = _local_time(run_starts['arrival_s'])
+    start_dates = pd.Series(start_dates)
+    candidates = pd.concat([run_starts.assign(service_date=start_dates.to_numpy()),
+                            run_starts.assign(service_date=(start_dates - pd.Timedelta(days=1)).to_numpy())])
+
+    trips = schedule[['realtime_trip_id', 'service_date', 'trip_id']].drop_duplicates()
+    candidates = candidates[['obs_trip', 'realtime_trip_id', 'service_date']].merge(
+        trips, on=['realtime_trip_id', 'service_date'])
+    if candidates.empty:
+        return candidates[['obs_trip', 'trip_id', 'service_date']]
+
+    pairs = runs[['obs_trip', 'stop_id', 'arrival_s']].merge(candidates[['obs_trip', 'trip_id', 'service_date']],
+                                                             on='obs_trip')
+    pairs = pairs.merge(schedule[['trip_id', 'service_date', 'stop_id', 'scheduled_s']],
+                        on=['trip_id', 'service_date', 'stop_id'])
+    pairs['abs_delay'] = (pairs['arrival_s'] - pairs['scheduled_s']).abs()
+    scores = pairs.groupby(['obs_trip', 'trip_id', 'service_date'])['abs_delay'].median().rename('score')
+    scores = scores.reset_index().sort_values(['obs_trip', 'score'], kind='stable')
+    return scores.drop_duplicates('obs_trip')[['obs_trip', 'trip_id', 'service_date']]
+
+
+def _trips_by_vote(nearest):
+    """Scheduled trip most of each observed run's arrivals were nearest to."""
+    votes = nearest[(nearest['obs_trip'] >= 0) & nearest['nearest_trip'].notna()]
+    votes = votes.groupby(['obs_trip', 'nearest_trip', 'nearest_date']).size().rename('n').reset_index()
+    votes = votes.sort_values(['obs_trip', 'n'], ascending=[True, False], kind='stable').drop_duplicates('obs_trip')
+    return votes.rename(columns={'nearest_trip': 'trip_id', 'nearest_date': 'service_date'})[
+        ['obs_trip', 'trip_id', 'service_date']]
+
+
+def match_observations(feed, observations, tolerance_min=DEFAULT_TOLERANCE_MIN):
+    """
+    Match observed arrivals to scheduled trips.
+
+    Observations with a realtime trip ID are grouped into runs (one ID, no
+    gap over TRIP_RUN_GAP_S). A run takes the scheduled trip with the same
+    realtime trip ID (see realtime_trip_id()) on its service day; runs whose
+    ID is not in the schedule take the scheduled trip most of their arrivals
+    are nearest to. Observations without a trip ID are matched to the nearest
+    scheduled arrival of their route, direction and stop.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    observations : pd.DataFrame or str
+        Observed arrivals (see load_observations())
+    tolerance_min : float, default=DEFAULT_TOLERANCE_MIN
+        Nearest-arrival matching ignores scheduled arrivals farther away than
+        this
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per observation with columns obs_trip_id, route_id,
+        direction_id (-1 if the schedule never serves the stop), stop_id,
+        station_id, arrival_s, hour (local hour of arrival), obs_trip
+        (observed run number, -1 without a trip ID), trip_id and
+        service_date (matched scheduled trip, None if unmatched),
+        scheduled_s (that trip's scheduled arrival at the stop, NaN if it
+        does not stop there) and delay_min (observed minus scheduled)
+
+    Examples:
+    ---------
+    >>> matched = match_observations(feed, replay.arrivals())
+    >>> matched.groupby('hour')['delay_min'].median()
+    """
+    obs = load_observations(observations)
+    obs = obs.merge(_stop_directions(feed), on=['route_id', 'stop_id'], how='left')
+    obs['direction_id'] = obs['direction_id'].fillna(-1).astype(np.int64)
+    obs['station_id'] = obs['stop_id'].map(get_station_lookup(feed)).fillna(obs['stop_id'])
+    local_dates, obs['hour'] = _local_time(obs['arrival_s'])
+
+    # Each date, plus the day before for trips running past midnight
+    dates = set(local_dates) | {d - pd.Timedelta(days=1) for d in set(local_dates)}
+    schedule = scheduled_arrivals(feed, dates, obs['route_id'].unique(), obs['stop_id'].unique())
+    schedule['scheduled_s'] = schedule['scheduled_s'].astype(np.int64)
+
+    keys = ['route_id', 'direction_id', 'stop_id']
+    nearest = pd.merge_asof(
+        obs, schedule[keys + ['trip_id', 'service_date', 'scheduled_s']].rename(
+            columns={'trip_id': 'nearest_trip', 'service_date': 'nearest_date'}),
+        left_on='arrival_s', right_on='scheduled_s', by=keys,
+        direction='nearest', tolerance=int(tolerance_min * 60)
+    ).drop(columns='scheduled_s')
+
+    # Observed runs: one realtime trip ID, no long gaps
+    nearest = nearest.sort_values(['obs_trip_id', 'arrival_s'], kind='stable', na_position='last')
+    nearest = nearest.reset_index(drop=True)
+    new_run = (nearest['obs_trip_id'].ne(nearest['obs_trip_id'].shift()) |
+               nearest['arrival_s'].diff().gt(TRIP_RUN_GAP_S))
+    nearest['obs_trip'] = np.cumsum(new_run.to_numpy()) - 1
+    nearest.loc[nearest['obs_trip_id'].isna(), 'obs_trip'] = -1
+
+    runs = nearest[nearest['obs_trip'] >= 0]
+    if len(runs):
+        schedule['realtime_trip_id'] = realtime_trip_id(schedule['trip_id'])
+        runs = runs.assign(realtime_trip_id=realtime_trip_id(runs['obs_trip_id']))
+        by_id = _trips_by_id(runs, schedule)
+        by_vote = _trips_by_vote(nearest)
+        assigned = pd.concat([by_id, by_vote[~by_vote['obs_trip'].isin(by_id['obs_trip'])]])
+        nearest = nearest.merge(assigned, on='obs_trip', how='left')
+    else:
+        nearest['trip_id'] = None
+        nearest['service_date'] = None
+    loose = nearest['obs_trip'] < 0
+    nearest.loc[loose, 'trip_id'] = nearest.loc[loose, 'nearest_trip']
+    nearest.loc[loose, 'service_date'] = nearest.loc[loose, 'nearest_date']
+
+    matched = nearest.merge(schedule[['trip_id', 'service_date', 'stop_id', 'scheduled_s']],
+                            on=['trip_id', 'service_date', 'stop_id'], how='left')
+    matched['delay_min'] = (matched['arrival_s'] - matched['scheduled_s']) / 60.0
+
+    columns = ['obs_trip_id', 'route_id', 'direction_id', 'stop_id', 'station_id', 'arrival_s', 'hour',
+               'obs_trip', 'trip_id', 'service_date', 'scheduled_s', 'delay_min']
+    return matched[columns].sort_values('arrival_s', kind='stable').reset_index(drop=True)
+
+
+def _headway_sums(events, keys, time_column):
+    """
+    Per keys + hour: trains, days, and sum / sum of squares / min / max of headways (seconds).
+    """
+    events = events.sort_values(keys + [time_column], kind='stable')
+    same = np.ones(len(events), dtype=bool)
+    for key in keys:
+        same &= events[key].eq(events[key].shift()).to_numpy()
+    headway = events[time_column].diff().where(same)
+    dates, hours = _local_time(events[time_column])
+    events = events.assign(headway=headway, hour=hours, local_date=dates)
+
+    trains = events.groupby(keys + ['hour']).agg(trains=('headway', 'size'), days=('local_date', 'nunique'))
+    headways = events[events['headway'] > 0]
+    sums = headways.assign(headway_sq=headways['headway'] ** 2).groupby(keys + ['hour']).agg(
+        headways=('headway', 'size'), sum_headway=('headway', 'sum'), sum_headway_sq=('headway_sq', 'sum'),
+        min_headway=('headway', 'min'), max_headway=('headway', 'max'),
+    )
+    return trains.join(sums, how='left').fillna({'headways': 0}).reset_index()
+
+
+def excess_wait_table(feed, observations, combine_routes=False):
+    """
+    Observed vs scheduled headways and excess wait per stop and hour.
+
+    Scheduled headways at each stop are taken over the time span that stop
+    was observed, so partial days compare like with like.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    observations : pd.DataFrame or str
+        Observed arrivals (see load_observations()) or the output of
+        match_observations()
+    combine_routes : bool, default=False
+        Treat all routes at a platform as one service (headway between any
+        two trains), like get_headway_dist() with several routes
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per stop_id, direction_id, route_id (unless combined) and
+        local hour, with columns stop_name, days, observed_trains,
+        scheduled_trains (per day), observed_avg_headway,
+        scheduled_avg_headway, observed_min_headway, observed_max_headway,
+        observed_expected_wait, scheduled_expected_wait and excess_wait
+        (minutes)
+    """
+    if isinstance(observations, pd.DataFrame) and 'direction_id' in observations.columns:
+        obs = observations[['route_id', 'direction_id', 'stop_id', 'arrival_s']]
+    else:
+        obs = load_observations(observations).merge(_stop_directions(feed), on=['route_id', 'stop_id'],
+                                                    how='left')
+        obs['direction_id'] = obs['direction_id'].fillna(-1).astype(np.int64)
+
+    local_dates, _ = _local_time(obs['arrival_s'])
+    dates = set(local_dates) | {d - pd.Timedelta(days=1) for d in set(local_dates)}
+    schedule = scheduled_arrivals(feed, dates, obs['route_id'].unique(), obs['stop_id'].unique())
+    keys = ['stop_id', 'direction_id'] + ([] if combine_routes else ['route_id'])
+
+    # Scheduled arrivals within the span each stop was observed
+    span = obs.groupby(keys)['arrival_s'].agg(['min', 'max']).reset_index()
+    schedule = schedule.astype({'scheduled_s': np.int64}).merge(span, on=keys)
+    schedule = schedule[schedule['scheduled_s'].between(schedule['min'], schedule['max'])]
+
+    observed = _headway_sums(obs, keys, 'arrival_s')
+    scheduled = _headway_sums(schedule, keys, 'scheduled_s')
+
+    table = observed.merge(scheduled, on=keys + ['hour'], how='outer', suffixes=('_obs', '_sched'))
+    days = table['days_obs'].fillna(table['days_sched'])
+
+    def expected_wait(suffix):
+        return table[f'sum_headway_sq{suffix}'] / (2 * table[f'sum_headway{suffix}']) / 60.0
+
+    result = table[keys + ['hour']].copy()
+    result.insert(1, 'stop_name', result['stop_id'].map(get_stop_name_lookup(feed)))
+    result['days'] = days.astype(int)
+    result['observed_trains'] = table['trains_obs'].fillna(0) / days
+    result['scheduled_trains'] = table['trains_sched'].fillna(0) / days
+    result['observed_avg_headway'] = table['sum_headway_obs'] / table['headways_obs'] / 60.0
+    result['scheduled_avg_headway'] = table['sum_headway_sched'] / table['headways_sched'] / 60.0
+    result['observed_min_headway'] = table['min_headway_obs'] / 60.0
+    result['observed_max_headway'] = table['max_headway_obs'] / 60.0
+    result['observed_expected_wait'] = expected_wait('_obs')
+    result['scheduled_expected_wait'] = expected_wait('_sched')
+    result['excess_wait'] = result['observed_expected_wait'] - result['scheduled_expected_wait']
+    return result.sort_values(keys + ['hour']).reset_index(drop=True)
+
+
+def reconcile_headway_dist(feed, observations, direction_id, *route_ids, stop_id):
+    """
+    Observed headway distribution at one stop, in get_headway_dist() format.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    observations : pd.DataFrame or str
+        Observed arrivals (see load_observations()) or the output of
+        match_observations()
+    direction_id : int
+        Direction ID (0 or 1)
+    *route_ids : str
+        One or more route IDs; several are combined (time between any train)
+    stop_id : str
+        Platform stop ID (e.g., '120S') or parent station ID (e.g., '120')
+
+    Returns:
+    --------
+    pd.DataFrame
+        24 rows with get_headway_dist() columns (hour, num_trains,
+        avg_headway, min_headway, max_headway; observed, num_trains averaged
+        per day and rounded) plus scheduled_trains, scheduled_avg_headway,
+        observed_expected_wait, scheduled_expected_wait and excess_wait.
+        attrs match get_headway_dist(), with service_id describing the
+        observed date range.
+
+    Examples:
+    ---------
+    >>> df = reconcile_headway_dist(feed, replay.arrivals(), 1, '1', '2', '3', stop_id='120S')
+    >>> ch.print_headway_dist(df)
+    """
+    if len(route_ids) == 0:
+        raise ValueError("Must provide at least one route ID")
+    route_list = list(route_ids)
+
+    obs = observations if isinstance(observations, pd.DataFrame) and 'direction_id' in observations.columns \
+        else match_observations(feed, observations)
+    stations = get_station_lookup(feed)
+    at_stop = obs['stop_id'].eq(stop_id) | obs['stop_id'].map(stations).eq(stop_id)
+    obs = obs[at_stop & obs['route_id'].isin(route_list) & obs['direction_id'].eq(direction_id)]
+    obs = obs.assign(stop_id=stop_id)
+
+    table = excess_wait_table(feed, obs, combine_routes=True) if len(obs) else pd.DataFrame(columns=['hour'])
+    table = table.set_index('hour').reindex(range(24))
+
+    df = pd.DataFrame({
+        'hour': range(24),
+        'num_trains': table['observed_trains'].fillna(0).round().astype(int).to_numpy(),
+        'avg_headway': table['observed_avg_headway'].to_numpy(),
+        'min_headway': table['observed_min_headway'].to_numpy(),
+        'max_headway': table['observed_max_headway'].to_numpy(),
+        'scheduled_trains': table['scheduled_trains'].to_numpy(),
+        'scheduled_avg_headway': table['scheduled_avg_headway'].to_numpy(),
+        'observed_expected_wait': table['observed_expected_wait'].to_numpy(),
+        'scheduled_expected_wait': table['scheduled_expected_wait'].to_numpy(),
+        'excess_wait': table['excess_wait'].to_numpy(),
+    })
+    df = df.astype(object).where(df.notna(), None).astype({'hour': int, 'num_trains': int})
+
+    dates, _ = _local_time(obs['arrival_s']) if len(obs) else ([], None)
+    first, last = (min(dates), max(dates)) if len(dates) else (None, None)
+    df.attrs['route_ids'] = route_list
+    df.attrs['direction_id'] = direction_id
+    df.attrs['service_id'] = f"Observed {first:%Y-%m-%d} to {last:%Y-%m-%d}" if first else 'Observed (none)'
+    df.attrs['date'] = None
+    df.attrs['stop_id'] = stop_id
+    df.attrs['direction_name'] = get_direction_name(feed, route_list[0], direction_id, service_id=None)
+    return df
+
+
+def reconcile_travel_times(feed, matched, route_id, direction_id, hour=None, station_order=None):
+    """
+    Observed and scheduled travel time matrices over the same matched trips.
+
+    Every observed trip contributes the time between each pair of its
+    observed stops, and its matched scheduled trip the scheduled time between
+    the same stops, so the deviation compares identical journeys. Times are
+    arrival to arrival.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    matched : pd.DataFrame
+        Output of match_observations()
+    route_id : str
+        The route ID
+    direction_id : int
+        Direction ID (0 or 1)
+    hour : int or tuple of (int, int), optional
+        Local hour or inclusive hour range of the arrival at the origin
+    station_order : list, optional
+        Ordered list of (stop_id, stop_name) tuples. Defaults to
+        get_station_order() over all services.
+
+    Returns:
+    --------
+    dict
+        Dictionary with 'observed', 'scheduled' and 'deviation' (observed
+        minus scheduled) matrices in minutes, shaped like
+        calculate_travel_time_matrix() (columns = origins, rows =
+        destinations)
+    """
+    if station_order is None:
+        station_order = get_station_order(feed, route_id, direction_id, service_id=None)
+
+    rows = matched[(matched['route_id'] == route_id) & (matched['direction_id'] == direction_id) &
+                   matched['scheduled_s'].notna()]
+    # Trip key: the observed run, or the matched scheduled trip and date
+    if (rows['obs_trip'] >= 0).all():
+        trip_key = rows['obs_trip'].to_numpy()
+    else:
+        trip_key = pd.factorize(pd.MultiIndex.from_frame(rows[['trip_id', 'service_date']]))[0]
+    rows = rows.assign(trip_key=trip_key).sort_values(['trip_key', 'arrival_s'], kind='stable')
+    rows = rows.drop_duplicates(['trip_key', 'station_id'])
+
+    station_ids = np.unique(rows['station_id'].to_numpy().astype(str))
+    codes = np.searchsorted(station_ids, rows['station_id'].to_numpy().astype(str))
+    trips = rows['trip_key'].to_numpy()
+    hours = rows['hour'].to_numpy()
+
+    cubes = {}
+    for name, column in (('observed', 'arrival_s'), ('scheduled', 'scheduled_s')):
+        times = rows[column].to_numpy().astype(float)
+        sums, counts = accumulate_trip_pairs(trips, codes, hours, times, times, len(station_ids))
+        cubes[name] = {'station_ids': station_ids, 'sums': sums, 'counts': counts}
+
+    observed = travel_time_matrix_from_cube(cubes['observed'], station_order, hour)
+    scheduled = travel_time_matrix_from_cube(cubes['scheduled'], station_order, hour)
+    return {'observed': observed, 'scheduled': scheduled, 'deviation': observed - scheduled}
+
+
+if __name__ == "__main__":
+    import sys
+
+    import combined_headways as ch
+    from travel_times import print_travel_time_matrix
+
+    print(__doc__)
+
+    if len(sys.argv) < 2:
+        print("Usage: python reconcile.py OBSERVATIONS.csv")
+        sys.exit(1)
+
+    feed = gk.read_feed("gtfs_subway.zip", dist_units="m")
+    matched = match_observations(feed, sys.argv[1])
+    print(f"Matched {matched['trip_id'].notna().sum()} of {len(matched)} observed arrivals\n")
+
+    table = excess_wait_table(feed, matched)
+    table.to_csv('excess_wait.csv', index=False)
+    print("Exported to: excess_wait.csv")
+
+    # 96 St southbound, 1/2/3 combined
+    ch.print_headway_dist(reconcile_headway_dist(feed, matched, 1, '1', '2', '3', stop_id='120S'))
+
+    deviation = reconcile_travel_times(feed, matched, '1', 1, hour=(7, 9))['deviation']
+    print_travel_time_matrix(deviation, '1', 1, 'Observed - scheduled, 7-9 AM')
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Resolve calendar dates to the GTFS service IDs running on them.
+
+The analysis functions in this project take a service_id like 'Weekday'
+directly. That works for a typical day, but not for holidays (Christmas runs a
+Sunday schedule) or dates covered by a supplemented feed, where the answer
+comes from calendar.txt and calendar_dates.txt.
+
+This module builds a service x date bitmap once per feed covering the feed's
+whole validity window, so resolving a date (or a month of dates) is an array
+lookup instead of re-reading the calendar tables.
+
+Functions that accept date= use resolve_service_ids() to turn
+(service_id, date) into the list of services to keep.
+"""
+from datetime import date as dt_date, datetime
+
+import numpy as np
+import pandas as pd
+
+from feed_index import get_feed_cache, get_trip_table
+
+
+WEEKDAY_COLUMNS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+
+def parse_service_date(value):
+    """
+    Convert a date given in any of the usual forms to a datetime.date.
+
+    Parameters:
+    -----------
+    value : str, int, datetime.date, datetime.datetime or pd.Timestamp
+        Date to convert. Strings may be GTFS style ('20250101') or ISO
+        ('2025-01-01').
+
+    Returns:
+    --------
+    datetime.date
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, dt_date):
+        return value
+    if isinstance(value, pd.Timestamp):
+        return value.date()
+
+    text = str(value).strip()
+    for fmt in ('%Y%m%d', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+
+    raise ValueError(f"Could not parse date '{value}' (expected YYYYMMDD or YYYY-MM-DD)")
+
+
+class ServiceCalendar:
+    """
+    Service x date activity bitmap for a GTFS feed.
+
+    Rows are service IDs, columns are every date from the earliest start_date
+    (or calendar_dates date) to the latest end_date. A cell is True when the
+    service runs that day, after applying calendar_dates exceptions
+    (exception_type 1 adds the service, 2 removes it).
+
+    Parameters:
+    -----------
+    calendar : pd.DataFrame or None
+        The feed's calendar table
+    calendar_dates : pd.DataFrame or None
+        The feed's calendar_dates table
+
+    Examples:
+    ---------
+    >>> cal = ServiceCalendar(feed.calendar, feed.calendar_dates)
+    >>> cal.active_service_ids('20241225')
+    ['Sunday']
+    """
+
+    def __init__(self, calendar, calendar_dates):
+        if calendar is None:
+            calendar = pd.DataFrame(columns=['service_id', 'start_date', 'end_date'] + WEEKDAY_COLUMNS)
+        if calendar_dates is None:
+            calendar_dates = pd.DataFrame(columns=['service_id', 'date', 'exception_type'])
+
+        service_ids = pd.unique(pd.concat([
+            calendar['service_id'].astype(str), calendar_dates['service_id'].astype(str)
+        ], ignore_index=True))
+        self.service_ids = np.array(sorted(service_ids), dtype=object)
+        self._service_positions = {s: i for i, s in enumerate(self.service_ids)}
+
+        starts = pd.to_datetime(calendar['start_date'].astype(str), format='%Y%m%d')
+        ends = pd.to_datetime(calendar['end_date'].astype(str), format='%Y%m%d')
+        exception_dates = pd.to_datetime(calendar_dates['date'].astype(str), format='%Y%m%d')
+
+        all_dates = pd.concat([starts, ends, exception_dates], ignore_index=True)
+        if len(all_dates) == 0:
+            self.start_date = None
+            self.end_date = None
+            self.dates = np.array([], dtype='datetime64[D]')
+            self.bitmap = np.zeros((len(self.service_ids), 0), dtype=bool)
+            return
+
+        first = all_dates.min().to_datetime64().astype('datetime64[D]')
+        last = all_dates.max().to_datetime64().astype('datetime64[D]')
+        self.dates = np.arange(first, last + 1, dtype='datetime64[D]')
+        self.start_date = first.astype(dt_date)
+        self.end_date = last.astype(dt_date)
+
+        # Monday = 0, matching WEEKDAY_COLUMNS (1970-01-01 was a Thursday)
+        weekdays = (self.dates.astype(np.int64) + 3) % 7
+        bitmap = np.zeros((len(self.service_ids), len(self.dates)), dtype=bool)
+
+        if len(calendar):
+            day_flags = calendar[WEEKDAY_COLUMNS].astype(int).to_numpy().astype(bool)
+            start_idx = (starts.to_numpy().astype('datetime64[D]') - first).astype(np.int64)
+            end_idx = (ends.to_numpy().astype('datetime64[D]') - first).astype(np.int64)
+            date_idx = np.arange(len(self.dates))
+            for row, service_id in enumerate(calendar['service_id'].astype(str)):
+                in_range = (date_idx >= start_idx[row]) & (date_idx <= end_idx[row])
+                bitmap[self._service_positions[service_id]] |= in_range & day_flags[row][weekdays]
+
+        if len(calendar_dates):
+            rows = calendar_dates['service_id'].astype(str).map(self._service_positions).to_numpy()
+            cols = (exception_dates.to_numpy().astype('datetime64[D]') - first).astype(np.int64)
+            exception_types = calendar_dates['exception_type'].astype(int).to_numpy()
+            bitmap[rows[exception_types == 1], cols[exception_types == 1]] = True
+            bitmap[rows[exception_types == 2], cols[exception_types == 2]] = False
+
+        self.bitmap = bitmap
+
+    def _date_position(self, date):
+        """Column of date in the bitmap, or -1 if outside the feed's window."""
+        if not len(self.dates):
+            return -1
+        day = np.datetime64(parse_service_date(date), 'D')
+        position = int((day - self.dates[0]).astype(np.int64))
+        if position < 0 or position >= len(self.dates):
+            return -1
+        return position
+
+    def covers(self, date):
+        """Whether date falls inside the feed's validity window."""
+        return self._date_position(date) >= 0
+
+    def active_service_ids(self, date):
+        """
+        Get the service IDs that run on a date.
+
+        Parameters:
+        -----------
+        date : str, datetime.date or pd.Timestamp
+            Calendar date (e.g., '20250101' or '2025-01-01')
+
+        Returns:
+        --------
+        list
+            Sorted list of active service IDs (empty if none run that day)
+
+        Raises:
+        -------
+        ValueError
+            If date is outside the feed's validity window
+        """
+        position = self._date_position(date)
+        if position < 0:
+            raise ValueError(
+                f"Date {parse_service_date(date)} is outside the feed's service window "
+                f"({self.start_date} to {self.end_date})"
+            )
+        return self.service_ids[self.bitmap[:, position]].tolist()
+
+    def is_active(self, service_id, date):
+        """Whether service_id runs on date (False for unknown services or dates)."""
+        position = self._date_position(date)
+        row = self._service_positions.get(service_id)
+        if position < 0 or row is None:
+            return False
+        return bool(self.bitmap[row, position])
+
+    def service_dates(self, service_id):
+        """
+        Get every date a service runs on.
+
+        Returns:
+        --------
+        list of datetime.date
+        """
+        row = self._service_positions.get(service_id)
+        if row is None:
+            return []
+        return self.dates[self.bitmap[row]].astype(dt_date).tolist()
+
+    def activity(self, dates):
+        """
+        Get the bitmap columns for a list of dates.
+
+        Unlike active_service_ids(), dates outside the feed's validity window
+        are allowed and simply have no active services.
+
+        Parameters:
+        -----------
+        dates : list
+            Dates in any form accepted by parse_service_date()
+
+        Returns:
+        --------
+        np.ndarray
+            Boolean array of shape (len(service_ids), len(dates))
+        """
+        positions = np.array([self._date_position(d) for d in dates], dtype=np.int64)
+        result = np.zeros((len(self.service_ids), len(positions)), dtype=bool)
+        inside = positions >= 0
+        result[:, inside] = self.bitmap[:, positions[inside]]
+        return result
+
+    def date_range_table(self, start_date=None, end_date=None):
+        """
+        Get the bitmap for a range of dates as a DataFrame.
+
+        Useful for batch runs: resolve a month of dates once, then look up each
+        day's services from the table.
+
+        Parameters:
+        -----------
+        start_date : optional
+            First date (inclusive). Defaults to the start of the feed window.
+        end_date : optional
+            Last date (inclusive). Defaults to the end of the feed window.
+
+        Returns:
+        --------
+        pd.DataFrame
+            Boolean DataFrame indexed by date with one column per service ID
+        """
+        keep = np.ones(len(self.dates), dtype=bool)
+        if start_date is not None:
+            keep &= self.dates >= np.datetime64(parse_service_date(start_date), 'D')
+        if end_date is not None:
+            keep &= self.dates <= np.datetime64(parse_service_date(end_date), 'D')
+
+        return pd.DataFrame(
+            self.bitmap[:, keep].T,
+            index=pd.DatetimeIndex(self.dates[keep], name='date'),
+            columns=list(self.service_ids),
+        )
+
+
+def get_service_calendar(feed):
+    """
+    Get the cached ServiceCalendar for a feed.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+
+    Returns:
+    --------
+    ServiceCalendar
+    """
+    cache = get_feed_cache(feed)
+    if 'service_calendar' not in cache:
+        cache['service_calendar'] = ServiceCalendar(
+            getattr(feed, 'calendar', None), getattr(feed, 'calendar_dates', None)
+        )
+    return cache['service_calendar']
+
+
+def get_trip_service_codes(feed):
+    """
+    Get the ServiceCalendar row of each trip's service_id.
+
+    Returns:
+    --------
+    np.ndarray
+        int array aligned with feed_index.get_trip_table() rows; -1 for trips
+        whose service_id is not in the calendar
+    """
+    cache = get_feed_cache(feed)
+    if 'trip_service_codes' not in cache:
+        calendar = get_service_calendar(feed)
+        positions = pd.Series(np.arange(len(calendar.service_ids)), index=calendar.service_ids)
+        service_ids = get_trip_table(feed)['service_id'].astype(object)
+        cache['trip_service_codes'] = service_ids.map(positions).fillna(-1).to_numpy(dtype=np.int64)
+    return cache['trip_service_codes']
+
+
+def get_active_service_ids(feed, date):
+    """
+    Get the service IDs that run on a date.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    date : str, datetime.date or pd.Timestamp
+        Calendar date (e.g., '20241225')
+
+    Returns:
+    --------
+    list
+        Active service IDs
+
+    Examples:
+    ---------
+    >>> get_active_service_ids(feed, '20241225')
+    ['Sunday']
+    """
+    return get_service_calendar(feed).active_service_ids(date)
+
+
+def resolve_service_ids(feed, service_id=None, date=None):
+    """
+    Resolve the service_id / date arguments of an analysis function.
+
+    If date is given it takes precedence and the services active that day are
+    returned. Otherwise service_id is returned as a list, or None meaning
+    "all services".
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_id : str or list of str, optional
+        Service ID(s) as passed by the caller
+    date : str, datetime.date or pd.Timestamp, optional
+        Calendar date to resolve
+
+    Returns:
+    --------
+    list or None
+        Service IDs to keep, or None for no service filter
+    """
+    if date is not None:
+        return get_active_service_ids(feed, date)
+    if service_id is None:
+        return None
+    if isinstance(service_id, str):
+        return [service_id]
+    return list(service_id)
+
+
+def service_mask(feed, trips, service_id=None, date=None):
+    """
+    Boolean mask over a trips DataFrame for a service_id or calendar date.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    trips : pd.DataFrame
+        Trips table (feed.trips or a subset of it)
+    service_id : str or list of str, optional
+        Service ID(s) to keep. Ignored if date is given. None (with no date)
+        means no service filter: every trip is kept.
+    date : str, datetime.date or pd.Timestamp, optional
+        Keep only trips whose service runs on this date. A date on which no
+        service runs keeps no trips.
+
+    Returns:
+    --------
+    pd.Series
+        Boolean Series aligned with trips: all True without a service filter,
+        all False when the filter matches no services
+    """
+    service_ids = resolve_service_ids(feed, service_id, date)
+    if service_ids is None:
+        return pd.Series(True, index=trips.index)
+    return trips['service_id'].isin(service_ids).fillna(False).astype(bool)
+
+
+def describe_service(feed, service_id=None, date=None):
+    """
+    Label for the service being analyzed, used in printed output and attrs.
+
+    Returns service_id unchanged when no date is given, otherwise the date and
+    the services running on it, e.g. '2024-12-25 (Sunday)'.
+    """
+    if date is None:
+        return service_id
+    service_ids = get_active_service_ids(feed, date)
+    label = parse_service_date(date).strftime('%Y-%m-%d')
+    return f"{label} ({', '.join(service_ids) if service_ids else 'no service'})"
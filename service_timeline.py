@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Stitch consecutive service days into one continuous departure timeline.
+
+GTFS times are relative to the service day, so a Weekday trip leaving at
+"25:10:00" actually departs at 1:10 AM on the next calendar day. Analyzing one
+service_id at a time (sort departures, drop the first and last headway) never
+merges those late trips with the early trips of the following service day, so
+overnight headways are distorted - most visibly Friday night into Saturday,
+where Weekday 24:xx trips and Saturday 0:xx trips run in the same hours.
+
+This module places every departure on an absolute timeline: the departure's
+service-day seconds plus 86400 x the number of days since the start of the
+range, using the calendar to decide which service runs on which day. The
+result is a single sorted departure stream per stop that headway, window and
+span calculations can consume directly.
+
+Departures are taken from feed_index.get_stop_departure_index(), which is
+already grouped by stop and sorted, so building a timeline never re-sorts
+stop_times.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from feed_index import get_stop_departures, get_trip_table, seconds_to_gtfs_time, trip_mask
+from service_calendar import (get_service_calendar, get_trip_service_codes,
+                              parse_service_date)
+
+
+SECONDS_PER_DAY = 86400
+
+# A gap longer than this between trains of different service days is the
+# overnight break in service, not a headway
+OVERNIGHT_BREAK_S = 3600
+
+
+def build_service_timeline(feed, start_date, end_date, route_id=None, direction_id=None,
+                           stop_id=None, mask=None):
+    """
+    Build a continuous, time-sorted departure stream across service days.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    start_date : str or datetime.date
+        First service day to include (e.g., '20241213')
+    end_date : str or datetime.date
+        Last service day to include (inclusive)
+    route_id : str or list of str, optional
+        Route ID(s) to include. If None, includes all routes.
+    direction_id : int, optional
+        Direction ID (0 or 1). If None, includes both directions.
+    stop_id : str, optional
+        Stop to take departures at. If None (default), uses the first stop of
+        each trip.
+    mask : np.ndarray, optional
+        Boolean mask over feed_index.get_trip_table() selecting the trips to
+        include (e.g., one branch). Used instead of route_id/direction_id.
+        Service IDs in the mask are ignored; the calendar decides which trips
+        run on each day.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per departure, sorted by timeline_s, with columns:
+        - trip_id, route_id, service_id: From trips.txt
+        - service_date (datetime.date): Service day the trip belongs to
+        - departure_s (int): GTFS departure time in seconds (can exceed 86400)
+        - timeline_s (int): Seconds since midnight of start_date
+        - calendar_date (datetime.date): Calendar day the train actually leaves
+        - clock_s (int): Seconds after midnight on calendar_date (0-86399)
+
+    Examples:
+    ---------
+    >>> # Friday night into Saturday morning on the 1 train
+    >>> stream = build_service_timeline(feed, '20241213', '20241214', route_id='1',
+    ...                                 direction_id=0, stop_id='127S')
+    >>> stream[stream['calendar_date'] == date(2024, 12, 14)].head()
+    """
+    start = parse_service_date(start_date)
+    end = parse_service_date(end_date)
+    if end < start:
+        raise ValueError(f"end_date {end} is before start_date {start}")
+
+    trips = get_trip_table(feed)
+
+    if stop_id is None:
+        trip_idx = np.arange(len(trips))
+        departure_s = trips['first_departure_s'].to_numpy()
+    else:
+        trip_idx, departure_s = get_stop_departures(feed, stop_id)
+
+    # Route/direction filter is a lookup into the trip table mask
+    if mask is None:
+        mask = trip_mask(feed, route_id, direction_id)
+    keep = mask[trip_idx]
+    trip_idx = trip_idx[keep]
+    departure_s = departure_s[keep]
+
+    # Which of these departures run on each day of the range
+    days = [start + timedelta(days=k) for k in range((end - start).days + 1)]
+    activity = get_service_calendar(feed).activity(days)
+    service_codes = get_trip_service_codes(feed)[trip_idx]
+
+    runs = np.zeros((len(trip_idx), len(days)), dtype=bool)
+    known = service_codes >= 0
+    runs[known] = activity[service_codes[known]]
+    rows, day_offsets = np.nonzero(runs)
+
+    timeline_s = departure_s[rows] + day_offsets * SECONDS_PER_DAY
+    order = np.argsort(timeline_s, kind='stable')
+    rows, day_offsets, timeline_s = rows[order], day_offsets[order], timeline_s[order]
+
+    selected = trips.iloc[trip_idx[rows]]
+    calendar_offsets = timeline_s // SECONDS_PER_DAY
+    start_day = np.datetime64(start, 'D')
+
+    return pd.DataFrame({
+        'trip_id': selected['trip_id'].to_numpy(),
+        'route_id': selected['route_id'].to_numpy(),
+        'service_id': selected['service_id'].to_numpy(),
+        'service_date': (start_day + day_offsets).astype(object),
+        'departure_s': departure_s[rows],
+        'timeline_s': timeline_s,
+        'calendar_date': (start_day + calendar_offsets).astype(object),
+        'clock_s': timeline_s % SECONDS_PER_DAY,
+    })
+
+
+def get_calendar_day_departures(feed, date, route_id=None, direction_id=None, stop_id=None,
+                                mask=None):
+    """
+    Get the departures that actually leave on a calendar date.
+
+    Includes the previous service day's trips with times past 24:00, and the
+    first departure after midnight at the end of the day (so the last headway
+    of the day can be measured).
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    date : str or datetime.date
+        Calendar date (e.g., '20241214')
+    route_id : str or list of str, optional
+        Route ID(s) to include
+    direction_id : int, optional
+        Direction ID (0 or 1)
+    stop_id : str, optional
+        Stop to take departures at. If None, uses the first stop of each trip.
+    mask : np.ndarray, optional
+        Boolean mask over feed_index.get_trip_table() selecting the trips to
+        include. Used instead of route_id/direction_id.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Same columns as build_service_timeline(), plus day_s: seconds after
+        midnight on date (>= 86400 for the trailing next-day departure).
+    """
+    day = parse_service_date(date)
+    # Validates that the date is inside the feed's calendar window
+    get_service_calendar(feed).active_service_ids(day)
+
+    stream = build_service_timeline(
+        feed, day - timedelta(days=1), day + timedelta(days=1),
+        route_id=route_id, direction_id=direction_id, stop_id=stop_id, mask=mask
+    )
+
+    day_s = stream['timeline_s'].to_numpy() - SECONDS_PER_DAY
+    in_day = (day_s >= 0) & (day_s < SECONDS_PER_DAY)
+    after = np.flatnonzero(day_s >= SECONDS_PER_DAY)
+    if len(after):
+        in_day[after[0]] = True
+
+    result = stream[in_day].reset_index(drop=True)
+    result['day_s'] = day_s[in_day]
+    return result
+
+
+def service_break_mask(departures, max_gap_s=OVERNIGHT_BREAK_S):
+    """
+    Which gaps between consecutive departures are overnight service breaks.
+
+    A gap is a break when its two trains belong to different service days and
+    it is longer than max_gap_s: the last train of one service day and the
+    first train after the route's overnight shutdown. Short gaps between
+    service days (a 24-hour route's late-night trains handing over to the
+    next day's) are real headways and are kept.
+
+    Parameters:
+    -----------
+    departures : pd.DataFrame
+        Time-sorted departures with service_date and timeline_s columns
+        (e.g., from build_service_timeline() or get_calendar_day_departures())
+    max_gap_s : int, default=OVERNIGHT_BREAK_S
+        Longest gap between service days still counted as a headway
+
+    Returns:
+    --------
+    np.ndarray
+        Boolean array of length len(departures) - 1; element i is the gap
+        between rows i and i + 1
+    """
+    if len(departures) < 2:
+        return np.zeros(0, dtype=bool)
+    dates = departures['service_date'].to_numpy()
+    gaps = np.diff(departures['timeline_s'].to_numpy())
+    return (dates[1:] != dates[:-1]) & (gaps > max_gap_s)
+
+
+def get_stitched_headways_by_hour(feed, date, route_ids, direction_id=None, stop_id=None,
+                                  exclude_first_last=True):
+    """
+    Calculate headways by hour for one calendar date on a stitched timeline.
+
+    Late-night departures from the previous service day and early departures
+    of the current one are merged, so 0:00-5:00 headways reflect the trains
+    that actually run. Each headway is assigned to the clock hour of the
+    earlier train. The gap from the day's last train to the first train
+    after midnight is kept when service runs through the night; with
+    exclude_first_last, a gap across the overnight break in service (see
+    service_break_mask()) is dropped instead.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    date : str or datetime.date
+        Calendar date to analyze
+    route_ids : str or list of str
+        Route ID(s) to combine
+    direction_id : int, optional
+        Direction ID (0 or 1)
+    stop_id : str, optional
+        Stop to measure headways at. If None, uses the first stop of each trip.
+    exclude_first_last : bool, default=True
+        Drop gaps across the overnight break in service, the stitched
+        counterpart of dropping the first and last headway of a service day
+
+    Returns:
+    --------
+    tuple
+        (headways_by_hour, trains_by_hour): dicts keyed by hour (0-23) with
+        lists of headways in minutes, and train counts
+    """
+    departures = get_calendar_day_departures(feed, date, route_ids, direction_id, stop_id)
+    day_s = departures['day_s'].to_numpy()
+
+    headways_by_hour = defaultdict(list)
+    trains_by_hour = {}
+
+    in_day = day_s < SECONDS_PER_DAY
+    hours, counts = np.unique(day_s[in_day] // 3600, return_counts=True)
+    for hour, count in zip(hours, counts):
+        trains_by_hour[int(hour)] = int(count)
+
+    if len(day_s) < 2:
+        return dict(headways_by_hour), trains_by_hour
+
+    headways = np.diff(day_s) / 60.0
+    keep = ~service_break_mask(departures) if exclude_first_last else np.ones(len(headways), dtype=bool)
+    for hour, headway in zip(day_s[:-1][keep] // 3600, headways[keep]):
+        headways_by_hour[int(hour)].append(float(headway))
+
+    return dict(headways_by_hour), trains_by_hour
+
+
+def get_service_span(feed, date, route_ids, direction_id=None, stop_id=None):
+    """
+    Get the first and last departures and the longest gap on a calendar date.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    date : str or datetime.date
+        Calendar date to analyze
+    route_ids : str or list of str
+        Route ID(s) to combine
+    direction_id : int, optional
+        Direction ID (0 or 1)
+    stop_id : str, optional
+        Stop to measure at. If None, uses the first stop of each trip.
+
+    Returns:
+    --------
+    dict or None
+        Dictionary with first_departure, last_departure (HH:MM:SS clock
+        times), num_trains, max_gap_minutes and max_gap_start, or None if no
+        trains leave that day
+    """
+    departures = get_calendar_day_departures(feed, date, route_ids, direction_id, stop_id)
+    day_s = departures['day_s'].to_numpy()
+    in_day = day_s[day_s < SECONDS_PER_DAY]
+
+    if len(in_day) == 0:
+        return None
+
+    if len(day_s) >= 2:
+        gaps = np.diff(day_s)
+        longest = int(np.argmax(gaps))
+        max_gap_minutes = float(gaps[longest] / 60.0)
+        max_gap_start = seconds_to_gtfs_time(day_s[longest])
+    else:
+        max_gap_minutes = None
+        max_gap_start = None
+
+    return {
+        'first_departure': seconds_to_gtfs_time(in_day[0]),
+        'last_departure': seconds_to_gtfs_time(in_day[-1]),
+        'num_trains': int(len(in_day)),
+        'max_gap_minutes': max_gap_minutes,
+        'max_gap_start': max_gap_start,
+    }
@@ -10,12 +10,20 @@ The J and Z trains use a skip-stop system during rush hours:
 
 This is different from traditional express/local service where one train
 consistently skips stations across all hours.
+
+find_skip_stop_patterns() generalizes this to any routes: it compares every
+pair of stop patterns in the feed and reports pairs that split a shared
+corridor into A, B and AB stations, with their service windows.
 """
 import pandas as pd
 import numpy as np
+from feed_index import (get_stop_departures, get_stop_name_lookup, get_stop_times_table, get_trip_table,
+                        seconds_to_gtfs_time, trip_mask)
+from service_calendar import service_mask
+from stop_patterns import get_pattern_catalog, popcount
 
 
-def get_z_service_hours(feed, service_id='Weekday'):
+def get_z_service_hours(feed, service_id='Weekday', date=None):
     """
     Determine which hours Z train service operates.
 
@@ -25,35 +33,29 @@ def get_z_service_hours(feed, service_id='Weekday'):
         A GTFS feed object loaded with gtfs_kit
     service_id : str, default='Weekday'
         Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
     set
         Set of hours (0-23) when Z trains operate
     """
-    z_trips = feed.trips[
-        (feed.trips['route_id'] == 'Z') &
-        (feed.trips['service_id'] == service_id)
-    ]
-
-    if len(z_trips) == 0:
+    z_mask = trip_mask(feed, 'Z', service_id=service_id, date=date)
+    if not z_mask.any():
         return set()
 
-    # Get all stop times for Z trains
-    z_stop_times = feed.stop_times[
-        feed.stop_times['trip_id'].isin(z_trips['trip_id'])
-    ]
-
-    # Extract hours from departure times
-    hours = set()
-    for time_str in z_stop_times['departure_time']:
-        hour = int(time_str.split(':')[0])
-        hours.add(hour)
+    # Hour of every Z departure (hours past 24 are kept as-is)
+    stop_times = get_stop_times_table(feed)
+    trip_idx = stop_times['trip_idx'].to_numpy()
+    is_z = (trip_idx >= 0) & z_mask[trip_idx]
+    hours = np.unique(stop_times['departure_s'].to_numpy()[is_z] // 3600)
 
-    return hours
+    return set(hours.tolist())
 
 
-def get_skip_stop_stations(feed, direction_id=1, service_id='Weekday'):
+def get_skip_stop_stations(feed, direction_id=1, service_id='Weekday', date=None):
     """
     Identify which stations are skipped by Z trains (and theoretically should
     be served by skip-stop J trains during rush hours).
@@ -66,6 +68,9 @@ def get_skip_stop_stations(feed, direction_id=1, service_id='Weekday'):
         Direction ID (0 or 1)
     service_id : str, default='Weekday'
         Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -80,52 +85,61 @@ def get_skip_stop_stations(feed, direction_id=1, service_id='Weekday'):
     j_trips = feed.trips[
         (feed.trips['route_id'] == 'J') &
         (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
+        service_mask(feed, feed.trips, service_id, date)
     ]
 
     z_trips = feed.trips[
         (feed.trips['route_id'] == 'Z') &
         (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
+        service_mask(feed, feed.trips, service_id, date)
     ]
 
+    # Stop patterns are compared as bitsets (see stop_patterns.py)
+    catalog = get_pattern_catalog(feed)
+    trip_table = get_trip_table(feed)
+    trip_positions = pd.Series(np.arange(len(trip_table)), index=trip_table['trip_id'])
+
+    def trip_patterns(trip_ids):
+        positions = trip_positions.reindex(trip_ids).fillna(-1).to_numpy(dtype=np.int64)
+        return np.where(positions >= 0, catalog.trip_patterns(np.maximum(positions, 0)), -1)
+
     # Get stops for each route
     # For J, use the trip with the most stops (all-stop pattern)
-    j_stop_counts = {}
-    for trip_id in j_trips['trip_id']:
-        stops = feed.stop_times[feed.stop_times['trip_id'] == trip_id]['stop_id'].tolist()
-        j_stop_counts[trip_id] = len(stops)
+    j_patterns = trip_patterns(j_trips['trip_id'].tolist())
+    if len(j_patterns) == 0:
+        return [], [], []
 
-    if not j_stop_counts:
+    j_sizes = np.where(j_patterns >= 0, catalog.sizes[np.maximum(j_patterns, 0)], 0)
+    j_pattern = j_patterns[np.argmax(j_sizes)]
+    if j_pattern < 0:
         return [], [], []
 
-    # Get the J trip with most stops
-    max_j_trip = max(j_stop_counts, key=j_stop_counts.get)
-    j_stop_ids = feed.stop_times[
-        feed.stop_times['trip_id'] == max_j_trip
-    ].sort_values('stop_sequence')['stop_id'].tolist()
+    j_sequence = catalog.sequences[j_pattern]
+    j_bits = catalog.bits[j_pattern]
 
     # Get Z stops if Z trains exist
-    z_stop_ids = []
+    z_sequence = np.array([], dtype=np.int64)
+    z_bits = np.zeros(catalog.n_words, dtype=np.uint64)
     if len(z_trips) > 0:
-        z_trip = z_trips.iloc[0]['trip_id']
-        z_stop_ids = feed.stop_times[
-            feed.stop_times['trip_id'] == z_trip
-        ].sort_values('stop_sequence')['stop_id'].tolist()
+        z_pattern = trip_patterns([z_trips.iloc[0]['trip_id']])[0]
+        if z_pattern >= 0:
+            z_sequence = catalog.sequences[z_pattern]
+            z_bits = catalog.bits[z_pattern]
+
+    # Categorize stops with bit operations, keeping each route's stop order
+    j_only_bits = j_bits & ~z_bits
+    z_only_bits = z_bits & ~j_bits
+    shared_bits = j_bits & z_bits
 
-    # Categorize stops
-    j_only_ids = [s for s in j_stop_ids if s not in z_stop_ids]
-    z_only_ids = [s for s in z_stop_ids if s not in j_stop_ids]
-    shared_ids = [s for s in j_stop_ids if s in z_stop_ids]
+    j_only_ids = catalog.stop_ids[j_sequence[catalog.contains(j_only_bits, j_sequence)]]
+    z_only_ids = catalog.stop_ids[z_sequence[catalog.contains(z_only_bits, z_sequence)]]
+    shared_ids = catalog.stop_ids[j_sequence[catalog.contains(shared_bits, j_sequence)]]
 
     # Convert to (stop_id, stop_name) tuples
+    stop_names = get_stop_name_lookup(feed)
+
     def get_stop_names(stop_id_list):
-        result = []
-        for stop_id in stop_id_list:
-            stop_name = feed.stops[feed.stops['stop_id'] == stop_id]['stop_name'].values
-            if len(stop_name) > 0:
-                result.append((stop_id, stop_name[0]))
-        return result
+        return [(stop_id, stop_names[stop_id]) for stop_id in stop_id_list if stop_id in stop_names]
 
     j_only_stops = get_stop_names(j_only_ids)
     z_only_stops = get_stop_names(z_only_ids)
@@ -134,7 +148,7 @@ def get_skip_stop_stations(feed, direction_id=1, service_id='Weekday'):
     return j_only_stops, z_only_stops, shared_stops
 
 
-def classify_j_trips(feed, direction_id=1, service_id='Weekday'):
+def classify_j_trips(feed, direction_id=1, service_id='Weekday', date=None):
     """
     Classify J train trips as either "all-stop" or "skip-stop".
 
@@ -149,6 +163,9 @@ def classify_j_trips(feed, direction_id=1, service_id='Weekday'):
         Direction ID (0 or 1)
     service_id : str, default='Weekday'
         Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -163,49 +180,35 @@ def classify_j_trips(feed, direction_id=1, service_id='Weekday'):
     j_trips = feed.trips[
         (feed.trips['route_id'] == 'J') &
         (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
+        service_mask(feed, feed.trips, service_id, date)
     ]
 
     # Get Z service hours
-    z_hours = get_z_service_hours(feed, service_id)
-
-    # Analyze each J trip
-    results = []
-    for _, trip in j_trips.iterrows():
-        trip_id = trip['trip_id']
-
-        # Get stops for this trip
-        stop_times = feed.stop_times[feed.stop_times['trip_id'] == trip_id]
-        num_stops = len(stop_times)
-
-        # Get first departure time
-        first_departure = stop_times.sort_values('stop_sequence').iloc[0]['departure_time']
-        hour = int(first_departure.split(':')[0])
-
-        # Determine if Z service is active
-        z_active = hour in z_hours
-
-        # Infer pattern
-        # In theory, J should run skip-stop when Z is active
-        # But GTFS data shows all J trips as all-stop
-        # So we mark based on Z service presence
-        if z_active:
-            pattern = 'all-stop (Z active)'
-        else:
-            pattern = 'all-stop (no Z)'
-
-        results.append({
-            'trip_id': trip_id,
-            'departure_hour': hour,
-            'pattern': pattern,
-            'num_stops': num_stops,
-            'z_service_active': z_active
-        })
-
-    return pd.DataFrame(results)
-
-
-def print_skip_stop_summary(feed, direction_id=1, service_id='Weekday'):
+    z_hours = get_z_service_hours(feed, service_id, date)
+
+    # Number of stops and first departure hour of each J trip, from the trip table
+    trips = get_trip_table(feed)
+    positions = pd.Series(np.arange(len(trips)), index=trips['trip_id'])
+    positions = positions.reindex(j_trips['trip_id']).dropna().to_numpy(dtype=np.int64)
+    hours = trips['first_departure_s'].to_numpy()[positions] // 3600
+
+    # Determine if Z service is active
+    z_active = np.isin(hours, list(z_hours))
+
+    # Infer pattern
+    # In theory, J should run skip-stop when Z is active
+    # But GTFS data shows all J trips as all-stop
+    # So we mark based on Z service presence
+    return pd.DataFrame({
+        'trip_id': trips['trip_id'].to_numpy()[positions],
+        'departure_hour': hours,
+        'pattern': np.where(z_active, 'all-stop (Z active)', 'all-stop (no Z)'),
+        'num_stops': trips['num_stops'].to_numpy()[positions],
+        'z_service_active': z_active,
+    })
+
+
+def print_skip_stop_summary(feed, direction_id=1, service_id='Weekday', date=None):
     """
     Print a summary of the skip-stop service pattern.
 
@@ -217,17 +220,20 @@ def print_skip_stop_summary(feed, direction_id=1, service_id='Weekday'):
         Direction ID (0 or 1)
     service_id : str, default='Weekday'
         Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
     """
     print("="*80)
     print("J/Z SKIP-STOP SERVICE ANALYSIS")
     print("="*80)
 
     # Get Z service hours
-    z_hours = get_z_service_hours(feed, service_id)
+    z_hours = get_z_service_hours(feed, service_id, date)
     print(f"\nZ train service hours: {sorted(z_hours)}")
 
     # Get skip-stop stations
-    j_only, z_only, shared = get_skip_stop_stations(feed, direction_id, service_id)
+    j_only, z_only, shared = get_skip_stop_stations(feed, direction_id, service_id, date)
 
     print(f"\n{len(shared)} stations served by both J and Z trains:")
     for stop_id, stop_name in shared:
@@ -243,7 +249,7 @@ def print_skip_stop_summary(feed, direction_id=1, service_id='Weekday'):
             print(f"  • {stop_name}")
 
     # Classify J trips
-    j_classification = classify_j_trips(feed, direction_id, service_id)
+    j_classification = classify_j_trips(feed, direction_id, service_id, date)
 
     print(f"\nJ train trip patterns:")
     print(f"  Total J trips: {len(j_classification)}")
@@ -256,7 +262,7 @@ def print_skip_stop_summary(feed, direction_id=1, service_id='Weekday'):
 
 
 def get_effective_headway(feed, direction_id=1, service_id='Weekday',
-                          stop_id=None, hour_range=None):
+                          stop_id=None, hour_range=None, date=None):
     """
     Calculate effective headway for J/Z service, accounting for skip-stop pattern.
 
@@ -281,6 +287,9 @@ def get_effective_headway(feed, direction_id=1, service_id='Weekday',
         that both J and Z serve.
     hour_range : tuple of (int, int), optional
         Hour range to filter (start_hour, end_hour)
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -288,11 +297,11 @@ def get_effective_headway(feed, direction_id=1, service_id='Weekday',
         DataFrame with headway statistics by hour and station type
     """
     # Get Z service hours
-    z_hours = get_z_service_hours(feed, service_id)
+    z_hours = get_z_service_hours(feed, service_id, date)
 
     # Get skip-stop station classification
     j_only_stops, z_only_stops, shared_stops = get_skip_stop_stations(
-        feed, direction_id, service_id
+        feed, direction_id, service_id, date
     )
 
     # If no stop specified, use first shared stop
@@ -306,81 +315,143 @@ def get_effective_headway(feed, direction_id=1, service_id='Weekday',
     is_j_only = any(sid == stop_id for sid, _ in j_only_stops)
     is_shared = any(sid == stop_id for sid, _ in shared_stops)
 
-    # Get all relevant trips (J and maybe Z)
-    all_trips = []
+    # J trains always count; Z trains only at shared stations
+    routes = ['J', 'Z'] if is_shared else ['J']
+    mask = trip_mask(feed, routes, direction_id, service_id, date)
 
-    # J trips
-    j_trips = feed.trips[
-        (feed.trips['route_id'] == 'J') &
-        (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
-    ]
-    all_trips.extend(j_trips['trip_id'].tolist())
-
-    # Z trips (only for shared stations)
-    if is_shared:
-        z_trips = feed.trips[
-            (feed.trips['route_id'] == 'Z') &
-            (feed.trips['direction_id'] == direction_id) &
-            (feed.trips['service_id'] == service_id)
-        ]
-        all_trips.extend(z_trips['trip_id'].tolist())
-
-    # Get stop times at this station
-    stop_times = feed.stop_times[
-        (feed.stop_times['stop_id'] == stop_id) &
-        (feed.stop_times['trip_id'].isin(all_trips))
-    ].sort_values('departure_time').copy()
-
-    if len(stop_times) == 0:
+    trip_idx, departure_s = get_stop_departures(feed, stop_id)
+    keep = (trip_idx >= 0) & mask[np.maximum(trip_idx, 0)]
+    departures = pd.DataFrame({'hour': departure_s[keep] // 3600, 'departure_s': departure_s[keep]})
+
+    if len(departures) == 0:
         return pd.DataFrame()
 
-    # Extract hour
-    stop_times['hour'] = stop_times['departure_time'].apply(
-        lambda x: int(x.split(':')[0])
+    # Filter by hour range if specified
+    if hour_range is not None:
+        start_hour, end_hour = hour_range
+        departures = departures[(departures['hour'] >= start_hour) & (departures['hour'] < end_hour)]
+
+    results = _hourly_headway_stats(departures, [])
+    if results.empty:
+        return pd.DataFrame()
+
+    # Check if Z is active during each hour
+    results['z_active'] = results['hour'].isin(z_hours)
+    results['station_type'] = 'J-only' if is_j_only else 'Shared (J+Z)'
+    return results
+
+
+def _hourly_headway_stats(departures, keys):
+    """
+    Headway statistics per hour (and key columns) in one grouped diff.
+
+    Headways are measured between consecutive trains within the same hour, so
+    each hour with fewer than 2 trains is dropped.
+
+    Parameters:
+    -----------
+    departures : pd.DataFrame
+        Columns keys + hour, departure_s
+    keys : list of str
+        Grouping columns in addition to the hour (e.g., ['stop_id'])
+
+    Returns:
+    --------
+    pd.DataFrame
+        keys + hour, num_trains, avg_headway, min_headway, max_headway
+        (minutes), sorted by keys and hour
+    """
+    columns = keys + ['hour', 'num_trains', 'avg_headway', 'min_headway', 'max_headway']
+    if departures.empty:
+        return pd.DataFrame(columns=columns)
+
+    group_cols = keys + ['hour']
+    departures = departures.sort_values(group_cols + ['departure_s'], kind='stable')
+
+    # Diff across the whole table, then blank out the first row of each group
+    headways = departures['departure_s'].diff() / 60.0
+    first_in_group = ~departures.duplicated(group_cols)
+    departures = departures.assign(headway=headways.mask(first_in_group))
+
+    grouped = departures.groupby(group_cols)
+    stats = grouped['headway'].agg(['mean', 'min', 'max'])
+    stats.columns = ['avg_headway', 'min_headway', 'max_headway']
+    stats.insert(0, 'num_trains', grouped.size())
+
+    stats = stats[stats['num_trains'] >= 2].reset_index()
+    return stats[columns]
+
+
+def get_station_headways(feed, direction_id=1, service_id='Weekday', hour_range=None, date=None):
+    """
+    Effective headways by hour at every J/Z station at once.
+
+    Same rules as get_effective_headway(): shared stations count J and Z
+    trains, J-only stations count J trains. All stations are computed in one
+    grouped diff over the per-stop departure arrays.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    direction_id : int, default=1
+        Direction ID (0 or 1)
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    hour_range : tuple of (int, int), optional
+        Hour range to filter (start_hour, end_hour)
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Columns stop_id, stop_name, station_type, hour, num_trains,
+        avg_headway, min_headway, max_headway, z_active
+    """
+    z_hours = get_z_service_hours(feed, service_id, date)
+    j_only_stops, z_only_stops, shared_stops = get_skip_stop_stations(
+        feed, direction_id, service_id, date
     )
 
-    # Filter by hour range if specified
+    stations = pd.DataFrame(
+        [(stop_id, stop_name, 'J-only') for stop_id, stop_name in j_only_stops] +
+        [(stop_id, stop_name, 'Shared (J+Z)') for stop_id, stop_name in shared_stops],
+        columns=['stop_id', 'stop_name', 'station_type']
+    )
+    columns = ['stop_id', 'stop_name', 'station_type', 'hour', 'num_trains',
+               'avg_headway', 'min_headway', 'max_headway', 'z_active']
+    if stations.empty:
+        return pd.DataFrame(columns=columns)
+
+    j_mask = trip_mask(feed, 'J', direction_id, service_id, date)
+    jz_mask = trip_mask(feed, ['J', 'Z'], direction_id, service_id, date)
+
+    frames = []
+    for station in stations.itertuples(index=False):
+        mask = jz_mask if station.station_type == 'Shared (J+Z)' else j_mask
+        trip_idx, departure_s = get_stop_departures(feed, station.stop_id)
+        keep = (trip_idx >= 0) & mask[np.maximum(trip_idx, 0)]
+        frames.append(pd.DataFrame({'stop_id': station.stop_id, 'departure_s': departure_s[keep]}))
+
+    departures = pd.concat(frames, ignore_index=True)
+    departures['hour'] = departures['departure_s'] // 3600
     if hour_range is not None:
         start_hour, end_hour = hour_range
-        stop_times = stop_times[
-            (stop_times['hour'] >= start_hour) &
-            (stop_times['hour'] < end_hour)
-        ]
-
-    # Calculate headways by hour
-    results = []
-    for hour in sorted(stop_times['hour'].unique()):
-        hour_stops = stop_times[stop_times['hour'] == hour].sort_values('departure_time')
-
-        if len(hour_stops) < 2:
-            continue
-
-        # Calculate time differences
-        times = pd.to_datetime(hour_stops['departure_time'], format='%H:%M:%S')
-        headways = times.diff().dt.total_seconds() / 60  # Convert to minutes
-        headways = headways[headways.notna()]
-
-        if len(headways) == 0:
-            continue
-
-        # Check if Z is active during this hour
-        z_active = hour in z_hours
-
-        results.append({
-            'hour': hour,
-            'num_trains': len(hour_stops),
-            'avg_headway': headways.mean(),
-            'min_headway': headways.min(),
-            'max_headway': headways.max(),
-            'z_active': z_active,
-            'station_type': 'J-only' if is_j_only else 'Shared (J+Z)'
-        })
+        departures = departures[(departures['hour'] >= start_hour) & (departures['hour'] < end_hour)]
 
-    return pd.DataFrame(results)
+    results = _hourly_headway_stats(departures, ['stop_id'])
+    results = results.merge(stations, on='stop_id', how='left')
+    results['z_active'] = results['hour'].isin(z_hours)
 
+    # Keep station order along the line
+    order = {stop_id: i for i, stop_id in enumerate(stations['stop_id'])}
+    results = results.sort_values(['stop_id', 'hour'], key=lambda col: col.map(order) if col.name == 'stop_id' else col)
+    return results[columns].reset_index(drop=True)
 
-def get_express_service_window(feed, direction_id, service_id='Weekday'):
+
+def get_express_service_window(feed, direction_id, service_id='Weekday', date=None):
     """
     Get the service window for express J trains and Z trains.
 
@@ -395,6 +466,9 @@ def get_express_service_window(feed, direction_id, service_id='Weekday'):
         Direction ID (0 or 1)
     service_id : str, default='Weekday'
         Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -406,13 +480,13 @@ def get_express_service_window(feed, direction_id, service_id='Weekday'):
     j_trips = feed.trips[
         (feed.trips['route_id'] == 'J') &
         (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
+        service_mask(feed, feed.trips, service_id, date)
     ]
 
     z_trips = feed.trips[
         (feed.trips['route_id'] == 'Z') &
         (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
+        service_mask(feed, feed.trips, service_id, date)
     ]
 
     # Get the stop IDs for the express-defining stations
@@ -420,33 +494,27 @@ def get_express_service_window(feed, direction_id, service_id='Weekday'):
     express_skip_stops = feed.stops[
         feed.stops['stop_name'].str.contains('Hewes St|Lorimer St|Flushing Av', case=False, na=False)
     ]
-    express_skip_stop_ids = set(express_skip_stops['stop_id'])
 
     # Find express J trips (those that don't stop at Hewes, Lorimer, or Flushing)
-    express_j_times = []
-
-    for trip_id in j_trips['trip_id']:
-        trip_stops = feed.stop_times[feed.stop_times['trip_id'] == trip_id]
-        stop_ids = set(trip_stops['stop_id'])
-
-        # Check if this trip skips all three express-defining stations
-        skips_express_stops = len(express_skip_stop_ids & stop_ids) == 0
-
-        if skips_express_stops:
-            # This is an express J trip
-            first_stop_time = trip_stops.sort_values('stop_sequence').iloc[0]
-            express_j_times.append(first_stop_time['departure_time'])
+    # by testing each trip's stop pattern bitset against those stops
+    catalog = get_pattern_catalog(feed)
+    skip_bits = catalog.encode(express_skip_stops['stop_id'])
+    trips = get_trip_table(feed)
+    trip_positions = pd.Series(np.arange(len(trips)), index=trips['trip_id'])
+    departures = trips['first_departure_s'].to_numpy()
+
+    def first_departures(trip_ids):
+        positions = trip_positions.reindex(trip_ids).dropna().to_numpy(dtype=np.int64)
+        return positions, departures[positions]
+
+    j_positions, j_departures = first_departures(j_trips['trip_id'])
+    j_patterns = catalog.trip_patterns(j_positions)
+    served = popcount(catalog.bits[j_patterns] & skip_bits)
+    express_j_times = [seconds_to_gtfs_time(t) for t in np.sort(j_departures[served == 0])]
 
     # Get Z trip times
-    z_times = []
-    for trip_id in z_trips['trip_id']:
-        trip_stops = feed.stop_times[feed.stop_times['trip_id'] == trip_id]
-        first_stop_time = trip_stops.sort_values('stop_sequence').iloc[0]
-        z_times.append(first_stop_time['departure_time'])
-
-    # Sort times
-    express_j_times = sorted(express_j_times) if express_j_times else []
-    z_times = sorted(z_times) if z_times else []
+    _, z_departures = first_departures(z_trips['trip_id'])
+    z_times = [seconds_to_gtfs_time(t) for t in np.sort(z_departures)]
 
     # Return tuple
     first_express_j = express_j_times[0] if express_j_times else None
@@ -457,7 +525,220 @@ def get_express_service_window(feed, direction_id, service_id='Weekday'):
     return (first_express_j, first_z, last_z, last_express_j)
 
 
-def print_service_timeline(feed, service_id='Weekday'):
+def _corridor_partition(catalog, pattern_a, pattern_b, max_run):
+    """
+    Split the corridor two patterns share into A-only, B-only and shared stops.
+
+    The corridor runs from the first to the last stop both patterns make (in
+    A's stop order). Stops outside it (branches, short turns) are ignored.
+
+    Returns:
+    --------
+    tuple or None
+        (a_only, b_only, shared) arrays of stop index positions in corridor
+        order, or None if the patterns do not look like skip-stop service:
+        they share fewer than 2 stops, or a run of more than max_run
+        consecutive stops between two shared stops is served by only one of
+        them (two different lines that meet at both ends).
+    """
+    seq_a = catalog.sequences[pattern_a]
+    seq_b = catalog.sequences[pattern_b]
+    bits_a = catalog.bits[pattern_a]
+    bits_b = catalog.bits[pattern_b]
+
+    shared_in_a = np.flatnonzero(catalog.contains(bits_b, seq_a))
+    shared_in_b = np.flatnonzero(catalog.contains(bits_a, seq_b))
+    if len(shared_in_a) < 2 or len(shared_in_b) < 2:
+        return None
+
+    corridor_a = seq_a[shared_in_a[0]:shared_in_a[-1] + 1]
+    corridor_b = seq_b[shared_in_b[0]:shared_in_b[-1] + 1]
+
+    # Runs of single-pattern stops between consecutive shared stops
+    for gaps in (np.diff(shared_in_a) - 1, np.diff(shared_in_b) - 1):
+        if len(gaps) and gaps.max() > max_run:
+            return None
+
+    a_only = corridor_a[~catalog.contains(bits_b, corridor_a)]
+    b_only = corridor_b[~catalog.contains(bits_a, corridor_b)]
+    shared = corridor_a[catalog.contains(bits_b, corridor_a)]
+    return a_only, b_only, shared
+
+
+def find_skip_stop_patterns(feed, route_ids=None, direction_id=None, service_id='Weekday', date=None,
+                            min_trips=2, min_skipped=1, max_run=3):
+    """
+    Find complementary skip-stop service between any pair of stop patterns.
+
+    Generalizes the J/Z analysis to the whole system. Trips are grouped by
+    their exact stop pattern (see stop_patterns.py), and every pair of
+    patterns running in the same direction is compared with bit operations.
+    A pair is reported when, along the corridor they share, each pattern
+    serves stations the other skips ("A stops" and "B stops") while both
+    serve the rest ("AB stops") - the classic skip-stop layout. Pairs where
+    one pattern simply makes a subset of the other's stops are ordinary
+    express/local service and are not reported.
+
+    Pairs with the same A/B/AB split (e.g., short turns of the same
+    patterns) are merged into one row.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    route_ids : str or list of str, optional
+        Routes to include. If None, sweeps every route.
+    direction_id : int, optional
+        Direction ID (0 or 1). If None, checks both directions.
+    service_id : str, default='Weekday'
+        Service ID to filter by. None includes all services.
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
+    min_trips : int, default=2
+        Ignore patterns run by fewer trips than this
+    min_skipped : int, default=1
+        Minimum number of corridor stations each side must skip
+    max_run : int, default=3
+        Longest run of consecutive stations served by only one pattern
+        between two shared stations. Longer runs mean the patterns use
+        different lines between the shared stations.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per skip-stop pair with columns:
+        - direction_id
+        - routes_a, routes_b (str): Routes running each pattern ('J', 'J/Z')
+        - a_stops, b_stops (list): (stop_id, stop_name) served only by A / B
+        - num_shared_stops (int): Corridor stations both serve
+        - corridor_start, corridor_end (str): First and last shared station
+        - trips_a, trips_b (int): Number of trips on each side
+        - first_a, last_a, first_b, last_b (str): Service window of each side
+          (first departures, HH:MM:SS)
+
+    Examples:
+    ---------
+    >>> pairs = find_skip_stop_patterns(feed, service_id='Weekday')
+    >>> pairs[['routes_a', 'routes_b', 'first_a', 'last_a', 'first_b', 'last_b']]
+    """
+    catalog = get_pattern_catalog(feed)
+    trips = get_trip_table(feed)
+    stop_names = get_stop_name_lookup(feed)
+
+    selected = np.flatnonzero(trip_mask(feed, route_ids, direction_id, service_id, date))
+    selected = selected[catalog.trip_patterns(selected) >= 0]
+
+    # One row per (direction, pattern) with its trips
+    clusters = pd.DataFrame({
+        'direction_id': trips['direction_id'].to_numpy()[selected],
+        'pattern': catalog.trip_patterns(selected),
+        'route_id': trips['route_id'].to_numpy()[selected],
+        'departure_s': trips['first_departure_s'].to_numpy()[selected],
+    })
+
+    columns = ['direction_id', 'routes_a', 'routes_b', 'a_stops', 'b_stops', 'num_shared_stops',
+               'corridor_start', 'corridor_end', 'trips_a', 'trips_b',
+               'first_a', 'last_a', 'first_b', 'last_b']
+    if clusters.empty:
+        return pd.DataFrame(columns=columns)
+
+    trip_counts = clusters.groupby(['direction_id', 'pattern']).size()
+    frequent = trip_counts[trip_counts >= min_trips].reset_index()[['direction_id', 'pattern']]
+
+    # Candidate pairs: each pattern serves at least min_skipped stops the
+    # other skips, and they share at least 2 (popcounts over all pairs at once)
+    merged = {}
+    for direction, group in frequent.groupby('direction_id'):
+        patterns = group['pattern'].to_numpy()
+        bits = catalog.bits[patterns]
+        only_a = popcount(bits[:, None, :] & ~bits[None, :, :])
+        both = popcount(bits[:, None, :] & bits[None, :, :])
+        candidates = (only_a >= min_skipped) & (only_a.T >= min_skipped) & (both >= 2)
+
+        for i, j in zip(*np.nonzero(np.triu(candidates, k=1))):
+            partition = _corridor_partition(catalog, patterns[i], patterns[j], max_run)
+            if partition is None:
+                continue
+            a_only, b_only, shared = partition
+            if len(a_only) < min_skipped or len(b_only) < min_skipped:
+                continue
+
+            # Orient pairs consistently so the same split from different
+            # short turns lands on one key
+            pattern_a, pattern_b = patterns[i], patterns[j]
+            if a_only.tobytes() > b_only.tobytes():
+                a_only, b_only = b_only, a_only
+                pattern_a, pattern_b = pattern_b, pattern_a
+
+            key = (direction, a_only.tobytes(), b_only.tobytes())
+            entry = merged.setdefault(key, {'a_only': a_only, 'b_only': b_only, 'shared': shared,
+                                            'patterns_a': set(), 'patterns_b': set()})
+            entry['patterns_a'].add(pattern_a)
+            entry['patterns_b'].add(pattern_b)
+
+    def describe(positions):
+        return [(stop_id, stop_names.get(stop_id)) for stop_id in catalog.stop_ids[positions]]
+
+    rows = []
+    for (direction, _, _), entry in merged.items():
+        in_direction = clusters['direction_id'] == direction
+        side_a = clusters[in_direction & clusters['pattern'].isin(entry['patterns_a'])]
+        side_b = clusters[in_direction & clusters['pattern'].isin(entry['patterns_b'])]
+        shared_ids = catalog.stop_ids[entry['shared']]
+
+        rows.append({
+            'direction_id': direction,
+            'routes_a': '/'.join(sorted(side_a['route_id'].unique())),
+            'routes_b': '/'.join(sorted(side_b['route_id'].unique())),
+            'a_stops': describe(entry['a_only']),
+            'b_stops': describe(entry['b_only']),
+            'num_shared_stops': len(shared_ids),
+            'corridor_start': stop_names.get(shared_ids[0]),
+            'corridor_end': stop_names.get(shared_ids[-1]),
+            'trips_a': len(side_a),
+            'trips_b': len(side_b),
+            'first_a': seconds_to_gtfs_time(side_a['departure_s'].min()),
+            'last_a': seconds_to_gtfs_time(side_a['departure_s'].max()),
+            'first_b': seconds_to_gtfs_time(side_b['departure_s'].min()),
+            'last_b': seconds_to_gtfs_time(side_b['departure_s'].max()),
+        })
+
+    if not rows:
+        return pd.DataFrame(columns=columns)
+
+    return pd.DataFrame(rows, columns=columns).sort_values(
+        ['direction_id', 'routes_a', 'routes_b']
+    ).reset_index(drop=True)
+
+
+def print_skip_stop_patterns(feed, service_id='Weekday', date=None, **kwargs):
+    """
+    Print every skip-stop pair found by find_skip_stop_patterns().
+
+    Extra keyword arguments are passed to find_skip_stop_patterns().
+    """
+    pairs = find_skip_stop_patterns(feed, service_id=service_id, date=date, **kwargs)
+
+    print("="*80)
+    print("SKIP-STOP PATTERNS")
+    print("="*80)
+
+    if pairs.empty:
+        print("\nNo skip-stop service found.")
+        return
+
+    for pair in pairs.itertuples(index=False):
+        print(f"\nDirection {pair.direction_id}: {pair.routes_a} (A) / {pair.routes_b} (B), "
+              f"{pair.corridor_start} - {pair.corridor_end}")
+        print(f"  A: {pair.trips_a} trips, {pair.first_a} - {pair.last_a}")
+        print(f"  B: {pair.trips_b} trips, {pair.first_b} - {pair.last_b}")
+        print(f"  {pair.num_shared_stops} AB stations")
+        print(f"  A stations: {', '.join(name for _, name in pair.a_stops)}")
+        print(f"  B stations: {', '.join(name for _, name in pair.b_stops)}")
+
+
+def print_service_timeline(feed, service_id='Weekday', date=None):
     """
     Print a visual timeline showing express J and Z service windows for both directions.
 
@@ -467,14 +748,17 @@ def print_service_timeline(feed, service_id='Weekday'):
         A GTFS feed object loaded with gtfs_kit
     service_id : str, default='Weekday'
         Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
     """
     print("="*80)
     print("J/Z EXPRESS SERVICE TIMELINE")
     print("="*80)
 
     # Get service windows for both directions
-    dir0_times = get_express_service_window(feed, 0, service_id)
-    dir1_times = get_express_service_window(feed, 1, service_id)
+    dir0_times = get_express_service_window(feed, 0, service_id, date)
+    dir1_times = get_express_service_window(feed, 1, service_id, date)
 
     def format_time(time_str):
         """Convert HH:MM:SS to HH:MM for display"""
@@ -0,0 +1,524 @@
+#!/usr/bin/env python3
+"""
+Station complexes and in-complex transfers.
+
+The MTA's entrances dataset (station_data/MTA_Subway_Entrances_and_Exits_*.csv)
+has one row per street entrance, tagged with the Complex ID, MTA Station ID
+and GTFS Stop ID of the station it leads to. Joining it to the feed's parent
+stations groups stations into complexes - Times Sq-42 St (127, 902, R16)
+and 42 St-Port Authority (A27), for example, are all complex 611.
+
+Every pair of stations in the same complex gets an estimated transfer time:
+
+    transfer_s = TRANSFER_OVERHEAD_S + DETOUR_FACTOR * distance / WALK_SPEED_M_S
+
+where distance is the straight-line distance between the two stations'
+platform coordinates in feed.stops (or between their entrance centroids when
+a station has no coordinates). This is only an estimate - the real walk
+depends on stairs, mezzanines and corridors - and transfers.txt should win
+wherever it has an entry (see raptor.build_footpaths).
+
+The index is cached per feed with feed_index.get_feed_cache(), so complex,
+transfer and station stats lookups are dictionary lookups. The cached
+routing tables (raptor.get_raptor_network, csa.get_connection_table) and the
+station graph add these transfers to the transfers.txt ones.
+"""
+import glob
+import os
+
+import gtfs_kit as gk
+import numpy as np
+import pandas as pd
+
+from feed_index import get_feed_cache
+
+
+# Default location of the entrances dataset (the newest matching file is used)
+ENTRANCES_PATTERN = os.path.join('station_data', 'MTA_Subway_Entrances_and_Exits__*.csv')
+
+# Transfer time estimate: a fixed overhead for stairs and level changes,
+# plus walking time over the straight-line distance scaled up for corridors
+WALK_SPEED_M_S = 1.2
+DETOUR_FACTOR = 1.4
+TRANSFER_OVERHEAD_S = 60
+
+EARTH_RADIUS_M = 6371000.0
+
+# Entrance types that provide step-free access (matched against each part of
+# compound types, see match_entrance_types)
+ELEVATOR_TYPES = ('Elevator', 'Ramp')
+
+_COLUMNS = {
+    'GTFS Stop ID': 'station_id',
+    'Complex ID': 'complex_id',
+    'Station ID': 'mta_station_id',
+    'Stop Name': 'complex_name',
+    'Constituent Station Name': 'station_name',
+    'Division': 'division',
+    'Line': 'line',
+    'Borough': 'borough',
+    'Daytime Routes': 'daytime_routes',
+    'Entrance Type': 'entrance_type',
+    'Entry Allowed': 'entry_allowed',
+    'Exit Allowed': 'exit_allowed',
+    'Entrance Latitude': 'entrance_lat',
+    'Entrance Longitude': 'entrance_lon',
+}
+
+
+def find_entrances_csv(pattern=ENTRANCES_PATTERN):
+    """
+    Path of the newest entrances dataset matching pattern.
+
+    Raises:
+    -------
+    FileNotFoundError
+        If no file matches
+    """
+    matches = sorted(glob.glob(pattern))
+    if not matches:
+        raise FileNotFoundError(f"No entrances dataset matches {pattern}")
+    return matches[-1]
+
+
+def load_entrances(csv_path=None):
+    """
+    Load the MTA subway entrances dataset.
+
+    Parameters:
+    -----------
+    csv_path : str, optional
+        Path to the CSV. Defaults to the newest file matching
+        ENTRANCES_PATTERN.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per (entrance, station) with columns entrance_id (row of the
+        entrance in the CSV), station_id (GTFS parent station), complex_id,
+        mta_station_id, complex_name, station_name, division, line, borough,
+        daytime_routes (tuple), entrance_type, entry_allowed, exit_allowed
+        (bool), entrance_lat and entrance_lon. An entrance that leads to
+        several stations (GTFS Stop ID 'A32; D20' at W 4 St-Wash Sq) has one
+        row per station, all with the same entrance_id.
+    """
+    if csv_path is None:
+        csv_path = find_entrances_csv()
+
+    entrances = pd.read_csv(csv_path, dtype={'GTFS Stop ID': str, 'Daytime Routes': str})
+    entrances = entrances[list(_COLUMNS)].rename(columns=_COLUMNS)
+    entrances.insert(0, 'entrance_id', np.arange(len(entrances)))
+    entrances = entrances[entrances['station_id'].notna()].copy()
+
+    entrances['station_id'] = entrances['station_id'].str.split(';')
+    entrances = entrances.explode('station_id')
+    entrances['station_id'] = entrances['station_id'].str.strip()
+    entrances = entrances[entrances['station_id'] != '']
+    entrances['daytime_routes'] = entrances['daytime_routes'].fillna('').map(lambda r: tuple(r.split()))
+    for column in ('entry_allowed', 'exit_allowed'):
+        entrances[column] = entrances[column].astype(str).str.upper().eq('YES')
+    return entrances.reset_index(drop=True)
+
+
+def match_entrance_types(entrance_types, wanted):
+    """
+    Which entrances have one of the wanted types.
+
+    Compound types are split on '/' and match if any part does, so 'Ramp'
+    matches 'Stair/Ramp' and 'Stair/Ramp/Walkway'.
+
+    Parameters:
+    -----------
+    entrance_types : array-like of str
+        Entrance Type of each entrance
+    wanted : str or iterable of str
+        Single entrance types (e.g., ELEVATOR_TYPES)
+
+    Returns:
+    --------
+    np.ndarray
+        Boolean array aligned with entrance_types
+    """
+    wanted = {wanted} if isinstance(wanted, str) else set(wanted)
+    parts = pd.Series(entrance_types, dtype=object).fillna('').str.split('/')
+    return parts.map(lambda p: not wanted.isdisjoint(t.strip() for t in p)).to_numpy(dtype=bool)
+
+
+def _haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters (works on arrays)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def estimate_transfer_seconds(distance_m):
+    """
+    Estimated in-complex transfer time for a straight-line distance.
+
+    Parameters:
+    -----------
+    distance_m : float or np.ndarray
+        Distance between the two stations in meters
+
+    Returns:
+    --------
+    int or np.ndarray
+        Seconds, rounded to the nearest second
+    """
+    seconds = TRANSFER_OVERHEAD_S + DETOUR_FACTOR * np.asarray(distance_m, dtype=float) / WALK_SPEED_M_S
+    seconds = np.rint(seconds).astype(np.int64)
+    return int(seconds) if seconds.ndim == 0 else seconds
+
+
+def _assign_complexes(entrances):
+    """
+    Complex ID of each station in the entrances dataset.
+
+    A handful of stations are filed under more than one Complex ID (some
+    14 St-Union Sq entrances carry the 34 St-Herald Sq complex, and
+    61 St-Woodside has one complex per entrance). Such a station goes to the
+    candidate complex whose other stations' entrances are nearest; among
+    candidates with no other stations, the one with the most entrances wins.
+    """
+    votes = entrances.groupby(['station_id', 'complex_id']).size().rename('n').reset_index()
+    ambiguous = votes['station_id'].duplicated(keep=False)
+
+    votes['distance_m'] = 0.0
+    centroids = entrances.groupby('station_id')[['entrance_lat', 'entrance_lon']].mean()
+    for k in np.flatnonzero(ambiguous.to_numpy()):
+        station_id, complex_id = votes.at[k, 'station_id'], votes.at[k, 'complex_id']
+        others = entrances[(entrances['complex_id'] == complex_id) & (entrances['station_id'] != station_id)]
+        if len(others):
+            votes.at[k, 'distance_m'] = _haversine_m(
+                centroids.at[station_id, 'entrance_lat'], centroids.at[station_id, 'entrance_lon'],
+                others['entrance_lat'].mean(), others['entrance_lon'].mean()
+            )
+
+    votes = votes.sort_values(['station_id', 'distance_m', 'n', 'complex_id'], ascending=[True, True, False, True])
+    return votes.drop_duplicates('station_id').set_index('station_id')['complex_id']
+
+
+def build_station_table(feed, entrances):
+    """
+    One row per feed parent station found in the entrances dataset.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    entrances : pd.DataFrame
+        Output of load_entrances()
+
+    Returns:
+    --------
+    pd.DataFrame
+        Columns station_id, stop_name, complex_id, complex_name,
+        mta_station_id, division, line, borough, daytime_routes, stop_lat,
+        stop_lon, entrance_lat, entrance_lon, entrances, entry_entrances,
+        elevators (step-free entrances of the station itself),
+        station_accessible (the station has a step-free entrance where entry
+        is allowed) and accessible (some station of its complex does),
+        sorted by complex_id then station_id
+
+    Notes:
+    ------
+    The dataset often lists a complex's elevator under just one of its
+    stations (at Times Sq-42 St only 902 has one), so accessible is decided
+    per complex. This assumes the complex's stations are connected step-free
+    inside the station, which the entrances dataset cannot confirm.
+    """
+    stops = feed.stops
+    parents = stops[stops['location_type'].fillna(0).astype(int) == 1] if 'location_type' in stops.columns \
+        else stops[stops['parent_station'].isna()]
+    parents = parents[['stop_id', 'stop_name', 'stop_lat', 'stop_lon']].rename(columns={'stop_id': 'station_id'})
+
+    entrances = entrances[entrances['station_id'].isin(parents['station_id'])]
+
+    complexes = _assign_complexes(entrances)
+
+    grouped = entrances.groupby('station_id', sort=True)
+    step_free = pd.Series(match_entrance_types(entrances['entrance_type'], ELEVATOR_TYPES), index=entrances.index)
+    first = grouped[['mta_station_id', 'complex_name', 'division', 'line', 'borough', 'daytime_routes']].first()
+    table = pd.DataFrame({
+        'complex_id': complexes,
+        'entrance_lat': grouped['entrance_lat'].mean(),
+        'entrance_lon': grouped['entrance_lon'].mean(),
+        'entrances': grouped.size(),
+        'entry_entrances': grouped['entry_allowed'].sum(),
+        'elevators': step_free.groupby(entrances['station_id']).sum(),
+        'station_accessible': (step_free & entrances['entry_allowed']).groupby(entrances['station_id']).any(),
+    }).join(first)
+    table.index.name = 'station_id'
+
+    table = parents.merge(table.reset_index(), on='station_id', how='inner')
+    # Complex name from the station the complex's entrances mostly lead to
+    table['complex_name'] = table.groupby('complex_id')['complex_name'].transform(lambda n: n.mode().iloc[0])
+    for column in ('complex_id', 'mta_station_id', 'entrances', 'entry_entrances', 'elevators'):
+        table[column] = table[column].astype(int)
+    table['station_accessible'] = table['station_accessible'].astype(bool)
+    table['accessible'] = table.groupby('complex_id')['station_accessible'].transform('any').astype(bool)
+
+    # Every parent station in the dataset must land in exactly one complex
+    missing = sorted(set(entrances['station_id']) - set(table['station_id']))
+    duplicated = sorted(table.loc[table['station_id'].duplicated(), 'station_id'])
+    if missing or duplicated:
+        raise ValueError(f"Stations without exactly one complex: missing {missing}, duplicated {duplicated}")
+
+    columns = ['station_id', 'stop_name', 'complex_id', 'complex_name', 'mta_station_id', 'division', 'line',
+               'borough', 'daytime_routes', 'stop_lat', 'stop_lon', 'entrance_lat', 'entrance_lon',
+               'entrances', 'entry_entrances', 'elevators', 'station_accessible', 'accessible']
+    return table[columns].sort_values(['complex_id', 'station_id']).reset_index(drop=True)
+
+
+def build_complex_transfers(stations):
+    """
+    Estimated transfers between every pair of stations in the same complex.
+
+    Parameters:
+    -----------
+    stations : pd.DataFrame
+        Output of build_station_table()
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per ordered (from_station, to_station) pair with columns
+        complex_id, from_station, to_station, distance_m and transfer_s
+    """
+    lat = stations['stop_lat'].fillna(stations['entrance_lat'])
+    lon = stations['stop_lon'].fillna(stations['entrance_lon'])
+    located = stations.assign(lat=lat, lon=lon)[['complex_id', 'station_id', 'lat', 'lon']]
+
+    pairs = located.merge(located, on='complex_id', suffixes=('_from', '_to'))
+    pairs = pairs[pairs['station_id_from'] != pairs['station_id_to']]
+
+    distance = _haversine_m(pairs['lat_from'], pairs['lon_from'], pairs['lat_to'], pairs['lon_to'])
+    transfers = pd.DataFrame({
+        'complex_id': pairs['complex_id'].to_numpy(),
+        'from_station': pairs['station_id_from'].to_numpy(),
+        'to_station': pairs['station_id_to'].to_numpy(),
+        'distance_m': np.round(distance, 1),
+        'transfer_s': estimate_transfer_seconds(distance),
+    })
+    return transfers.sort_values(['complex_id', 'from_station', 'to_station']).reset_index(drop=True)
+
+
+class StationComplexIndex:
+    """
+    Station complexes, in-complex transfers and station stats for one feed.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    csv_path : str, optional
+        Entrances dataset. Defaults to the newest file matching
+        ENTRANCES_PATTERN.
+
+    Attributes:
+    -----------
+    stations : pd.DataFrame
+        Output of build_station_table()
+    transfers : pd.DataFrame
+        Output of build_complex_transfers()
+    station_to_complex : dict
+        Parent station ID -> complex ID
+    complex_stations : dict
+        Complex ID -> tuple of parent station IDs
+    transfer_seconds : dict
+        (from_station, to_station) -> estimated transfer seconds
+    accessible_stations : frozenset
+        Parent station IDs whose complex has a step-free entrance where
+        entry is allowed (see build_station_table())
+    """
+
+    def __init__(self, feed, csv_path=None):
+        self.stations = build_station_table(feed, load_entrances(csv_path))
+        self.transfers = build_complex_transfers(self.stations)
+
+        self.station_to_complex = dict(zip(self.stations['station_id'], self.stations['complex_id']))
+        self.complex_stations = {
+            complex_id: tuple(group) for complex_id, group in self.stations.groupby('complex_id')['station_id']
+        }
+        self.transfer_seconds = dict(zip(
+            zip(self.transfers['from_station'], self.transfers['to_station']), self.transfers['transfer_s']
+        ))
+        self.accessible_stations = frozenset(self.stations.loc[self.stations['accessible'], 'station_id'])
+        self._rows = {station_id: i for i, station_id in enumerate(self.stations['station_id'])}
+
+    def complex_of(self, station_id):
+        """Complex ID of a parent station, or None if it is not in the dataset."""
+        return self.station_to_complex.get(station_id)
+
+    def same_complex(self, station_a, station_b):
+        """Whether two parent stations belong to the same complex."""
+        complex_id = self.station_to_complex.get(station_a)
+        return complex_id is not None and complex_id == self.station_to_complex.get(station_b)
+
+    def transfer_time(self, from_station, to_station):
+        """
+        Estimated transfer seconds between two stations of one complex.
+
+        Returns:
+        --------
+        int or None
+            0 for the same station, None if the stations are not in the same
+            complex
+        """
+        if from_station == to_station:
+            return 0
+        return self.transfer_seconds.get((from_station, to_station))
+
+    def transfers_from(self, station_id):
+        """
+        Stations reachable by an in-complex transfer.
+
+        Returns:
+        --------
+        dict
+            Other station ID -> estimated transfer seconds
+        """
+        complex_id = self.station_to_complex.get(station_id)
+        if complex_id is None:
+            return {}
+        return {other: self.transfer_seconds[(station_id, other)]
+                for other in self.complex_stations[complex_id] if other != station_id}
+
+    def station_stats(self, station_id):
+        """
+        Summary of one parent station.
+
+        Parameters:
+        -----------
+        station_id : str
+            Parent station ID (e.g., '127')
+
+        Returns:
+        --------
+        dict
+            station_id, stop_name, complex_id, complex_name, borough,
+            daytime_routes (every route serving the complex), entrances,
+            entry_entrances, elevators, station_accessible, accessible and
+            transfers (other station ID -> seconds)
+
+        Raises:
+        -------
+        KeyError
+            If the station is not in the entrances dataset
+        """
+        row = self.stations.iloc[self._rows[station_id]]
+        return {
+            'station_id': station_id,
+            'stop_name': row['stop_name'],
+            'complex_id': int(row['complex_id']),
+            'complex_name': row['complex_name'],
+            'borough': row['borough'],
+            'daytime_routes': row['daytime_routes'],
+            'entrances': int(row['entrances']),
+            'entry_entrances': int(row['entry_entrances']),
+            'elevators': int(row['elevators']),
+            'station_accessible': bool(row['station_accessible']),
+            'accessible': bool(row['accessible']),
+            'transfers': self.transfers_from(station_id),
+        }
+
+    def complex_table(self):
+        """
+        One row per complex.
+
+        Returns:
+        --------
+        pd.DataFrame
+            Columns complex_id, complex_name, stations (tuple of parent
+            station IDs), n_stations, daytime_routes, entrances, elevators
+            and max_transfer_s (longest in-complex transfer, 0 for single
+            station complexes)
+        """
+        grouped = self.stations.groupby('complex_id', sort=True)
+        table = pd.DataFrame({
+            'complex_name': grouped['complex_name'].first(),
+            'stations': grouped['station_id'].agg(tuple),
+            'n_stations': grouped.size(),
+            'daytime_routes': grouped['daytime_routes'].agg(lambda r: tuple(sorted(set().union(*r)))),
+            'entrances': grouped['entrances'].sum(),
+            'elevators': grouped['elevators'].sum(),
+        })
+        longest = self.transfers.groupby('complex_id')['transfer_s'].max()
+        table['max_transfer_s'] = longest.reindex(table.index).fillna(0).astype(int)
+        return table.reset_index()
+
+
+def get_station_complexes(feed, csv_path=None):
+    """
+    Get the cached StationComplexIndex for a feed.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    csv_path : str, optional
+        Entrances dataset. Defaults to the newest file matching
+        ENTRANCES_PATTERN.
+
+    Returns:
+    --------
+    StationComplexIndex
+
+    Examples:
+    ---------
+    >>> complexes = get_station_complexes(feed)
+    >>> complexes.transfer_time('127', '902')   # Times Sq: 1/2/3 to the shuttle
+    >>> complexes.station_stats('127')['transfers']
+    """
+    if csv_path is None:
+        csv_path = find_entrances_csv()
+    key = ('station_complexes', os.path.abspath(csv_path))
+    cache = get_feed_cache(feed)
+    if key not in cache:
+        cache[key] = StationComplexIndex(feed, csv_path)
+    return cache[key]
+
+
+def get_complex_transfer_seconds(feed, csv_path=None):
+    """
+    In-complex transfer times for a feed, for raptor.build_footpaths().
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    csv_path : str, optional
+        Entrances dataset. Defaults to the newest file matching
+        ENTRANCES_PATTERN.
+
+    Returns:
+    --------
+    dict
+        (from_station, to_station) -> estimated seconds (the cached
+        StationComplexIndex.transfer_seconds), or an empty dict when no
+        entrances dataset is found, so routing falls back to transfers.txt
+    """
+    if csv_path is None:
+        try:
+            csv_path = find_entrances_csv()
+        except FileNotFoundError:
+            return {}
+    return get_station_complexes(feed, csv_path).transfer_seconds
+
+
+if __name__ == "__main__":
+    print(__doc__)
+
+    feed = gk.read_feed("gtfs_subway.zip", dist_units="m")
+    complexes = get_station_complexes(feed)
+
+    table = complexes.complex_table()
+    multi = table[table['n_stations'] > 1]
+    print(f"{len(table)} complexes, {len(multi)} with in-complex transfers\n")
+    print(multi[['complex_id', 'complex_name', 'stations', 'max_transfer_s']].to_string(index=False))
+
+    print()
+    stats = complexes.station_stats('127')
+    print(f"{stats['stop_name']} ({stats['complex_name']}): {' '.join(stats['daytime_routes'])}")
+    for station, seconds in stats['transfers'].items():
+        print(f"  transfer to {station}: {seconds / 60:.1f} min")
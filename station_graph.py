@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+All-pairs station travel times from a weighted station graph.
+
+A quicker, schedule-free alternative to raptor.py/csa.py for static book
+tables: for each hour of the day, build a directed graph whose nodes are
+parent stations and whose edges are
+
+- ride edges: boarding route R at station A and riding to station B, with
+  weight = expected wait for R at A + mean in-vehicle time A -> B.
+  In-vehicle times come from the hourly travel time cubes
+  (travel_times.get_travel_time_cube); the expected wait is half the mean
+  headway of R at A in that hour. When several routes connect A to B, the
+  fastest is kept.
+- transfer edges: walking between connected stations of a complex (e.g.
+  Times Sq-42 St on the 1/2/3 and on the 7), from transfers.txt plus the
+  estimated in-complex transfers of station_complexes.py for station pairs
+  transfers.txt does not list.
+
+Each path through the graph pays a wait every time it boards, so transfers
+are penalized naturally. All-pairs shortest paths for one hour are a single
+scipy.sparse.csgraph.shortest_path (Dijkstra) call.
+"""
+import gtfs_kit as gk
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import shortest_path
+
+import travel_times as tt
+from feed_index import get_stop_name_lookup, get_stop_times_table, get_trip_table, trip_mask
+from raptor import DEFAULT_TRANSFER_S, build_footpaths
+from service_calendar import resolve_service_ids
+from station_complexes import get_complex_transfer_seconds
+
+
+def get_expected_waits(feed, service_id='Weekday', date=None, route_ids=None):
+    """
+    Expected wait (half the mean headway) for each route, direction, station and hour.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date (e.g., '20241225'). If given, overrides service_id.
+    route_ids : list of str, optional
+        Routes to include. Defaults to every route.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Columns route_id, direction_id, station_id, hour (0-23, times past
+        24:00 wrap), trains and expected_wait (minutes). A station with n
+        trains in the hour has a mean headway of 60 / n minutes.
+    """
+    trips = get_trip_table(feed)
+    stop_times = get_stop_times_table(feed)
+
+    mask = trip_mask(feed, route_ids, None, resolve_service_ids(feed, service_id, date))
+    trip_idx = stop_times['trip_idx'].to_numpy()
+    rows = np.flatnonzero((trip_idx >= 0) & mask[np.maximum(trip_idx, 0)])
+    trip_idx = trip_idx[rows]
+
+    departures = pd.DataFrame({
+        'route_id': trips['route_id'].to_numpy()[trip_idx],
+        'direction_id': trips['direction_id'].to_numpy()[trip_idx],
+        'station_id': stop_times['station_id'].to_numpy()[rows],
+        'hour': (stop_times['departure_s'].to_numpy()[rows] // 3600) % 24,
+    })
+    # Trains leaving from their last stop don't take anyone anywhere
+    departures = departures[
+        stop_times['stop_id'].to_numpy()[rows] != trips['terminal_stop_id'].to_numpy()[trip_idx]
+    ]
+
+    waits = departures.groupby(['route_id', 'direction_id', 'station_id', 'hour']).size()
+    waits = waits.rename('trains').reset_index()
+    waits['expected_wait'] = 30.0 / waits['trains']
+    return waits
+
+
+def _transfer_edges(feed, station_ids, default_transfer_s=DEFAULT_TRANSFER_S):
+    """
+    Station-to-station transfer edges (minutes) between different parent stations.
+    """
+    stop_times = get_stop_times_table(feed)
+    platforms = stop_times.drop_duplicates('stop_id')
+    foot_from, foot_to, foot_s = build_footpaths(feed, platforms['station_id'].to_numpy().astype(object),
+                                                 default_transfer_s, get_complex_transfer_seconds(feed))
+    platform_stations = platforms['station_id'].to_numpy().astype(str)
+
+    edges = pd.DataFrame({
+        'from_station': platform_stations[foot_from],
+        'to_station': platform_stations[foot_to],
+        'minutes': foot_s / 60.0,
+    })
+    edges = edges[edges['from_station'] != edges['to_station']]
+    edges = edges.groupby(['from_station', 'to_station'], as_index=False)['minutes'].min()
+
+    positions = {station_id: i for i, station_id in enumerate(station_ids)}
+    rows = edges['from_station'].map(positions)
+    cols = edges['to_station'].map(positions)
+    known = rows.notna() & cols.notna()
+    return (rows[known].to_numpy(dtype=np.int64), cols[known].to_numpy(dtype=np.int64),
+            edges['minutes'][known].to_numpy())
+
+
+def build_station_graphs(feed, service_id='Weekday', date=None, route_ids=None, hours=None,
+                         default_transfer_s=DEFAULT_TRANSFER_S):
+    """
+    Build one weighted station graph per hour.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date. If given, overrides service_id.
+    route_ids : list of str, optional
+        Routes to include. Defaults to every route.
+    hours : list of int, optional
+        Hours (0-23) to build. Defaults to all 24.
+    default_transfer_s : int, default=DEFAULT_TRANSFER_S
+        Transfer time for transfers.txt entries without min_transfer_time
+
+    Returns:
+    --------
+    tuple
+        (station_ids, graphs): sorted array of parent station IDs, and a
+        dict mapping hour -> scipy.sparse.csr_matrix of edge weights in
+        minutes (row = from station, column = to station)
+    """
+    hours = list(range(24)) if hours is None else list(hours)
+    trips = get_trip_table(feed)
+    if route_ids is None:
+        route_ids = sorted(trips['route_id'].dropna().unique())
+
+    waits = get_expected_waits(feed, service_id, date, route_ids)
+    station_ids = np.unique(get_stop_times_table(feed)['station_id'].to_numpy().astype(str))
+    positions = {station_id: i for i, station_id in enumerate(station_ids)}
+    hour_column = np.full(24, -1, dtype=np.int64)
+    hour_column[hours] = np.arange(len(hours))
+
+    edge_hours, edge_from, edge_to, edge_minutes = [], [], [], []
+    for (route_id, direction_id), route_waits in waits.groupby(['route_id', 'direction_id']):
+        cube = tt.get_travel_time_cube(feed, route_id, int(direction_id), service_id, date)
+        cube_stations = [str(s) for s in cube['station_ids']]
+        if not cube_stations:
+            continue
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ride = np.where(cube['counts'] > 0, cube['sums'] / np.maximum(cube['counts'], 1), np.nan)
+
+        # Expected wait by (hour, origin) over this route's stations
+        local = {station_id: i for i, station_id in enumerate(cube_stations)}
+        known = route_waits['station_id'].astype(str).map(local)
+        keep = known.notna().to_numpy()
+        wait = np.full((24, len(cube_stations)), np.nan)
+        wait[route_waits['hour'].to_numpy()[keep], known[keep].to_numpy(dtype=np.int64)] = \
+            route_waits['expected_wait'].to_numpy()[keep]
+
+        weights = wait[:, :, None] + ride
+        off_diagonal = ~np.eye(len(cube_stations), dtype=bool)
+        h, i, j = np.nonzero(np.isfinite(weights) & off_diagonal & (hour_column >= 0)[:, None, None])
+
+        global_positions = np.array([positions[s] for s in cube_stations], dtype=np.int64)
+        edge_hours.append(hour_column[h])
+        edge_from.append(global_positions[i])
+        edge_to.append(global_positions[j])
+        edge_minutes.append(weights[h, i, j])
+
+    n = len(station_ids)
+    if edge_hours:
+        edge_hours = np.concatenate(edge_hours)
+        edge_from = np.concatenate(edge_from)
+        edge_to = np.concatenate(edge_to)
+        edge_minutes = np.concatenate(edge_minutes)
+    else:
+        edge_hours = edge_from = edge_to = np.array([], dtype=np.int64)
+        edge_minutes = np.array([])
+
+    # Keep the fastest route for each (hour, from, to)
+    order = np.lexsort((edge_minutes, edge_to, edge_from, edge_hours))
+    edge_hours, edge_from, edge_to, edge_minutes = (a[order] for a in (edge_hours, edge_from, edge_to, edge_minutes))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = ((edge_hours[1:] != edge_hours[:-1]) | (edge_from[1:] != edge_from[:-1]) |
+                 (edge_to[1:] != edge_to[:-1]))
+    edge_hours, edge_from, edge_to, edge_minutes = (a[first] for a in (edge_hours, edge_from, edge_to, edge_minutes))
+
+    transfer_from, transfer_to, transfer_minutes = _transfer_edges(feed, station_ids, default_transfer_s)
+
+    graphs = {}
+    for k, hour in enumerate(hours):
+        in_hour = edge_hours == k
+        rows = np.concatenate((edge_from[in_hour], transfer_from))
+        cols = np.concatenate((edge_to[in_hour], transfer_to))
+        data = np.concatenate((edge_minutes[in_hour], transfer_minutes))
+
+        # A transfer edge and a ride edge between the same stations: keep the faster
+        order = np.lexsort((data, cols, rows))
+        rows, cols, data = rows[order], cols[order], data[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        graphs[hour] = csr_matrix((data[first], (rows[first], cols[first])), shape=(n, n))
+
+    return station_ids, graphs
+
+
+def calculate_all_pairs_travel_times(feed, service_id='Weekday', date=None, hours=None, route_ids=None,
+                                     default_transfer_s=DEFAULT_TRANSFER_S):
+    """
+    Shortest expected travel time between every pair of stations, for each hour.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date. If given, overrides service_id.
+    hours : list of int, optional
+        Hours (0-23) to compute. Defaults to all 24.
+    route_ids : list of str, optional
+        Routes to include. Defaults to every route.
+    default_transfer_s : int, default=DEFAULT_TRANSFER_S
+        Transfer time for transfers.txt entries without min_transfer_time
+
+    Returns:
+    --------
+    dict
+        Dictionary with:
+        - 'station_ids': sorted array of parent station IDs
+        - 'hours': list of hours
+        - 'minutes': float array (n_hours, n_stations, n_stations) of
+          expected minutes (wait + ride + transfers) from row station to
+          column station; inf if unreachable, 0 on the diagonal
+
+    Examples:
+    ---------
+    >>> result = calculate_all_pairs_travel_times(feed, 'Weekday', hours=[8, 12, 18])
+    >>> matrix = get_travel_time_matrix(feed, result, 8)
+    """
+    hours = list(range(24)) if hours is None else list(hours)
+    station_ids, graphs = build_station_graphs(feed, service_id, date, route_ids, hours, default_transfer_s)
+
+    minutes = np.empty((len(hours), len(station_ids), len(station_ids)))
+    for k, hour in enumerate(hours):
+        minutes[k] = shortest_path(graphs[hour], method='D', directed=True)
+
+    return {'station_ids': station_ids, 'hours': hours, 'minutes': minutes}
+
+
+def get_travel_time_matrix(feed, result, hour, station_ids=None):
+    """
+    One hour of calculate_all_pairs_travel_times() as a labeled DataFrame.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit (for station names)
+    result : dict
+        Output of calculate_all_pairs_travel_times()
+    hour : int
+        Hour to return (must be one of result['hours'])
+    station_ids : list of str, optional
+        Stations to include, in order. Defaults to all.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Minutes from row station to column station (NaN if unreachable),
+        indexed by station name
+    """
+    positions = {station_id: i for i, station_id in enumerate(result['station_ids'])}
+    if station_ids is None:
+        station_ids = list(result['station_ids'])
+    idx = [positions[s] for s in station_ids]
+
+    matrix = result['minutes'][result['hours'].index(hour)][np.ix_(idx, idx)]
+    matrix = np.where(np.isfinite(matrix), matrix, np.nan)
+
+    names = get_stop_name_lookup(feed)
+    labels = [names.get(s, s) for s in station_ids]
+    return pd.DataFrame(matrix, index=labels, columns=labels)
+
+
+if __name__ == "__main__":
+    import time
+
+    print(__doc__)
+
+    feed = gk.read_feed("gtfs_subway.zip", dist_units="m")
+
+    start = time.perf_counter()
+    result = calculate_all_pairs_travel_times(feed, 'Weekday')
+    n = len(result['station_ids'])
+    print(f"{n} x {n} stations x {len(result['hours'])} hours in {time.perf_counter() - start:.1f}s")
+
+    # 8 AM, from Van Cortlandt Park-242 St
+    matrix = get_travel_time_matrix(feed, result, 8)
+    print(matrix.iloc[0].dropna().sort_values().round(1).to_string())
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Bitset representation of trip stop patterns.
+
+Every stop that appears in stop_times gets a position in a systemwide stop
+index. A stop pattern (the exact sequence of stops a trip makes) is stored
+once, both as its ordered sequence and as a bit array over that index, packed
+into uint64 words. Trips point at their pattern by ID, so the thousands of
+trips on a route collapse to a handful of distinct patterns.
+
+With patterns as bitsets, the set questions the express/local and skip-stop
+code asks become word-wise bit operations:
+
+- Stops a pattern makes in a borough:   popcount(pattern & borough_mask)
+- Express in borough B (vs reference R): popcount(P & R & B) < popcount(R & B)
+- Stops J makes but Z skips:             J & ~Z
+
+and can be answered for every pattern at once with NumPy.
+"""
+import numpy as np
+
+from feed_index import get_feed_cache, get_stop_times_table, get_trip_table
+
+
+# Classification codes returned by classify_patterns()
+NOT_SERVED = 0
+LOCAL = 1
+EXPRESS = 2
+
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(bits):
+    """
+    Count set bits along the last axis of a uint64 bitset array.
+
+    Parameters:
+    -----------
+    bits : np.ndarray
+        uint64 array of shape (..., n_words)
+
+    Returns:
+    --------
+    np.ndarray
+        int array of shape (...)
+    """
+    bits = np.ascontiguousarray(bits, dtype=np.uint64)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+    # NumPy < 2.0: count through a per-byte lookup table
+    as_bytes = bits.view(np.uint8).reshape(bits.shape[:-1] + (-1,))
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=-1, dtype=np.int64)
+
+
+class PatternCatalog:
+    """
+    All distinct stop patterns in a feed, as sequences and as bitsets.
+
+    Parameters:
+    -----------
+    stop_times : pd.DataFrame
+        Sorted stop times from feed_index.get_stop_times_table()
+    trip_table : pd.DataFrame
+        Trip table from feed_index.get_trip_table()
+
+    Attributes:
+    -----------
+    stop_ids : np.ndarray
+        Sorted array of every stop ID in stop_times (the stop index)
+    n_words : int
+        Number of uint64 words per bitset
+    sequences : list of np.ndarray
+        Ordered stop index positions of each pattern
+    bits : np.ndarray
+        uint64 array of shape (n_patterns, n_words)
+    sizes : np.ndarray
+        Number of stops in each pattern
+    trip_pattern : np.ndarray
+        Pattern ID of each row of the trip table (-1 if it has no stop times)
+    """
+
+    def __init__(self, stop_times, trip_table):
+        stop_id_values = stop_times['stop_id'].astype(object).to_numpy()
+        self.stop_ids = np.unique(stop_id_values)
+        self._positions = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+        self.n_words = max(1, (len(self.stop_ids) + 63) // 64)
+
+        codes = np.searchsorted(self.stop_ids, stop_id_values)
+        trip_idx = stop_times['trip_idx'].to_numpy()
+
+        # Rows of each trip in the sorted stop times table
+        if len(trip_idx):
+            starts = np.concatenate(([0], np.flatnonzero(trip_idx[1:] != trip_idx[:-1]) + 1))
+        else:
+            starts = np.array([], dtype=np.int64)
+        ends = np.append(starts[1:], len(trip_idx))
+
+        pattern_ids = {}
+        self.sequences = []
+        self.trip_pattern = np.full(len(trip_table), -1, dtype=np.int64)
+
+        for start, end in zip(starts, ends):
+            if trip_idx[start] < 0:
+                continue
+            sequence = codes[start:end]
+            key = sequence.tobytes()
+            pattern = pattern_ids.get(key)
+            if pattern is None:
+                pattern = len(self.sequences)
+                pattern_ids[key] = pattern
+                self.sequences.append(sequence)
+            self.trip_pattern[trip_idx[start]] = pattern
+
+        self.bits = np.zeros((len(self.sequences), self.n_words), dtype=np.uint64)
+        if self.sequences:
+            rows = np.repeat(np.arange(len(self.sequences)), [len(s) for s in self.sequences])
+            positions = np.concatenate(self.sequences)
+            np.bitwise_or.at(self.bits, (rows, positions >> 6),
+                             np.left_shift(np.uint64(1), (positions & 63).astype(np.uint64)))
+        self.sizes = popcount(self.bits)
+
+    def __len__(self):
+        return len(self.sequences)
+
+    def encode(self, stop_ids):
+        """
+        Build a bitset from stop IDs. Stops not in the index are ignored.
+
+        Parameters:
+        -----------
+        stop_ids : iterable of str
+
+        Returns:
+        --------
+        np.ndarray
+            uint64 array of shape (n_words,)
+        """
+        positions = np.array([self._positions[s] for s in stop_ids if s in self._positions],
+                             dtype=np.int64)
+        bits = np.zeros(self.n_words, dtype=np.uint64)
+        np.bitwise_or.at(bits, positions >> 6,
+                         np.left_shift(np.uint64(1), (positions & 63).astype(np.uint64)))
+        return bits
+
+    def contains(self, bits, positions):
+        """
+        Test stop index positions for membership in a bitset.
+
+        Parameters:
+        -----------
+        bits : np.ndarray
+            uint64 bitset of shape (n_words,)
+        positions : np.ndarray
+            Stop index positions
+
+        Returns:
+        --------
+        np.ndarray
+            Boolean array aligned with positions
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        words = bits[positions >> 6]
+        return (np.right_shift(words, (positions & 63).astype(np.uint64)) & np.uint64(1)).astype(bool)
+
+    def pattern_stop_ids(self, pattern):
+        """Ordered stop IDs of a pattern."""
+        return self.stop_ids[self.sequences[pattern]].tolist()
+
+    def trip_patterns(self, trip_positions):
+        """Pattern ID of each trip table row in trip_positions (-1 if none)."""
+        return self.trip_pattern[np.asarray(trip_positions, dtype=np.int64)]
+
+
+def get_pattern_catalog(feed):
+    """
+    Get the cached PatternCatalog for a feed.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+
+    Returns:
+    --------
+    PatternCatalog
+    """
+    cache = get_feed_cache(feed)
+    if 'pattern_catalog' not in cache:
+        cache['pattern_catalog'] = PatternCatalog(get_stop_times_table(feed), get_trip_table(feed))
+    return cache['pattern_catalog']
+
+
+def build_borough_masks(catalog, stop_borough_map):
+    """
+    Build one bitset per borough over the catalog's stop index.
+
+    Parameters:
+    -----------
+    catalog : PatternCatalog
+    stop_borough_map : dict
+        Dictionary mapping stop_id -> borough name (or None)
+
+    Returns:
+    --------
+    dict
+        Dictionary mapping borough -> uint64 bitset
+    """
+    stops_by_borough = {}
+    for stop_id in catalog.stop_ids:
+        borough = stop_borough_map.get(stop_id)
+        if borough:
+            stops_by_borough.setdefault(borough, []).append(stop_id)
+
+    return {borough: catalog.encode(stop_ids) for borough, stop_ids in stops_by_borough.items()}
+
+
+def classify_patterns(catalog, pattern_ids, reference_bits, borough_masks):
+    """
+    Classify patterns as express or local in each borough (vectorized).
+
+    Uses the same rules as express_local.classify_trip_express_local():
+    within a borough, compare the stops a pattern makes against the reference
+    "all stops" pattern's stops in that borough.
+    - Makes none of them: not served in that borough
+    - Makes all of them: local
+    - Makes at least 2 but not all: express
+    - Makes exactly 1 (short turn): local
+
+    Parameters:
+    -----------
+    catalog : PatternCatalog
+    pattern_ids : np.ndarray
+        Pattern IDs to classify (-1 entries are never served)
+    reference_bits : np.ndarray
+        uint64 bitset of the reference pattern
+    borough_masks : dict
+        Dictionary mapping borough -> uint64 bitset (see build_borough_masks)
+
+    Returns:
+    --------
+    dict
+        Dictionary mapping borough -> int array aligned with pattern_ids,
+        holding NOT_SERVED, LOCAL or EXPRESS. Only boroughs where the
+        reference pattern has stops are included.
+    """
+    pattern_ids = np.asarray(pattern_ids, dtype=np.int64)
+    valid = pattern_ids >= 0
+    patterns = np.zeros((len(pattern_ids), catalog.n_words), dtype=np.uint64)
+    patterns[valid] = catalog.bits[pattern_ids[valid]]
+
+    result = {}
+    for borough, mask in borough_masks.items():
+        reference_in_borough = reference_bits & mask
+        reference_count = int(popcount(reference_in_borough))
+        if reference_count == 0:
+            continue
+
+        served = popcount(patterns & reference_in_borough)
+        codes = np.full(len(pattern_ids), NOT_SERVED, dtype=np.int8)
+        codes[served > 0] = LOCAL
+        codes[(served >= 2) & (served < reference_count)] = EXPRESS
+        result[borough] = codes
+
+    return result
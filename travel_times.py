@@ -8,11 +8,12 @@ Rows = origin stations, Columns = destination stations, Values = travel time in
 import gtfs_kit as gk
 import pandas as pd
 import numpy as np
-from collections import defaultdict
 import os
+from feed_index import get_feed_cache, get_station_lookup, get_stop_times_table, trip_mask
+from service_calendar import resolve_service_ids, service_mask
 
 
-def identify_branches(feed, route_id, direction_id, service_id='Weekday'):
+def identify_branches(feed, route_id, direction_id, service_id='Weekday', date=None):
     """
     Identify branches for a multi-branch route.
 
@@ -28,6 +29,9 @@ def identify_branches(feed, route_id, direction_id, service_id='Weekday'):
         Direction ID (0 or 1)
     service_id : str, default='Weekday'
         Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -38,7 +42,7 @@ def identify_branches(feed, route_id, direction_id, service_id='Weekday'):
     trips = feed.trips[
         (feed.trips['route_id'] == route_id) &
         (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
+        service_mask(feed, feed.trips, service_id, date)
     ].copy()
 
     if trips.empty:
@@ -116,17 +120,10 @@ def normalize_stop_id(feed, stop_id):
     In GTFS, stops like H11N and H11S are different platforms at the same station H11.
     This function returns the parent station ID if it exists, otherwise the stop ID itself.
     """
-    stop_row = feed.stops[feed.stops['stop_id'] == stop_id]
-    if stop_row.empty:
-        return stop_id
+    return get_station_lookup(feed).get(stop_id, stop_id)
 
-    parent = stop_row['parent_station'].values[0]
-    if pd.notna(parent):
-        return parent
-    return stop_id
 
-
-def get_station_order(feed, route_id, direction_id, service_id='Weekday'):
+def get_station_order(feed, route_id, direction_id, service_id='Weekday', date=None):
     """
     Get the canonical ordering of stations for a route/direction.
 
@@ -143,6 +140,9 @@ def get_station_order(feed, route_id, direction_id, service_id='Weekday'):
         Direction ID (0 or 1)
     service_id : str, default='Weekday'
         Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -152,14 +152,14 @@ def get_station_order(feed, route_id, direction_id, service_id='Weekday'):
     trips = feed.trips[
         (feed.trips['route_id'] == route_id) &
         (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
+        service_mask(feed, feed.trips, service_id, date)
     ].copy()
 
     if trips.empty:
         return []
 
     # Check for branches
-    branch_point, branches_info = identify_branches(feed, route_id, direction_id, service_id)
+    branch_point, branches_info = identify_branches(feed, route_id, direction_id, service_id, date)
 
     stop_times = feed.stop_times[feed.stop_times['trip_id'].isin(trips['trip_id'])].copy()
     stop_times = stop_times.sort_values(['trip_id', 'stop_sequence'])
@@ -236,7 +236,7 @@ def get_station_order(feed, route_id, direction_id, service_id='Weekday'):
     return all_stops
 
 
-def get_bidirectional_station_order(feed, route_id, service_id='Weekday'):
+def get_bidirectional_station_order(feed, route_id, service_id='Weekday', date=None):
     """
     Get the complete station order including stops that only serve one direction.
     
@@ -252,6 +252,9 @@ def get_bidirectional_station_order(feed, route_id, service_id='Weekday'):
         The route ID (e.g., 'A', 'L', '7')
     service_id : str, default='Weekday'
         Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
     
     Returns:
     --------
@@ -259,8 +262,8 @@ def get_bidirectional_station_order(feed, route_id, service_id='Weekday'):
         Ordered list of (stop_id, stop_name) tuples including all stations
     """
     # Get station orders from both directions
-    order_dir0 = get_station_order(feed, route_id, 0, service_id)
-    order_dir1 = get_station_order(feed, route_id, 1, service_id)
+    order_dir0 = get_station_order(feed, route_id, 0, service_id, date)
+    order_dir1 = get_station_order(feed, route_id, 1, service_id, date)
     
     # Use direction 1 as base (typically has better ordering for display)
     # but add any stations that only appear in direction 0
@@ -292,7 +295,7 @@ def get_bidirectional_station_order(feed, route_id, service_id='Weekday'):
 
 
 def filter_station_order_express(feed, station_order, route_id, direction_id, service_id='Weekday',
-                                  express_boroughs=None, all_stops_boroughs=None):
+                                  express_boroughs=None, all_stops_boroughs=None, date=None):
     """
     Filter station order to show only express stops in certain boroughs.
 
@@ -314,6 +317,9 @@ def filter_station_order_express(feed, station_order, route_id, direction_id, se
     all_stops_boroughs : list, optional
         List of borough names where all stops should be shown
         (e.g., ['Queens'])
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -326,17 +332,15 @@ def filter_station_order_express(feed, station_order, route_id, direction_id, se
     # Import express_local module to get borough mapping
     import express_local as el
 
-    # Create borough mapping
-    stop_boroughs = el.create_stop_borough_mapping(feed)
-    stop_borough_map = dict(zip(stop_boroughs['stop_id'], stop_boroughs['borough']))
+    # Borough mapping (cached per feed)
+    stop_borough_map = el.get_stop_borough_map(feed)
 
     # Get express/local classification for this route
-    patterns = el.analyze_route_express_patterns(feed, route_id, direction_id, service_id)
+    patterns = el.analyze_route_express_patterns(feed, route_id, direction_id, service_id, date=date)
 
     if patterns.empty:
         return station_order
 
-    # Count how many trips stop at each station
     # A stop is only "express" if a significant percentage of trips stop there
     # This filters out late-night/off-peak local stops on otherwise express routes
     #
@@ -348,24 +352,19 @@ def filter_station_order_express(feed, station_order, route_id, direction_id, se
     # excluding legitimate express stops that have <50% service coverage due to branches
     # or service patterns. Consider removing this threshold or making it configurable
     # if it causes problems in the future.
-    from collections import defaultdict
-
     # Get all trips for this route/direction/service
     trips_for_route = feed.trips[
         (feed.trips['route_id'] == route_id) &
         (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
+        service_mask(feed, feed.trips, service_id, date)
     ]
     total_trips = len(trips_for_route)
     trip_ids = set(trips_for_route['trip_id'])
 
     # Count trips per stop
-    stop_trip_counts = defaultdict(int)
     stop_times = feed.stop_times[feed.stop_times['trip_id'].isin(trip_ids)]
-
-    for stop_id in stop_times['stop_id']:
-        normalized_stop_id = normalize_stop_id(feed, stop_id)
-        stop_trip_counts[normalized_stop_id] += 1
+    stations = get_station_lookup(feed)
+    stop_trip_counts = stop_times['stop_id'].map(lambda stop_id: stations.get(stop_id, stop_id)).value_counts()
 
     # A stop is considered "express" if at least 50% of trips stop there
     # This threshold filters out stations like Liberty Av (14%) while keeping
@@ -400,7 +399,7 @@ def filter_station_order_express(feed, station_order, route_id, direction_id, se
     return filtered_order
 
 
-def calculate_travel_time_matrix(feed, route_id, direction_id, service_id='Weekday', canonical_station_order=None):
+def calculate_travel_time_matrix(feed, route_id, direction_id, service_id='Weekday', canonical_station_order=None, date=None):
     """
     Calculate a travel time matrix for a route.
 
@@ -419,6 +418,9 @@ def calculate_travel_time_matrix(feed, route_id, direction_id, service_id='Weekd
         Service ID to filter by
     canonical_station_order : list, optional
         Pre-determined station order to use. If None, will determine from this direction.
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -429,7 +431,7 @@ def calculate_travel_time_matrix(feed, route_id, direction_id, service_id='Weekd
     """
     # Get station ordering
     if canonical_station_order is None:
-        station_order = get_station_order(feed, route_id, direction_id, service_id)
+        station_order = get_station_order(feed, route_id, direction_id, service_id, date)
     else:
         station_order = canonical_station_order
 
@@ -439,73 +441,12 @@ def calculate_travel_time_matrix(feed, route_id, direction_id, service_id='Weekd
     stop_ids = [s[0] for s in station_order]
     stop_names = [s[1] for s in station_order]
 
-    # Get all trips for this route/direction/service
-    trips = feed.trips[
-        (feed.trips['route_id'] == route_id) &
-        (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
-    ].copy()
-
-    # Initialize matrix to store travel times (list of times for each pair)
-    travel_times = defaultdict(list)
-
-    # For each trip, calculate travel times between all pairs of stops
-    for trip_id in trips['trip_id']:
-        stop_times = feed.stop_times[feed.stop_times['trip_id'] == trip_id].sort_values('stop_sequence')
-
-        # Convert to list for easier iteration
-        stops_data = []
-        for _, row in stop_times.iterrows():
-            # Normalize stop ID to parent station
-            normalized_stop_id = normalize_stop_id(feed, row['stop_id'])
-
-            if normalized_stop_id in stop_ids:
-                # Parse time to seconds
-                arrival_parts = row['arrival_time'].split(':')
-                arrival_seconds = int(arrival_parts[0]) * 3600 + int(arrival_parts[1]) * 60 + int(arrival_parts[2])
-
-                departure_parts = row['departure_time'].split(':')
-                departure_seconds = int(departure_parts[0]) * 3600 + int(departure_parts[1]) * 60 + int(departure_parts[2])
-
-                stops_data.append({
-                    'stop_id': normalized_stop_id,
-                    'arrival_seconds': arrival_seconds,
-                    'departure_seconds': departure_seconds
-                })
-
-        # Calculate travel time between each pair of stops on this trip
-        for i, origin in enumerate(stops_data):
-            for j, destination in enumerate(stops_data):
-                if j > i:  # Calculate for the direction this trip is traveling
-                    travel_seconds = destination['arrival_seconds'] - origin['departure_seconds']
-                    travel_minutes = travel_seconds / 60.0
-
-                    # Store the travel time for this pair
-                    pair_key = (origin['stop_id'], destination['stop_id'])
-                    travel_times[pair_key].append(travel_minutes)
-
-    # Calculate average travel times
-    matrix_data = np.full((len(stop_ids), len(stop_ids)), np.nan)
-
-    for i, origin_id in enumerate(stop_ids):
-        for j, dest_id in enumerate(stop_ids):
-            if i == j:
-                matrix_data[i][j] = 0  # Same station = 0 minutes
-            else:
-                # Fill based on actual travel time data (could be upper or lower triangle)
-                pair_key = (origin_id, dest_id)
-                if pair_key in travel_times and travel_times[pair_key]:
-                    matrix_data[i][j] = np.mean(travel_times[pair_key])
-
-    # Create DataFrame with station names as indices
-    # Transpose so columns = departure points, rows = destinations
-    df = pd.DataFrame(matrix_data, index=stop_names, columns=stop_names)
-    df = df.T
-
-    return df
+    # Average trip times between every pair of stations, from the hourly cube
+    cube = get_travel_time_cube(feed, route_id, direction_id, service_id, date)
+    return travel_time_matrix_from_cube(cube, station_order)
 
 
-def calculate_travel_time_matrix_by_hour(feed, route_id, direction_id, hour, service_id='Weekday', canonical_station_order=None):
+def calculate_travel_time_matrix_by_hour(feed, route_id, direction_id, hour, service_id='Weekday', canonical_station_order=None, date=None):
     """
     Calculate a travel time matrix for a route filtered by hour(s) of day.
 
@@ -529,6 +470,9 @@ def calculate_travel_time_matrix_by_hour(feed, route_id, direction_id, hour, ser
         Service ID to filter by
     canonical_station_order : list, optional
         Pre-determined station order to use. If None, will determine from this direction.
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -547,7 +491,7 @@ def calculate_travel_time_matrix_by_hour(feed, route_id, direction_id, hour, ser
     """
     # Get station ordering
     if canonical_station_order is None:
-        station_order = get_station_order(feed, route_id, direction_id, service_id)
+        station_order = get_station_order(feed, route_id, direction_id, service_id, date)
     else:
         station_order = canonical_station_order
 
@@ -557,99 +501,197 @@ def calculate_travel_time_matrix_by_hour(feed, route_id, direction_id, hour, ser
     stop_ids = [s[0] for s in station_order]
     stop_names = [s[1] for s in station_order]
 
-    # Parse hour parameter to determine range
-    if isinstance(hour, tuple) or isinstance(hour, list):
-        hour_start, hour_end = hour
-        hour_range = range(hour_start, hour_end + 1)  # Inclusive range
+    # Average trip times between every pair of stations, from the hourly cube
+    cube = get_travel_time_cube(feed, route_id, direction_id, service_id, date)
+    return travel_time_matrix_from_cube(cube, station_order, hour)
+
+
+def get_travel_time_cube(feed, route_id, direction_id, service_id='Weekday', date=None):
+    """
+    Get summed travel times between every pair of stations, by hour of departure.
+
+    Every trip contributes the time from each of its stops to each later
+    stop, binned by the hour the train leaves the origin (times past 24:00
+    wrap to the early morning hours). Any hour window's average matrix is
+    then a sum over the hour axis divided by the matching trip counts, so
+    matrices for different hour ranges never re-read stop_times.
+
+    The cube is cached per feed, route, direction and service.
+
+    Parameters:
+    -----------
+    feed : gtfs_kit.Feed
+        A GTFS feed object loaded with gtfs_kit
+    route_id : str
+        The route ID (e.g., 'A', 'L', '7')
+    direction_id : int
+        Direction ID (0 or 1)
+    service_id : str, default='Weekday'
+        Service ID to filter by
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
+
+    Returns:
+    --------
+    dict
+        Dictionary with:
+        - 'station_ids': sorted array of the parent stations the route serves
+        - 'sums': float array (24, n, n) of summed travel minutes, indexed
+          [origin departure hour, origin station, destination station]
+        - 'counts': int array (24, n, n) of trips summed into each cell
+    """
+    service_ids = resolve_service_ids(feed, service_id, date)
+    key = ('travel_time_cube', route_id, direction_id,
+           None if service_ids is None else tuple(sorted(service_ids)))
+    cache = get_feed_cache(feed)
+    if key in cache:
+        return cache[key]
+
+    mask = trip_mask(feed, route_id, direction_id, service_ids)
+    stop_times = get_stop_times_table(feed)
+    trip_idx = stop_times['trip_idx'].to_numpy()
+    rows = np.flatnonzero((trip_idx >= 0) & mask[np.maximum(trip_idx, 0)])
+
+    stations = stop_times['station_id'].to_numpy()[rows].astype(object)
+    station_ids = np.unique(stations)
+    codes = np.searchsorted(station_ids, stations)
+    departure_s = stop_times['departure_s'].to_numpy()[rows]
+    arrival_s = stop_times['arrival_s'].to_numpy()[rows]
+
+    # Rows are sorted by trip, then stop_sequence
+    hours = (departure_s // 3600) % 24
+    sums, counts = accumulate_trip_pairs(trip_idx[rows], codes, hours, departure_s, arrival_s, len(station_ids))
+
+    cube = {
+        'station_ids': station_ids,
+        'sums': sums,
+        'counts': counts,
+    }
+    cache[key] = cube
+    return cube
+
+
+def accumulate_trip_pairs(trips, codes, hours, origin_s, destination_s, n_stations):
+    """
+    Sum travel minutes over every (earlier stop, later stop) pair of every trip.
+
+    The rows of one trip must be contiguous and in travel order.
+
+    Parameters:
+    -----------
+    trips : np.ndarray
+        Trip key of each row
+    codes : np.ndarray
+        Station code (0..n_stations-1) of each row
+    hours : np.ndarray
+        Hour bucket (0-23) of each row, used when the row is the origin
+    origin_s, destination_s : np.ndarray
+        Time of each row when used as origin (e.g., departure) and as
+        destination (e.g., arrival), in seconds
+    n_stations : int
+        Number of station codes
+
+    Returns:
+    --------
+    tuple of np.ndarray
+        (sums, counts), each (24, n_stations, n_stations), indexed [origin
+        hour, origin station, destination station]
+    """
+    if len(trips):
+        starts = np.concatenate(([0], np.flatnonzero(trips[1:] != trips[:-1]) + 1))
     else:
-        hour_range = [hour]  # Single hour
+        starts = np.array([], dtype=np.int64)
+    lengths = np.diff(np.append(starts, len(trips)))
 
-    # Get all trips for this route/direction/service
-    trips = feed.trips[
-        (feed.trips['route_id'] == route_id) &
-        (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
-    ].copy()
+    n = n_stations
+    sums = np.zeros(24 * n * n)
+    counts = np.zeros(24 * n * n, dtype=np.int64)
+
+    # Every (earlier stop, later stop) pair of every trip, one trip length at a time
+    for length in np.unique(lengths):
+        if length < 2:
+            continue
+        first, second = np.triu_indices(length, k=1)
+        trip_starts = starts[lengths == length][:, None]
+        origin = (trip_starts + first).ravel()
+        destination = (trip_starts + second).ravel()
+
+        minutes = (destination_s[destination] - origin_s[origin]) / 60.0
+        cells = (hours[origin] * n + codes[origin]) * n + codes[destination]
+
+        sums += np.bincount(cells, weights=minutes, minlength=len(sums))
+        counts += np.bincount(cells, minlength=len(counts))
+
+    return sums.reshape(24, n, n), counts.reshape(24, n, n)
+
+
+def travel_time_matrix_from_cube(cube, station_order, hour=None):
+    """
+    Build a travel time matrix from a travel time cube.
 
-    # Initialize matrix to store travel times (list of times for each pair)
-    travel_times = defaultdict(list)
-
-    # For each trip, calculate travel times between all pairs of stops
-    for trip_id in trips['trip_id']:
-        stop_times = feed.stop_times[feed.stop_times['trip_id'] == trip_id].sort_values('stop_sequence')
-
-        # Convert to list for easier iteration
-        stops_data = []
-        for _, row in stop_times.iterrows():
-            # Normalize stop ID to parent station
-            normalized_stop_id = normalize_stop_id(feed, row['stop_id'])
-
-            if normalized_stop_id in stop_ids:
-                # Parse time to seconds
-                arrival_parts = row['arrival_time'].split(':')
-                arrival_seconds = int(arrival_parts[0]) * 3600 + int(arrival_parts[1]) * 60 + int(arrival_parts[2])
-
-                departure_parts = row['departure_time'].split(':')
-                departure_seconds = int(departure_parts[0]) * 3600 + int(departure_parts[1]) * 60 + int(departure_parts[2])
-                departure_hour = int(departure_parts[0]) % 24  # Handle times >= 24:00:00
-
-                stops_data.append({
-                    'stop_id': normalized_stop_id,
-                    'arrival_seconds': arrival_seconds,
-                    'departure_seconds': departure_seconds,
-                    'departure_hour': departure_hour
-                })
-
-        # Calculate travel time between each pair of stops on this trip
-        # Only include if departure from origin is within the specified hour range
-        for i, origin in enumerate(stops_data):
-            # Check if departure from origin is in the specified hour range
-            if origin['departure_hour'] in hour_range:
-                for j, destination in enumerate(stops_data):
-                    if j > i:  # Calculate for the direction this trip is traveling
-                        travel_seconds = destination['arrival_seconds'] - origin['departure_seconds']
-                        travel_minutes = travel_seconds / 60.0
-
-                        # Store the travel time for this pair
-                        pair_key = (origin['stop_id'], destination['stop_id'])
-                        travel_times[pair_key].append(travel_minutes)
-
-    # Identify stations that actually have data during this hour
-    # A station should be included if it appears in any travel time pair
-    stations_with_data = set()
-    for (origin_id, dest_id) in travel_times.keys():
-        if travel_times[(origin_id, dest_id)]:  # Only if there's actual data
-            stations_with_data.add(origin_id)
-            stations_with_data.add(dest_id)
-
-    # Filter station lists to only include stations with data
-    filtered_stop_ids = []
-    filtered_stop_names = []
-    for stop_id, stop_name in zip(stop_ids, stop_names):
-        if stop_id in stations_with_data:
-            filtered_stop_ids.append(stop_id)
-            filtered_stop_names.append(stop_name)
-
-    # If no stations have data during this hour, return empty DataFrame
-    if not filtered_stop_ids:
+    Gives the same result as calculate_travel_time_matrix() (hour=None) or
+    calculate_travel_time_matrix_by_hour() (hour given) for the cube's route.
+
+    Parameters:
+    -----------
+    cube : dict
+        Output of get_travel_time_cube()
+    station_order : list
+        Ordered list of (stop_id, stop_name) tuples
+    hour : int or tuple of (int, int), optional
+        Hour or inclusive hour range of departure from the origin. If given,
+        stations without any trips in the window are dropped.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Travel time matrix in minutes (columns = origins, rows = destinations)
+    """
+    if not station_order:
         return pd.DataFrame()
 
-    # Calculate average travel times
-    matrix_data = np.full((len(filtered_stop_ids), len(filtered_stop_ids)), np.nan)
+    stop_ids = [s[0] for s in station_order]
+    stop_names = [s[1] for s in station_order]
 
-    for i, origin_id in enumerate(filtered_stop_ids):
-        for j, dest_id in enumerate(filtered_stop_ids):
-            if i == j:
-                matrix_data[i][j] = 0  # Same station = 0 minutes
-            else:
-                # Fill based on actual travel time data (could be upper or lower triangle)
-                pair_key = (origin_id, dest_id)
-                if pair_key in travel_times and travel_times[pair_key]:
-                    matrix_data[i][j] = np.mean(travel_times[pair_key])
+    if hour is None:
+        hours = np.arange(24)
+    elif isinstance(hour, tuple) or isinstance(hour, list):
+        hour_start, hour_end = hour
+        hours = np.array([h for h in range(hour_start, hour_end + 1) if 0 <= h < 24], dtype=np.int64)
+    else:
+        hours = np.array([hour] if 0 <= hour < 24 else [], dtype=np.int64)
+
+    # Position of each ordered station in the cube (-1 if the route never serves it)
+    cube_positions = {station_id: i for i, station_id in enumerate(cube['station_ids'])}
+    positions = np.array([cube_positions.get(stop_id, -1) for stop_id in stop_ids], dtype=np.int64)
+    known = positions >= 0
+
+    n = len(stop_ids)
+    sums = np.zeros((n, n))
+    counts = np.zeros((n, n), dtype=np.int64)
+    if known.any() and len(hours):
+        idx = np.flatnonzero(known)
+        grid = np.ix_(hours, positions[idx], positions[idx])
+        sums[np.ix_(idx, idx)] = cube['sums'][grid].sum(axis=0)
+        counts[np.ix_(idx, idx)] = cube['counts'][grid].sum(axis=0)
+
+    if hour is not None:
+        # Keep only stations that appear in a pair with trips in this window
+        with_data = (counts > 0).any(axis=0) | (counts > 0).any(axis=1)
+        if not with_data.any():
+            return pd.DataFrame()
+        sums = sums[np.ix_(with_data, with_data)]
+        counts = counts[np.ix_(with_data, with_data)]
+        stop_names = [name for name, keep in zip(stop_names, with_data) if keep]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        matrix_data = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    np.fill_diagonal(matrix_data, 0)  # Same station = 0 minutes
 
     # Create DataFrame with station names as indices
     # Transpose so columns = departure points, rows = destinations
-    df = pd.DataFrame(matrix_data, index=filtered_stop_names, columns=filtered_stop_names)
+    df = pd.DataFrame(matrix_data, index=stop_names, columns=stop_names)
     df = df.T
 
     return df
@@ -690,7 +732,7 @@ def load_official_direction_names(csv_path='direction_names.csv'):
         return {}
 
 
-def get_direction_name(feed, route_id, direction_id, service_id='Weekday', csv_path='direction_names.csv'):
+def get_direction_name(feed, route_id, direction_id, service_id='Weekday', csv_path='direction_names.csv', date=None):
     """
     Get a human-readable direction name.
 
@@ -709,6 +751,9 @@ def get_direction_name(feed, route_id, direction_id, service_id='Weekday', csv_p
         Service ID to filter by
     csv_path : str, default='direction_names.csv'
         Path to CSV file with official direction names
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -727,7 +772,7 @@ def get_direction_name(feed, route_id, direction_id, service_id='Weekday', csv_p
     trips = feed.trips[
         (feed.trips['route_id'] == route_id) &
         (feed.trips['direction_id'] == direction_id) &
-        (feed.trips['service_id'] == service_id)
+        service_mask(feed, feed.trips, service_id, date)
     ].copy()
 
     if trips.empty:
@@ -792,22 +837,16 @@ def combine_bidirectional_matrix(matrix_dir0, matrix_dir1):
         matrix_dir0 = matrix_dir0.reindex(index=all_stations, columns=all_stations)
         matrix_dir1 = matrix_dir1.reindex(index=all_stations, columns=all_stations)
     
-    # Start with a copy of direction 0
-    combined = matrix_dir0.copy()
-
     # After transpose:
     # - Direction 0 originally had lower triangle → now has UPPER triangle
     # - Direction 1 originally had upper triangle → now has LOWER triangle
     # So we just need to fill in NaN values from direction 1
-    for i in range(len(combined)):
-        for j in range(len(combined.columns)):
-            if pd.isna(combined.iloc[i, j]) and pd.notna(matrix_dir1.iloc[i, j]):
-                combined.iloc[i, j] = matrix_dir1.iloc[i, j]
+    combined = matrix_dir0.where(matrix_dir0.notna(), matrix_dir1)
 
     return combined
 
 
-def display_bidirectional_matrix(feed, route_id, service_id, canonical_station_order, hour=None):
+def display_bidirectional_matrix(feed, route_id, service_id, canonical_station_order, hour=None, date=None):
     """
     Calculate and combine bidirectional travel time matrices.
 
@@ -839,6 +878,9 @@ def display_bidirectional_matrix(feed, route_id, service_id, canonical_station_o
         - Single int (0-23): filters to that specific hour (e.g., 7 = 7:00-7:59 AM)
         - Tuple (start, end): filters to hour range inclusive (e.g., (7, 9) = 7:00-9:59 AM)
         - None (default): all trips are included regardless of time
+    date : str or datetime.date, optional
+        Calendar date to analyze (e.g., '20241225'). If given, overrides
+        service_id with the services that run on that date.
 
     Returns:
     --------
@@ -911,11 +953,11 @@ def display_bidirectional_matrix(feed, route_id, service_id, canonical_station_o
     # Calculate matrices for both directions using the provided order
     # Use hour-filtered function if hour is specified, otherwise use standard function
     if hour is not None:
-        matrix_dir0 = calculate_travel_time_matrix_by_hour(feed, route_id, 0, hour, service_id, canonical_station_order)
-        matrix_dir1 = calculate_travel_time_matrix_by_hour(feed, route_id, 1, hour, service_id, canonical_station_order)
+        matrix_dir0 = calculate_travel_time_matrix_by_hour(feed, route_id, 0, hour, service_id, canonical_station_order, date=date)
+        matrix_dir1 = calculate_travel_time_matrix_by_hour(feed, route_id, 1, hour, service_id, canonical_station_order, date=date)
     else:
-        matrix_dir0 = calculate_travel_time_matrix(feed, route_id, 0, service_id, canonical_station_order)
-        matrix_dir1 = calculate_travel_time_matrix(feed, route_id, 1, service_id, canonical_station_order)
+        matrix_dir0 = calculate_travel_time_matrix(feed, route_id, 0, service_id, canonical_station_order, date=date)
+        matrix_dir1 = calculate_travel_time_matrix(feed, route_id, 1, service_id, canonical_station_order, date=date)
 
     # Combine the matrices
     combined = combine_bidirectional_matrix(matrix_dir0, matrix_dir1)